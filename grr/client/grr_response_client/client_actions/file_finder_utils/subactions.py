@@ -139,6 +139,9 @@ class DownloadAction(Action):
     chunk_size = self.opts.chunk_size
 
     uploader = uploading.TransferStoreUploader(self.flow, chunk_size=chunk_size)
+    if self.opts.upload_only_missing_chunks:
+      # The server will request the chunks it doesn't have with TransferBuffers.
+      return uploader.HashFilePath(filepath, amount=max_size)
     return uploader.UploadFilePath(filepath, amount=max_size)
 
 
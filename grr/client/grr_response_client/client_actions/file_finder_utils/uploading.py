@@ -59,6 +59,31 @@ class TransferStoreUploader(object):
     return rdf_client_fs.BlobImageDescriptor(
         chunks=chunks, chunk_size=self._streamer.chunk_size)
 
+  def HashFilePath(self, filepath, offset=0, amount=None):
+    """Computes digests of chunks of a file without uploading them.
+
+    This is the first step of the hash-first upload mode: the server checks
+    which of the chunks it already has and requests only the missing ones.
+
+    Args:
+      filepath: A path to the file to hash.
+      offset: An integer offset at which hashing should start on.
+      amount: An upper bound on number of bytes to hash. If it is `None` then
+          the whole file is hashed.
+
+    Returns:
+      A `BlobImageDescriptor` object.
+    """
+    chunk_stream = self._streamer.StreamFilePath(
+        filepath, offset=offset, amount=amount)
+
+    chunks = []
+    for chunk in chunk_stream:
+      chunks.append(_ChunkDescriptor(chunk))
+
+    return rdf_client_fs.BlobImageDescriptor(
+        chunks=chunks, chunk_size=self._streamer.chunk_size)
+
   def UploadChunk(self, chunk):
     """Uploads a single chunk to the transfer store flow.
 
@@ -73,10 +98,14 @@ class TransferStoreUploader(object):
     self._action.ChargeBytesToSession(len(chunk.data))
     self._action.SendReply(blob, session_id=self._TRANSFER_STORE_SESSION_ID)
 
-    return rdf_client_fs.BlobImageChunkDescriptor(
-        digest=hashlib.sha256(chunk.data).digest(),
-        offset=chunk.offset,
-        length=len(chunk.data))
+    return _ChunkDescriptor(chunk)
+
+
+def _ChunkDescriptor(chunk):
+  return rdf_client_fs.BlobImageChunkDescriptor(
+      digest=hashlib.sha256(chunk.data).digest(),
+      offset=chunk.offset,
+      length=len(chunk.data))
 
 
 def _CompressedDataBlob(chunk):
@@ -133,6 +133,31 @@ class UploaderTest(absltest.TestCase):
       self.assertEqual(blobdesc.chunks[2].length, 1)
       self.assertEqual(blobdesc.chunks[2].digest, Sha256("6"))
 
+  def testHashFilePathDoesNotUploadChunks(self):
+    action = FakeAction()
+    uploader = uploading.TransferStoreUploader(action, chunk_size=3)
+
+    with temp.AutoTempFilePath() as temp_filepath:
+      with open(temp_filepath, "w") as temp_file:
+        temp_file.write("1234567")
+
+      blobdesc = uploader.HashFilePath(temp_filepath)
+
+      self.assertEqual(action.charged_bytes, 0)
+      self.assertEmpty(action.messages)
+
+      self.assertLen(blobdesc.chunks, 3)
+      self.assertEqual(blobdesc.chunk_size, 3)
+      self.assertEqual(blobdesc.chunks[0].offset, 0)
+      self.assertEqual(blobdesc.chunks[0].length, 3)
+      self.assertEqual(blobdesc.chunks[0].digest, Sha256("123"))
+      self.assertEqual(blobdesc.chunks[1].offset, 3)
+      self.assertEqual(blobdesc.chunks[1].length, 3)
+      self.assertEqual(blobdesc.chunks[1].digest, Sha256("456"))
+      self.assertEqual(blobdesc.chunks[2].offset, 6)
+      self.assertEqual(blobdesc.chunks[2].length, 1)
+      self.assertEqual(blobdesc.chunks[2].digest, Sha256("7"))
+
   def testIncorrectFile(self):
     action = FakeAction()
     uploader = uploading.TransferStoreUploader(action, chunk_size=10)
@@ -72,6 +72,45 @@ class ReadBuffer(actions.ActionPlugin):
             offset=offset, data=data, length=len(data), pathspec=fd.pathspec))
 
 
+def _TransferBuffer(action, buffer_reference):
+  """Reads a buffer and sends it to the server's TransferStore.
+
+  Args:
+    action: The ActionPlugin transferring the buffer.
+    buffer_reference: A BufferReference of the buffer to transfer.
+
+  Returns:
+    A BufferReference with the offset, length and digest of the transferred
+    data.
+  """
+  # Make sure we limit the size of our output
+  if buffer_reference.length > constants.CLIENT_MAX_BUFFER_SIZE:
+    raise RuntimeError("Can not read buffers this large.")
+
+  data = vfs.ReadVFS(
+      buffer_reference.pathspec,
+      buffer_reference.offset,
+      buffer_reference.length,
+      progress_callback=action.Progress)
+  result = rdf_protodict.DataBlob(
+      data=zlib.compress(data),
+      compression=rdf_protodict.DataBlob.CompressionType.ZCOMPRESSION)
+
+  digest = hashlib.sha256(data).digest()
+
+  # Ensure that the buffer is counted against this response. Check network
+  # send limit.
+  action.ChargeBytesToSession(len(data))
+
+  # Now return the data to the server into the special TransferStore well
+  # known flow.
+  action.grr_worker.SendReply(
+      result, session_id=rdfvalue.SessionID(flow_name="TransferStore"))
+
+  return rdf_client.BufferReference(
+      offset=buffer_reference.offset, length=len(data), data=digest)
+
+
 class TransferBuffer(actions.ActionPlugin):
   """Reads a buffer from a file and returns it to the server efficiently."""
   in_rdfvalue = rdf_client.BufferReference
@@ -79,35 +118,31 @@ class TransferBuffer(actions.ActionPlugin):
 
   def Run(self, args):
     """Reads a buffer on the client and sends it to the server."""
-    # Make sure we limit the size of our output
-    if args.length > constants.CLIENT_MAX_BUFFER_SIZE:
-      raise RuntimeError("Can not read buffers this large.")
+    # Report the hash of the transferred blob to our flow as well as the offset
+    # and length.
+    self.SendReply(_TransferBuffer(self, args))
 
-    data = vfs.ReadVFS(
-        args.pathspec,
-        args.offset,
-        args.length,
-        progress_callback=self.Progress)
-    result = rdf_protodict.DataBlob(
-        data=zlib.compress(data),
-        compression=rdf_protodict.DataBlob.CompressionType.ZCOMPRESSION)
 
-    digest = hashlib.sha256(data).digest()
+class TransferBuffers(actions.ActionPlugin):
+  """Reads multiple buffers and returns them to the server efficiently."""
+  in_rdfvalue = rdf_client.BufferReferences
+  out_rdfvalues = [rdf_client.BufferReference]
 
-    # Ensure that the buffer is counted against this response. Check network
-    # send limit.
-    self.ChargeBytesToSession(len(data))
+  def Run(self, args):
+    """Sends every buffer to the server and reports its hash to the flow.
 
-    # Now return the data to the server into the special TransferStore well
-    # known flow.
-    self.grr_worker.SendReply(
-        result, session_id=rdfvalue.SessionID(flow_name="TransferStore"))
+    Buffers that can't be read are skipped, so that the other buffers are
+    still transferred.
 
-    # Now report the hash of this blob to our flow as well as the offset and
-    # length.
-    self.SendReply(
-        rdf_client.BufferReference(
-            offset=args.offset, length=len(data), data=digest))
+    Args:
+      args: BufferReferences of the buffers to transfer.
+    """
+    for buffer_reference in args:
+      try:
+        self.SendReply(_TransferBuffer(self, buffer_reference))
+      except (IOError, OSError) as e:
+        logging.warning("Failed to transfer a buffer of %s: %s",
+                        buffer_reference.pathspec.CollapsePath(), e)
 
 
 class HashBuffer(actions.ActionPlugin):
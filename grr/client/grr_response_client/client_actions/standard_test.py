@@ -309,6 +309,34 @@ class GetFileStatTest(client_test_lib.EmptyActionTest):
       self.assertEmpty(results[0].ext_attrs)
 
 
+class TestTransferBuffers(client_test_lib.EmptyActionTest):
+  """Test the TransferBuffers client action."""
+
+  def testTransfersAllReadableBuffers(self):
+    with temp.AutoTempFilePath() as temp_filepath:
+      with open(temp_filepath, "wb") as temp_file:
+        temp_file.write(b"foobar")
+
+      pathspec = rdf_paths.PathSpec(
+          path=temp_filepath, pathtype=rdf_paths.PathSpec.PathType.OS)
+      missing_pathspec = rdf_paths.PathSpec(
+          path=temp_filepath + "-missing",
+          pathtype=rdf_paths.PathSpec.PathType.OS)
+      request = rdf_client.BufferReferences([
+          rdf_client.BufferReference(pathspec=pathspec, offset=0, length=3),
+          rdf_client.BufferReference(
+              pathspec=missing_pathspec, offset=0, length=3),
+          rdf_client.BufferReference(pathspec=pathspec, offset=3, length=3),
+      ])
+      results = self.ExecuteAction(standard.TransferBuffers, request)
+
+    status = results.pop()
+    self.assertEqual(status.status, rdf_flows.GrrStatus.ReturnedStatus.OK)
+    self.assertEqual([(r.offset, r.length, r.data) for r in results],
+                     [(0, 3, hashlib.sha256(b"foo").digest()),
+                      (3, 3, hashlib.sha256(b"bar").digest())])
+
+
 class TestNetworkByteLimits(client_test_lib.EmptyActionTest):
   """Test CopyPathToFile client actions."""
 
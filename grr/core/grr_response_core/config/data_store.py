@@ -17,6 +17,69 @@ config_lib.DEFINE_string("Datastore.implementation", "FakeDataStore",
 config_lib.DEFINE_string("Blobstore.implementation", "MemoryStreamBlobStore",
                          "Blob storage subsystem to use.")
 
+config_lib.DEFINE_integer(
+    "Blobstore.cache_max_size",
+    default=0,
+    help="Maximum total size (in bytes) of blobs cached in memory by the "
+    "blob store. 0 disables caching. Every component (e.g. Frontend, Worker, "
+    "AdminUI) can size the cache separately with a context section.")
+
+config_lib.DEFINE_string(
+    "Blobstore.cache_disk_path",
+    default="",
+    help="If set, blobs evicted from the blob store memory cache are moved to "
+    "an on-disk cache in this directory. The directory should not be shared "
+    "between processes.")
+
+config_lib.DEFINE_integer(
+    "Blobstore.cache_disk_max_size",
+    default=0,
+    help="Maximum total size (in bytes) of blobs cached on disk by the blob "
+    "store.")
+
+config_lib.DEFINE_integer(
+    "Blobstore.negative_cache_size",
+    default=10000,
+    help="Maximum number of missing blob ids remembered by the blob store "
+    "cache.")
+
+config_lib.DEFINE_semantic_value(
+    rdfvalue.Duration,
+    "Blobstore.negative_cache_ttl",
+    default="60s",
+    help="Time for which the blob store cache remembers missing blob ids.")
+
+config_lib.DEFINE_string(
+    "LocalDiskBlobStore.path",
+    default="%(Config.prefix)/var/grr-blobstore",
+    help="Root directory of the LocalDiskBlobStore.")
+
+config_lib.DEFINE_integer(
+    "LocalDiskBlobStore.shard_depth",
+    default=2,
+    help="Number of directory levels (each named after the next two hex "
+    "digits of the blob id) used to shard blobs stored by LocalDiskBlobStore.")
+
+config_lib.DEFINE_bool(
+    "LocalDiskBlobStore.fsync",
+    default=True,
+    help="If True, LocalDiskBlobStore syncs every blob to disk before making "
+    "it visible.")
+
+config_lib.DEFINE_bool(
+    "LocalDiskBlobStore.use_bloom_filter",
+    default=True,
+    help="If True, LocalDiskBlobStore answers CheckBlobsExist for unknown "
+    "blobs from an in-memory bloom filter without touching the disk. Blobs "
+    "written by other processes after this one has started may then be "
+    "reported as missing (which only leads to them being written again).")
+
+config_lib.DEFINE_integer(
+    "LocalDiskBlobStore.bloom_filter_capacity",
+    default=10 * 1000 * 1000,
+    help="Expected number of blobs that LocalDiskBlobStore's bloom filter is "
+    "sized for.")
+
 config_lib.DEFINE_string("Database.implementation", "",
                          "Relational database system to use.")
 
@@ -196,6 +259,62 @@ config_lib.DEFINE_integer(
 config_lib.DEFINE_string(
     "Mysql.rel_db_name", default="grr_db", help="Name of the database to use.")
 
+config_lib.DEFINE_integer(
+    "Mysql.conn_pool_idle_timeout", 300,
+    "Pooled connections of the relational database that were idle for longer "
+    "than this many seconds are closed instead of being reused.")
+
+config_lib.DEFINE_integer(
+    "Mysql.conn_pool_max_lifetime", 3600,
+    "Pooled connections of the relational database are closed instead of "
+    "being reused once they are older than this many seconds.")
+
+config_lib.DEFINE_integer(
+    "Mysql.conn_pool_check_after_idle", 10,
+    "Pooled connections of the relational database that were idle for longer "
+    "than this many seconds are pinged before being reused.")
+
+config_lib.DEFINE_string(
+    "Mysql.replica_host", "",
+    "Hostname of a read replica of the relational database. If set, read-only "
+    "transactions are sent to the replica instead of the primary. Reads done "
+    "while processing flows and client messages, API access checks and API "
+    "calls changing the state always go to the primary.")
+
+config_lib.DEFINE_integer(
+    "Mysql.replica_port", 0,
+    "Port of the read replica. If 0, Mysql.port is used.")
+
+config_lib.DEFINE_string(
+    "Mysql.replica_username", "",
+    "The user to connect to the read replica with. If empty, "
+    "Mysql.database_username is used.")
+
+config_lib.DEFINE_string(
+    "Mysql.replica_password", "",
+    "The password to connect to the read replica with. If empty, "
+    "Mysql.database_password is used.")
+
+config_lib.DEFINE_integer(
+    "Mysql.replica_sticky_after_write", 10,
+    "After a thread writes to the relational database, its read-only "
+    "transactions stay on the primary for this many seconds so that it reads "
+    "its own writes despite replication lag. 0 disables this.")
+
+config_lib.DEFINE_float(
+    "Mysql.queue_poll_min_delay", 0.1,
+    "Minimum time in seconds between polls of an empty request queue (flow "
+    "processing and message handler requests).")
+
+config_lib.DEFINE_float(
+    "Mysql.queue_poll_max_delay", 5,
+    "Maximum time in seconds between polls of an empty request queue. The "
+    "delay doubles on every empty poll, up to this value.")
+
+config_lib.DEFINE_integer(
+    "Mysql.flow_processing_lease_batch_size", 50,
+    "Maximum number of flow processing requests leased with a single query.")
+
 # Support for MySQL SSL connections.
 
 config_lib.DEFINE_string(
@@ -215,6 +334,35 @@ config_lib.DEFINE_string(
     "This option, if used, must specify the same certificate used by the "
     "server.")
 
+# SQLite relational database.
+config_lib.DEFINE_string(
+    "Sqlite.path",
+    default="%(Config.prefix)/var/grr-server.sqlite",
+    help="Path of the database file of the SQLite relational database.")
+
+config_lib.DEFINE_float(
+    "Sqlite.busy_timeout", 30,
+    "Time in seconds a transaction waits for a lock held by another "
+    "connection to the SQLite database before failing.")
+
+config_lib.DEFINE_integer(
+    "Sqlite.cached_statements", 256,
+    "Number of prepared statements cached per SQLite connection.")
+
+config_lib.DEFINE_float(
+    "Sqlite.queue_poll_min_delay", 0.1,
+    "Minimum time in seconds between polls of an empty request queue of the "
+    "SQLite database.")
+
+config_lib.DEFINE_float(
+    "Sqlite.queue_poll_max_delay", 5,
+    "Maximum time in seconds between polls of an empty request queue of the "
+    "SQLite database.")
+
+config_lib.DEFINE_integer(
+    "Sqlite.flow_processing_lease_batch_size", 50,
+    "Maximum number of flow processing requests leased with a single query.")
+
 # CloudBigTable data store.
 config_lib.DEFINE_string(
     "CloudBigtable.project_id",
@@ -121,6 +121,47 @@ config_lib.DEFINE_integer(
     "Maximum time messages remain valid within the "
     "system.")
 
+config_lib.DEFINE_integer(
+    "Frontend.cipher_cache_size", 50000,
+    "Maximum number of outbound session ciphers the frontend keeps cached, "
+    "keyed by client id. Reusing a cipher saves the RSA signing and "
+    "encryption of a new session key on every client poll. 0 disables the "
+    "cache.")
+
+config_lib.DEFINE_semantic_value(
+    rdfvalue.Duration, "Frontend.cipher_cache_ttl", "1h",
+    "Time after which a cached outbound session cipher is replaced by a "
+    "fresh one.")
+
+config_lib.DEFINE_semantic_value(
+    rdfvalue.Duration, "Frontend.public_key_cache_warmup_window", "1d",
+    "On startup, the frontend preloads the public keys of all clients that "
+    "pinged within this time window. 0 disables the warm-up.")
+
+config_lib.DEFINE_integer(
+    "Frontend.ingestion_batch_max_messages", 1000,
+    "Maximum number of client messages the frontend writes to the database "
+    "in a single batch. Messages of concurrent client polls are batched "
+    "together.")
+
+config_lib.DEFINE_integer(
+    "Frontend.ingestion_batch_max_delay_ms", 0,
+    "Maximum time in milliseconds a client poll waits for other polls to "
+    "join its batch of database writes. With 0, polls are only batched while "
+    "a previous batch is being written.")
+
+config_lib.DEFINE_semantic_value(
+    rdfvalue.Duration, "Frontend.client_metadata_flush_interval", "5s",
+    "The frontend buffers the last ping, clock and ip of polling clients and "
+    "writes them to the database in bulk at this interval. A client's first "
+    "contact and ip changes are always written immediately. 0 disables the "
+    "buffering.")
+
+config_lib.DEFINE_integer(
+    "Frontend.client_metadata_buffer_size", 10000,
+    "Maximum number of clients with buffered metadata. The buffer is written "
+    "to the database early once it holds this many clients.")
+
 config_lib.DEFINE_bool(
     "Server.initialized", False, "True once config_updater initialize has been "
     "run at least once.")
@@ -249,6 +290,12 @@ config_lib.DEFINE_string(
     help="Inactive clients marked with "
     "this label will be retained forever.")
 
+config_lib.DEFINE_semantic_value(
+    rdfvalue.Duration, "Foreman.rules_cache_ttl", "10s",
+    "The foreman keeps compiled foreman rules in memory and checks whether "
+    "they changed in the database at most this often. New hunts reach clients "
+    "with this delay at most. 0 checks on every foreman run.")
+
 config_lib.DEFINE_integer(
     "Hunt.default_crash_limit",
     default=100,
@@ -277,6 +324,32 @@ config_lib.DEFINE_integer(
     "If the average network usage per client becomes "
     "greater than this limit, the hunt gets stopped.")
 
+config_lib.DEFINE_bool(
+    "Hunt.schedule_on_fleet_at_start", False,
+    "If True, ScheduleHuntsOnFleetCronJob evaluates the client rules of every "
+    "started hunt against all the recently seen clients and schedules the "
+    "hunt's flows for the matching ones instead of waiting for every client's "
+    "foreman check. Starting a hunt doesn't wait for this.")
+
+config_lib.DEFINE_semantic_value(
+    rdfvalue.Duration, "Hunt.fleet_scheduling_ping_window", "1d",
+    "Only clients that were seen within this window are scheduled when a hunt "
+    "is scheduled on the fleet. Other clients get the hunt through the "
+    "foreman once they come back online.")
+
+config_lib.DEFINE_integer(
+    "Hunt.fleet_scheduling_batch_size", 1000,
+    "Number of clients read and evaluated at once when a hunt is scheduled on "
+    "the fleet.")
+
+config_lib.DEFINE_semantic_value(
+    rdfvalue.Duration, "ClientIndex.bitmap_index_ttl", "10m",
+    "Every server process keeps an in-memory bitmap index of client labels, "
+    "operating systems, versions and last pings that is updated by the "
+    "process' own writes. It is rebuilt from the database in the background "
+    "this often to pick up writes of other processes. 0 rebuilds it "
+    "synchronously on every use.")
+
 # Fleetspeak server-side integration flags.
 config_lib.DEFINE_string(
     "Server.fleetspeak_message_listen_address", "",
@@ -321,6 +321,11 @@ class Communicator(with_metaclass(abc.ABCMeta, object)):
     self.server_cipher_age = rdfvalue.RDFDatetime.Now()
     return self.server_cipher
 
+  def _GetRemoteCipher(self, destination):
+    """Returns a cipher for sending messages to the given destination."""
+    remote_public_key = self._GetRemotePublicKey(destination)
+    return Cipher(self.common_name, self.private_key, remote_public_key)
+
   def EncodeMessages(self,
                      message_list,
                      result,
@@ -360,8 +365,7 @@ class Communicator(with_metaclass(abc.ABCMeta, object)):
       # it's the only cipher it ever uses.
       cipher = self._GetServerCipher()
     else:
-      remote_public_key = self._GetRemotePublicKey(destination)
-      cipher = Cipher(self.common_name, self.private_key, remote_public_key)
+      cipher = self._GetRemoteCipher(destination)
 
     # Make a nonce for this transaction
     if timestamp is None:
@@ -444,7 +448,9 @@ class Communicator(with_metaclass(abc.ABCMeta, object)):
       raise DecodingError("Compression scheme not supported")
 
     try:
-      result = rdf_flows.MessageList.FromSerializedString(data)
+      # Messages are only split from the decompressed data as they are read,
+      # and unchanged ones are copied out of it as is when stored.
+      result = rdf_flows.MessageList.FromSerializedBuffer(data)
     except rdfvalue.DecodeError:
       raise DecodingError("RDFValue parsing failed.")
 
@@ -499,7 +505,7 @@ class Communicator(with_metaclass(abc.ABCMeta, object)):
     # Decrypt the message with the per packet IV.
     plain = cipher.Decrypt(response_comms.encrypted, response_comms.packet_iv)
     try:
-      packed_message_list = rdf_flows.PackedMessageList.FromSerializedString(
+      packed_message_list = rdf_flows.PackedMessageList.FromSerializedBuffer(
           plain)
     except rdfvalue.DecodeError as e:
       raise DecryptionError(e)
@@ -7,11 +7,13 @@ from __future__ import unicode_literals
 
 from future.builtins import range
 from future.utils import iteritems
+import mock
 from typing import Text
 
 from grr_response_core.lib import flags
 from grr_response_core.lib import type_info
 from grr_response_core.lib.rdfvalues import client as rdf_client
+from grr_response_core.lib.rdfvalues import flows as rdf_flows
 from grr_response_core.lib.rdfvalues import structs as rdf_structs
 from grr_response_proto import jobs_pb2
 from grr_response_proto import knowledge_base_pb2
@@ -347,6 +349,56 @@ class RDFValueBenchmark(benchmark_test_lib.AverageMicroBenchmarks):
     self.TimeIt(RDFStructDecodeEncode)
     self.TimeIt(ProtoDecodeEncode)
 
+  def _TimeMessageListDecoding(self, name, payload):
+    """Times eager and lazy decoding of a MessageList with given payloads."""
+    repeats = self.REPEATS // 50
+    message_list = rdf_flows.MessageList()
+    for i in range(self.REPEATS):
+      message_list.job.Append(
+          session_id="aff4:/flows/W:1234",
+          name="foobar",
+          request_id=i,
+          payload=payload)
+
+    data = message_list.SerializeToString()
+
+    # Frontends mark every decoded message as authenticated and write it to the
+    # database (see Communicator.DecodeMessages()). The payloads are not
+    # modified.
+    def Decode(from_serialized):
+      decoded = from_serialized(data)
+      for message in decoded.job:
+        message.auth_state = message.AuthorizationState.AUTHENTICATED
+        message.source = "C.1000000000000000"
+        message.SerializeToString()
+
+    def EagerDecode():
+      Decode(rdf_flows.MessageList.FromSerializedString)
+
+    def LazyDecode():
+      Decode(rdf_flows.MessageList.FromSerializedBuffer)
+
+    # pylint: disable=protected-access
+    if rdf_structs._semantic:
+      self.TimeIt(
+          EagerDecode, "Eager %s Decode (_semantic)" % name,
+          repetitions=repeats)
+
+    with mock.patch.object(rdf_structs, "SplitBuffer",
+                           rdf_structs._PythonSplitBuffer):
+      self.TimeIt(
+          EagerDecode, "Eager %s Decode (Python)" % name, repetitions=repeats)
+    # pylint: enable=protected-access
+
+    self.TimeIt(LazyDecode, "Lazy %s Decode" % name, repetitions=repeats)
+
+  def testDecodeLargeMessageList(self):
+    """Compare eager and lazy decoding of a large MessageList."""
+    self._TimeMessageListDecoding("Small Payloads",
+                                  rdf_client.User(**self.USER_ACCOUNT))
+    self._TimeMessageListDecoding(
+        "4KiB Payloads",
+        rdf_client.BufferReference(offset=0, length=4096, data=b"x" * 4096))
 
 def main(argv):
   # Run the full test suite
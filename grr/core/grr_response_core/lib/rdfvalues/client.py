@@ -340,6 +340,11 @@ class BufferReference(rdf_structs.RDFProtoStruct):
     return self.data == other
 
 
+class BufferReferences(rdf_protodict.RDFValueArray):
+  """A list of buffer references."""
+  rdf_type = BufferReference
+
+
 class Process(rdf_structs.RDFProtoStruct):
   """Represent a process on the client."""
   protobuf = sysinfo_pb2.Process
@@ -7,6 +7,7 @@ from __future__ import unicode_literals
 
 import base64
 import copy
+import operator
 import struct
 
 from future.builtins import chr
@@ -207,6 +208,109 @@ def SplitBuffer(buff, index=0, length=None):
       raise rdfvalue.DecodeError("Unexpected Tag.")
 
 
+class _BufferSlice(tuple):
+  """A (buffer, start, end) slice of a buffer a protobuf was lazily parsed from.
+
+  Only offsets into the immutable bytes of the buffer are recorded. The data is
+  copied out of the buffer when the field is decoded or serialized. Slices are
+  immutable, so copies of a protobuf share them.
+  """
+
+  __slots__ = ()
+
+  buffer = property(operator.itemgetter(0))
+  start = property(operator.itemgetter(1))
+  end = property(operator.itemgetter(2))
+
+  def tobytes(self):  # pylint: disable=invalid-name
+    buff, start, end = self
+    return buff[start:end]
+
+  def __copy__(self):
+    return self
+
+  def __deepcopy__(self, memo):
+    return self
+
+  def __reduce__(self):
+    # Only the slice is pickled and not the whole buffer.
+    return bytes, (self.tobytes(),)
+
+  def __repr__(self):
+    return "<_BufferSlice [%d:%d]>" % (self.start, self.end)
+
+
+# This function is HOT.
+def _SplitBufferSlice(buffer_slice):
+  """Parses a slice of a buffer as a protobuf without copying its fields.
+
+  This is the same as SplitBuffer(), but yields offsets into the buffer
+  instead of copies of the fields' data.
+
+  Args:
+    buffer_slice: The _BufferSlice to parse.
+
+  Yields:
+    Tuples of (encoded_tag, encoded_length, buffer_slice), where the last item
+    is a _BufferSlice of the field's data.
+  """
+  buff, index, end = buffer_slice
+  while index < end:
+    # Almost all tags fit into a single byte.
+    encoded_tag = buff[index]
+    if ORD_MAP_AND_0X80[encoded_tag]:
+      encoded_tag, data_index = ReadTag(buff, index)
+    else:
+      data_index = index + 1
+
+    tag_type = ORD_MAP[encoded_tag[0]] & TAG_TYPE_MASK
+    if tag_type == WIRETYPE_VARINT:
+      _, index = VarintReader(buff, data_index)
+      yield (encoded_tag, b"", _BufferSlice((buff, data_index, index)))
+
+    elif tag_type == WIRETYPE_FIXED64:
+      index = data_index + 8
+      yield (encoded_tag, b"", _BufferSlice((buff, data_index, index)))
+
+    elif tag_type == WIRETYPE_FIXED32:
+      index = data_index + 4
+      yield (encoded_tag, b"", _BufferSlice((buff, data_index, index)))
+
+    elif tag_type == WIRETYPE_LENGTH_DELIMITED:
+      length, start = VarintReader(buff, data_index)
+      index = start + length
+      yield (encoded_tag, buff[data_index:start],
+             _BufferSlice((buff, start, index)))
+
+    else:
+      raise rdfvalue.DecodeError("Unexpected Tag.")
+
+  if index > end:
+    raise rdfvalue.DecodeError("Field exceeds the buffer.")
+
+
+def _SplitBufferOrSlice(buff):
+  """Splits a buffer or a _BufferSlice into wire formats of its fields."""
+  if buff.__class__ is _BufferSlice:
+    return _SplitBufferSlice(buff)
+  return SplitBuffer(buff)
+
+
+def _WireFormatToBytes(wire_format):
+  """Copies the data of a lazily parsed wire format out of its buffer."""
+  encoded_tag, encoded_length, buffer_slice = wire_format
+  return (encoded_tag, encoded_length, buffer_slice.tobytes())
+
+
+def _ConvertFromWireFormat(type_descriptor, wire_format, container):
+  """Decodes a wire format, copying lazily parsed data only if needed."""
+  if (wire_format[2].__class__ is _BufferSlice and
+      not type_descriptor.accepts_buffer_slices):
+    wire_format = _WireFormatToBytes(wire_format)
+
+  return type_descriptor.ConvertFromWireFormat(wire_format, container=container)
+
+
 def _SerializeEntries(entries):
   """Serializes given triplets of python and wire values and a descriptor."""
 
@@ -216,6 +320,10 @@ def _SerializeEntries(entries):
     if wire_format is None or (python_format and
                                type_descriptor.IsDirty(python_format)):
       wire_format = type_descriptor.ConvertToWireFormat(python_format)
+    elif wire_format[2].__class__ is _BufferSlice:
+      # Unchanged lazily parsed fields are copied out of the buffer as is.
+      encoded_tag, encoded_length, (buff, start, end) = wire_format
+      wire_format = (encoded_tag, encoded_length, buff[start:end])
 
     precondition.AssertIterableType(wire_format, bytes)
     output.extend(wire_format)
@@ -224,14 +332,26 @@ def _SerializeEntries(entries):
 
 
 def ReadIntoObject(buff, index, value_obj, length=0):
-  """Reads all tags until the next end group and store in the value_obj."""
+  """Reads all tags until the next end group and store in the value_obj.
+
+  Args:
+    buff: The buffer to parse. If it is a _BufferSlice, fields are not copied
+      out of the underlying buffer and index and length are ignored.
+    index: The position to start parsing.
+    value_obj: The RDFStruct to store the fields in.
+    length: Optional length to parse until.
+  """
   raw_data = value_obj.GetRawData()
   count = 0
 
+  if buff.__class__ is _BufferSlice:
+    fields = _SplitBufferSlice(buff)
+  else:
+    fields = SplitBuffer(buff, index=index, length=length)
+
   # Split the buffer into tags and wire_format representations, then collect
   # these into the raw data cache.
-  for (encoded_tag, encoded_length, encoded_field) in SplitBuffer(
-      buff, index=index, length=length):
+  for (encoded_tag, encoded_length, encoded_field) in fields:
 
     type_info_obj = value_obj.type_infos_by_encoded_tag.get(encoded_tag)
 
@@ -269,6 +389,8 @@ def ReadIntoObject(buff, index, value_obj, length=0):
 
 
 # pylint: disable=invalid-name
+# Kept for comparing the accelerated and the pure Python implementations.
+_PythonSplitBuffer = SplitBuffer
 if _semantic:
   VarintEncode = _semantic.varint_encode
   VarintReader = _semantic.varint_decode
@@ -342,6 +464,10 @@ class ProtoType(type_info.TypeInfoObject):
     self.tag = self.field_number << 3 | self.wire_type
     self.encoded_tag = VarintEncode(self.tag)
 
+  # Whether ConvertFromWireFormat() accepts wire formats whose data is a
+  # _BufferSlice. Other types get the data copied out of the buffer first.
+  accepts_buffer_slices = False
+
   def IsDirty(self, unused_python_format):
     """Return and clear the dirty state of the python object."""
     return False
@@ -857,6 +983,8 @@ class ProtoEmbedded(ProtoType):
   # the owner protobuf.
   set_default_on_access = True
 
+  accepts_buffer_slices = True
+
   def __init__(self, nested=None, **kwargs):
     super(ProtoEmbedded, self).__init__(**kwargs)
 
@@ -888,6 +1016,11 @@ class ProtoEmbedded(ProtoType):
     result = self.type()
     ReadIntoObject(value[2], 0, result)
 
+    # A lazily parsed message is unchanged until it is modified, so it can be
+    # serialized by copying its slice of the buffer.
+    if value[2].__class__ is _BufferSlice:
+      result.dirty = False
+
     return result
 
   def ConvertToWireFormat(self, value):
@@ -1026,6 +1159,8 @@ class ProtoDynamicAnyValueEmbedded(ProtoDynamicEmbedded):
 
   proto_type_name = "google.protobuf.Any"
 
+  accepts_buffer_slices = True
+
   WRAPPER_BY_TYPE = {
       "bytes": wrappers_pb2.BytesValue,
       "string": wrappers_pb2.StringValue,
@@ -1155,9 +1290,10 @@ class RepeatedFieldHelper(object):
     if self.dirty:
       return True
 
-    # If any of the items is dirty we are also dirty.
+    # If any of the items is dirty we are also dirty. Items that were not
+    # decoded yet can't be.
     for item in self.wrapped_list:
-      if self.type_descriptor.IsDirty(item[0]):
+      if item[0] is not None and self.type_descriptor.IsDirty(item[0]):
         self.dirty = True
         return True
 
@@ -1213,8 +1349,8 @@ class RepeatedFieldHelper(object):
 
     python_format, wire_format = self.wrapped_list[item]
     if python_format is None:
-      python_format = self.type_descriptor.ConvertFromWireFormat(
-          wire_format, container=self.container)
+      python_format = _ConvertFromWireFormat(
+          self.type_descriptor, wire_format, container=self.container)
 
       self.wrapped_list[item] = (python_format, wire_format)
 
@@ -1279,6 +1415,8 @@ class ProtoList(ProtoType):
   # TODO
   set_default_on_access = True
 
+  accepts_buffer_slices = True
+
   def __init__(self, delegate, labels=None, **kwargs):
     self.delegate = delegate
     if not isinstance(delegate, ProtoType):
@@ -1330,7 +1468,7 @@ class ProtoList(ProtoType):
 
   def ConvertFromWireFormat(self, value, container=None):
     result = RepeatedFieldHelper(type_descriptor=self.delegate)
-    for wire_format in SplitBuffer(value[2]):
+    for wire_format in _SplitBufferOrSlice(value[2]):
       result.wrapped_list.append((None, wire_format))
 
     return result
@@ -1760,6 +1898,32 @@ class RDFStruct(with_metaclass(RDFStructMetaclass, rdfvalue.RDFValue)):
     ReadIntoObject(string, 0, self)
     self.dirty = True
 
+  def ParseFromBuffer(self, buff):
+    """Lazily parses a serialized protobuf without copying its fields.
+
+    Only field offsets into the buffer are recorded. Fields and nested
+    messages are decoded on first access, and unchanged ones are serialized
+    again by copying their slice of the buffer. The buffer is kept alive by
+    the parsed object.
+
+    Args:
+      buff: A bytes object (or any other object supporting the buffer
+        protocol, which is copied once) holding the serialized protobuf.
+    """
+    if not isinstance(buff, bytes):
+      buff = memoryview(buff).tobytes()
+    ReadIntoObject(_BufferSlice((buff, 0, len(buff))), 0, self)
+    self.dirty = True
+
+  @classmethod
+  def FromSerializedBuffer(cls, buff, age=None):
+    """Lazily parses a serialized protobuf, see ParseFromBuffer()."""
+    res = cls()
+    res.ParseFromBuffer(buff)
+    if age:
+      res.age = age
+    return res
+
   def ParseFromDatastore(self, value):
     precondition.AssertType(value, bytes)
     self.ParseFromString(value)
@@ -1787,8 +1951,8 @@ class RDFStruct(with_metaclass(RDFStructMetaclass, rdfvalue.RDFValue)):
     for k, (python_format, wire_format, type_descriptor) in sorted(
         iteritems(self.GetRawData())):
       if python_format is None:
-        python_format = type_descriptor.ConvertFromWireFormat(
-            wire_format, container=self)
+        python_format = _ConvertFromWireFormat(
+            type_descriptor, wire_format, container=self)
 
       # Skip printing of unknown fields.
       if isinstance(k, string_types):
@@ -1859,8 +2023,8 @@ class RDFStruct(with_metaclass(RDFStructMetaclass, rdfvalue.RDFValue)):
 
     # Decode on demand and cache for next time.
     if python_format is None:
-      python_format = type_descriptor.ConvertFromWireFormat(
-          wire_format, container=self)
+      python_format = _ConvertFromWireFormat(
+          type_descriptor, wire_format, container=self)
 
       self._data[attr] = (python_format, wire_format, type_descriptor)
 
@@ -6,6 +6,8 @@ from __future__ import absolute_import
 from __future__ import division
 from __future__ import unicode_literals
 
+import copy
+import pickle
 import random
 
 from builtins import range  # pylint: disable=redefined-builtin
@@ -355,6 +357,85 @@ class RDFStructsTest(rdf_test_base.RDFValueTestMixin, test_lib.GRRBaseTest):
     # Check that nested fields are also preserved.
     self.assertEqual(decoded_tested.nested.foobar, "goodbye")
 
+  def _GenerateNestedSample(self):
+    sample = TestStruct(foobar="foo", int=1, repeated=["a", "b"], float=2.5)
+    sample.nested.foobar = "nested"
+    sample.nested.nested.int = 3
+    sample.repeat_nested.Append(foobar="first", urn="aff4:/first")
+    sample.repeat_nested.Append(foobar="second", type="FIRST")
+    return sample
+
+  def testFromSerializedBuffer(self):
+    sample = self._GenerateNestedSample()
+    data = sample.SerializeToString()
+
+    parsed = TestStruct.FromSerializedBuffer(data)
+    self.assertEqual(parsed, sample)
+    self.assertEqual(parsed.foobar, "foo")
+    self.assertEqual(parsed.repeated, ["a", "b"])
+    self.assertEqual(parsed.nested.nested.int, 3)
+    self.assertEqual(parsed.repeat_nested[0].urn, rdfvalue.RDFURN("first"))
+    self.assertEqual(parsed.repeat_nested[1].type, 1)
+
+  def testFromSerializedBufferDoesNotCopyNestedFields(self):
+    data = self._GenerateNestedSample().SerializeToString()
+
+    parsed = TestStruct.FromSerializedBuffer(data)
+    nested_slice = parsed.GetRawData()["nested"][1][2]
+    foobar_slice = parsed.nested.GetRawData()["foobar"][1][2]
+
+    # Both fields point into the original buffer.
+    self.assertIs(foobar_slice.buffer, data)
+    self.assertIs(nested_slice.buffer, data)
+    self.assertEqual(foobar_slice.tobytes(), b"nested")
+
+  def testFromSerializedBufferReserializesUnchangedFields(self):
+    data = self._GenerateNestedSample().SerializeToString()
+
+    parsed = TestStruct.FromSerializedBuffer(data)
+    self.assertEqual(parsed.nested.foobar, "nested")
+    self.assertEqual(parsed.repeat_nested[1].foobar, "second")
+    self.assertFalse(parsed.repeat_nested.IsDirty())
+
+    self.assertEqual(parsed.SerializeToString(), data)
+
+  def testFromSerializedBufferReserializesModifiedFields(self):
+    data = self._GenerateNestedSample().SerializeToString()
+
+    parsed = TestStruct.FromSerializedBuffer(data)
+    parsed.nested.nested.int = 4
+    parsed.repeat_nested[0].foobar = "changed"
+
+    reparsed = TestStruct.FromSerializedString(parsed.SerializeToString())
+    self.assertEqual(reparsed.nested.nested.int, 4)
+    self.assertEqual(reparsed.nested.foobar, "nested")
+    self.assertEqual(reparsed.repeat_nested[0].foobar, "changed")
+    self.assertEqual(reparsed.repeat_nested[1].foobar, "second")
+
+  def testFromSerializedBufferPreservesUnknownFields(self):
+    data = self._GenerateNestedSample().SerializeToString()
+
+    reduced = PartialTest1.FromSerializedBuffer(data)
+    self.assertEqual(reduced.int, 1)
+
+    decoded = TestStruct.FromSerializedString(reduced.SerializeToString())
+    self.assertEqual(decoded.foobar, "foo")
+    self.assertEqual(decoded.nested.foobar, "nested")
+
+  def testFromSerializedBufferCopies(self):
+    sample = self._GenerateNestedSample()
+    parsed = TestStruct.FromSerializedBuffer(sample.SerializeToString())
+
+    self.assertEqual(parsed.Copy(), sample)
+    self.assertEqual(copy.deepcopy(parsed), sample)
+    self.assertEqual(pickle.loads(pickle.dumps(parsed)), sample)
+
+  def testFromSerializedBufferRaisesOnTruncatedData(self):
+    data = TestStruct(foobar="hello").SerializeToString()
+
+    with self.assertRaises(rdfvalue.DecodeError):
+      TestStruct.FromSerializedBuffer(data[:-1])
+
   def testRDFStruct(self):
     tested = TestStruct()
 
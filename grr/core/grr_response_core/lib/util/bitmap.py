@@ -0,0 +1,329 @@
+#!/usr/bin/env python
+"""A compressed bitmap of non-negative integers.
+
+The bitmap follows the layout of roaring bitmaps: values are partitioned by
+their high bits into containers of 2^16 values each. A container holding at
+most `_MAX_ARRAY_SIZE` values is a sorted list of their low 16 bits, a fuller
+container is a bitset stored as a Python integer. Sparse sets stay small, and
+set operations on dense sets boil down to bitwise operations on integers, which
+Python runs in native code.
+
+Unlike in roaring bitmaps, bitsets are not converted back to arrays when they
+become sparse: counting the bits of a Python integer costs far more than the
+bitwise operation itself. Bitmaps holding the same values may therefore have
+different containers, so equality compares values.
+"""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import unicode_literals
+
+import binascii
+import bisect
+
+from future.builtins import range
+from future.utils import iteritems
+from typing import Dict, Iterable, Iterator, List, Optional, Union
+
+_CONTAINER_BITS = 16
+_CONTAINER_BYTES = (1 << _CONTAINER_BITS) // 8
+_LOW_MASK = (1 << _CONTAINER_BITS) - 1
+# Containers with more values are stored as bitsets. A bitset container takes
+# 8 KiB, the same as an array of this many 16-bit values.
+_MAX_ARRAY_SIZE = 4096
+
+# Offsets of bits that are set in each byte value.
+_BYTE_OFFSETS = [[offset
+                  for offset in range(8)
+                  if byte & (1 << offset)]
+                 for byte in range(256)]
+
+# Either a sorted list of low bits or a non-zero bitset.
+_Container = Union[List[int], int]
+
+
+def _PopCount(bits):
+  return bin(bits).count("1")
+
+
+def _BitsToBytes(bits):
+  """Returns bytes of a bitset, least significant byte first."""
+  digits = "%0*x" % (_CONTAINER_BYTES * 2, bits)
+  result = bytearray(binascii.unhexlify(digits))
+  result.reverse()
+  return result
+
+
+def _ArrayToBits(array):
+  # Setting bits of a bytearray and converting it once is much faster than
+  # setting bits of a long integer one by one.
+  buf = bytearray(_CONTAINER_BYTES)
+  for low in array:
+    buf[low >> 3] |= 1 << (low & 7)
+  buf.reverse()
+  return int(binascii.hexlify(bytes(buf)), 16)
+
+
+def _BitsToArray(bits):
+  # type: (int) -> List[int]
+  """Returns a sorted list of positions of set bits."""
+  result = []
+  for i, byte in enumerate(_BitsToBytes(bits)):
+    if byte:
+      base = i * 8
+      for offset in _BYTE_OFFSETS[byte]:
+        result.append(base + offset)
+  return result
+
+
+def _Filter(array, bits, keep_set):
+  """Returns values of an array that are (or are not) set in a bitset."""
+  buf = _BitsToBytes(bits)
+  if keep_set:
+    result = [low for low in array if buf[low >> 3] & (1 << (low & 7))]
+  else:
+    result = [low for low in array if not buf[low >> 3] & (1 << (low & 7))]
+  return result or None
+
+
+def _And(left, right):
+  """Intersects two containers."""
+  if isinstance(left, list):
+    if isinstance(right, list):
+      return sorted(set(left).intersection(right)) or None
+    return _Filter(left, right, True)
+
+  if isinstance(right, list):
+    return _Filter(right, left, True)
+  return left & right or None
+
+
+def _Or(left, right):
+  """Unites two containers."""
+  if isinstance(left, list):
+    if isinstance(right, list):
+      result = sorted(set(left).union(right))
+      if len(result) > _MAX_ARRAY_SIZE:
+        return _ArrayToBits(result)
+      return result
+    return right | _ArrayToBits(left)
+
+  if isinstance(right, list):
+    return left | _ArrayToBits(right)
+  return left | right
+
+
+def _Sub(left, right):
+  """Returns values of the left container missing from the right one."""
+  if isinstance(left, list):
+    if isinstance(right, list):
+      right = set(right)
+      return [low for low in left if low not in right] or None
+    return _Filter(left, right, False)
+
+  if isinstance(right, list):
+    right = _ArrayToBits(right)
+  return left & ~right or None
+
+
+def _Len(container):
+  if isinstance(container, list):
+    return len(container)
+  return _PopCount(container)
+
+
+def _AsBits(container):
+  if isinstance(container, list):
+    return _ArrayToBits(container)
+  return container
+
+
+def _Copy(container):
+  if isinstance(container, list):
+    return list(container)
+  return container
+
+
+class Bitmap(object):
+  """A set of non-negative integers stored as a roaring bitmap."""
+
+  def __init__(self, values=None):
+    # type: (Optional[Iterable[int]]) -> None
+    # Maps the high bits of values to their non-empty container.
+    self._containers = {}  # type: Dict[int, _Container]
+
+    if values is not None:
+      for value in values:
+        self.Add(value)
+
+  @classmethod
+  def _FromContainers(cls, containers):
+    result = cls()
+    result._containers = containers
+    return result
+
+  def Add(self, value):
+    """Adds a value to the bitmap."""
+    high, low = value >> _CONTAINER_BITS, value & _LOW_MASK
+
+    container = self._containers.get(high)
+    if container is None:
+      self._containers[high] = [low]
+    elif isinstance(container, list):
+      idx = bisect.bisect_left(container, low)
+      if idx == len(container) or container[idx] != low:
+        container.insert(idx, low)
+        if len(container) > _MAX_ARRAY_SIZE:
+          self._containers[high] = _ArrayToBits(container)
+    else:
+      self._containers[high] = container | (1 << low)
+
+  def Discard(self, value):
+    """Removes a value from the bitmap if it is present."""
+    high, low = value >> _CONTAINER_BITS, value & _LOW_MASK
+
+    container = self._containers.get(high)
+    if container is None:
+      return
+
+    if isinstance(container, list):
+      idx = bisect.bisect_left(container, low)
+      if idx < len(container) and container[idx] == low:
+        del container[idx]
+    else:
+      container &= ~(1 << low)
+      self._containers[high] = container
+
+    if not container:
+      del self._containers[high]
+
+  def Copy(self):
+    """Returns a copy of the bitmap."""
+    return self._FromContainers({
+        high: _Copy(container)
+        for high, container in iteritems(self._containers)
+    })
+
+  def __contains__(self, value):
+    container = self._containers.get(value >> _CONTAINER_BITS)
+    if container is None:
+      return False
+
+    low = value & _LOW_MASK
+    if isinstance(container, list):
+      idx = bisect.bisect_left(container, low)
+      return idx < len(container) and container[idx] == low
+    return bool(container >> low & 1)
+
+  def __len__(self):
+    return sum(_Len(container) for container in self._containers.values())
+
+  def __bool__(self):
+    return bool(self._containers)
+
+  def __nonzero__(self):
+    return bool(self._containers)
+
+  def __iter__(self):
+    # type: () -> Iterator[int]
+    """Yields values of the bitmap in ascending order."""
+    for high in sorted(self._containers):
+      base = high << _CONTAINER_BITS
+      container = self._containers[high]
+      if not isinstance(container, list):
+        container = _BitsToArray(container)
+      for low in container:
+        yield base + low
+
+  def __eq__(self, other):
+    if not isinstance(other, Bitmap):
+      return NotImplemented
+    if set(self._containers) != set(other._containers):
+      return False
+
+    for high, container in iteritems(self._containers):
+      other_container = other._containers[high]
+      if isinstance(container, list) and isinstance(other_container, list):
+        if container != other_container:
+          return False
+      elif _AsBits(container) != _AsBits(other_container):
+        return False
+    return True
+
+  def __ne__(self, other):
+    return not self == other
+
+  def __and__(self, other):
+    containers = {}
+    smaller, bigger = sorted([self._containers, other._containers], key=len)
+    for high, container in iteritems(smaller):
+      other_container = bigger.get(high)
+      if other_container is not None:
+        result = _And(container, other_container)
+        if result is not None:
+          containers[high] = result
+    return self._FromContainers(containers)
+
+  def __or__(self, other):
+    return UnionAll([self, other])
+
+  def __sub__(self, other):
+    containers = {}
+    for high, container in iteritems(self._containers):
+      other_container = other._containers.get(high)
+      if other_container is None:
+        result = _Copy(container)
+      else:
+        result = _Sub(container, other_container)
+      if result is not None:
+        containers[high] = result
+    return self._FromContainers(containers)
+
+  def __repr__(self):
+    return "<Bitmap with %d values>" % len(self)
+
+
+def UnionAll(bitmaps):
+  # type: (Iterable[Bitmap]) -> Bitmap
+  """Returns a union of given bitmaps."""
+  # Merging containers directly avoids copying the partial result for every
+  # bitmap, which matters when uniting many small bitmaps.
+  # pylint: disable=protected-access
+  containers = {}
+  for bitmap in bitmaps:
+    for high, container in iteritems(bitmap._containers):
+      own_container = containers.get(high)
+      if own_container is None:
+        containers[high] = container
+      else:
+        containers[high] = _Or(own_container, container)
+
+  # Containers taken over as they are must not be shared with the operands.
+  for high, container in iteritems(containers):
+    containers[high] = _Copy(container)
+  return Bitmap._FromContainers(containers)
+  # pylint: enable=protected-access
+
+
+def IntersectAll(bitmaps):
+  # type: (Iterable[Bitmap]) -> Bitmap
+  """Returns an intersection of given bitmaps.
+
+  Args:
+    bitmaps: A non-empty iterable of bitmaps.
+
+  Returns:
+    A bitmap with values present in every given bitmap.
+
+  Raises:
+    ValueError: If no bitmaps are given.
+  """
+  bitmaps = list(bitmaps)
+  if not bitmaps:
+    raise ValueError("Can't intersect an empty list of bitmaps.")
+
+  result = bitmaps[0].Copy()
+  for bitmap in bitmaps[1:]:
+    if not result:
+      break
+    result &= bitmap
+  return result
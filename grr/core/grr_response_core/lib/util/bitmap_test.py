@@ -0,0 +1,137 @@
+#!/usr/bin/env python
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import unicode_literals
+
+import random
+
+from absl.testing import absltest
+from future.builtins import range
+
+from grr_response_core.lib.util import bitmap
+
+
+def _Sample(rnd, count, limit):
+  return set(rnd.randrange(limit) for _ in range(count))
+
+
+class BitmapTest(absltest.TestCase):
+
+  def testEmpty(self):
+    bm = bitmap.Bitmap()
+    self.assertFalse(bm)
+    self.assertLen(bm, 0)
+    self.assertEqual(list(bm), [])
+    self.assertNotIn(0, bm)
+
+  def testAddAndContains(self):
+    bm = bitmap.Bitmap([5, 1, 70000, 1])
+    self.assertTrue(bm)
+    self.assertLen(bm, 3)
+    self.assertEqual(list(bm), [1, 5, 70000])
+    self.assertIn(70000, bm)
+    self.assertNotIn(4464, bm)
+
+  def testDiscard(self):
+    bm = bitmap.Bitmap([1, 2, 70000])
+    bm.Discard(2)
+    bm.Discard(3)
+    bm.Discard(70000)
+    self.assertEqual(list(bm), [1])
+    bm.Discard(1)
+    self.assertFalse(bm)
+
+  def testDenseContainer(self):
+    values = list(range(0, 60000, 2))
+    bm = bitmap.Bitmap(values)
+    self.assertLen(bm, len(values))
+    self.assertEqual(list(bm), values)
+    self.assertIn(2, bm)
+    self.assertNotIn(3, bm)
+
+    for value in values[:-10]:
+      bm.Discard(value)
+    self.assertEqual(list(bm), values[-10:])
+    self.assertEqual(bm, bitmap.Bitmap(values[-10:]))
+
+  def testEqualityDoesNotDependOnHistory(self):
+    bm = bitmap.Bitmap(range(5000))
+    for value in range(10, 5000):
+      bm.Discard(value)
+    self.assertEqual(bm, bitmap.Bitmap(range(10)))
+    self.assertNotEqual(bm, bitmap.Bitmap(range(11)))
+
+  def testCopyIsIndependent(self):
+    bm = bitmap.Bitmap([1, 2])
+    copy = bm.Copy()
+    copy.Add(3)
+    bm.Discard(1)
+    self.assertEqual(list(bm), [2])
+    self.assertEqual(list(copy), [1, 2, 3])
+
+  def testOperationsDoNotModifyOperands(self):
+    left = bitmap.Bitmap([1, 2])
+    right = bitmap.Bitmap([2, 3])
+    result = left | right
+    result.Add(4)
+    self.assertEqual(list(left), [1, 2])
+    self.assertEqual(list(right), [2, 3])
+
+  def testSetOperationsMatchSets(self):
+    rnd = random.Random(42)
+    # Mixes sparse and dense containers across several high keys.
+    for left_count, right_count in [(10, 20), (200, 30000), (30000, 50000)]:
+      left = _Sample(rnd, left_count, 200000)
+      right = _Sample(rnd, right_count, 200000)
+      left_bm = bitmap.Bitmap(left)
+      right_bm = bitmap.Bitmap(right)
+
+      self.assertEqual(list(left_bm & right_bm), sorted(left & right))
+      self.assertEqual(list(left_bm | right_bm), sorted(left | right))
+      self.assertEqual(list(left_bm - right_bm), sorted(left - right))
+      self.assertEqual(list(right_bm - left_bm), sorted(right - left))
+      self.assertEqual(left_bm & right_bm, bitmap.Bitmap(left & right))
+      self.assertEqual(left_bm | right_bm, bitmap.Bitmap(left | right))
+      self.assertLen(left_bm | right_bm, len(left | right))
+
+
+class UnionAllTest(absltest.TestCase):
+
+  def testEmpty(self):
+    self.assertFalse(bitmap.UnionAll([]))
+
+  def testMany(self):
+    result = bitmap.UnionAll(
+        [bitmap.Bitmap([1]),
+         bitmap.Bitmap([2, 3]),
+         bitmap.Bitmap([3, 70000])])
+    self.assertEqual(list(result), [1, 2, 3, 70000])
+
+  def testResultIsIndependent(self):
+    bm = bitmap.Bitmap([1])
+    result = bitmap.UnionAll([bm])
+    result.Add(2)
+    self.assertEqual(list(bm), [1])
+
+
+class IntersectAllTest(absltest.TestCase):
+
+  def testEmpty(self):
+    with self.assertRaises(ValueError):
+      bitmap.IntersectAll([])
+
+  def testMany(self):
+    result = bitmap.IntersectAll([
+        bitmap.Bitmap([1, 2, 3, 70000]),
+        bitmap.Bitmap([2, 3, 70000]),
+        bitmap.Bitmap([3, 70000, 70001])
+    ])
+    self.assertEqual(list(result), [3, 70000])
+
+  def testDisjoint(self):
+    result = bitmap.IntersectAll([bitmap.Bitmap([1]), bitmap.Bitmap([2])])
+    self.assertFalse(result)
+
+
+if __name__ == "__main__":
+  absltest.main()
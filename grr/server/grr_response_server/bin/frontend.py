@@ -5,6 +5,7 @@ from __future__ import division
 from __future__ import print_function
 from __future__ import unicode_literals
 
+import atexit
 import cgi
 import io
 import logging
@@ -344,6 +345,9 @@ def main(argv):
   server_startup.Init()
 
   httpd = CreateServer()
+  httpd.frontend.WarmUpCaches()
+  # Buffered client metadata would otherwise be lost on shutdown.
+  atexit.register(httpd.frontend.Close)
 
   server_startup.DropPrivileges()
 
@@ -611,6 +611,16 @@ class GrrWorkerTest(flow_test_lib.FlowTestsBaseclass):
     # Make sure there are no leftover requests.
     self.assertEqual(data_store.REL_DB.ReadMessageHandlerRequests(), [])
 
+  def testMessageHandlersReadFromPrimary(self):
+    worker_obj = self._TestWorker()
+    with mock.patch.object(
+        data_store.REL_DB,
+        "ReadsFromPrimary",
+        wraps=data_store.REL_DB.ReadsFromPrimary) as reads_from_primary_mock:
+      worker_obj._ProcessMessageHandlerRequests([])
+
+    reads_from_primary_mock.assert_called_once_with()
+
   def _testProcessMessagesWellKnown(self):
     worker_obj = self._TestWorker()
 
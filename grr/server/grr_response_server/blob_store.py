@@ -5,10 +5,18 @@ from __future__ import division
 from __future__ import unicode_literals
 
 import abc
+import collections
+import logging
+import os
+import threading
 
+from future.utils import iteritems
 from future.utils import with_metaclass
 
+from grr_response_core.lib import utils
 from grr_response_core.lib.util import precondition
+from grr_response_core.stats import stats_collector_instance
+from grr_response_server.blob_stores import local_disk_utils
 from grr_response_server.rdfvalues import objects as rdf_objects
 
 # Global blob stores registry.
@@ -125,3 +133,290 @@ class BlobStoreValidationWrapper(BlobStore):
     precondition.AssertIterableType(blob_ids, rdf_objects.BlobID)
 
     return self.delegate.CheckBlobsExist(blob_ids)
+
+
+class _MemoryBlobCache(object):
+  """An LRU cache of blobs bounded by the total size of cached blobs."""
+
+  def __init__(self, max_size):
+    self._max_size = max_size
+    self._size = 0
+    self._blobs = collections.OrderedDict()
+    self._lock = threading.RLock()
+
+  def __contains__(self, blob_id):
+    with self._lock:
+      return blob_id in self._blobs
+
+  def Get(self, blob_id):
+    """Returns a cached blob (or None) and marks it as most recently used."""
+    with self._lock:
+      blob_data = self._blobs.pop(blob_id, None)
+      if blob_data is not None:
+        self._blobs[blob_id] = blob_data
+      return blob_data
+
+  def Put(self, blob_id, blob_data):
+    """Caches a blob.
+
+    Args:
+      blob_id: rdf_objects.BlobID of the blob.
+      blob_data: Blob contents.
+
+    Returns:
+      A list of (blob_id, blob_data) pairs evicted to make space for the blob.
+    """
+    if len(blob_data) > self._max_size:
+      return []
+
+    evicted = []
+    with self._lock:
+      old_data = self._blobs.pop(blob_id, None)
+      if old_data is not None:
+        self._size -= len(old_data)
+
+      self._blobs[blob_id] = blob_data
+      self._size += len(blob_data)
+
+      while self._size > self._max_size:
+        evicted_id, evicted_data = self._blobs.popitem(last=False)
+        self._size -= len(evicted_data)
+        evicted.append((evicted_id, evicted_data))
+
+    return evicted
+
+
+class _DiskBlobCache(object):
+  """An LRU cache of blobs kept in a local directory.
+
+  The directory should be private to a single process. Blobs found in it on
+  startup are reused.
+  """
+
+  def __init__(self, path, max_size):
+    self._path = path
+    self._max_size = max_size
+    self._size = 0
+    self._blob_sizes = collections.OrderedDict()
+    self._lock = threading.RLock()
+
+    local_disk_utils.MakeDirs(path)
+
+    for filename in os.listdir(path):
+      filepath = os.path.join(path, filename)
+      try:
+        blob_id = local_disk_utils.BlobIdFromHex(filename)
+      except ValueError:
+        # Leftover temporary file or an unrelated one.
+        if filename.startswith("tmp"):
+          os.remove(filepath)
+        continue
+
+      self._blob_sizes[blob_id] = os.path.getsize(filepath)
+      self._size += self._blob_sizes[blob_id]
+
+    self._Expire()
+
+  def __contains__(self, blob_id):
+    with self._lock:
+      return blob_id in self._blob_sizes
+
+  def _BlobPath(self, blob_id):
+    return local_disk_utils.BlobPath(self._path, blob_id)
+
+  def _Expire(self):
+    """Removes least recently used blobs until the size limit is met."""
+    evicted = 0
+    with self._lock:
+      while self._size > self._max_size:
+        blob_id, size = self._blob_sizes.popitem(last=False)
+        self._size -= size
+        evicted += 1
+        try:
+          os.remove(self._BlobPath(blob_id))
+        except OSError as e:
+          logging.warning("Failed to remove cached blob %s: %s", blob_id, e)
+
+    return evicted
+
+  def Get(self, blob_id):
+    """Returns a cached blob (or None) and marks it as most recently used."""
+    with self._lock:
+      size = self._blob_sizes.pop(blob_id, None)
+      if size is None:
+        return None
+      self._blob_sizes[blob_id] = size
+
+    try:
+      with open(self._BlobPath(blob_id), "rb") as fd:
+        return fd.read()
+    except (IOError, OSError):
+      with self._lock:
+        if self._blob_sizes.pop(blob_id, None) is not None:
+          self._size -= size
+      return None
+
+  def Put(self, blob_id, blob_data):
+    """Caches a blob, returns the number of evicted blobs."""
+    if len(blob_data) > self._max_size:
+      return 0
+
+    with self._lock:
+      if blob_id in self._blob_sizes:
+        return 0
+
+    local_disk_utils.WriteBlobAtomically(
+        self._BlobPath(blob_id), blob_data, self._path)
+
+    with self._lock:
+      if blob_id not in self._blob_sizes:
+        self._blob_sizes[blob_id] = len(blob_data)
+        self._size += len(blob_data)
+      return self._Expire()
+
+
+class CachingBlobStore(BlobStore):
+  """BlobStore wrapper caching blobs read from the delegate.
+
+  Blobs are kept in a memory LRU cache bounded by the total size of cached
+  blobs. Optionally, blobs evicted from memory are moved to a second-tier LRU
+  cache on the local disk.
+
+  Blobs reported missing by CheckBlobsExist are remembered for a limited time,
+  so that repeated checks don't hit the delegate. Writes through this wrapper
+  invalidate such entries. Blobs written by other processes may be reported
+  missing until the entry expires.
+  """
+
+  def __init__(self,
+               delegate,
+               max_size,
+               disk_cache_path=None,
+               disk_cache_max_size=0,
+               negative_cache_size=0,
+               negative_cache_ttl=60):
+    """Initializes the wrapper.
+
+    Args:
+      delegate: BlobStore to wrap.
+      max_size: Maximum total size (in bytes) of blobs cached in memory.
+      disk_cache_path: Directory of the on-disk cache. If not set, blobs are
+        cached in memory only.
+      disk_cache_max_size: Maximum total size (in bytes) of blobs cached on
+        disk.
+      negative_cache_size: Maximum number of missing blob ids to remember.
+      negative_cache_ttl: Number of seconds to remember missing blob ids for.
+    """
+    super(CachingBlobStore, self).__init__()
+    self.delegate = delegate
+
+    self._memory_cache = _MemoryBlobCache(max_size)
+    self._disk_cache = None
+    if disk_cache_path and disk_cache_max_size:
+      self._disk_cache = _DiskBlobCache(disk_cache_path, disk_cache_max_size)
+
+    self._negative_cache = None
+    if negative_cache_size:
+      self._negative_cache = utils.AgeBasedCache(
+          max_size=negative_cache_size, max_age=negative_cache_ttl)
+
+  def _CountHits(self, tier, count):
+    if count:
+      stats_collector_instance.Get().IncrementCounter(
+          "blob_store_cache_hits", delta=count, fields=[tier])
+
+  def _CountMisses(self, tier, count):
+    if count:
+      stats_collector_instance.Get().IncrementCounter(
+          "blob_store_cache_misses", delta=count, fields=[tier])
+
+  def _CountEvictions(self, tier, count):
+    if count:
+      stats_collector_instance.Get().IncrementCounter(
+          "blob_store_cache_evictions", delta=count, fields=[tier])
+
+  def _CacheInMemory(self, blob_id, blob_data):
+    evicted = self._memory_cache.Put(blob_id, blob_data)
+    self._CountEvictions("memory", len(evicted))
+
+    if self._disk_cache is not None:
+      disk_evicted = 0
+      for evicted_id, evicted_data in evicted:
+        disk_evicted += self._disk_cache.Put(evicted_id, evicted_data)
+      self._CountEvictions("disk", disk_evicted)
+
+  def WriteBlobs(self, blob_id_data_map):
+    self.delegate.WriteBlobs(blob_id_data_map)
+
+    if self._negative_cache is not None:
+      for blob_id in blob_id_data_map:
+        self._negative_cache.ExpireObject(blob_id)
+
+  def ReadBlobs(self, blob_ids):
+    result = {}
+    missing = []
+    for blob_id in blob_ids:
+      blob_data = self._memory_cache.Get(blob_id)
+      if blob_data is not None:
+        result[blob_id] = blob_data
+      else:
+        missing.append(blob_id)
+
+    self._CountHits("memory", len(result))
+    self._CountMisses("memory", len(missing))
+
+    if missing and self._disk_cache is not None:
+      on_disk = {}
+      still_missing = []
+      for blob_id in missing:
+        blob_data = self._disk_cache.Get(blob_id)
+        if blob_data is not None:
+          on_disk[blob_id] = blob_data
+        else:
+          still_missing.append(blob_id)
+
+      self._CountHits("disk", len(on_disk))
+      self._CountMisses("disk", len(still_missing))
+
+      for blob_id, blob_data in iteritems(on_disk):
+        result[blob_id] = blob_data
+        self._CacheInMemory(blob_id, blob_data)
+      missing = still_missing
+
+    if missing:
+      for blob_id, blob_data in iteritems(self.delegate.ReadBlobs(missing)):
+        result[blob_id] = blob_data
+        if blob_data is not None:
+          self._CacheInMemory(blob_id, blob_data)
+
+    return result
+
+  def CheckBlobsExist(self, blob_ids):
+    result = {}
+    to_check = []
+    for blob_id in blob_ids:
+      if blob_id in self._memory_cache or (self._disk_cache is not None and
+                                           blob_id in self._disk_cache):
+        result[blob_id] = True
+        continue
+
+      if self._negative_cache is not None:
+        try:
+          self._negative_cache.Get(blob_id)
+          result[blob_id] = False
+          continue
+        except KeyError:
+          pass
+
+      to_check.append(blob_id)
+
+    self._CountHits("exists", len(result))
+    self._CountMisses("exists", len(to_check))
+
+    if to_check:
+      for blob_id, exists in iteritems(self.delegate.CheckBlobsExist(to_check)):
+        result[blob_id] = exists
+        if not exists and self._negative_cache is not None:
+          self._negative_cache.Put(blob_id, True)
+
+    return result
@@ -0,0 +1,149 @@
+#!/usr/bin/env python
+"""Tests for blob store wrappers."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import unicode_literals
+
+import os
+import shutil
+
+import mock
+
+from grr_response_core.lib import flags
+from grr_response_core.lib.util import temp
+from grr_response_server import blob_store
+from grr_response_server import blob_store_test_mixin
+from grr_response_server.blob_stores import db_blob_store
+from grr_response_server.rdfvalues import objects as rdf_objects
+from grr.test_lib import stats_test_lib
+from grr.test_lib import test_lib
+
+
+class CachingBlobStoreTest(blob_store_test_mixin.BlobStoreTestMixin,
+                           stats_test_lib.StatsTestMixin,
+                           test_lib.GRRBaseTest):
+
+  def CreateBlobStore(self):
+    self.delegate = db_blob_store.DbBlobStore()
+    return (blob_store.CachingBlobStore(
+        self.delegate, 1024, negative_cache_size=100), lambda: None)
+
+  def _BlobIds(self, count):
+    return [rdf_objects.BlobID((b"%d1234567" % i) * 4) for i in range(count)]
+
+  def testServesRepeatedReadsFromMemory(self):
+    blob_id, = self._BlobIds(1)
+    self.blob_store.WriteBlobs({blob_id: b"foo"})
+    self.blob_store.ReadBlobs([blob_id])
+
+    with mock.patch.object(self.delegate, "ReadBlobs") as read_blobs_mock:
+      with self.assertStatsCounterDelta(
+          1, "blob_store_cache_hits", fields=["memory"]):
+        result = self.blob_store.ReadBlobs([blob_id])
+
+    self.assertEqual(result, {blob_id: b"foo"})
+    read_blobs_mock.assert_not_called()
+
+  def testEvictsLeastRecentlyUsedBlobsWhenFull(self):
+    blob_ids = self._BlobIds(3)
+    self.blob_store.WriteBlobs({blob_id: b"x" * 500 for blob_id in blob_ids})
+
+    with self.assertStatsCounterDelta(
+        1, "blob_store_cache_evictions", fields=["memory"]):
+      self.blob_store.ReadBlobs(blob_ids[:1])
+      self.blob_store.ReadBlobs(blob_ids[1:2])
+      self.blob_store.ReadBlobs(blob_ids[2:3])
+
+    with mock.patch.object(
+        self.delegate, "ReadBlobs",
+        wraps=self.delegate.ReadBlobs) as read_blobs_mock:
+      self.blob_store.ReadBlobs(blob_ids[1:3])
+      read_blobs_mock.assert_not_called()
+
+      self.blob_store.ReadBlobs(blob_ids[:1])
+      read_blobs_mock.assert_called_once_with(blob_ids[:1])
+
+  def testDoesNotCacheBlobsBiggerThanCache(self):
+    blob_id, = self._BlobIds(1)
+    self.blob_store.WriteBlobs({blob_id: b"x" * 2048})
+
+    self.assertEqual(
+        self.blob_store.ReadBlobs([blob_id]), {blob_id: b"x" * 2048})
+    with mock.patch.object(
+        self.delegate, "ReadBlobs",
+        wraps=self.delegate.ReadBlobs) as read_blobs_mock:
+      self.blob_store.ReadBlobs([blob_id])
+      read_blobs_mock.assert_called_once()
+
+  def testCachesMissingBlobs(self):
+    blob_id, = self._BlobIds(1)
+    self.assertEqual(
+        self.blob_store.CheckBlobsExist([blob_id]), {blob_id: False})
+
+    with mock.patch.object(self.delegate,
+                           "CheckBlobsExist") as check_blobs_exist_mock:
+      self.assertEqual(
+          self.blob_store.CheckBlobsExist([blob_id]), {blob_id: False})
+      check_blobs_exist_mock.assert_not_called()
+
+  def testWritingBlobInvalidatesNegativeCacheEntry(self):
+    blob_id, = self._BlobIds(1)
+    self.blob_store.CheckBlobsExist([blob_id])
+    self.blob_store.WriteBlobs({blob_id: b"foo"})
+
+    self.assertEqual(
+        self.blob_store.CheckBlobsExist([blob_id]), {blob_id: True})
+
+  def testMovesEvictedBlobsToDiskCache(self):
+    disk_cache_path = temp.TempDirPath()
+    self.addCleanup(shutil.rmtree, disk_cache_path, ignore_errors=True)
+
+    bs = blob_store.CachingBlobStore(
+        self.delegate,
+        1024,
+        disk_cache_path=disk_cache_path,
+        disk_cache_max_size=1024 * 1024)
+
+    blob_ids = self._BlobIds(3)
+    bs.WriteBlobs({blob_id: b"x" * 500 for blob_id in blob_ids})
+    for blob_id in blob_ids:
+      bs.ReadBlobs([blob_id])
+
+    self.assertEqual(os.listdir(disk_cache_path), [blob_ids[0].AsHexString()])
+
+    with mock.patch.object(self.delegate, "ReadBlobs") as read_blobs_mock:
+      with self.assertStatsCounterDelta(
+          1, "blob_store_cache_hits", fields=["disk"]):
+        result = bs.ReadBlobs(blob_ids[:1])
+
+    self.assertEqual(result, {blob_ids[0]: b"x" * 500})
+    read_blobs_mock.assert_not_called()
+
+  def testChecksDiskCacheBeforeDelegate(self):
+    disk_cache_path = temp.TempDirPath()
+    self.addCleanup(shutil.rmtree, disk_cache_path, ignore_errors=True)
+
+    bs = blob_store.CachingBlobStore(
+        self.delegate,
+        1024,
+        disk_cache_path=disk_cache_path,
+        disk_cache_max_size=1024 * 1024)
+
+    blob_ids = self._BlobIds(3)
+    bs.WriteBlobs({blob_id: b"x" * 500 for blob_id in blob_ids})
+    for blob_id in blob_ids:
+      bs.ReadBlobs([blob_id])
+
+    with mock.patch.object(self.delegate,
+                           "CheckBlobsExist") as check_blobs_exist_mock:
+      with self.assertStatsCounterDelta(
+          3, "blob_store_cache_hits", fields=["exists"]):
+        result = bs.CheckBlobsExist(blob_ids)
+
+    self.assertEqual(result, {blob_id: True for blob_id in blob_ids})
+    check_blobs_exist_mock.assert_not_called()
+
+
+if __name__ == "__main__":
+  flags.StartMain(test_lib.main)
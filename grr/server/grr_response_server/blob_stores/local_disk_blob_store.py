@@ -0,0 +1,159 @@
+#!/usr/bin/env python
+"""A content-addressed blob store keeping blobs on a local disk."""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import unicode_literals
+
+import errno
+import logging
+import math
+import os
+import struct
+import threading
+
+from future.builtins import range
+from future.utils import iteritems
+
+from grr_response_core import config
+from grr_response_server import blob_store
+from grr_response_server.blob_stores import local_disk_utils
+
+
+class _BloomFilter(object):
+  """A bloom filter over blob ids.
+
+  Blob ids are SHA-256 digests already, so bit positions are derived directly
+  from the id bytes using double hashing instead of rehashing them.
+  """
+
+  def __init__(self, capacity, error_rate=0.01):
+    capacity = max(1, capacity)
+    num_bits = int(-capacity * math.log(error_rate) / (math.log(2)**2))
+    self._num_bits = max(8, num_bits)
+    self._num_hashes = max(
+        1, int(round(self._num_bits / capacity * math.log(2))))
+    self._bits = bytearray((self._num_bits + 7) // 8)
+    self._lock = threading.Lock()
+
+  def _Positions(self, blob_id):
+    h1, h2 = struct.unpack_from("<QQ", blob_id.AsBytes())
+    for i in range(self._num_hashes):
+      yield (h1 + i * h2) % self._num_bits
+
+  def Add(self, blob_id):
+    with self._lock:
+      for pos in self._Positions(blob_id):
+        self._bits[pos >> 3] |= 1 << (pos & 7)
+
+  def MayContain(self, blob_id):
+    for pos in self._Positions(blob_id):
+      if not self._bits[pos >> 3] & (1 << (pos & 7)):
+        return False
+    return True
+
+
+class LocalDiskBlobStore(blob_store.BlobStore):
+  """A blob store keeping every blob in a separate file on a local disk.
+
+  Blobs are content-addressed: every blob is stored in a file named after the
+  hex representation of its id, in a directory tree sharded by the first
+  bytes of the id (e.g. "ab/cd/abcd..." for a shard depth of 2). Since blob
+  contents never change, blobs that already exist are never rewritten.
+
+  Blobs are written to a temporary file first and then renamed into place, so
+  readers never see partially written blobs.
+  """
+
+  _TMP_DIR_NAME = "tmp"
+
+  def __init__(self, path=None):
+    super(LocalDiskBlobStore, self).__init__()
+
+    if path is None:
+      path = config.CONFIG["LocalDiskBlobStore.path"]
+    self._path = path
+    self._tmp_path = os.path.join(self._path, self._TMP_DIR_NAME)
+    self._shard_depth = config.CONFIG["LocalDiskBlobStore.shard_depth"]
+    self._fsync = config.CONFIG["LocalDiskBlobStore.fsync"]
+
+    local_disk_utils.MakeDirs(self._tmp_path)
+
+    self._bloom_filter = None
+    if config.CONFIG["LocalDiskBlobStore.use_bloom_filter"]:
+      self._bloom_filter = _BloomFilter(
+          config.CONFIG["LocalDiskBlobStore.bloom_filter_capacity"])
+      self._LoadBloomFilter()
+
+  def _LoadBloomFilter(self):
+    """Adds all the blobs already present on disk to the bloom filter."""
+    count = 0
+    for dirpath, dirnames, filenames in os.walk(self._path):
+      if dirpath == self._path and self._TMP_DIR_NAME in dirnames:
+        dirnames.remove(self._TMP_DIR_NAME)
+
+      for filename in filenames:
+        try:
+          blob_id = local_disk_utils.BlobIdFromHex(filename)
+        except ValueError:
+          continue
+
+        self._bloom_filter.Add(blob_id)
+        count += 1
+
+    logging.info("Loaded %d blob ids from %s into the bloom filter.", count,
+                 self._path)
+
+  def _BlobPath(self, blob_id):
+    return local_disk_utils.BlobPath(self._path, blob_id, self._shard_depth)
+
+  def _WriteBlob(self, blob_id, blob_data):
+    """Atomically writes a single blob unless it already exists."""
+    path = self._BlobPath(blob_id)
+    if os.path.exists(path):
+      return
+
+    local_disk_utils.MakeDirs(os.path.dirname(path))
+    local_disk_utils.WriteBlobAtomically(
+        path, blob_data, self._tmp_path, fsync=self._fsync)
+
+  def _ReadBlob(self, blob_id):
+    """Reads a single blob, returns None if it doesn't exist."""
+    try:
+      with open(self._BlobPath(blob_id), "rb") as fd:
+        return fd.read()
+    except IOError as e:
+      if e.errno == errno.ENOENT:
+        return None
+      raise
+
+  def WriteBlobs(self, blob_id_data_map):
+    """Creates blobs that don't exist yet.
+
+    Blobs are content-addressed, so blobs that already exist are skipped
+    instead of being rewritten.
+
+    Args:
+      blob_id_data_map: A dict of rdf_objects.BlobID -> blob data (bytes).
+    """
+    for blob_id, blob_data in iteritems(blob_id_data_map):
+      self._WriteBlob(blob_id, blob_data)
+      if self._bloom_filter is not None:
+        self._bloom_filter.Add(blob_id)
+
+  def ReadBlobs(self, blob_ids):
+    """Reads given blobs."""
+    return {blob_id: self._ReadBlob(blob_id) for blob_id in blob_ids}
+
+  def CheckBlobsExist(self, blob_ids):
+    """Checks if given blobs exist."""
+    result = {}
+    for blob_id in blob_ids:
+      if (self._bloom_filter is not None and
+          not self._bloom_filter.MayContain(blob_id)):
+        result[blob_id] = False
+      else:
+        # The bloom filter may give false positives, so confirm with a stat.
+        result[blob_id] = os.path.exists(self._BlobPath(blob_id))
+
+    return result
+
@@ -0,0 +1,90 @@
+#!/usr/bin/env python
+"""Tests for the local disk blob store."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import unicode_literals
+
+import os
+import shutil
+
+import mock
+
+from grr_response_core.lib import flags
+from grr_response_core.lib.util import temp
+from grr_response_server import blob_store_test_mixin
+from grr_response_server.blob_stores import local_disk_blob_store
+from grr_response_server.rdfvalues import objects as rdf_objects
+from grr.test_lib import test_lib
+
+
+class LocalDiskBlobStoreTest(blob_store_test_mixin.BlobStoreTestMixin,
+                             test_lib.GRRBaseTest):
+
+  def CreateBlobStore(self):
+    self.blob_store_path = temp.TempDirPath()
+    return (local_disk_blob_store.LocalDiskBlobStore(
+        path=self.blob_store_path),
+            lambda: shutil.rmtree(self.blob_store_path, ignore_errors=True))
+
+  def testStoresBlobsInShardedDirectories(self):
+    blob_id = rdf_objects.BlobID(b"01234567" * 4)
+    self.blob_store.WriteBlobs({blob_id: b"foo"})
+
+    hex_id = blob_id.AsHexString()
+    path = os.path.join(self.blob_store_path, hex_id[0:2], hex_id[2:4], hex_id)
+    with open(path, "rb") as fd:
+      self.assertEqual(fd.read(), b"foo")
+
+  def testDoesNotRewriteExistingBlobs(self):
+    blob_id = rdf_objects.BlobID(b"01234567" * 4)
+    self.blob_store.WriteBlobs({blob_id: b"foo"})
+    self.blob_store.WriteBlobs({blob_id: b"bar"})
+    self.assertEqual(self.blob_store.ReadBlobs([blob_id]), {blob_id: b"foo"})
+
+  def testReadsEmptyBlobs(self):
+    blob_id = rdf_objects.BlobID.FromBlobData(b"")
+    self.blob_store.WriteBlobs({blob_id: b""})
+    self.assertEqual(self.blob_store.ReadBlobs([blob_id]), {blob_id: b""})
+
+  def testLoadsExistingBlobsIntoBloomFilter(self):
+    blob_id = rdf_objects.BlobID(b"01234567" * 4)
+    self.blob_store.WriteBlobs({blob_id: b"foo"})
+
+    bs = local_disk_blob_store.LocalDiskBlobStore(path=self.blob_store_path)
+    self.assertEqual(bs.CheckBlobsExist([blob_id]), {blob_id: True})
+
+  def testDoesNotStatBlobsMissingFromBloomFilter(self):
+    blob_id = rdf_objects.BlobID(b"01234567" * 4)
+
+    with mock.patch.object(os.path, "exists") as exists_mock:
+      result = self.blob_store.CheckBlobsExist([blob_id])
+
+    self.assertEqual(result, {blob_id: False})
+    exists_mock.assert_not_called()
+
+  def testWorksWithoutBloomFilter(self):
+    blob_id = rdf_objects.BlobID(b"01234567" * 4)
+    other_blob_id = rdf_objects.BlobID(b"abcdefgh" * 4)
+
+    with test_lib.ConfigOverrider({"LocalDiskBlobStore.use_bloom_filter":
+                                   False}):
+      bs = local_disk_blob_store.LocalDiskBlobStore(path=self.blob_store_path)
+    bs.WriteBlobs({blob_id: b"foo"})
+
+    self.assertEqual(
+        bs.CheckBlobsExist([blob_id, other_blob_id]), {
+            blob_id: True,
+            other_blob_id: False
+        })
+
+  def testDoesNotLeaveTemporaryFiles(self):
+    blob_id = rdf_objects.BlobID(b"01234567" * 4)
+    self.blob_store.WriteBlobs({blob_id: b"foo"})
+    self.blob_store.WriteBlobs({blob_id: b"foo"})
+
+    self.assertEmpty(os.listdir(os.path.join(self.blob_store_path, "tmp")))
+
+
+if __name__ == "__main__":
+  flags.StartMain(test_lib.main)
@@ -0,0 +1,94 @@
+#!/usr/bin/env python
+"""Helpers for keeping content-addressed blobs in local files."""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import unicode_literals
+
+import errno
+import os
+import tempfile
+
+from future.builtins import range
+
+from grr_response_server.rdfvalues import objects as rdf_objects
+
+
+def BlobPath(root, blob_id, shard_depth=0):
+  """Returns the path of the file keeping a given blob.
+
+  Files are named after the hex representation of the blob id and are kept
+  in a directory tree sharded by the first bytes of the id (e.g.
+  "ab/cd/abcd..." for a shard depth of 2).
+
+  Args:
+    root: Root directory of the blob files.
+    blob_id: rdf_objects.BlobID of the blob.
+    shard_depth: Number of directory levels to shard the files into.
+
+  Returns:
+    A path of the blob file.
+  """
+  hex_id = blob_id.AsHexString()
+  shards = [hex_id[2 * i:2 * i + 2] for i in range(shard_depth)]
+  return os.path.join(root, *(shards + [hex_id]))
+
+
+def BlobIdFromHex(hex_id):
+  """Converts a blob file name back to a blob id.
+
+  Args:
+    hex_id: Name of the blob file.
+
+  Returns:
+    rdf_objects.BlobID corresponding to the file name.
+
+  Raises:
+    ValueError: if the file name is not a hex representation of a blob id.
+  """
+  try:
+    raw = bytes(bytearray.fromhex(hex_id))
+  except (TypeError, ValueError):
+    raise ValueError("Not a blob id: %r" % hex_id)
+
+  if len(raw) != rdf_objects.BlobID.hash_id_length:
+    raise ValueError("Not a blob id: %r" % hex_id)
+
+  return rdf_objects.BlobID.FromBytes(raw)
+
+
+def WriteBlobAtomically(path, blob_data, tmp_dir, fsync=False):
+  """Writes blob data to a temporary file and renames it into place.
+
+  Readers never see partially written blobs.
+
+  Args:
+    path: Path of the blob file.
+    blob_data: Blob contents as bytes.
+    tmp_dir: Directory for the temporary file. Has to be on the same
+      filesystem as the blob file.
+    fsync: If True, the data is synced to disk before the rename.
+  """
+  fd, tmp_path = tempfile.mkstemp(dir=tmp_dir)
+  try:
+    with os.fdopen(fd, "wb") as tmp_file:
+      tmp_file.write(blob_data)
+      if fsync:
+        tmp_file.flush()
+        os.fsync(tmp_file.fileno())
+
+    os.rename(tmp_path, path)
+  except:  # pylint: disable=bare-except
+    try:
+      os.remove(tmp_path)
+    except OSError:
+      pass
+    raise
+
+
+def MakeDirs(path):
+  """Creates a directory with all its parents unless it exists already."""
+  try:
+    os.makedirs(path)
+  except OSError as e:
+    if e.errno != errno.EEXIST:
+      raise
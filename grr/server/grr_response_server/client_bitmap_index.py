@@ -0,0 +1,365 @@
+#!/usr/bin/env python
+"""An in-memory bitmap index of client attributes.
+
+Every client gets a dense ordinal and every indexed attribute value (label
+name, operating system, client version, last ping hour) maps to a bitmap of the
+ordinals of clients having it. Questions like "clients with label X running
+Windows seen in the last day" then become a handful of bitmap operations
+instead of database reads followed by set arithmetic in Python.
+
+Each server process keeps its own index. The database wrapper mirrors the
+process' own writes into it and it is rebuilt from the database in the
+background every ClientIndex.bitmap_index_ttl to pick up writes of other
+processes. The index can therefore be slightly stale and is meant for selecting
+candidate clients that are then read from the database and verified.
+"""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import unicode_literals
+
+import bisect
+import threading
+import time
+
+from future.utils import iteritems
+from future.utils import itervalues
+
+from grr_response_core import config
+from grr_response_core.lib.util import bitmap
+from grr_response_server import data_store
+
+# Clients are bucketed by the hour of their last ping. Only clients in the
+# bucket of the queried time have to be checked individually.
+_PING_BUCKET_MICROS = 3600 * 1000000
+
+_BUILD_LOCK = threading.Lock()
+# Guards starting of _refresh_thread.
+_REFRESH_LOCK = threading.Lock()
+_refresh_thread = None
+
+
+class ClientBitmapIndex(object):
+  """An index of client labels, operating systems, versions and pings."""
+
+  def __init__(self):
+    self._lock = threading.RLock()
+    # Time of the last full build from the database.
+    self.build_time = None
+
+    self._ordinals = {}
+    self._client_ids = []
+    self._all = bitmap.Bitmap()
+
+    # Label name -> owner -> bitmap.
+    self._labels = {}
+    # Operating system -> bitmap and ordinal -> operating system.
+    self._os = {}
+    self._client_os = {}
+    # Client version -> bitmap and ordinal -> client version.
+    self._versions = {}
+    self._client_versions = {}
+    # Ping bucket -> bitmap, sorted bucket keys and ordinal -> last ping in
+    # microseconds since epoch. As in the database, clients that never pinged
+    # are treated as if they pinged at the epoch.
+    self._ping_buckets = {}
+    self._ping_bucket_keys = []
+    self._pings = {}
+
+    # The index that is built to replace this one. Writes mirrored into this
+    # index are forwarded to it.
+    self._successor = None
+    # Writes mirrored into this index while it is filled from the database,
+    # by client id. They are applied again after the client is read, since
+    # the read might have happened before the write.
+    self._journal = None
+
+  @classmethod
+  def FromDatabase(cls, database, predecessor=None):
+    """Builds an index of all the clients of a database.
+
+    Args:
+      database: The database to read the clients from.
+      predecessor: An index that gets replaced by the new one. Writes mirrored
+        into it during and after the build are forwarded to the new index.
+
+    Returns:
+      A new ClientBitmapIndex instance.
+    """
+    index = cls()
+    index._journal = {}
+    if predecessor is not None:
+      with predecessor._lock:
+        predecessor._successor = index
+    for info in database.IterateAllClientsFullInfo():
+      index.AddClientFullInfo(info)
+    with index._lock:
+      index._journal = None
+      index.build_time = time.time()
+    return index
+
+  def _Mirror(self, method, client_id, *args):
+    """Applies a write of this process to the index and its successor."""
+    with self._lock:
+      method(self, client_id, *args)
+      if self._journal is not None:
+        self._journal.setdefault(client_id, []).append((method, args))
+      if self._successor is not None:
+        # pylint: disable=protected-access
+        self._successor._Mirror(method, client_id, *args)
+
+  def _Ordinal(self, client_id):
+    ordinal = self._ordinals.get(client_id)
+    if ordinal is None:
+      ordinal = len(self._client_ids)
+      self._ordinals[client_id] = ordinal
+      self._client_ids.append(client_id)
+      self._all.Add(ordinal)
+      self._SetPing(ordinal, 0)
+    return ordinal
+
+  def _SetPing(self, ordinal, micros):
+    """Moves an ordinal to the bucket of its new last ping time."""
+    old_micros = self._pings.get(ordinal)
+    old_bucket = None
+    if old_micros is not None:
+      old_bucket = old_micros // _PING_BUCKET_MICROS
+    new_bucket = micros // _PING_BUCKET_MICROS
+    self._pings[ordinal] = micros
+    if old_bucket == new_bucket:
+      return
+
+    if old_bucket is not None:
+      old_bitmap = self._ping_buckets[old_bucket]
+      old_bitmap.Discard(ordinal)
+      if not old_bitmap:
+        del self._ping_buckets[old_bucket]
+        del self._ping_bucket_keys[bisect.bisect_left(self._ping_bucket_keys,
+                                                      old_bucket)]
+
+    if new_bucket not in self._ping_buckets:
+      self._ping_buckets[new_bucket] = bitmap.Bitmap()
+      bisect.insort(self._ping_bucket_keys, new_bucket)
+    self._ping_buckets[new_bucket].Add(ordinal)
+
+  def _Move(self, values, bitmaps, ordinal, value):
+    """Moves an ordinal to the bitmap of a new attribute value."""
+    old_value = values.get(ordinal)
+    if old_value == value:
+      return
+
+    if old_value is not None:
+      old_bitmap = bitmaps[old_value]
+      old_bitmap.Discard(ordinal)
+      if not old_bitmap:
+        del bitmaps[old_value]
+
+    if value is None:
+      values.pop(ordinal, None)
+    else:
+      values[ordinal] = value
+      bitmaps.setdefault(value, bitmap.Bitmap()).Add(ordinal)
+
+  def _AddClient(self, client_id):
+    self._Ordinal(client_id)
+
+  def _UpdatePing(self, client_id, last_ping):
+    self._SetPing(
+        self._Ordinal(client_id), last_ping.AsMicrosecondsSinceEpoch())
+
+  def _UpdateSnapshot(self, client_id, snapshot):
+    ordinal = self._Ordinal(client_id)
+    self._Move(self._client_os, self._os, ordinal,
+               snapshot.knowledge_base.os or None)
+    if snapshot.startup_info is not None:
+      self._UpdateStartupInfo(client_id, snapshot.startup_info)
+
+  def _UpdateStartupInfo(self, client_id, startup_info):
+    ordinal = self._Ordinal(client_id)
+    self._Move(self._client_versions, self._versions, ordinal,
+               startup_info.client_info.client_version)
+
+  def _AddClientLabels(self, client_id, owner, labels):
+    ordinal = self._Ordinal(client_id)
+    for label in labels:
+      owners = self._labels.setdefault(label, {})
+      owners.setdefault(owner, bitmap.Bitmap()).Add(ordinal)
+
+  def _RemoveClientLabels(self, client_id, owner, labels):
+    ordinal = self._ordinals.get(client_id)
+    if ordinal is None:
+      return
+
+    for label in labels:
+      owners = self._labels.get(label, {})
+      owner_bitmap = owners.get(owner)
+      if owner_bitmap is None:
+        continue
+      owner_bitmap.Discard(ordinal)
+      if not owner_bitmap:
+        del owners[owner]
+      if not owners:
+        del self._labels[label]
+
+  def AddClientFullInfo(self, info):
+    """Indexes a `rdf_objects.ClientFullInfo` read from the database."""
+    client_id = info.last_snapshot.client_id
+    with self._lock:
+      self._AddClient(client_id)
+      if info.metadata.ping:
+        self._UpdatePing(client_id, info.metadata.ping)
+      for label in info.labels:
+        self._AddClientLabels(client_id, label.owner, [label.name])
+      self._UpdateSnapshot(client_id, info.last_snapshot)
+      if info.last_startup_info is not None:
+        self._UpdateStartupInfo(client_id, info.last_startup_info)
+
+      if self._journal is not None:
+        for method, args in self._journal.get(client_id, []):
+          method(self, client_id, *args)
+
+  # The following methods mirror writes of this process into the index.
+
+  def AddClient(self, client_id):
+    self._Mirror(ClientBitmapIndex._AddClient, client_id)
+
+  def UpdatePing(self, client_id, last_ping):
+    """Records the last ping time of a client."""
+    self._Mirror(ClientBitmapIndex._UpdatePing, client_id, last_ping)
+
+  def UpdateSnapshot(self, snapshot):
+    """Indexes the operating system and client version of a snapshot."""
+    self._Mirror(ClientBitmapIndex._UpdateSnapshot, snapshot.client_id,
+                 snapshot)
+
+  def UpdateStartupInfo(self, client_id, startup_info):
+    self._Mirror(ClientBitmapIndex._UpdateStartupInfo, client_id, startup_info)
+
+  def AddClientLabels(self, client_id, owner, labels):
+    self._Mirror(ClientBitmapIndex._AddClientLabels, client_id, owner,
+                 list(labels))
+
+  def RemoveClientLabels(self, client_id, owner, labels):
+    self._Mirror(ClientBitmapIndex._RemoveClientLabels, client_id, owner,
+                 list(labels))
+
+  def AllClients(self):
+    with self._lock:
+      return self._all.Copy()
+
+  def ClientsWithLabel(self, label, owners=None):
+    """Returns clients having a label set by any of the given owners.
+
+    Args:
+      label: A label name.
+      owners: Owners of the label to consider. If None, the label set by any
+        owner matches.
+
+    Returns:
+      A bitmap of client ordinals.
+    """
+    with self._lock:
+      by_owner = self._labels.get(label, {})
+      if owners is None:
+        return bitmap.UnionAll(itervalues(by_owner))
+      return bitmap.UnionAll(by_owner[o] for o in owners if o in by_owner)
+
+  def ClientsWithOsPrefixes(self, prefixes):
+    """Returns clients whose operating system starts with any prefix."""
+    prefixes = tuple(prefixes)
+    with self._lock:
+      return bitmap.UnionAll(
+          bm for os_name, bm in iteritems(self._os)
+          if os_name.startswith(prefixes))
+
+  def ClientsWithVersion(self, predicate):
+    """Returns clients whose client version satisfies a predicate."""
+    with self._lock:
+      return bitmap.UnionAll(
+          bm for version, bm in iteritems(self._versions) if predicate(version))
+
+  def ClientsPingedSince(self, min_last_ping):
+    """Returns clients that pinged at or after a given time."""
+    micros = min_last_ping.AsMicrosecondsSinceEpoch()
+    first_bucket = micros // _PING_BUCKET_MICROS
+    with self._lock:
+      idx = bisect.bisect_left(self._ping_bucket_keys, first_bucket)
+      later_buckets = self._ping_bucket_keys[idx:]
+      if later_buckets and later_buckets[0] == first_bucket:
+        later_buckets = later_buckets[1:]
+        boundary = bitmap.Bitmap(
+            ordinal for ordinal in self._ping_buckets[first_bucket]
+            if self._pings[ordinal] >= micros)
+      else:
+        boundary = bitmap.Bitmap()
+
+      return bitmap.UnionAll(
+          [boundary] + [self._ping_buckets[key] for key in later_buckets])
+
+  def ClientIds(self, ordinals):
+    """Returns sorted ids of clients with given ordinals."""
+    with self._lock:
+      return sorted(self._client_ids[ordinal] for ordinal in ordinals)
+
+
+def _Rebuild(database, index):
+  """Replaces the index of a database with a new one built from its clients."""
+  with _BUILD_LOCK:
+    if database.client_bitmap_index is not index:
+      # Somebody else rebuilt the index in the meantime.
+      return database.client_bitmap_index
+
+    new_index = ClientBitmapIndex.FromDatabase(database, predecessor=index)
+    database.client_bitmap_index = new_index
+    return new_index
+
+
+def _RefreshInBackground(database, index):
+  """Starts a rebuild of the index unless one is already running."""
+  global _refresh_thread
+
+  with _REFRESH_LOCK:
+    if _refresh_thread is not None and _refresh_thread.is_alive():
+      return
+
+    _refresh_thread = threading.Thread(
+        name="ClientBitmapIndexRefresher",
+        target=_Rebuild,
+        args=(database, index))
+    _refresh_thread.daemon = True
+    _refresh_thread.start()
+
+
+def GetIndex():
+  """Returns the index of the relational database, building it if needed.
+
+  The first call of a process builds the index. Afterwards an expired index is
+  still returned while a new one is built in the background, so that callers
+  don't wait for a read of the whole fleet.
+
+  Returns:
+    A ClientBitmapIndex instance.
+  """
+  ttl = config.CONFIG["ClientIndex.bitmap_index_ttl"].seconds
+  database = data_store.REL_DB
+  index = database.client_bitmap_index
+  if index is None:
+    with _BUILD_LOCK:
+      if database.client_bitmap_index is None:
+        # An empty index that mirrors the writes made during the first build.
+        database.client_bitmap_index = ClientBitmapIndex()
+      index = database.client_bitmap_index
+
+  if index.build_time is None or not ttl:
+    return _Rebuild(database, index)
+
+  if time.time() >= index.build_time + ttl:
+    _RefreshInBackground(database, index)
+  return index
+
+
+def WaitForRefresh():
+  """Waits for a background rebuild of the index to finish."""
+  with _REFRESH_LOCK:
+    refresh_thread = _refresh_thread
+  if refresh_thread is not None:
+    refresh_thread.join()
@@ -0,0 +1,172 @@
+#!/usr/bin/env python
+"""Tests for the client bitmap index."""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import unicode_literals
+
+from grr_response_core.lib import flags
+from grr_response_core.lib import rdfvalue
+from grr_response_core.lib import utils
+from grr_response_core.lib.rdfvalues import client as rdf_client
+from grr_response_server import client_bitmap_index
+from grr_response_server import data_store
+from grr_response_server.rdfvalues import objects as rdf_objects
+from grr.test_lib import test_lib
+
+
+class ClientBitmapIndexTest(test_lib.GRRBaseTest):
+
+  def _WriteClient(self, client_id, os=None, version=None, ping=None):
+    data_store.REL_DB.WriteClientMetadata(
+        client_id, fleetspeak_enabled=False, last_ping=ping)
+    snapshot = rdf_objects.ClientSnapshot(client_id=client_id)
+    if os is not None:
+      snapshot.knowledge_base.os = os
+    if version is not None:
+      snapshot.startup_info.client_info.client_version = version
+    data_store.REL_DB.WriteClientSnapshot(snapshot)
+
+  def testBuildsFromDatabase(self):
+    self._WriteClient("C.1000000000000000", os="Linux", version=3000)
+    self._WriteClient("C.1000000000000001", os="Windows", version=3100)
+    self._WriteClient("C.1000000000000002")
+    data_store.REL_DB.AddClientLabels("C.1000000000000000", "owner1", ["foo"])
+    data_store.REL_DB.AddClientLabels("C.1000000000000001", "owner2", ["foo"])
+
+    index = client_bitmap_index.GetIndex()
+
+    self.assertEqual(
+        index.ClientIds(index.AllClients()),
+        ["C.1000000000000000", "C.1000000000000001", "C.1000000000000002"])
+    self.assertEqual(
+        index.ClientIds(index.ClientsWithLabel("foo")),
+        ["C.1000000000000000", "C.1000000000000001"])
+    self.assertEqual(
+        index.ClientIds(index.ClientsWithLabel("foo", owners=["owner2"])),
+        ["C.1000000000000001"])
+    self.assertEqual(index.ClientIds(index.ClientsWithLabel("bar")), [])
+    self.assertEqual(
+        index.ClientIds(index.ClientsWithOsPrefixes(["Linux", "Darwin"])),
+        ["C.1000000000000000"])
+    self.assertEqual(
+        index.ClientIds(index.ClientsWithVersion(lambda v: v > 3000)),
+        ["C.1000000000000001"])
+
+  def testRebuildsWhenTtlExpires(self):
+    with test_lib.ConfigOverrider({"ClientIndex.bitmap_index_ttl": "1h"}):
+      with test_lib.FakeTime(rdfvalue.RDFDatetime.FromSecondsSinceEpoch(0)):
+        index = client_bitmap_index.GetIndex()
+        self.assertIs(client_bitmap_index.GetIndex(), index)
+
+        # Writes of other processes don't go through this process' wrapper.
+        data_store.REL_DB.delegate.WriteClientMetadata(
+            "C.1000000000000000", fleetspeak_enabled=False)
+        self.assertFalse(client_bitmap_index.GetIndex().AllClients())
+
+      with test_lib.FakeTime(rdfvalue.RDFDatetime.FromSecondsSinceEpoch(3600)):
+        # The expired index is still used while a new one is built.
+        self.assertIs(client_bitmap_index.GetIndex(), index)
+        client_bitmap_index.WaitForRefresh()
+
+        index = client_bitmap_index.GetIndex()
+        self.assertEqual(
+            index.ClientIds(index.AllClients()), ["C.1000000000000000"])
+
+  def testMirrorsWrites(self):
+    with test_lib.ConfigOverrider({"ClientIndex.bitmap_index_ttl": "1h"}):
+      index = client_bitmap_index.GetIndex()
+      client_id = "C.1000000000000000"
+
+      self._WriteClient(client_id, os="Linux", version=3000)
+      data_store.REL_DB.AddClientLabels(client_id, "owner", ["foo", "bar"])
+      self.assertEqual(index.ClientIds(index.AllClients()), [client_id])
+      self.assertEqual(
+          index.ClientIds(index.ClientsWithLabel("foo")), [client_id])
+      self.assertEqual(
+          index.ClientIds(index.ClientsWithOsPrefixes(["Linux"])),
+          [client_id])
+
+      data_store.REL_DB.RemoveClientLabels(client_id, "owner", ["foo"])
+      self._WriteClient(client_id, os="Windows", version=3100)
+      startup_info = rdf_client.StartupInfo()
+      startup_info.client_info.client_version = 3200
+      data_store.REL_DB.WriteClientStartupInfo(client_id, startup_info)
+
+      self.assertIs(client_bitmap_index.GetIndex(), index)
+      self.assertEqual(index.ClientIds(index.ClientsWithLabel("foo")), [])
+      self.assertEqual(
+          index.ClientIds(index.ClientsWithLabel("bar")), [client_id])
+      self.assertEqual(
+          index.ClientIds(index.ClientsWithOsPrefixes(["Linux"])), [])
+      self.assertEqual(
+          index.ClientIds(index.ClientsWithOsPrefixes(["Windows"])),
+          [client_id])
+      self.assertEqual(
+          index.ClientIds(index.ClientsWithVersion(lambda v: v == 3200)),
+          [client_id])
+
+  def testWritesDuringBuildAreNotLost(self):
+    client_id = "C.1000000000000000"
+    self._WriteClient(client_id)
+    data_store.REL_DB.AddClientLabels(client_id, "owner", ["foo"])
+    index = client_bitmap_index.GetIndex()
+
+    iterate = data_store.REL_DB.IterateAllClientsFullInfo
+
+    def IterateAllClientsFullInfo():
+      for info in iterate():
+        # The label is removed after the client was read.
+        data_store.REL_DB.RemoveClientLabels(client_id, "owner", ["foo"])
+        data_store.REL_DB.AddClientLabels(client_id, "owner", ["bar"])
+        yield info
+
+    with utils.Stubber(data_store.REL_DB, "IterateAllClientsFullInfo",
+                       IterateAllClientsFullInfo):
+      new_index = client_bitmap_index.ClientBitmapIndex.FromDatabase(
+          data_store.REL_DB, predecessor=index)
+
+    self.assertEqual(new_index.ClientIds(new_index.ClientsWithLabel("foo")), [])
+    self.assertEqual(
+        new_index.ClientIds(new_index.ClientsWithLabel("bar")), [client_id])
+
+    # Writes mirrored into the replaced index are forwarded to the new one.
+    index.RemoveClientLabels(client_id, "owner", ["bar"])
+    self.assertEqual(new_index.ClientIds(new_index.ClientsWithLabel("bar")), [])
+
+  def testClientsPingedSince(self):
+    hour = rdfvalue.Duration("1h")
+    minute = rdfvalue.Duration("1m")
+    base = rdfvalue.RDFDatetime.FromSecondsSinceEpoch(100 * 3600)
+    self._WriteClient("C.1000000000000000", ping=base - hour)
+    self._WriteClient("C.1000000000000001", ping=base + minute)
+    self._WriteClient("C.1000000000000002", ping=base + minute + minute)
+    self._WriteClient("C.1000000000000003", ping=base + hour)
+    self._WriteClient("C.1000000000000004")
+
+    index = client_bitmap_index.GetIndex()
+
+    self.assertEqual(
+        index.ClientIds(index.ClientsPingedSince(base - hour)), [
+            "C.1000000000000000", "C.1000000000000001", "C.1000000000000002",
+            "C.1000000000000003"
+        ])
+    self.assertEqual(
+        index.ClientIds(index.ClientsPingedSince(base + minute + minute)),
+        ["C.1000000000000002", "C.1000000000000003"])
+    self.assertEqual(
+        index.ClientIds(index.ClientsPingedSince(base + hour + hour)), [])
+
+    # Pings move clients between buckets.
+    data_store.REL_DB.WriteClientMetadata(
+        "C.1000000000000000", last_ping=base + hour + hour)
+    self.assertEqual(
+        index.ClientIds(index.ClientsPingedSince(base + hour)),
+        ["C.1000000000000000", "C.1000000000000003"])
+
+
+def main(argv):
+  test_lib.main(argv)
+
+
+if __name__ == "__main__":
+  flags.StartMain(main)
@@ -11,14 +11,16 @@ from __future__ import unicode_literals
 from builtins import map  # pylint: disable=redefined-builtin
 from builtins import range  # pylint: disable=redefined-builtin
 from future.utils import iteritems
-from future.utils import itervalues
 from future.utils import string_types
 
 from grr_response_core.lib import rdfvalue
 from grr_response_core.lib import utils
 from grr_response_core.lib.rdfvalues import client as rdf_client
+from grr_response_core.lib.util import bitmap
 from grr_response_server import aff4
+from grr_response_server import client_bitmap_index
 from grr_response_server import data_store
+from grr_response_server import db
 from grr_response_server import keyword_index
 from grr_response_server.aff4_objects import aff4_grr
 
@@ -348,6 +350,10 @@ class ClientIndex(object):
 
   def _AnalyzeKeywords(self, keywords):
     """Extracts a start time from a list of keywords if present."""
+    if isinstance(keywords, string_types):
+      raise ValueError(
+          "Keywords should be an iterable, not a string (got %s)." % keywords)
+
     start_time = rdfvalue.RDFDatetime.Now() - rdfvalue.Duration("180d")
     filtered_keywords = []
 
@@ -366,38 +372,69 @@ class ClientIndex(object):
 
     return start_time, filtered_keywords
 
-  def LookupClients(self, keywords):
-    """Returns a list of client URNs associated with keywords.
+  def LookupClients(self, keywords, offset=0, count=None):
+    """Returns a list of client ids associated with keywords.
+
+    Keywords are intersected and the results are paginated by the database,
+    so only the requested page of client ids is read.
 
     Args:
       keywords: The list of keywords to search by.
+      offset: Number of matching clients to skip.
+      count: Maximum number of client ids to return. If not set, all matching
+        clients are returned.
 
     Returns:
-      A list of client URNs.
+      A list of client ids sorted in ascending order.
 
     Raises:
       ValueError: A string (single keyword) was passed instead of an iterable.
     """
-    if isinstance(keywords, string_types):
-      raise ValueError(
-          "Keywords should be an iterable, not a string (got %s)." % keywords)
+    start_time, filtered_keywords = self._AnalyzeKeywords(keywords)
 
+    return data_store.REL_DB.ListClientsForAllKeywords(
+        list(map(self._NormalizeKeyword, filtered_keywords)),
+        offset,
+        db.MAX_COUNT if count is None else count,
+        start_time=start_time)
+
+  def EstimateClients(self, keywords):
+    """Estimates the number of clients associated with keywords.
+
+    Args:
+      keywords: The list of keywords to search by.
+
+    Returns:
+      The number of clients associated with the least common keyword. It is
+      exact for a single keyword and an upper bound otherwise.
+
+    Raises:
+      ValueError: A string (single keyword) was passed instead of an iterable.
+    """
     start_time, filtered_keywords = self._AnalyzeKeywords(keywords)
 
-    keyword_map = data_store.REL_DB.ListClientsForKeywords(
+    return data_store.REL_DB.EstimateClientsForAllKeywords(
         list(map(self._NormalizeKeyword, filtered_keywords)),
         start_time=start_time)
 
-    results = itervalues(keyword_map)
-    relevant_set = set(next(results))
+  def LookupClientsWithLabels(self, labels, owners=None):
+    """Returns ids of clients having any of the given labels.
 
-    for hits in results:
-      relevant_set &= set(hits)
+    Clients are looked up in the client bitmap index of this process, so
+    labels written by other processes may be missed until it is rebuilt.
 
-      if not relevant_set:
-        return []
+    Args:
+      labels: Names of the labels to search by.
+      owners: Owners of the labels to consider. If not set, labels set by any
+        owner match.
 
-    return sorted(relevant_set)
+    Returns:
+      A list of client ids sorted in ascending order.
+    """
+    index = client_bitmap_index.GetIndex()
+    return index.ClientIds(
+        bitmap.UnionAll(
+            index.ClientsWithLabel(label, owners=owners) for label in labels))
 
   def ReadClientPostingLists(self, keywords):
     """Looks up all clients associated with any of the given keywords.
@@ -391,6 +391,59 @@ class ClientIndexTest(aff4_test_lib.AFF4ObjectTest):
     # Universal keyword should find everything.
     self.assertCountEqual(index.LookupClients(["."]), list(clients))
 
+  def testLookupClientsPaginates(self):
+    index = client_index.ClientIndex()
+
+    clients = self._SetupClients(5)
+    for client_id, client in iteritems(clients):
+      data_store.REL_DB.WriteClientMetadata(client_id, fleetspeak_enabled=False)
+      index.AddClient(client)
+
+    client_ids = sorted(clients)
+    self.assertEqual(index.LookupClients(["."], offset=0, count=2),
+                     client_ids[:2])
+    self.assertEqual(index.LookupClients(["."], offset=2, count=2),
+                     client_ids[2:4])
+    self.assertEqual(index.LookupClients(["."], offset=4, count=2),
+                     client_ids[4:])
+    self.assertEqual(
+        index.LookupClients(["192.168.0", "windows"], offset=1, count=1),
+        client_ids[1:2])
+
+  def testEstimateClients(self):
+    index = client_index.ClientIndex()
+
+    clients = self._SetupClients(5)
+    for client_id, client in iteritems(clients):
+      data_store.REL_DB.WriteClientMetadata(client_id, fleetspeak_enabled=False)
+      index.AddClient(client)
+
+    self.assertEqual(index.EstimateClients(["."]), 5)
+    self.assertEqual(index.EstimateClients([]), 5)
+    self.assertEqual(index.EstimateClients(["windows", "Host-2"]), 1)
+    self.assertEqual(index.EstimateClients(["windows", "missing"]), 0)
+
+    with self.assertRaises(ValueError):
+      index.EstimateClients("windows")
+
+  def testLookupClientsWithLabels(self):
+    index = client_index.ClientIndex()
+
+    client_ids = sorted(self._SetupClients(4))
+    for client_id in client_ids:
+      data_store.REL_DB.WriteClientMetadata(client_id, fleetspeak_enabled=False)
+    data_store.REL_DB.AddClientLabels(client_ids[0], "owner1", ["foo"])
+    data_store.REL_DB.AddClientLabels(client_ids[1], "owner2", ["foo"])
+    data_store.REL_DB.AddClientLabels(client_ids[2], "owner1", ["bar"])
+
+    self.assertEqual(index.LookupClientsWithLabels(["foo"]), client_ids[:2])
+    self.assertEqual(
+        index.LookupClientsWithLabels(["foo", "bar"]), client_ids[:3])
+    self.assertEqual(
+        index.LookupClientsWithLabels(["foo", "bar"], owners=["owner1"]),
+        [client_ids[0], client_ids[2]])
+    self.assertEqual(index.LookupClientsWithLabels(["baz"]), [])
+
   def testAddTimestamp(self):
     index = client_index.ClientIndex()
 
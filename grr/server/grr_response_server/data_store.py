@@ -1701,7 +1701,17 @@ class DataStoreInit(registry.InitHook):
       cls = blob_store.REGISTRY[blobstore_name]
     except KeyError:
       raise ValueError("No blob store %s found." % blobstore_name)
-    BLOBS = blob_store.BlobStoreValidationWrapper(cls())
+    bs = cls()
+    if config.CONFIG["Blobstore.cache_max_size"]:
+      bs = blob_store.CachingBlobStore(
+          bs,
+          config.CONFIG["Blobstore.cache_max_size"],
+          disk_cache_path=config.CONFIG["Blobstore.cache_disk_path"],
+          disk_cache_max_size=config.CONFIG["Blobstore.cache_disk_max_size"],
+          negative_cache_size=config.CONFIG["Blobstore.negative_cache_size"],
+          negative_cache_ttl=config.CONFIG["Blobstore.negative_cache_ttl"]
+          .seconds)
+    BLOBS = blob_store.BlobStoreValidationWrapper(bs)
 
     # Initialize a relational DB if configured.
     rel_db_name = config.CONFIG["Database.implementation"]
@@ -6,12 +6,11 @@ from __future__ import unicode_literals
 
 import collections
 import sys
-import threading
 
 
 from grr_response_core.lib import rdfvalue
-from grr_response_core.lib import utils
 from grr_response_core.lib.util import precondition
+from grr_response_core.lib.util import random
 from grr_response_server import db
 from grr_response_server.databases import mem_artifacts
 from grr_response_server.databases import mem_blobs
@@ -26,6 +25,7 @@ from grr_response_server.databases import mem_paths
 from grr_response_server.databases import mem_signed_binaries
 from grr_response_server.databases import mem_stats
 from grr_response_server.databases import mem_users
+from grr_response_server.databases import mem_utils
 from grr_response_server.rdfvalues import objects as rdf_objects
 
 
@@ -50,7 +50,9 @@ class InMemoryDB(mem_artifacts.InMemoryDBArtifactsMixin,
   def __init__(self):
     super(InMemoryDB, self).__init__()
     self._Init()
-    self.lock = threading.RLock()
+    # Each mixin guards its state with its own lock, see mem_utils for the
+    # locking rules.
+    self.locks = mem_utils.OrderedLocks(mem_utils.LOCK_ORDER)
 
   def _Init(self):
     self.artifacts = {}
@@ -63,7 +65,10 @@ class InMemoryDB(mem_artifacts.InMemoryDBArtifactsMixin,
     self.cronjob_leases = {}
     self.cronjobs = {}
     self.foreman_rules = []
+    # Maps keyword to client id to the time the keyword was associated.
     self.keywords = {}
+    # Maps keyword to a sorted list of ids of clients associated with it.
+    self.keyword_postings = {}
     self.labels = {}
     self.message_handler_leases = {}
     self.message_handler_requests = {}
@@ -74,6 +79,9 @@ class InMemoryDB(mem_artifacts.InMemoryDBArtifactsMixin,
     # debugging experience.
     # Maps (client_id, path_type, components) to a path record.
     self.path_records = {}
+    # Maps (client_id, path_type) to a trie of path records indexed by path
+    # components.
+    self.path_tries = {}
     # Maps (client_id, path_type, path_id) to a blob record.
     self.blob_records = {}
     self.message_handler_requests = {}
@@ -82,6 +90,9 @@ class InMemoryDB(mem_artifacts.InMemoryDBArtifactsMixin,
     self.cronjob_leases = {}
     self.cronjob_runs = {}
     self.foreman_rules = []
+    # Starts at a random value so that versions of a cleared database don't
+    # collide with the ones seen before.
+    self.foreman_rules_version = random.UInt64()
     self.blobs = {}
     self.blob_refs_by_hashes = {}
     self.users = {}
@@ -104,14 +115,23 @@ class InMemoryDB(mem_artifacts.InMemoryDBArtifactsMixin,
     self.flow_handler_stop = True
     self.stats_store_entries = {}
     self.api_audit_entries = []
+    # Maps starts of rolled up days to dicts of numbers of audit entries.
+    self.api_audit_daily_counts = {}
     self.hunts = {}
+    # Maps hunt_id to metadata of the hunt, used to list hunts.
+    self.hunt_metadata = {}
+    # Maps hunt_id to an index of results of the hunt's flows.
+    self.hunt_results = {}
+    # Maps hunt_id to an index of the hunt's flows.
+    self.hunt_flows = {}
     self.signed_binary_references = {}
     self.client_graph_series = {}
 
-  @utils.Synchronized
   def ClearTestDB(self):
+    # The message handler thread needs the locks to finish.
     self.UnregisterMessageHandler()
-    self._Init()
+    with self.locks.AcquireAll():
+      self._Init()
 
   def _AllPathIDs(self):
     result = set()
@@ -8,11 +8,13 @@ from future.builtins import str
 from future.utils import itervalues
 
 from grr_response_server import db
+from grr_response_server.databases import mem_utils
 
 
 class InMemoryDBArtifactsMixin(object):
   """An in-memory database mixin with artifact-related methods."""
 
+  @mem_utils.Synchronized(mem_utils.ARTIFACTS)
   def WriteArtifact(self, artifact):
     """Writes new artifact to the database."""
     name = str(artifact.name)
@@ -22,6 +24,7 @@ class InMemoryDBArtifactsMixin(object):
 
     self.artifacts[name] = artifact.Copy()
 
+  @mem_utils.Synchronized(mem_utils.ARTIFACTS)
   def ReadArtifact(self, name):
     """Looks up an artifact with given name from the database."""
     try:
@@ -31,6 +34,7 @@ class InMemoryDBArtifactsMixin(object):
 
     return artifact.Copy()
 
+  @mem_utils.Synchronized(mem_utils.ARTIFACTS)
   def ReadAllArtifacts(self):
     """Lists all artifacts that are stored in the database."""
     artifacts = []
@@ -40,6 +44,7 @@ class InMemoryDBArtifactsMixin(object):
 
     return artifacts
 
+  @mem_utils.Synchronized(mem_utils.ARTIFACTS)
   def DeleteArtifact(self, name):
     """Deletes an artifact with given name from the database."""
     try:
@@ -0,0 +1,71 @@
+#!/usr/bin/env python
+"""Benchmarks of concurrent access to the in memory database."""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import unicode_literals
+
+import threading
+import time
+
+from builtins import range  # pylint: disable=redefined-builtin
+
+from grr_response_core.lib import flags
+from grr_response_core.lib import rdfvalue
+from grr_response_server.databases import mem
+from grr_response_server.rdfvalues import objects as rdf_objects
+from grr.test_lib import benchmark_test_lib
+from grr.test_lib import test_lib
+
+
+class InMemoryDBConcurrencyBenchmark(benchmark_test_lib.MicroBenchmarks):
+  """Measures InMemoryDB throughput with a growing number of threads."""
+
+  units = "s"
+
+  OPERATIONS_PER_THREAD = 2000
+
+  def setUp(self):
+    super(InMemoryDBConcurrencyBenchmark, self).setUp(["Ops/s"], ["<20"])
+
+  def _Work(self, db, thread_idx):
+    client_id = "C.%016x" % (thread_idx + 1)
+    username = "user%d" % thread_idx
+    db.WriteClientMetadata(client_id, fleetspeak_enabled=False)
+
+    for i in range(self.OPERATIONS_PER_THREAD // 4):
+      db.WriteClientMetadata(client_id, last_ping=rdfvalue.RDFDatetime.Now())
+      db.WriteGRRUser(username)
+      db.WritePathInfos(
+          client_id, [rdf_objects.PathInfo.OS(components=["dir", str(i)])])
+      db.ReadGRRUser(username)
+
+  def _RunThreads(self, num_threads):
+    db = mem.InMemoryDB()
+    threads = [
+        threading.Thread(target=self._Work, args=(db, idx))
+        for idx in range(num_threads)
+    ]
+
+    start = time.time()
+    for thread in threads:
+      thread.start()
+    for thread in threads:
+      thread.join()
+    time_taken = time.time() - start
+
+    operations = num_threads * self.OPERATIONS_PER_THREAD
+    self.AddResult("%d threads" % num_threads, time_taken, operations,
+                   "%.1f" % (operations / time_taken))
+
+  def testMixedWorkload(self):
+    """Mixed clients, users and paths writes and reads."""
+    for num_threads in [1, 2, 4, 8]:
+      self._RunThreads(num_threads)
+
+
+def main(argv):
+  test_lib.main(argv)
+
+
+if __name__ == "__main__":
+  flags.StartMain(main)
@@ -7,7 +7,7 @@ from __future__ import unicode_literals
 
 from future.utils import itervalues
 
-from grr_response_core.lib import utils
+from grr_response_server.databases import mem_utils
 
 
 class _BlobRecord(object):
@@ -25,12 +25,12 @@ class _BlobRecord(object):
 class InMemoryDBBlobsMixin(object):
   """InMemoryDB mixin for blobs related functions."""
 
-  @utils.Synchronized
+  @mem_utils.Synchronized(mem_utils.BLOBS)
   def WriteBlobs(self, blob_id_data_map):
     """Writes given blobs."""
     self.blobs.update(blob_id_data_map)
 
-  @utils.Synchronized
+  @mem_utils.Synchronized(mem_utils.BLOBS)
   def ReadBlobs(self, blob_ids):
     """Reads given blobs."""
 
@@ -40,7 +40,7 @@ class InMemoryDBBlobsMixin(object):
 
     return result
 
-  @utils.Synchronized
+  @mem_utils.Synchronized(mem_utils.BLOBS)
   def CheckBlobsExist(self, blob_ids):
     """Checks if given blobs exit."""
 
@@ -50,12 +50,12 @@ class InMemoryDBBlobsMixin(object):
 
     return result
 
-  @utils.Synchronized
+  @mem_utils.Synchronized(mem_utils.BLOBS)
   def WriteHashBlobReferences(self, references_by_hash):
     for k, vs in references_by_hash.items():
       self.blob_refs_by_hashes[k] = [v.Copy() for v in vs]
 
-  @utils.Synchronized
+  @mem_utils.Synchronized(mem_utils.BLOBS)
   def ReadHashBlobReferences(self, hashes):
     result = {}
     for hash_id in hashes:
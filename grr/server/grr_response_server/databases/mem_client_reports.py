@@ -10,9 +10,9 @@ from typing import Dict, Optional, Text
 
 from grr_response_core.lib import rdfvalue
 from grr_response_core.lib import time_utils
-from grr_response_core.lib import utils
 from grr_response_core.lib.rdfvalues import stats as rdf_stats
 from grr_response_core.lib.rdfvalues import structs as rdf_structs
+from grr_response_server.databases import mem_utils
 
 
 # TODO(user): Remove this pytype exception when DB mixins are refactored to
@@ -28,7 +28,7 @@ class InMemoryDBClientReportsMixin(object):
       mem.py, for consistency with other in-memory DB mixins.
   """
 
-  @utils.Synchronized
+  @mem_utils.Synchronized(mem_utils.CLIENT_REPORTS)
   def WriteClientGraphSeries(self,
                              graph_series,
                              client_label,
@@ -41,7 +41,7 @@ class InMemoryDBClientReportsMixin(object):
     series_key = (client_label, graph_series.report_type, timestamp)
     self.client_graph_series[series_key] = graph_series.Copy()
 
-  @utils.Synchronized
+  @mem_utils.Synchronized(mem_utils.CLIENT_REPORTS)
   def ReadAllClientGraphSeries(
       self,
       client_label,
@@ -58,7 +58,7 @@ class InMemoryDBClientReportsMixin(object):
         series_with_timestamps[timestamp.Copy()] = series.Copy()
     return series_with_timestamps
 
-  @utils.Synchronized
+  @mem_utils.Synchronized(mem_utils.CLIENT_REPORTS)
   def ReadMostRecentClientGraphSeries(self, client_label,
                                       report_type
                                      ):
@@ -5,6 +5,7 @@ from __future__ import division
 
 from __future__ import unicode_literals
 
+import bisect
 
 from future.utils import iteritems
 from future.utils import itervalues
@@ -15,13 +16,14 @@ from grr_response_core.lib import utils
 from grr_response_core.lib.rdfvalues import client as rdf_client
 from grr_response_core.lib.rdfvalues import client_stats as rdf_client_stats
 from grr_response_server import db
+from grr_response_server.databases import mem_utils
 from grr_response_server.rdfvalues import objects as rdf_objects
 
 
 class InMemoryDBClientMixin(object):
   """InMemoryDB mixin for client related functions."""
 
-  @utils.Synchronized
+  @mem_utils.Synchronized(mem_utils.CLIENTS)
   def WriteClientMetadata(self,
                           client_id,
                           certificate=None,
@@ -59,7 +61,7 @@ class InMemoryDBClientMixin(object):
 
     self.metadatas.setdefault(client_id, {}).update(md)
 
-  @utils.Synchronized
+  @mem_utils.Synchronized(mem_utils.CLIENTS)
   def MultiReadClientMetadata(self, client_ids):
     """Reads ClientMetadata records for a list of clients."""
     res = {}
@@ -81,7 +83,7 @@ class InMemoryDBClientMixin(object):
 
     return res
 
-  @utils.Synchronized
+  @mem_utils.Synchronized(mem_utils.CLIENTS)
   def WriteClientSnapshot(self, client):
     """Writes new client snapshot."""
     client_id = client.client_id
@@ -101,7 +103,7 @@ class InMemoryDBClientMixin(object):
 
     client.startup_info = startup_info
 
-  @utils.Synchronized
+  @mem_utils.Synchronized(mem_utils.CLIENTS)
   def MultiReadClientSnapshot(self, client_ids):
     """Reads the latest client snapshots for a list of clients."""
     res = {}
@@ -120,7 +122,7 @@ class InMemoryDBClientMixin(object):
       res[client_id] = client_obj
     return res
 
-  @utils.Synchronized
+  @mem_utils.Synchronized(mem_utils.CLIENTS)
   def MultiReadClientFullInfo(self, client_ids, min_last_ping=None):
     """Reads full client information for a list of clients."""
     res = {}
@@ -145,7 +147,7 @@ class InMemoryDBClientMixin(object):
       res[client_id] = full_info
     return res
 
-  @utils.Synchronized
+  @mem_utils.Synchronized(mem_utils.CLIENTS)
   def ReadAllClientIDs(self, min_last_ping=None):
     client_ids = []
     for client_id, metadata in iteritems(self.metadatas):
@@ -154,7 +156,12 @@ class InMemoryDBClientMixin(object):
         client_ids.append(client_id)
     return client_ids
 
-  @utils.Synchronized
+  @mem_utils.Synchronized(mem_utils.CLIENTS)
+  def _ClientExists(self, client_id):
+    """Checks a client's existence for mixins that hold their own locks."""
+    return client_id in self.metadatas
+
+  @mem_utils.Synchronized(mem_utils.CLIENTS)
   def WriteClientSnapshotHistory(self, clients):
     """Writes the full history for a particular client."""
     if clients[0].client_id not in self.metadatas:
@@ -172,7 +179,7 @@ class InMemoryDBClientMixin(object):
 
       client.startup_info = startup_info
 
-  @utils.Synchronized
+  @mem_utils.Synchronized(mem_utils.CLIENTS)
   def ReadClientSnapshotHistory(self, client_id, timerange=None):
     """Reads the full history for a particular client."""
     from_time, to_time = self._ParseTimeRange(timerange)
@@ -192,7 +199,7 @@ class InMemoryDBClientMixin(object):
       res.append(client_obj)
     return res
 
-  @utils.Synchronized
+  @mem_utils.Synchronized(mem_utils.CLIENTS)
   def AddClientKeywords(self, client_id, keywords):
     """Associates the provided keywords with the client."""
     if client_id not in self.metadatas:
@@ -201,9 +208,11 @@ class InMemoryDBClientMixin(object):
     keywords = [utils.SmartStr(k) for k in keywords]
     for k in keywords:
       self.keywords.setdefault(k, {})
+      if client_id not in self.keywords[k]:
+        bisect.insort(self.keyword_postings.setdefault(k, []), client_id)
       self.keywords[k][client_id] = rdfvalue.RDFDatetime.Now()
 
-  @utils.Synchronized
+  @mem_utils.Synchronized(mem_utils.CLIENTS)
   def ListClientsForKeywords(self, keywords, start_time=None):
     """Lists the clients associated with keywords."""
     keywords = set(keywords)
@@ -220,13 +229,67 @@ class InMemoryDBClientMixin(object):
         res[keyword_mapping[k]].append(client_id)
     return res
 
-  @utils.Synchronized
+  def _KeywordPostings(self, keywords):
+    """Returns sorted client id lists of given keywords, shortest first."""
+    postings = []
+    for k in set(utils.SmartStr(k) for k in keywords):
+      client_ids = self.keyword_postings.get(k, [])
+      postings.append((client_ids, self.keywords.get(k, {})))
+    postings.sort(key=lambda p: len(p[0]))
+    return postings
+
+  @mem_utils.Synchronized(mem_utils.CLIENTS)
+  def ListClientsForAllKeywords(self, keywords, offset, count, start_time=None):
+    """Lists the clients associated with all of the given keywords."""
+    postings = self._KeywordPostings(keywords)
+
+    # Merge intersection: every client id of the shortest posting list is
+    # looked up in the other lists. Since all lists are sorted, the lookups
+    # only ever move forward.
+    positions = [0] * len(postings)
+    result = []
+    for client_id in postings[0][0]:
+      if len(result) >= offset + count:
+        break
+
+      matches = True
+      for i, (client_ids, timestamps) in enumerate(postings):
+        if i:
+          positions[i] = bisect.bisect_left(client_ids, client_id, positions[i])
+          if (positions[i] == len(client_ids) or
+              client_ids[positions[i]] != client_id):
+            matches = False
+            break
+
+        if start_time is not None and timestamps[client_id] < start_time:
+          matches = False
+          break
+
+      if matches:
+        result.append(client_id)
+
+    return result[offset:]
+
+  @mem_utils.Synchronized(mem_utils.CLIENTS)
+  def EstimateClientsForAllKeywords(self, keywords, start_time=None):
+    """Estimates the number of clients associated with all given keywords."""
+    postings = self._KeywordPostings(keywords)
+    if start_time is None:
+      return len(postings[0][0])
+
+    return min(
+        sum(1 for ts in itervalues(timestamps) if ts >= start_time)
+        for _, timestamps in postings)
+
+  @mem_utils.Synchronized(mem_utils.CLIENTS)
   def RemoveClientKeyword(self, client_id, keyword):
     """Removes the association of a particular client to a keyword."""
     if keyword in self.keywords and client_id in self.keywords[keyword]:
       del self.keywords[keyword][client_id]
+      postings = self.keyword_postings[keyword]
+      del postings[bisect.bisect_left(postings, client_id)]
 
-  @utils.Synchronized
+  @mem_utils.Synchronized(mem_utils.CLIENTS)
   def AddClientLabels(self, client_id, owner, labels):
     """Attaches a user label to a client."""
     if client_id not in self.metadatas:
@@ -236,7 +299,7 @@ class InMemoryDBClientMixin(object):
     for l in labels:
       labelset.add(utils.SmartUnicode(l))
 
-  @utils.Synchronized
+  @mem_utils.Synchronized(mem_utils.CLIENTS)
   def MultiReadClientLabels(self, client_ids):
     """Reads the user labels for a list of clients."""
     res = {}
@@ -249,14 +312,14 @@ class InMemoryDBClientMixin(object):
       res[client_id].sort(key=lambda label: (label.owner, label.name))
     return res
 
-  @utils.Synchronized
+  @mem_utils.Synchronized(mem_utils.CLIENTS)
   def RemoveClientLabels(self, client_id, owner, labels):
     """Removes a list of user labels from a given client."""
     labelset = self.labels.setdefault(client_id, {}).setdefault(owner, set())
     for l in labels:
       labelset.discard(utils.SmartUnicode(l))
 
-  @utils.Synchronized
+  @mem_utils.Synchronized(mem_utils.CLIENTS)
   def ReadAllClientLabels(self):
     """Lists all client labels known to the system."""
     result = set()
@@ -267,7 +330,7 @@ class InMemoryDBClientMixin(object):
 
     return list(result)
 
-  @utils.Synchronized
+  @mem_utils.Synchronized(mem_utils.CLIENTS)
   def WriteClientStartupInfo(self, client_id, startup_info):
     """Writes a new client startup record."""
     if client_id not in self.metadatas:
@@ -278,7 +341,7 @@ class InMemoryDBClientMixin(object):
     history = self.startup_history.setdefault(client_id, {})
     history[ts] = startup_info.SerializeToString()
 
-  @utils.Synchronized
+  @mem_utils.Synchronized(mem_utils.CLIENTS)
   def ReadClientStartupInfo(self, client_id):
     """Reads the latest client startup record for a single client."""
     history = self.startup_history.get(client_id, None)
@@ -290,7 +353,7 @@ class InMemoryDBClientMixin(object):
     res.timestamp = ts
     return res
 
-  @utils.Synchronized
+  @mem_utils.Synchronized(mem_utils.CLIENTS)
   def ReadClientStartupInfoHistory(self, client_id, timerange=None):
     """Reads the full startup history for a particular client."""
     from_time, to_time = self._ParseTimeRange(timerange)
@@ -308,7 +371,7 @@ class InMemoryDBClientMixin(object):
       res.append(client_data)
     return res
 
-  @utils.Synchronized
+  @mem_utils.Synchronized(mem_utils.CLIENTS)
   def WriteClientCrashInfo(self, client_id, crash_info):
     """Writes a new client crash record."""
     if client_id not in self.metadatas:
@@ -319,7 +382,7 @@ class InMemoryDBClientMixin(object):
     history = self.crash_history.setdefault(client_id, {})
     history[ts] = crash_info.SerializeToString()
 
-  @utils.Synchronized
+  @mem_utils.Synchronized(mem_utils.CLIENTS)
   def ReadClientCrashInfo(self, client_id):
     """Reads the latest client crash record for a single client."""
     history = self.crash_history.get(client_id, None)
@@ -331,7 +394,7 @@ class InMemoryDBClientMixin(object):
     res.timestamp = ts
     return res
 
-  @utils.Synchronized
+  @mem_utils.Synchronized(mem_utils.CLIENTS)
   def ReadClientCrashInfoHistory(self, client_id):
     """Reads the full crash history for a particular client."""
     history = self.crash_history.get(client_id)
@@ -344,7 +407,7 @@ class InMemoryDBClientMixin(object):
       res.append(client_data)
     return res
 
-  @utils.Synchronized
+  @mem_utils.Synchronized(mem_utils.CLIENTS)
   def WriteClientStats(self, client_id,
                        stats):
     """Stores a ClientStats instance."""
@@ -353,7 +416,7 @@ class InMemoryDBClientMixin(object):
 
     self.client_stats[client_id][stats.create_time] = stats
 
-  @utils.Synchronized
+  @mem_utils.Synchronized(mem_utils.CLIENTS)
   def ReadClientStats(self, client_id,
                       min_timestamp,
                       max_timestamp
@@ -366,7 +429,7 @@ class InMemoryDBClientMixin(object):
     results.sort(key=lambda stats: stats.create_time)
     return results
 
-  @utils.Synchronized
+  @mem_utils.Synchronized(mem_utils.CLIENTS)
   def DeleteOldClientStats(
       self, yield_after_count,
       retention_time):
@@ -9,17 +9,18 @@ from future.utils import itervalues
 from grr_response_core.lib import rdfvalue
 from grr_response_core.lib import utils
 from grr_response_server import db
+from grr_response_server.databases import mem_utils
 
 
 class InMemoryDBCronJobMixin(object):
   """InMemoryDB mixin for cronjob related functions."""
 
-  @utils.Synchronized
+  @mem_utils.Synchronized(mem_utils.CRON_JOBS)
   def WriteCronJob(self, cronjob):
     """Writes a cronjob to the database."""
     self.cronjobs[cronjob.cron_job_id] = cronjob.Copy()
 
-  @utils.Synchronized
+  @mem_utils.Synchronized(mem_utils.CRON_JOBS)
   def ReadCronJobs(self, cronjob_ids=None):
     """Reads a cronjob from the database."""
     if cronjob_ids is None:
@@ -40,7 +41,7 @@ class InMemoryDBCronJobMixin(object):
         job.leased_until, job.leased_by = lease
     return res
 
-  @utils.Synchronized
+  @mem_utils.Synchronized(mem_utils.CRON_JOBS)
   def UpdateCronJob(self,
                     cronjob_id,
                     last_run_status=db.Database.unchanged,
@@ -64,7 +65,7 @@ class InMemoryDBCronJobMixin(object):
     if forced_run_requested != db.Database.unchanged:
       job.forced_run_requested = forced_run_requested
 
-  @utils.Synchronized
+  @mem_utils.Synchronized(mem_utils.CRON_JOBS)
   def EnableCronJob(self, cronjob_id):
     """Enables a cronjob."""
     job = self.cronjobs.get(cronjob_id)
@@ -72,7 +73,7 @@ class InMemoryDBCronJobMixin(object):
       raise db.UnknownCronJobError("Cron job %s not known." % cronjob_id)
     job.enabled = True
 
-  @utils.Synchronized
+  @mem_utils.Synchronized(mem_utils.CRON_JOBS)
   def DisableCronJob(self, cronjob_id):
     """Disables a cronjob."""
     job = self.cronjobs.get(cronjob_id)
@@ -80,7 +81,7 @@ class InMemoryDBCronJobMixin(object):
       raise db.UnknownCronJobError("Cron job %s not known." % cronjob_id)
     job.enabled = False
 
-  @utils.Synchronized
+  @mem_utils.Synchronized(mem_utils.CRON_JOBS)
   def DeleteCronJob(self, cronjob_id):
     """Deletes a cronjob."""
     if cronjob_id not in self.cronjobs:
@@ -91,7 +92,7 @@ class InMemoryDBCronJobMixin(object):
     except KeyError:
       pass
 
-  @utils.Synchronized
+  @mem_utils.Synchronized(mem_utils.CRON_JOBS)
   def LeaseCronJobs(self, cronjob_ids=None, lease_time=None):
     """Leases all available cron jobs."""
     leased_jobs = []
@@ -112,7 +113,7 @@ class InMemoryDBCronJobMixin(object):
 
     return leased_jobs
 
-  @utils.Synchronized
+  @mem_utils.Synchronized(mem_utils.CRON_JOBS)
   def ReturnLeasedCronJobs(self, jobs):
     """Makes leased cron jobs available for leasing again."""
     errored_jobs = []
@@ -134,6 +135,7 @@ class InMemoryDBCronJobMixin(object):
       raise ValueError("Some jobs could not be returned: %s" % ",".join(
           job.cron_job_id for job in errored_jobs))
 
+  @mem_utils.Synchronized(mem_utils.CRON_JOBS)
   def WriteCronJobRun(self, run_object):
     """Stores a cron job run object in the database."""
     if run_object.cron_job_id not in self.cronjobs:
@@ -144,6 +146,7 @@ class InMemoryDBCronJobMixin(object):
     clone.timestamp = rdfvalue.RDFDatetime.Now()
     self.cronjob_runs[(clone.cron_job_id, clone.run_id)] = clone
 
+  @mem_utils.Synchronized(mem_utils.CRON_JOBS)
   def ReadCronJobRuns(self, job_id):
     """Reads all cron job runs for a given job id."""
     runs = [
@@ -152,6 +155,7 @@ class InMemoryDBCronJobMixin(object):
     ]
     return sorted(runs, key=lambda run: run.started_at, reverse=True)
 
+  @mem_utils.Synchronized(mem_utils.CRON_JOBS)
   def ReadCronJobRun(self, job_id, run_id):
     """Reads a single cron job run from the db."""
     for run in itervalues(self.cronjob_runs):
@@ -160,6 +164,7 @@ class InMemoryDBCronJobMixin(object):
     raise db.UnknownCronJobRunError(
         "Run with job id %s and run id %s not found." % (job_id, run_id))
 
+  @mem_utils.Synchronized(mem_utils.CRON_JOBS)
   def DeleteOldCronJobRuns(self, cutoff_timestamp):
     """Deletes cron job runs for a given job id."""
     deleted = 0
@@ -4,14 +4,16 @@ from __future__ import absolute_import
 from __future__ import division
 from __future__ import unicode_literals
 
+from future.utils import iteritems
+
 from grr_response_core.lib import rdfvalue
-from grr_response_core.lib import utils
+from grr_response_server.databases import mem_utils
 
 
 class InMemoryDBEventMixin(object):
   """InMemoryDB mixin for event handling."""
 
-  @utils.Synchronized
+  @mem_utils.Synchronized(mem_utils.EVENTS)
   def ReadAPIAuditEntries(self,
                           username=None,
                           router_method_names=None,
@@ -38,9 +40,30 @@ class InMemoryDBEventMixin(object):
 
     return sorted(results, key=lambda entry: entry.timestamp)
 
-  @utils.Synchronized
+  @mem_utils.Synchronized(mem_utils.EVENTS)
   def WriteAPIAuditEntry(self, entry):
     """Writes an audit entry to the database."""
     copy = entry.Copy()
     copy.timestamp = rdfvalue.RDFDatetime.Now()
     self.api_audit_entries.append(copy)
+
+  @mem_utils.Synchronized(mem_utils.EVENTS)
+  def WriteAPIAuditDailyCounts(self, day, counts):
+    """Writes numbers of audit entries of a day, replacing existing ones."""
+    self.api_audit_daily_counts[day.Copy()] = dict(counts)
+
+  @mem_utils.Synchronized(mem_utils.EVENTS)
+  def ReadAPIAuditDailyCounts(self, min_day=None, max_day=None):
+    """Returns numbers of audit entries of rolled up days."""
+    results = {}
+
+    for day, counts in iteritems(self.api_audit_daily_counts):
+      if min_day is not None and day < min_day:
+        continue
+
+      if max_day is not None and day > max_day:
+        continue
+
+      results[day.Copy()] = dict(counts)
+
+    return results
@@ -19,6 +19,7 @@ from grr_response_core.lib.rdfvalues import flows as rdf_flows
 from grr_response_core.lib.util import compatibility
 from grr_response_server import db
 from grr_response_server import db_utils
+from grr_response_server.databases import mem_utils
 from grr_response_server.rdfvalues import flow_objects as rdf_flow_objects
 from grr_response_server.rdfvalues import objects as rdf_objects
 
@@ -26,7 +27,7 @@ from grr_response_server.rdfvalues import objects as rdf_objects
 class InMemoryDBFlowMixin(object):
   """InMemoryDB mixin for flow handling."""
 
-  @utils.Synchronized
+  @mem_utils.Synchronized(mem_utils.MESSAGES)
   def WriteMessageHandlerRequests(self, requests):
     """Writes a list of message handler requests to the database."""
     now = rdfvalue.RDFDatetime.Now()
@@ -36,7 +37,7 @@ class InMemoryDBFlowMixin(object):
       cloned_request.timestamp = now
       flow_dict[cloned_request.request_id] = cloned_request
 
-  @utils.Synchronized
+  @mem_utils.Synchronized(mem_utils.MESSAGES)
   def ReadMessageHandlerRequests(self):
     """Reads all message handler requests from the database."""
     res = []
@@ -49,7 +50,7 @@ class InMemoryDBFlowMixin(object):
 
     return sorted(res, key=lambda r: -1 * r.timestamp)
 
-  @utils.Synchronized
+  @mem_utils.Synchronized(mem_utils.MESSAGES)
   def DeleteMessageHandlerRequests(self, requests):
     """Deletes a list of message handler requests from the database."""
 
@@ -61,7 +62,6 @@ class InMemoryDBFlowMixin(object):
       if r.request_id in flow_dict:
         del flow_dict[r.request_id]
 
-  @utils.Synchronized
   def RegisterMessageHandler(self, handler, lease_time, limit=1000):
     """Leases a number of message handler requests up to the indicated limit."""
     self.UnregisterMessageHandler()
@@ -74,7 +74,6 @@ class InMemoryDBFlowMixin(object):
     self.handler_thread.daemon = True
     self.handler_thread.start()
 
-  @utils.Synchronized
   def UnregisterMessageHandler(self, timeout=None):
     """Unregisters any registered message handler."""
     if self.handler_thread:
@@ -95,7 +94,7 @@ class InMemoryDBFlowMixin(object):
       except Exception as e:  # pylint: disable=broad-except
         logging.exception("_LeaseMessageHandlerRequests raised %s.", e)
 
-  @utils.Synchronized
+  @mem_utils.Synchronized(mem_utils.MESSAGES)
   def _LeaseMessageHandlerRequests(self, lease_time, limit):
     """Read and lease some outstanding message handler requests."""
     leased_requests = []
@@ -118,7 +117,7 @@ class InMemoryDBFlowMixin(object):
 
     return leased_requests
 
-  @utils.Synchronized
+  @mem_utils.Synchronized(mem_utils.MESSAGES)
   def ReadClientMessages(self, client_id):
     """Reads all client messages available for a given client_id."""
     res = []
@@ -134,6 +133,7 @@ class InMemoryDBFlowMixin(object):
 
     return res
 
+  @mem_utils.Synchronized(mem_utils.MESSAGES)
   def _DeleteClientMessage(self, client_id, task_id):
     tasks = self.client_messages.get(client_id)
     if not tasks or task_id not in tasks:
@@ -144,7 +144,7 @@ class InMemoryDBFlowMixin(object):
     if task_id in self.client_message_leases:
       del self.client_message_leases[task_id]
 
-  @utils.Synchronized
+  @mem_utils.Synchronized(mem_utils.MESSAGES)
   def DeleteClientMessages(self, messages):
     """Deletes a list of client messages from the db."""
     to_delete = []
@@ -159,7 +159,7 @@ class InMemoryDBFlowMixin(object):
     for client_id, task_id in to_delete:
       self._DeleteClientMessage(client_id, task_id)
 
-  @utils.Synchronized
+  @mem_utils.Synchronized(mem_utils.MESSAGES)
   def LeaseClientMessages(self, client_id, lease_time=None, limit=sys.maxsize):
     """Leases available client messages for the client with the given id."""
     leased_messages = []
@@ -194,29 +194,34 @@ class InMemoryDBFlowMixin(object):
 
     return leased_messages
 
-  @utils.Synchronized
+  @mem_utils.Synchronized(mem_utils.MESSAGES)
   def WriteClientMessages(self, messages):
     """Writes messages that should go to the client to the db."""
     client_ids = [db_utils.ClientIdFromGrrMessage(msg) for msg in messages]
     for client_id in client_ids:
-      if client_id not in self.metadatas:
+      if not self._ClientExists(client_id):
         raise db.AtLeastOneUnknownClientError(client_ids=client_ids)
 
     for m in messages:
       client_id = db_utils.ClientIdFromGrrMessage(m)
       self.client_messages.setdefault(client_id, {})[m.task_id] = m
 
-  @utils.Synchronized
+  @mem_utils.Synchronized(mem_utils.FLOWS)
   def WriteFlowObject(self, flow_obj):
     """Writes a flow object to the database."""
-    if flow_obj.client_id not in self.metadatas:
+    if not self._ClientExists(flow_obj.client_id):
       raise db.UnknownClientError(flow_obj.client_id)
 
+    key = (flow_obj.client_id, flow_obj.flow_id)
+    if key in self.flows:
+      self._UnindexHuntFlow(self.flows[key])
+
     clone = flow_obj.Copy()
     clone.last_update_time = rdfvalue.RDFDatetime.Now()
-    self.flows[(flow_obj.client_id, flow_obj.flow_id)] = clone
+    self.flows[key] = clone
+    self._IndexHuntFlow(clone)
 
-  @utils.Synchronized
+  @mem_utils.Synchronized(mem_utils.FLOWS)
   def ReadFlowObject(self, client_id, flow_id):
     """Reads a flow object from the database."""
     try:
@@ -224,6 +229,7 @@ class InMemoryDBFlowMixin(object):
     except KeyError:
       raise db.UnknownFlowError(client_id, flow_id)
 
+  @mem_utils.Synchronized(mem_utils.FLOWS)
   def ReadAllFlowObjects(
       self,
       client_id = None,
@@ -241,7 +247,7 @@ class InMemoryDBFlowMixin(object):
         res.append(flow.Copy())
     return res
 
-  @utils.Synchronized
+  @mem_utils.Synchronized(mem_utils.FLOWS)
   def ReadChildFlowObjects(self, client_id, flow_id):
     """Reads flows that were started by a given flow from the database."""
     res = []
@@ -250,7 +256,7 @@ class InMemoryDBFlowMixin(object):
         res.append(flow)
     return res
 
-  @utils.Synchronized
+  @mem_utils.Synchronized(mem_utils.FLOWS)
   def ReadFlowForProcessing(self, client_id, flow_id, processing_time):
     """Marks a flow as being processed on this worker and returns it."""
     rdf_flow = self.ReadFlowObject(client_id, flow_id)
@@ -271,7 +277,7 @@ class InMemoryDBFlowMixin(object):
     rdf_flow.processing_deadline = processing_deadline
     return rdf_flow
 
-  @utils.Synchronized
+  @mem_utils.Synchronized(mem_utils.FLOWS)
   def UpdateFlow(self,
                  client_id,
                  flow_id,
@@ -288,6 +294,8 @@ class InMemoryDBFlowMixin(object):
     except KeyError:
       raise db.UnknownFlowError(client_id, flow_id)
 
+    self._UnindexHuntFlow(flow)
+
     if flow_obj != db.Database.unchanged:
       self.flows[(client_id, flow_id)] = flow_obj
       flow = flow_obj
@@ -304,7 +312,9 @@ class InMemoryDBFlowMixin(object):
       flow.processing_deadline = processing_deadline
     flow.last_update_time = rdfvalue.RDFDatetime.Now()
 
-  @utils.Synchronized
+    self._IndexHuntFlow(flow)
+
+  @mem_utils.Synchronized(mem_utils.FLOWS)
   def UpdateFlows(self,
                   client_id_flow_id_pairs,
                   pending_termination=db.Database.unchanged):
@@ -316,9 +326,15 @@ class InMemoryDBFlowMixin(object):
       except db.UnknownFlowError:
         pass
 
-  @utils.Synchronized
   def WriteFlowRequests(self, requests):
     """Writes a list of flow requests to the database."""
+    flow_processing_requests = self._WriteFlowRequests(requests)
+    if flow_processing_requests:
+      self.WriteFlowProcessingRequests(flow_processing_requests)
+
+  @mem_utils.Synchronized(mem_utils.FLOWS)
+  def _WriteFlowRequests(self, requests):
+    """Writes flow requests and returns the flow processing requests due."""
     flow_processing_requests = []
 
     for request in requests:
@@ -341,10 +357,9 @@ class InMemoryDBFlowMixin(object):
                   flow_id=request.flow_id,
                   delivery_time=request.start_time))
 
-    if flow_processing_requests:
-      self.WriteFlowProcessingRequests(flow_processing_requests)
+    return flow_processing_requests
 
-  @utils.Synchronized
+  @mem_utils.Synchronized(mem_utils.FLOWS)
   def DeleteFlowRequests(self, requests):
     """Deletes a list of flow requests from the database."""
     for request in requests:
@@ -366,9 +381,15 @@ class InMemoryDBFlowMixin(object):
       except KeyError:
         pass
 
-  @utils.Synchronized
   def WriteFlowResponses(self, responses):
     """Writes a list of flow responses to the database."""
+    flow_processing_requests = self._WriteFlowResponses(responses)
+    if flow_processing_requests:
+      self.WriteFlowProcessingRequests(flow_processing_requests)
+
+  @mem_utils.Synchronized(mem_utils.FLOWS)
+  def _WriteFlowResponses(self, responses):
+    """Writes flow responses and returns the flow processing requests due."""
     status_available = set()
     requests_updated = set()
     task_ids_by_request = {}
@@ -431,10 +452,9 @@ class InMemoryDBFlowMixin(object):
                 rdf_flows.FlowProcessingRequest(
                     client_id=client_id, flow_id=flow_id))
 
-    if needs_processing:
-      self.WriteFlowProcessingRequests(needs_processing)
+    return needs_processing
 
-  @utils.Synchronized
+  @mem_utils.Synchronized(mem_utils.FLOWS)
   def ReadAllFlowRequestsAndResponses(self, client_id, flow_id):
     """Reads all requests and responses for a given flow from the database."""
     flow_key = (client_id, flow_id)
@@ -452,7 +472,7 @@ class InMemoryDBFlowMixin(object):
 
     return res
 
-  @utils.Synchronized
+  @mem_utils.Synchronized(mem_utils.FLOWS)
   def DeleteAllFlowRequestsAndResponses(self, client_id, flow_id):
     """Deletes all requests and responses for a given flow from the database."""
     flow_key = (client_id, flow_id)
@@ -471,7 +491,7 @@ class InMemoryDBFlowMixin(object):
     except KeyError:
       pass
 
-  @utils.Synchronized
+  @mem_utils.Synchronized(mem_utils.FLOWS)
   def ReadFlowRequestsReadyForProcessing(self,
                                          client_id,
                                          flow_id,
@@ -509,7 +529,7 @@ class InMemoryDBFlowMixin(object):
 
     return res
 
-  @utils.Synchronized
+  @mem_utils.Synchronized(mem_utils.FLOWS)
   def ReturnProcessedFlow(self, flow_obj):
     """Returns a flow that the worker was processing to the database."""
     key = (flow_obj.client_id, flow_obj.flow_id)
@@ -537,17 +557,24 @@ class InMemoryDBFlowMixin(object):
         return False
     return True
 
-  @utils.Synchronized
   def WriteFlowProcessingRequests(self, requests):
     """Writes a list of flow processing requests to the database."""
+    handler = self._WriteFlowProcessingRequests(requests)
+    if handler is not None:
+      # Handlers call back into the database, so they have to run without
+      # holding any locks.
+      for r in requests:
+        handler(r)
+
+  @mem_utils.Synchronized(mem_utils.FLOWS)
+  def _WriteFlowProcessingRequests(self, requests):
+    """Queues flow processing requests or returns a handler to run them."""
     # If we don't have a handler thread running, we might be able to process the
     # requests inline. If we are not, we start the handler thread for real and
     # queue the requests normally.
     if not self.flow_handler_thread and self.flow_handler_target:
       if self._InlineProcessingOK(requests):
-        for r in requests:
-          self.flow_handler_target(r)
-        return
+        return self.flow_handler_target
       else:
         self._RegisterFlowProcessingHandler(self.flow_handler_target)
         self.flow_handler_target = None
@@ -559,12 +586,14 @@ class InMemoryDBFlowMixin(object):
       key = (r.client_id, r.flow_id)
       self.flow_processing_requests[key] = cloned_request
 
-  @utils.Synchronized
+    return None
+
+  @mem_utils.Synchronized(mem_utils.FLOWS)
   def ReadFlowProcessingRequests(self):
     """Reads all flow processing requests from the database."""
     return list(itervalues(self.flow_processing_requests))
 
-  @utils.Synchronized
+  @mem_utils.Synchronized(mem_utils.FLOWS)
   def AckFlowProcessingRequests(self, requests):
     """Deletes a list of flow processing requests from the database."""
     for r in requests:
@@ -572,7 +601,7 @@ class InMemoryDBFlowMixin(object):
       if key in self.flow_processing_requests:
         del self.flow_processing_requests[key]
 
-  @utils.Synchronized
+  @mem_utils.Synchronized(mem_utils.FLOWS)
   def DeleteAllFlowProcessingRequests(self):
     self.flow_processing_requests = {}
 
@@ -608,18 +637,23 @@ class InMemoryDBFlowMixin(object):
   def _HandleFlowProcessingRequestLoop(self, handler):
     """Handler thread for the FlowProcessingRequest queue."""
     while not self.flow_handler_stop:
-      now = rdfvalue.RDFDatetime.Now()
-      todo = []
-      for r in list(itervalues(self.flow_processing_requests)):
-        if r.delivery_time is None or r.delivery_time <= now:
-          todo.append(r)
-          del self.flow_processing_requests[(r.client_id, r.flow_id)]
-
-      for request in todo:
+      for request in self._PopDueFlowProcessingRequests():
         handler(request)
 
       time.sleep(0.2)
 
+  @mem_utils.Synchronized(mem_utils.FLOWS)
+  def _PopDueFlowProcessingRequests(self):
+    """Removes and returns flow processing requests that are due."""
+    now = rdfvalue.RDFDatetime.Now()
+    todo = []
+    for r in list(itervalues(self.flow_processing_requests)):
+      if r.delivery_time is None or r.delivery_time <= now:
+        todo.append(r)
+        del self.flow_processing_requests[(r.client_id, r.flow_id)]
+    return todo
+
+  @mem_utils.Synchronized(mem_utils.FLOWS)
   def WriteFlowResults(self, results):
     """Writes flow results for a given flow."""
     for r in results:
@@ -627,7 +661,9 @@ class InMemoryDBFlowMixin(object):
       to_write = r.Copy()
       to_write.timestamp = rdfvalue.RDFDatetime.Now()
       dest.append(to_write)
+      self._IndexHuntFlowResult(to_write)
 
+  @mem_utils.Synchronized(mem_utils.FLOWS)
   def ReadFlowResults(self,
                       client_id,
                       flow_id,
@@ -667,6 +703,7 @@ class InMemoryDBFlowMixin(object):
 
     return results[offset:offset + count]
 
+  @mem_utils.Synchronized(mem_utils.FLOWS)
   def CountFlowResults(self, client_id, flow_id, with_tag=None, with_type=None):
     """Counts flow results of a given flow using given query options."""
     return len(
@@ -678,6 +715,7 @@ class InMemoryDBFlowMixin(object):
             with_tag=with_tag,
             with_type=with_type))
 
+  @mem_utils.Synchronized(mem_utils.FLOWS)
   def WriteFlowLogEntries(self, entries):
     """Writes flow log entries for a given flow."""
     flow_ids = [(e.client_id, e.flow_id) for e in entries]
@@ -691,6 +729,7 @@ class InMemoryDBFlowMixin(object):
       to_write.timestamp = rdfvalue.RDFDatetime.Now()
       dest.append(to_write)
 
+  @mem_utils.Synchronized(mem_utils.FLOWS)
   def ReadFlowLogEntries(self,
                          client_id,
                          flow_id,
@@ -707,6 +746,7 @@ class InMemoryDBFlowMixin(object):
 
     return entries[offset:offset + count]
 
+  @mem_utils.Synchronized(mem_utils.FLOWS)
   def CountFlowLogEntries(self, client_id, flow_id):
     """Returns number of flow log entries of a given flow."""
     return len(self.ReadFlowLogEntries(client_id, flow_id, 0, sys.maxsize))
@@ -5,28 +5,35 @@ from __future__ import division
 from __future__ import unicode_literals
 
 from grr_response_core.lib import rdfvalue
-from grr_response_core.lib import utils
+from grr_response_server.databases import mem_utils
 
 
 class InMemoryDBForemanRulesMixin(object):
   """InMemoryDB mixin for foreman rules related functions."""
 
-  @utils.Synchronized
+  @mem_utils.Synchronized(mem_utils.FOREMAN_RULES)
   def WriteForemanRule(self, rule):
     self.RemoveForemanRule(rule.hunt_id)
     self.foreman_rules.append(rule)
+    self.foreman_rules_version += 1
 
-  @utils.Synchronized
+  @mem_utils.Synchronized(mem_utils.FOREMAN_RULES)
   def RemoveForemanRule(self, hunt_id):
     self.foreman_rules = [r for r in self.foreman_rules if r.hunt_id != hunt_id]
+    self.foreman_rules_version += 1
 
-  @utils.Synchronized
+  @mem_utils.Synchronized(mem_utils.FOREMAN_RULES)
   def ReadAllForemanRules(self):
     return self.foreman_rules
 
-  @utils.Synchronized
+  @mem_utils.Synchronized(mem_utils.FOREMAN_RULES)
   def RemoveExpiredForemanRules(self):
     now = rdfvalue.RDFDatetime.Now()
-    self.foreman_rules = [
-        r for r in self.foreman_rules if r.expiration_time >= now
-    ]
+    rules = [r for r in self.foreman_rules if r.expiration_time >= now]
+    if len(rules) != len(self.foreman_rules):
+      self.foreman_rules = rules
+      self.foreman_rules_version += 1
+
+  @mem_utils.Synchronized(mem_utils.FOREMAN_RULES)
+  def ReadForemanRulesVersion(self):
+    return self.foreman_rules_version
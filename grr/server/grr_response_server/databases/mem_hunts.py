@@ -4,31 +4,190 @@ from __future__ import absolute_import
 from __future__ import division
 from __future__ import unicode_literals
 
+import bisect
+import collections
 import sys
 
+from future.utils import iteritems
+
 from grr_response_core.lib import rdfvalue
-from grr_response_core.lib import utils
 from grr_response_core.lib.util import compatibility
 from grr_response_server import db
+from grr_response_server.databases import mem_utils
 from grr_response_server.rdfvalues import flow_objects as rdf_flow_objects
+from grr_response_server.rdfvalues import hunt_objects as rdf_hunt_objects
+from grr_response_server.rdfvalues import objects as rdf_objects
+
+
+class _SortedFlowResults(object):
+  """A list of flow results ordered by their timestamps."""
+
+  def __init__(self):
+    self._timestamps = []
+    self._results = []
+
+  def __len__(self):
+    return len(self._results)
+
+  def __getitem__(self, key):
+    return self._results[key]
+
+  def __iter__(self):
+    return iter(self._results)
+
+  def Add(self, result):
+    timestamp = result.timestamp.AsMicrosecondsSinceEpoch()
+    # Results are written with the current time, so this is an append unless
+    # the clock went back.
+    idx = bisect.bisect_right(self._timestamps, timestamp)
+    self._timestamps.insert(idx, timestamp)
+    self._results.insert(idx, result)
+
+  def WithTimestamp(self, timestamp):
+    timestamp = timestamp.AsMicrosecondsSinceEpoch()
+    start = bisect.bisect_left(self._timestamps, timestamp)
+    end = bisect.bisect_right(self._timestamps, timestamp)
+    return self._results[start:end]
+
+
+class _HuntResultsIndex(object):
+  """Results of all the flows of a hunt, indexed by tag and type."""
+
+  def __init__(self):
+    self._all = _SortedFlowResults()
+    self._by_tag = {}
+    self._by_type = {}
+    self._by_tag_and_type = {}
+    self.flows_with_results = set()
+
+  def Add(self, result):
+    type_name = compatibility.GetName(result.payload.__class__)
+
+    self._all.Add(result)
+    self._by_tag.setdefault(result.tag, _SortedFlowResults()).Add(result)
+    self._by_type.setdefault(type_name, _SortedFlowResults()).Add(result)
+    self._by_tag_and_type.setdefault((result.tag, type_name),
+                                     _SortedFlowResults()).Add(result)
+    self.flows_with_results.add((result.client_id, result.flow_id))
+
+  def Select(self, with_tag=None, with_type=None):
+    """Returns timestamp-ordered results with a given tag and type."""
+    if with_tag is None and with_type is None:
+      return self._all
+    elif with_type is None:
+      results = self._by_tag.get(with_tag)
+    elif with_tag is None:
+      results = self._by_type.get(with_type)
+    else:
+      results = self._by_tag_and_type.get((with_tag, with_type))
+
+    if results is None:
+      return _SortedFlowResults()
+    return results
+
+  def CountByType(self):
+    return {
+        type_name: len(results)
+        for type_name, results in iteritems(self._by_type)
+    }
+
+
+# Conditions that depend on the flow object only.
+_FLOW_CONDITIONS = frozenset([
+    db.HuntFlowsCondition.FAILED_FLOWS_ONLY,
+    db.HuntFlowsCondition.SUCCEEDED_FLOWS_ONLY,
+    db.HuntFlowsCondition.COMPLETED_FLOWS_ONLY,
+    db.HuntFlowsCondition.FLOWS_IN_PROGRESS_ONLY,
+    db.HuntFlowsCondition.CRASHED_FLOWS_ONLY,
+])
+
+
+def _HuntFlowConditions(flow_obj):
+  """Returns HuntFlowsConditions (except for results-based ones) of a flow."""
+  conditions = set()
+
+  if flow_obj.flow_state == flow_obj.FlowState.ERROR:
+    conditions.add(db.HuntFlowsCondition.FAILED_FLOWS_ONLY)
+    conditions.add(db.HuntFlowsCondition.COMPLETED_FLOWS_ONLY)
+  elif flow_obj.flow_state == flow_obj.FlowState.FINISHED:
+    conditions.add(db.HuntFlowsCondition.SUCCEEDED_FLOWS_ONLY)
+    conditions.add(db.HuntFlowsCondition.COMPLETED_FLOWS_ONLY)
+  elif flow_obj.flow_state == flow_obj.FlowState.RUNNING:
+    conditions.add(db.HuntFlowsCondition.FLOWS_IN_PROGRESS_ONLY)
+
+  if flow_obj.HasField("client_crash_info"):
+    conditions.add(db.HuntFlowsCondition.CRASHED_FLOWS_ONLY)
+
+  return frozenset(conditions)
+
+
+class _HuntFlowsIndex(object):
+  """Flows of a hunt with per-condition counts."""
+
+  def __init__(self):
+    # Maps (client_id, flow_id) to the conditions the flow was indexed with.
+    self.conditions_by_flow = {}
+    self.condition_counts = collections.Counter()
+
+  def Add(self, flow_obj):
+    key = (flow_obj.client_id, flow_obj.flow_id)
+    conditions = _HuntFlowConditions(flow_obj)
+
+    self.conditions_by_flow[key] = conditions
+    self.condition_counts.update(conditions)
+
+  def Remove(self, flow_obj):
+    key = (flow_obj.client_id, flow_obj.flow_id)
+    conditions = self.conditions_by_flow.pop(key, None)
+    if conditions is not None:
+      self.condition_counts.subtract(conditions)
 
 
 class InMemoryDBHuntMixin(object):
-  """Hunts-related DB methods implementation."""
+  """Hunts-related DB methods implementation.
+
+  Hunt objects are guarded by the hunts lock. The hunt_flows and hunt_results
+  indexes are updated together with the flows and results they index, so they
+  are guarded by the flows lock.
+  """
 
   def _GetHuntFlows(self, hunt_id):
-    return sorted(
-        [f for f in self.flows.values() if f.parent_hunt_id == hunt_id],
-        key=lambda f: f.client_id)
+    try:
+      flow_keys = self.hunt_flows[hunt_id].conditions_by_flow
+    except KeyError:
+      return []
+
+    return sorted([self.flows[key] for key in flow_keys],
+                  key=lambda f: f.client_id)
+
+  def _IndexHuntFlow(self, flow_obj):
+    """Adds a flow to the flow index of its parent hunt."""
+    if flow_obj.parent_hunt_id:
+      self.hunt_flows.setdefault(flow_obj.parent_hunt_id,
+                                 _HuntFlowsIndex()).Add(flow_obj)
+
+  def _UnindexHuntFlow(self, flow_obj):
+    """Removes a flow from the flow index of its parent hunt."""
+    if flow_obj.parent_hunt_id in self.hunt_flows:
+      self.hunt_flows[flow_obj.parent_hunt_id].Remove(flow_obj)
 
-  @utils.Synchronized
+  def _IndexHuntFlowResult(self, result):
+    """Adds a flow result to the results index of its flow's parent hunt."""
+    flow_obj = self.flows.get((result.client_id, result.flow_id))
+    if flow_obj is not None and flow_obj.parent_hunt_id:
+      self.hunt_results.setdefault(flow_obj.parent_hunt_id,
+                                   _HuntResultsIndex()).Add(result)
+
+  @mem_utils.Synchronized(mem_utils.HUNTS)
   def WriteHuntObject(self, hunt_obj):
     """Writes a hunt object to the database."""
     clone = self._DeepCopy(hunt_obj)
     clone.last_update_time = rdfvalue.RDFDatetime.Now()
     self.hunts[(hunt_obj.hunt_id)] = clone
+    self.hunt_metadata[hunt_obj.hunt_id] = (
+        rdf_hunt_objects.HuntMetadata.FromHunt(clone))
 
-  @utils.Synchronized
+  @mem_utils.Synchronized(mem_utils.HUNTS)
   def UpdateHuntObject(self, hunt_id, update_fn):
     """Updates the hunt object by applying the update function."""
     hunt_obj = self.ReadHuntObject(hunt_id)
@@ -38,14 +197,17 @@ class InMemoryDBHuntMixin(object):
     self.WriteHuntObject(updated_hunt_obj)
     return updated_hunt_obj
 
-  @utils.Synchronized
+  @mem_utils.Synchronized(mem_utils.FLOWS, mem_utils.HUNTS)
   def DeleteHuntObject(self, hunt_id):
     try:
       del self.hunts[hunt_id]
     except KeyError:
       raise db.UnknownHuntError(hunt_id)
+    del self.hunt_metadata[hunt_id]
+    self.hunt_results.pop(hunt_id, None)
+    self.hunt_flows.pop(hunt_id, None)
 
-  @utils.Synchronized
+  @mem_utils.Synchronized(mem_utils.HUNTS)
   def ReadHuntObject(self, hunt_id):
     """Reads a hunt object from the database."""
     try:
@@ -53,12 +215,54 @@ class InMemoryDBHuntMixin(object):
     except KeyError:
       raise db.UnknownHuntError(hunt_id)
 
-  @utils.Synchronized
+  @mem_utils.Synchronized(mem_utils.HUNTS)
   def ReadAllHuntObjects(self):
     """Reads all hunt objects from the database."""
     return [self._DeepCopy(h) for h in self.hunts.values()]
 
-  @utils.Synchronized
+  def _FilterHuntMetadata(self, with_creator, created_after,
+                          with_description_match):
+    """Returns metadata of hunts matching given conditions."""
+    result = []
+    for metadata in self.hunt_metadata.values():
+      if with_creator is not None and metadata.creator != with_creator:
+        continue
+
+      if created_after is not None and metadata.create_time <= created_after:
+        continue
+
+      if (with_description_match is not None and
+          with_description_match not in metadata.description):
+        continue
+
+      result.append(metadata)
+
+    return result
+
+  @mem_utils.Synchronized(mem_utils.HUNTS)
+  def ListHuntObjects(self,
+                      offset,
+                      count,
+                      with_creator=None,
+                      created_after=None,
+                      with_description_match=None):
+    """Lists metadata of hunts matching given conditions."""
+    result = self._FilterHuntMetadata(with_creator, created_after,
+                                      with_description_match)
+    result.sort(key=lambda m: (m.create_time, m.hunt_id), reverse=True)
+    return [m.Copy() for m in result[offset:offset + count]]
+
+  @mem_utils.Synchronized(mem_utils.HUNTS)
+  def CountHuntObjects(self,
+                       with_creator=None,
+                       created_after=None,
+                       with_description_match=None):
+    """Returns number of hunts matching given conditions."""
+    return len(
+        self._FilterHuntMetadata(with_creator, created_after,
+                                 with_description_match))
+
+  @mem_utils.Synchronized(mem_utils.FLOWS)
   def ReadHuntLogEntries(self, hunt_id, offset, count, with_substring=None):
     """Reads hunt log entries of a given hunt using given query options."""
     all_entries = []
@@ -79,12 +283,12 @@ class InMemoryDBHuntMixin(object):
 
     return sorted(all_entries, key=lambda x: x.timestamp)[offset:offset + count]
 
-  @utils.Synchronized
+  @mem_utils.Synchronized(mem_utils.FLOWS)
   def CountHuntLogEntries(self, hunt_id):
     """Returns number of hunt log entries of a given hunt."""
     return len(self.ReadHuntLogEntries(hunt_id, 0, sys.maxsize))
 
-  @utils.Synchronized
+  @mem_utils.Synchronized(mem_utils.FLOWS)
   def ReadHuntResults(self,
                       hunt_id,
                       offset,
@@ -94,47 +298,62 @@ class InMemoryDBHuntMixin(object):
                       with_substring=None,
                       with_timestamp=None):
     """Reads hunt results of a given hunt using given query options."""
-    all_results = []
-    for flow_obj in self._GetHuntFlows(hunt_id):
-      for entry in self.ReadFlowResults(
-          flow_obj.client_id,
-          flow_obj.flow_id,
-          0,
-          sys.maxsize,
-          with_tag=with_tag,
-          with_type=with_type,
-          with_substring=with_substring):
-        all_results.append(
-            rdf_flow_objects.FlowResult(
-                hunt_id=hunt_id,
-                client_id=flow_obj.client_id,
-                flow_id=flow_obj.flow_id,
-                timestamp=entry.timestamp,
-                tag=entry.tag,
-                payload=entry.payload))
+    try:
+      results = self.hunt_results[hunt_id].Select(
+          with_tag=with_tag, with_type=with_type)
+    except KeyError:
+      return []
 
     if with_timestamp:
-      all_results = [r for r in all_results if r.timestamp == with_timestamp]
+      results = results.WithTimestamp(with_timestamp)
+
+    if with_substring is not None:
+      encoded_substring = with_substring.encode("utf8")
+      results = [
+          r for r in results
+          if encoded_substring in r.payload.SerializeToString()
+      ]
+
+    hunt_results = []
+    for r in results[offset:offset + count]:
+      payload = r.payload.Copy()
+      # This is done in order to pass the tests that try to deserialize
+      # value of an unrecognized type.
+      cls_name = compatibility.GetName(payload.__class__)
+      if cls_name not in rdfvalue.RDFValue.classes:
+        payload = rdf_objects.SerializedValueOfUnrecognizedType(
+            type_name=cls_name, value=payload.SerializeToString())
 
-    return sorted(all_results, key=lambda x: x.timestamp)[offset:offset + count]
+      hunt_results.append(
+          rdf_flow_objects.FlowResult(
+              hunt_id=hunt_id,
+              client_id=r.client_id,
+              flow_id=r.flow_id,
+              timestamp=r.timestamp,
+              tag=r.tag,
+              payload=payload))
 
-  @utils.Synchronized
+    return hunt_results
+
+  @mem_utils.Synchronized(mem_utils.FLOWS)
   def CountHuntResults(self, hunt_id, with_tag=None, with_type=None):
     """Counts hunt results of a given hunt using given query options."""
-    return len(
-        self.ReadHuntResults(
-            hunt_id, 0, sys.maxsize, with_tag=with_tag, with_type=with_type))
+    try:
+      results = self.hunt_results[hunt_id].Select(
+          with_tag=with_tag, with_type=with_type)
+    except KeyError:
+      return 0
 
-  @utils.Synchronized
-  def CountHuntResultsByType(self, hunt_id):
-    result = {}
-    for hr in self.ReadHuntResults(hunt_id, 0, sys.maxsize):
-      key = compatibility.GetName(hr.payload.__class__)
-      result[key] = result.setdefault(key, 0) + 1
+    return len(results)
 
-    return result
+  @mem_utils.Synchronized(mem_utils.FLOWS)
+  def CountHuntResultsByType(self, hunt_id):
+    try:
+      return self.hunt_results[hunt_id].CountByType()
+    except KeyError:
+      return {}
 
-  @utils.Synchronized
+  @mem_utils.Synchronized(mem_utils.FLOWS)
   def ReadHuntFlows(self,
                     hunt_id,
                     offset,
@@ -143,20 +362,13 @@ class InMemoryDBHuntMixin(object):
     """Reads hunt flows matching given conditins."""
     if filter_condition == db.HuntFlowsCondition.UNSET:
       filter_fn = lambda _: True
-    elif filter_condition == db.HuntFlowsCondition.FAILED_FLOWS_ONLY:
-      filter_fn = lambda f: f.flow_state == f.FlowState.ERROR
-    elif filter_condition == db.HuntFlowsCondition.SUCCEEDED_FLOWS_ONLY:
-      filter_fn = lambda f: f.flow_state == f.FlowState.FINISHED
-    elif filter_condition == db.HuntFlowsCondition.COMPLETED_FLOWS_ONLY:
-      filter_fn = (
-          lambda f: f.flow_state in [f.FlowState.ERROR, f.FlowState.FINISHED])
-    elif filter_condition == db.HuntFlowsCondition.FLOWS_IN_PROGRESS_ONLY:
-      filter_fn = lambda f: f.flow_state == f.FlowState.RUNNING
-    elif filter_condition == db.HuntFlowsCondition.CRASHED_FLOWS_ONLY:
-      filter_fn = lambda f: f.HasField("client_crash_info")
     elif filter_condition == db.HuntFlowsCondition.FLOWS_WITH_RESULTS_ONLY:
-      filter_fn = (lambda f: self.ReadFlowResults(f.client_id, f.flow_id, 0, sys
-                                                  .maxsize))
+      flows_with_results = set()
+      if hunt_id in self.hunt_results:
+        flows_with_results = self.hunt_results[hunt_id].flows_with_results
+      filter_fn = lambda f: (f.client_id, f.flow_id) in flows_with_results
+    elif filter_condition in _FLOW_CONDITIONS:
+      filter_fn = lambda f: filter_condition in _HuntFlowConditions(f)
     else:
       raise ValueError("Invalid filter condition: %d" % filter_condition)
 
@@ -167,12 +379,36 @@ class InMemoryDBHuntMixin(object):
     results.sort(key=lambda f: f.last_update_time)
     return results[offset:offset + count]
 
-  @utils.Synchronized
+  @mem_utils.Synchronized(mem_utils.FLOWS)
   def CountHuntFlows(self,
                      hunt_id,
                      filter_condition=db.HuntFlowsCondition.UNSET):
     """Counts hunt flows matching given conditions."""
+    try:
+      flows_index = self.hunt_flows[hunt_id]
+    except KeyError:
+      flows_index = _HuntFlowsIndex()
 
-    return len(
-        self.ReadHuntFlows(
-            hunt_id, 0, sys.maxsize, filter_condition=filter_condition))
+    if filter_condition == db.HuntFlowsCondition.UNSET:
+      return len(flows_index.conditions_by_flow)
+    elif filter_condition == db.HuntFlowsCondition.FLOWS_WITH_RESULTS_ONLY:
+      if hunt_id not in self.hunt_results:
+        return 0
+      return len(self.hunt_results[hunt_id].flows_with_results)
+    elif filter_condition in _FLOW_CONDITIONS:
+      return flows_index.condition_counts[filter_condition]
+    else:
+      raise ValueError("Invalid filter condition: %d" % filter_condition)
+
+  @mem_utils.Synchronized(mem_utils.FLOWS)
+  def ReadClientIdsWithHuntFlows(self, hunt_id, client_ids):
+    """Checks which of given clients have the flow of a given hunt."""
+    try:
+      flow_keys = self.hunt_flows[hunt_id].conditions_by_flow
+    except KeyError:
+      return set()
+
+    # Flows started by a hunt have the hunt's id as their flow id.
+    return set(
+        client_id for client_id in client_ids
+        if (client_id, hunt_id) in flow_keys)
@@ -10,9 +10,8 @@ from future.utils import iteritems
 from future.utils import iterkeys
 
 from grr_response_core.lib import rdfvalue
-from grr_response_core.lib import utils
-from grr_response_core.lib.util import collection
 from grr_response_server import db
+from grr_response_server.databases import mem_utils
 from grr_response_server.rdfvalues import objects as rdf_objects
 
 
@@ -181,10 +180,84 @@ class _PathRecord(object):
       return None
 
 
+class _PathTrieNode(object):
+  """A node of a trie of path records indexed by path components.
+
+  Attributes:
+    path_record: A `_PathRecord` of the path that the node corresponds to or
+      `None` if there is no record for it.
+    children: A dictionary from path components to child nodes.
+  """
+
+  def __init__(self):
+    self.path_record = None
+    self.children = {}
+
+  def ListDescendentPathInfos(self, timestamp=None, max_depth=None):
+    """Lists path infos of the node descendants ordered by their components.
+
+    Args:
+      timestamp: A point in time from which the data should be retrieved. If
+        given, only paths that have a stat or hash entry at that time (or that
+        have descendants with such entries) are listed.
+      max_depth: If given, only descendants at most that many levels below the
+        node are listed.
+
+    Returns:
+      A list of `rdf_objects.PathInfo` instances.
+    """
+    result = []
+    self._CollectDescendentPathInfos(result, timestamp, max_depth)
+    return result
+
+  def _CollectDescendentPathInfos(self, result, timestamp, max_depth):
+    """Appends path infos of descendants to the result list.
+
+    Args:
+      result: A list to append path infos to.
+      timestamp: A point in time from which the data should be retrieved.
+      max_depth: A maximum depth of descendants to collect.
+
+    Returns:
+      True if any of the collected path infos has a stat or hash entry.
+    """
+    if max_depth is not None and max_depth <= 0:
+      return False
+
+    if max_depth is not None:
+      max_depth -= 1
+
+    any_explicit = False
+    for component in sorted(iterkeys(self.children)):
+      child = self.children[component]
+
+      idx = len(result)
+      explicit = False
+      if child.path_record is not None:
+        path_info = child.path_record.GetPathInfo(timestamp=timestamp)
+        explicit = (
+            path_info.HasField("stat_entry") or
+            path_info.HasField("hash_entry"))
+        result.append(path_info)
+
+      # pylint: disable=protected-access
+      explicit |= child._CollectDescendentPathInfos(result, timestamp,
+                                                    max_depth)
+      # pylint: enable=protected-access
+
+      # Implicit path infos are filtered out if a specific timestamp is given.
+      if timestamp is not None and not explicit:
+        del result[idx:]
+
+      any_explicit |= explicit
+
+    return any_explicit
+
+
 class InMemoryDBPathMixin(object):
   """InMemoryDB mixin for path related functions."""
 
-  @utils.Synchronized
+  @mem_utils.Synchronized(mem_utils.PATHS)
   def ReadPathInfo(self, client_id, path_type, components, timestamp=None):
     """Retrieves a path info record for a given path."""
     try:
@@ -194,7 +267,7 @@ class InMemoryDBPathMixin(object):
       raise db.UnknownPathError(
           client_id=client_id, path_type=path_type, components=components)
 
-  @utils.Synchronized
+  @mem_utils.Synchronized(mem_utils.PATHS)
   def ReadPathInfos(self, client_id, path_type, components_list):
     """Retrieves path info records for given paths."""
     result = {}
@@ -208,7 +281,7 @@ class InMemoryDBPathMixin(object):
 
     return result
 
-  @utils.Synchronized
+  @mem_utils.Synchronized(mem_utils.PATHS)
   def ListDescendentPathInfos(self,
                               client_id,
                               path_type,
@@ -216,80 +289,52 @@ class InMemoryDBPathMixin(object):
                               timestamp=None,
                               max_depth=None):
     """Lists path info records that correspond to children of given path."""
-    result = []
+    node = self._GetPathTrieNode(client_id, path_type, components)
+    if node is None:
+      return []
 
-    for path_idx, path_record in iteritems(self.path_records):
-      other_client_id, other_path_type, other_components = path_idx
-      if client_id != other_client_id or path_type != other_path_type:
-        continue
-      if len(other_components) == len(components):
-        continue
-      if not collection.StartsWith(other_components, components):
-        continue
-      if (max_depth is not None and
-          len(other_components) - len(components) > max_depth):
-        continue
+    return node.ListDescendentPathInfos(
+        timestamp=timestamp, max_depth=max_depth)
 
-      result.append(path_record.GetPathInfo(timestamp=timestamp))
+  def _GetPathTrieNode(self, client_id, path_type, components, create=False):
+    """Returns a trie node of a given path or `None` if it doesn't exist."""
+    trie_idx = (client_id, path_type)
 
-    if timestamp is None:
-      return sorted(result, key=lambda _: tuple(_.components))
+    node = self.path_tries.get(trie_idx)
+    if node is None:
+      if not create:
+        return None
+      node = self.path_tries.setdefault(trie_idx, _PathTrieNode())
 
-    # We need to filter implicit path infos if specific timestamp is given.
+    for component in components:
+      child = node.children.get(component)
+      if child is None:
+        if not create:
+          return None
+        child = node.children.setdefault(component, _PathTrieNode())
+      node = child
 
-    # TODO(hanuszczak): If we were to switch to use path trie instead of storing
-    # records by path id, everything would be much easier.
-
-    class TrieNode(object):
-      """A trie of path components with path infos as values."""
-
-      def __init__(self):
-        self.path_info = None
-        self.children = {}
-        self.explicit = False
-
-      def Add(self, path_info, idx=0):
-        """Adds given path info to the trie (or one of its subtrees)."""
-        components = path_info.components
-        if idx == len(components):
-          self.path_info = path_info
-          self.explicit |= (
-              path_info.HasField("stat_entry") or
-              path_info.HasField("hash_entry"))
-        else:
-          child = self.children.setdefault(components[idx], TrieNode())
-          child.Add(path_info, idx=idx + 1)
-          self.explicit |= child.explicit
-
-      def Collect(self, path_infos):
-        if self.path_info is not None and self.explicit:
-          path_infos.append(self.path_info)
-
-        for component in sorted(iterkeys(self.children)):
-          self.children[component].Collect(path_infos)
-
-    trie = TrieNode()
-    for path_info in result:
-      trie.Add(path_info)
-
-    explicit_path_infos = []
-    trie.Collect(explicit_path_infos)
-    return explicit_path_infos
+    return node
 
   def _GetPathRecord(self, client_id, path_info, set_default=True):
     components = tuple(path_info.components)
     path_idx = (client_id, path_info.path_type, components)
 
-    if set_default:
-      default = _PathRecord(
+    path_record = self.path_records.get(path_idx, None)
+    if path_record is None and set_default:
+      path_record = _PathRecord(
           path_type=path_info.path_type, components=components)
-      return self.path_records.setdefault(path_idx, default)
-    else:
-      return self.path_records.get(path_idx, None)
+      self.path_records[path_idx] = path_record
+
+      node = self._GetPathTrieNode(
+          client_id, path_info.path_type, components, create=True)
+      node.path_record = path_record
+
+    return path_record
 
   def _WritePathInfo(self, client_id, path_info):
     """Writes a single path info record for given client."""
-    if client_id not in self.metadatas:
+    if not self._ClientExists(client_id):
       raise db.UnknownClientError(client_id)
 
     path_record = self._GetPathRecord(client_id, path_info)
@@ -300,36 +345,36 @@ class InMemoryDBPathMixin(object):
       parent_path_record = self._GetPathRecord(client_id, parent_path_info)
       parent_path_record.AddChild(path_info)
 
-  @utils.Synchronized
+  @mem_utils.Synchronized(mem_utils.PATHS)
   def MultiWritePathInfos(self, path_infos):
     for client_id, client_path_infos in iteritems(path_infos):
       self.WritePathInfos(client_id, client_path_infos)
 
-  @utils.Synchronized
+  @mem_utils.Synchronized(mem_utils.PATHS)
   def WritePathInfos(self, client_id, path_infos):
     for path_info in path_infos:
       self._WritePathInfo(client_id, path_info)
       for ancestor_path_info in path_info.GetAncestors():
         self._WritePathInfo(client_id, ancestor_path_info)
 
-  @utils.Synchronized
+  @mem_utils.Synchronized(mem_utils.PATHS)
   def MultiClearPathHistory(self, path_infos):
     """Clears path history for specified paths of given clients."""
     for client_id, client_path_infos in iteritems(path_infos):
       self.ClearPathHistory(client_id, client_path_infos)
 
-  @utils.Synchronized
+  @mem_utils.Synchronized(mem_utils.PATHS)
   def ClearPathHistory(self, client_id, path_infos):
     """Clears path history for specified paths of given client."""
     for path_info in path_infos:
       path_record = self._GetPathRecord(client_id, path_info)
       path_record.ClearHistory()
 
-  @utils.Synchronized
+  @mem_utils.Synchronized(mem_utils.PATHS)
   def MultiWritePathHistory(self, client_path_histories):
     """Writes a collection of hash and stat entries observed for given paths."""
     for client_path, client_path_history in iteritems(client_path_histories):
-      if client_path.client_id not in self.metadatas:
+      if not self._ClientExists(client_path.client_id):
         raise db.UnknownClientError(client_path.client_id)
 
       path_info = rdf_objects.PathInfo(
@@ -353,7 +398,7 @@ class InMemoryDBPathMixin(object):
 
         path_record.AddHashEntry(hash_entry, timestamp)
 
-  @utils.Synchronized
+  @mem_utils.Synchronized(mem_utils.PATHS)
   def ReadPathInfosHistories(self, client_id, path_type, components_list):
     """Reads a collection of hash and stat entries for given paths."""
     results = {}
@@ -390,7 +435,7 @@ class InMemoryDBPathMixin(object):
 
     return results
 
-  @utils.Synchronized
+  @mem_utils.Synchronized(mem_utils.PATHS, mem_utils.BLOBS)
   def ReadLatestPathInfosWithHashBlobReferences(self,
                                                 client_paths,
                                                 max_timestamp=None):
@@ -9,8 +9,8 @@ from future.builtins import int
 from typing import Sequence, Text, Tuple
 
 from grr_response_core.lib import rdfvalue
-from grr_response_core.lib import utils
 from grr_response_server import db
+from grr_response_server.databases import mem_utils
 from grr_response_server.rdfvalues import objects as rdf_objects
 
 
@@ -41,14 +41,14 @@ class InMemoryDBSignedBinariesMixin(object):
       with other in-memory DB mixins.
   """
 
-  @utils.Synchronized
+  @mem_utils.Synchronized(mem_utils.SIGNED_BINARIES)
   def WriteSignedBinaryReferences(self, binary_id,
                                   references):
     """See db.Database."""
     self.signed_binary_references[_SignedBinaryKeyFromID(binary_id)] = (
         references.Copy(), rdfvalue.RDFDatetime.Now())
 
-  @utils.Synchronized
+  @mem_utils.Synchronized(mem_utils.SIGNED_BINARIES)
   def ReadSignedBinaryReferences(
       self, binary_id
   ):
@@ -60,11 +60,12 @@ class InMemoryDBSignedBinariesMixin(object):
       raise db.UnknownSignedBinaryError(binary_id)
     return references.Copy(), timestamp.Copy()
 
-  @utils.Synchronized
+  @mem_utils.Synchronized(mem_utils.SIGNED_BINARIES)
   def ReadIDsForAllSignedBinaries(self):
     """See db.Database."""
     return [_SignedBinaryIDFromKey(k) for k in self.signed_binary_references]
 
+  @mem_utils.Synchronized(mem_utils.SIGNED_BINARIES)
   def DeleteSignedBinaryReferences(self, binary_id):
     """See db.Database."""
     try:
@@ -12,10 +12,10 @@ from future.utils import itervalues
 from typing import Iterable, Optional, Text, Sequence, Tuple
 
 from grr_response_core.lib import rdfvalue
-from grr_response_core.lib import utils
 from grr_response_server import db
 from grr_response_server import db_utils
 from grr_response_server import stats_values
+from grr_response_server.databases import mem_utils
 
 # Type alias representing a time-range.
 # TODO: pylint: disable=invalid-name
@@ -40,7 +40,7 @@ class InMemoryDBStatsMixin(object):
       with other in-memory DB mixins.
   """
 
-  @utils.Synchronized
+  @mem_utils.Synchronized(mem_utils.STATS)
   def WriteStatsStoreEntries(
       self, stats_entries):
     """See db.Database."""
@@ -50,7 +50,7 @@ class InMemoryDBStatsMixin(object):
         raise db.DuplicateMetricValueError()
       self.stats_store_entries[entry_id] = stats_entry.SerializeToString()
 
-  @utils.Synchronized
+  @mem_utils.Synchronized(mem_utils.STATS)
   def ReadStatsStoreEntries(
       self,
       process_id_prefix,
@@ -72,7 +72,7 @@ class InMemoryDBStatsMixin(object):
         break
     return stats_entries
 
-  @utils.Synchronized
+  @mem_utils.Synchronized(mem_utils.STATS)
   def DeleteStatsStoreEntriesOlderThan(self, cutoff,
                                        limit):
     """See db.Database."""
@@ -10,15 +10,15 @@ from future.builtins import str
 from future.utils import itervalues
 
 from grr_response_core.lib import rdfvalue
-from grr_response_core.lib import utils
 from grr_response_server import db
+from grr_response_server.databases import mem_utils
 from grr_response_server.rdfvalues import objects as rdf_objects
 
 
 class InMemoryDBUsersMixin(object):
   """InMemoryDB mixin for GRR users and approval related functions."""
 
-  @utils.Synchronized
+  @mem_utils.Synchronized(mem_utils.USERS)
   def WriteGRRUser(self,
                    username,
                    password=None,
@@ -36,7 +36,7 @@ class InMemoryDBUsersMixin(object):
     if user_type is not None:
       u.user_type = user_type
 
-  @utils.Synchronized
+  @mem_utils.Synchronized(mem_utils.USERS)
   def ReadGRRUser(self, username):
     """Reads a user object corresponding to a given name."""
     try:
@@ -44,7 +44,7 @@ class InMemoryDBUsersMixin(object):
     except KeyError:
       raise db.UnknownGRRUserError(username)
 
-  @utils.Synchronized
+  @mem_utils.Synchronized(mem_utils.USERS)
   def ReadGRRUsers(self, offset=0, count=None):
     """Reads GRR users with optional pagination, sorted by username."""
     if count is None:
@@ -53,12 +53,12 @@ class InMemoryDBUsersMixin(object):
     users = sorted(self.users.values(), key=lambda user: user.username)
     return [user.Copy() for user in users[offset:offset + count]]
 
-  @utils.Synchronized
+  @mem_utils.Synchronized(mem_utils.USERS)
   def CountGRRUsers(self):
     """Returns the total count of GRR users."""
     return len(self.users)
 
-  @utils.Synchronized
+  @mem_utils.Synchronized(mem_utils.USERS)
   def DeleteGRRUser(self, username):
     """Deletes the user with the given username."""
     try:
@@ -66,7 +66,7 @@ class InMemoryDBUsersMixin(object):
     except KeyError:
       raise db.UnknownGRRUserError(username)
 
-  @utils.Synchronized
+  @mem_utils.Synchronized(mem_utils.USERS)
   def WriteApprovalRequest(self, approval_request):
     """Writes an approval request object."""
     approvals = self.approvals_by_username.setdefault(
@@ -80,7 +80,7 @@ class InMemoryDBUsersMixin(object):
 
     return approval_id
 
-  @utils.Synchronized
+  @mem_utils.Synchronized(mem_utils.USERS)
   def ReadApprovalRequest(self, requestor_username, approval_id):
     """Reads an approval request object with a given id."""
     try:
@@ -89,7 +89,7 @@ class InMemoryDBUsersMixin(object):
       raise db.UnknownApprovalRequestError(
           "Can't find approval with id: %s" % approval_id)
 
-  @utils.Synchronized
+  @mem_utils.Synchronized(mem_utils.USERS)
   def ReadApprovalRequests(self,
                            requestor_username,
                            approval_type,
@@ -111,7 +111,7 @@ class InMemoryDBUsersMixin(object):
 
       yield approval
 
-  @utils.Synchronized
+  @mem_utils.Synchronized(mem_utils.USERS)
   def GrantApproval(self, requestor_username, approval_id, grantor_username):
     """Grants approval for a given request using given username."""
     try:
@@ -124,7 +124,7 @@ class InMemoryDBUsersMixin(object):
       raise db.UnknownApprovalRequestError(
           "Can't find approval with id: %s" % approval_id)
 
-  @utils.Synchronized
+  @mem_utils.Synchronized(mem_utils.USERS)
   def WriteUserNotification(self, notification):
     """Writes a notification for a given user."""
     if notification.username not in self.users:
@@ -137,7 +137,7 @@ class InMemoryDBUsersMixin(object):
     self.notifications_by_username.setdefault(cloned_notification.username,
                                               []).append(cloned_notification)
 
-  @utils.Synchronized
+  @mem_utils.Synchronized(mem_utils.USERS)
   def ReadUserNotifications(self, username, state=None, timerange=None):
     """Reads notifications scheduled for a user within a given timerange."""
     from_time, to_time = self._ParseTimeRange(timerange)
@@ -150,7 +150,7 @@ class InMemoryDBUsersMixin(object):
 
     return sorted(result, key=lambda r: r.timestamp, reverse=True)
 
-  @utils.Synchronized
+  @mem_utils.Synchronized(mem_utils.USERS)
   def UpdateUserNotifications(self, username, timestamps, state=None):
     """Updates existing user notification objects."""
     if not timestamps:
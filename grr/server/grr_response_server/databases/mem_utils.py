@@ -0,0 +1,146 @@
+#!/usr/bin/env python
+"""Locking utilities of the in memory database.
+
+Every InMemoryDB mixin guards its state with its own lock, so that unrelated
+calls (e.g. frontend threads writing client messages while worker threads
+process flows) don't serialize on a single lock.
+
+A method that needs several locks declares all of them, and they are always
+acquired in LOCK_ORDER. While holding some locks, a thread may only acquire
+locks that come later in LOCK_ORDER (directly or through nested calls), so that
+no two threads can wait for each other. Violations raise LockOrderError instead
+of deadlocking. Callbacks that call back into the database (e.g. inline flow
+processing handlers) must be called without holding any lock.
+"""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import unicode_literals
+
+import contextlib
+import functools
+import threading
+
+# Flows, flow requests, responses, processing requests, results and log
+# entries. The hunt flow and result indexes are derived from flows and results,
+# so they are guarded by this lock too.
+FLOWS = "flows"
+# Path records and the path tries indexing them.
+PATHS = "paths"
+# Client messages, message handler requests and their leases.
+MESSAGES = "messages"
+# Hunt objects.
+HUNTS = "hunts"
+# Blobs and blob references of hashes.
+BLOBS = "blobs"
+# Client metadata, snapshots, labels, keywords, histories and stats.
+CLIENTS = "clients"
+USERS = "users"
+CRON_JOBS = "cron_jobs"
+FOREMAN_RULES = "foreman_rules"
+ARTIFACTS = "artifacts"
+EVENTS = "events"
+STATS = "stats"
+SIGNED_BINARIES = "signed_binaries"
+CLIENT_REPORTS = "client_reports"
+
+# Flows methods delete client messages and check that clients exist, paths
+# methods check clients and hash blob references. All other locks are never
+# held while acquiring another one.
+LOCK_ORDER = (
+    FLOWS,
+    PATHS,
+    MESSAGES,
+    HUNTS,
+    BLOBS,
+    CLIENTS,
+    USERS,
+    CRON_JOBS,
+    FOREMAN_RULES,
+    ARTIFACTS,
+    EVENTS,
+    STATS,
+    SIGNED_BINARIES,
+    CLIENT_REPORTS,
+)
+
+
+class LockOrderError(Exception):
+  """Raised when locks would be acquired in the wrong order."""
+
+
+class OrderedLocks(object):
+  """A set of named reentrant locks that are acquired in a fixed order."""
+
+  def __init__(self, names):
+    self._names = tuple(names)
+    self._indices = {name: idx for idx, name in enumerate(self._names)}
+    self._locks = [threading.RLock() for _ in self._names]
+    # Per-thread counts of how many times each lock is held.
+    self._local = threading.local()
+
+  def _HeldCounts(self):
+    try:
+      return self._local.held_counts
+    except AttributeError:
+      self._local.held_counts = [0] * len(self._locks)
+      return self._local.held_counts
+
+  @contextlib.contextmanager
+  def Acquire(self, *names):
+    """Acquires locks with given names for the duration of the context.
+
+    Args:
+      *names: Names of the locks to acquire.
+
+    Yields:
+      None.
+
+    Raises:
+      LockOrderError: If the current thread holds a lock that comes later in
+        the order than one of the locks it doesn't hold yet.
+    """
+    indices = sorted(set(self._indices[name] for name in names))
+    held_counts = self._HeldCounts()
+
+    new_indices = [idx for idx in indices if not held_counts[idx]]
+    if new_indices:
+      for idx in range(len(held_counts) - 1, new_indices[0], -1):
+        if held_counts[idx]:
+          raise LockOrderError("Can't acquire lock '%s' while holding '%s'." %
+                               (self._names[new_indices[0]], self._names[idx]))
+
+    for idx in indices:
+      self._locks[idx].acquire()
+      held_counts[idx] += 1
+    try:
+      yield
+    finally:
+      for idx in reversed(indices):
+        held_counts[idx] -= 1
+        self._locks[idx].release()
+
+  def AcquireAll(self):
+    """Acquires all locks for the duration of the context."""
+    return self.Acquire(*self._names)
+
+
+def Synchronized(*names):
+  """Returns a decorator that runs a method while holding given locks.
+
+  The decorated method has to be one of an object with an OrderedLocks `locks`
+  attribute.
+
+  Args:
+    *names: Names of the locks to hold while the method runs.
+  """
+
+  def Decorator(func):
+
+    @functools.wraps(func)
+    def Decorated(self, *args, **kwargs):
+      with self.locks.Acquire(*names):
+        return func(self, *args, **kwargs)
+
+    return Decorated
+
+  return Decorator
@@ -0,0 +1,124 @@
+#!/usr/bin/env python
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import unicode_literals
+
+import threading
+
+from absl.testing import absltest
+from grr_response_core.lib import flags
+from grr_response_server.databases import mem_utils
+from grr.test_lib import test_lib
+
+
+class OrderedLocksTest(absltest.TestCase):
+
+  def setUp(self):
+    super(OrderedLocksTest, self).setUp()
+    self.locks = mem_utils.OrderedLocks(["a", "b", "c"])
+
+  def testAcquireIsReentrant(self):
+    with self.locks.Acquire("a"):
+      with self.locks.Acquire("a"):
+        pass
+
+  def testAcquireManyInAnyArgumentOrder(self):
+    with self.locks.Acquire("c", "a"):
+      pass
+
+  def testAcquireLaterLockWhileHoldingEarlierOne(self):
+    with self.locks.Acquire("a"):
+      with self.locks.Acquire("c"):
+        with self.locks.Acquire("a", "c"):
+          pass
+
+  def testAcquireEarlierLockWhileHoldingLaterOneRaises(self):
+    with self.locks.Acquire("b"):
+      with self.assertRaises(mem_utils.LockOrderError):
+        with self.locks.Acquire("a"):
+          pass
+
+  def testFailedAcquireDoesNotLeakLocks(self):
+    with self.locks.Acquire("c"):
+      with self.assertRaises(mem_utils.LockOrderError):
+        with self.locks.Acquire("a", "b"):
+          pass
+
+    # The locks are free again, so acquiring them in order works.
+    with self.locks.Acquire("a"):
+      with self.locks.Acquire("b"):
+        pass
+
+  def testLocksAreReleasedOnException(self):
+    with self.assertRaises(ValueError):
+      with self.locks.Acquire("b"):
+        raise ValueError()
+
+    with self.locks.Acquire("a"):
+      pass
+
+  def testAcquireAll(self):
+    with self.locks.AcquireAll():
+      with self.locks.Acquire("a"):
+        pass
+
+  def testHeldLocksAreTrackedPerThread(self):
+    errors = []
+
+    def AcquireA():
+      try:
+        with self.locks.Acquire("a"):
+          pass
+      except mem_utils.LockOrderError as e:
+        errors.append(e)
+
+    # Another thread holding "c" must not affect this thread's ordering.
+    with self.locks.Acquire("c"):
+      thread = threading.Thread(target=AcquireA)
+      thread.start()
+      thread.join()
+
+    self.assertEqual(errors, [])
+
+  def testUnknownLockRaises(self):
+    with self.assertRaises(KeyError):
+      with self.locks.Acquire("d"):
+        pass
+
+
+class SynchronizedTest(absltest.TestCase):
+
+  class _Synchronized(object):
+
+    def __init__(self):
+      self.locks = mem_utils.OrderedLocks(["a", "b"])
+
+    @mem_utils.Synchronized("b")
+    def B(self):
+      return "b"
+
+    @mem_utils.Synchronized("a")
+    def A(self):
+      return self.B()
+
+    @mem_utils.Synchronized("b")
+    def BThenA(self):
+      return self.A()
+
+  def testNestedCallsInOrder(self):
+    self.assertEqual(self._Synchronized().A(), "b")
+
+  def testNestedCallsOutOfOrderRaise(self):
+    with self.assertRaises(mem_utils.LockOrderError):
+      self._Synchronized().BThenA()
+
+  def testKeepsMethodName(self):
+    self.assertEqual(self._Synchronized.A.__name__, "A")
+
+
+def main(argv):
+  test_lib.main(argv)
+
+
+if __name__ == "__main__":
+  flags.StartMain(main)
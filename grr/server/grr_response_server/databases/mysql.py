@@ -12,6 +12,7 @@ import contextlib
 import logging
 import math
 import random
+import threading
 import time
 import warnings
 
@@ -19,6 +20,7 @@ from builtins import range  # pylint: disable=redefined-builtin
 import MySQLdb
 
 from grr_response_core import config
+from grr_response_core.stats import stats_collector_instance
 from grr_response_server import db as db_module
 from grr_response_server import threadpool
 from grr_response_server.databases import mysql_artifacts
@@ -36,6 +38,7 @@ from grr_response_server.databases import mysql_pool
 from grr_response_server.databases import mysql_signed_binaries
 from grr_response_server.databases import mysql_stats
 from grr_response_server.databases import mysql_users
+from grr_response_server.databases import mysql_utils
 
 # Maximum retry count:
 _MAX_RETRY_COUNT = 5
@@ -49,6 +52,11 @@ _RETRYABLE_ERRORS = {
 
 _ER_BAD_DB_ERROR = 1049
 
+# Routes a transaction can take, used as field values of the
+# mysql_transaction_latency metric.
+_PRIMARY_ROUTE = "primary"
+_REPLICA_ROUTE = "replica"
+
 # Enforce sensible defaults for MySQL connection and database:
 # Use utf8mb4_unicode_ci collation and utf8mb4 character set.
 # Do not use what MySQL calls "utf8", it is only a limited subset of utf-8.
@@ -163,7 +171,14 @@ class MysqlDB(mysql_artifacts.MySQLDBArtifactsMixin,
   See server/db.py for a full description of the interface.
   """
 
-  def __init__(self, host=None, port=None, user=None, passwd=None, db=None):
+  def __init__(self,
+               host=None,
+               port=None,
+               user=None,
+               passwd=None,
+               db=None,
+               replica_host=None,
+               replica_port=None):
     """Creates a datastore implementation.
 
     Args:
@@ -172,6 +187,10 @@ class MysqlDB(mysql_artifacts.MySQLDBArtifactsMixin,
       user: Passed to MySQLdb.Connect when creating a new connection.
       passwd: Passed to MySQLdb.Connect when creating a new connection.
       db: Passed to MySQLdb.Connect when creating a new connection.
+      replica_host: Host of a read replica that read-only transactions are
+        sent to. Defaults to Mysql.replica_host, an empty value disables
+        replica reads.
+      replica_port: Port of the read replica. Defaults to Mysql.replica_port.
     """
 
     # Turn all SQL warnings not mentioned below into exceptions.
@@ -193,33 +212,85 @@ class MysqlDB(mysql_artifacts.MySQLDBArtifactsMixin,
       args = self._GetConnectionArgs(
           host=host, port=port, user=user, passwd=passwd, db=db)
       try:
-        return MySQLdb.Connect(**args)
+        connection = MySQLdb.Connect(**args)
       except MySQLdb.Error as e:
         # Database does not exist
         if e[0] == _ER_BAD_DB_ERROR:
           CreateDatabase(**args)
-          return MySQLdb.Connect(**args)
+          connection = MySQLdb.Connect(**args)
         else:
           raise
 
-    self.pool = mysql_pool.Pool(Connect)
-    with contextlib.closing(self.pool.get()) as connection:
+      # Session variables outlive transactions, so they are set once per
+      # pooled connection.
       with contextlib.closing(connection.cursor()) as cursor:
         self._MariaDBCompatibility(cursor)
         self._SetBinlogFormat(cursor)
+      return connection
+
+    self.pool = mysql_pool.Pool(
+        Connect,
+        idle_timeout=config.CONFIG["Mysql.conn_pool_idle_timeout"],
+        max_lifetime=config.CONFIG["Mysql.conn_pool_max_lifetime"],
+        check_after_idle=config.CONFIG["Mysql.conn_pool_check_after_idle"],
+        name="mysql")
+    with contextlib.closing(self.pool.get()) as connection:
+      with contextlib.closing(connection.cursor()) as cursor:
         self._InitializeSchema(cursor)
         self._CheckForSSL(cursor)
         _EnforceEncoding(cursor)
+
+    if replica_host is None:
+      replica_host = config.CONFIG["Mysql.replica_host"]
+    if replica_host:
+      self.replica_pool = self._CreateReplicaPool(replica_host, replica_port, db)
+    else:
+      self.replica_pool = None
+    self.replica_sticky_after_write = config.CONFIG[
+        "Mysql.replica_sticky_after_write"]
+    self._local = threading.local()
+
     self.handler_thread = None
     self.handler_stop = True
+    self.handler_scheduler = mysql_utils.LeaseScheduler(
+        config.CONFIG["Mysql.queue_poll_min_delay"],
+        config.CONFIG["Mysql.queue_poll_max_delay"])
 
     self.flow_processing_request_handler_thread = None
     self.flow_processing_request_handler_stop = None
+    self.flow_processing_request_handler_scheduler = (
+        mysql_utils.LeaseScheduler(
+            config.CONFIG["Mysql.queue_poll_min_delay"],
+            config.CONFIG["Mysql.queue_poll_max_delay"]))
     self.flow_processing_request_handler_pool = (
         threadpool.ThreadPool.Factory(
             "flow_processing_pool", min_threads=2, max_threads=50))
     self.flow_processing_request_handler_pool.Start()
 
+  def _CreateReplicaPool(self, host, port, db):
+    """Creates a connection pool for the read replica running on host."""
+    if not port:
+      port = config.CONFIG["Mysql.replica_port"] or None
+    # Empty replica credentials fall back to the ones of the primary.
+    user = config.CONFIG["Mysql.replica_username"] or None
+    passwd = config.CONFIG["Mysql.replica_password"] or None
+
+    def ReplicaConnect():
+      """Returns a MySQLdb connection to the read replica."""
+      args = self._GetConnectionArgs(
+          host=host, port=port, user=user, passwd=passwd, db=db)
+      connection = MySQLdb.Connect(**args)
+      with contextlib.closing(connection.cursor()) as cursor:
+        self._MariaDBCompatibility(cursor)
+      return connection
+
+    return mysql_pool.Pool(
+        ReplicaConnect,
+        idle_timeout=config.CONFIG["Mysql.conn_pool_idle_timeout"],
+        max_lifetime=config.CONFIG["Mysql.conn_pool_max_lifetime"],
+        check_after_idle=config.CONFIG["Mysql.conn_pool_check_after_idle"],
+        name="mysql_replica")
+
   def _GetConnectionArgs(self, host=None, port=None, user=None, passwd=None,
                          db=None):
     connection_args = dict(
@@ -259,6 +330,41 @@ class MysqlDB(mysql_artifacts.MySQLDBArtifactsMixin,
 
   def Close(self):
     self.pool.close()
+    if self.replica_pool is not None:
+      self.replica_pool.close()
+
+  @contextlib.contextmanager
+  def ReadsFromPrimary(self):
+    """Sends read-only transactions of the current thread to the primary.
+
+    Use this around reads that must observe writes done shortly before, e.g.
+    by another thread or process, which the replica might not have applied
+    yet.
+
+    Yields:
+      None.
+    """
+    self._local.primary_reads = getattr(self._local, "primary_reads", 0) + 1
+    try:
+      yield
+    finally:
+      self._local.primary_reads -= 1
+
+  def _TransactionRoute(self, readonly, primary_only):
+    """Returns whether a transaction goes to the primary or the replica."""
+    if not readonly or primary_only or self.replica_pool is None:
+      return _PRIMARY_ROUTE
+    if getattr(self._local, "primary_reads", 0):
+      return _PRIMARY_ROUTE
+
+    # Keep reading from the primary for a while after this thread wrote, so
+    # that it sees its own writes regardless of replication lag.
+    last_write_time = getattr(self._local, "last_write_time", None)
+    if (last_write_time is not None and
+        time.time() - last_write_time < self.replica_sticky_after_write):
+      return _PRIMARY_ROUTE
+
+    return _REPLICA_ROUTE
 
   def _CheckForMariaDB(self, cursor):
     """Checks if we are running against MariaDB."""
@@ -309,9 +415,48 @@ class MysqlDB(mysql_artifacts.MySQLDBArtifactsMixin,
             "{}. Error occurred during execution of {}"
             .format(e, command.strip()))
 
-  def _RunInTransaction(self, function, readonly=False):
+  def _RunInTransaction(self, function, readonly=False, primary_only=False):
     """Runs function within a transaction.
 
+    Read-only transactions are sent to the read replica if one is configured,
+    all other transactions run on the primary. See _RunInTransactionWithPool
+    for details.
+
+    Args:
+      function: A function to be run, must accept a single MySQLdb.connection
+        parameter.
+      readonly: Indicates that only a readonly (snapshot) transaction is
+        required.
+      primary_only: Indicates that a readonly transaction has to run on the
+        primary even if a read replica is configured.
+
+    Returns:
+      The value returned by the last call to function.
+
+    Raises: Any exception raised by function.
+    """
+    route = self._TransactionRoute(readonly, primary_only)
+    if route == _REPLICA_ROUTE:
+      pool = self.replica_pool
+    else:
+      pool = self.pool
+
+    start_time = time.time()
+    try:
+      ret = self._RunInTransactionWithPool(pool, function, readonly)
+    finally:
+      stats_collector_instance.Get().RecordEvent(
+          "mysql_transaction_latency",
+          time.time() - start_time,
+          fields=[route])
+
+    if not readonly:
+      self._local.last_write_time = time.time()
+    return ret
+
+  def _RunInTransactionWithPool(self, pool, function, readonly):
+    """Runs function within a transaction on a connection from pool.
+
     Allocates a connection, begins a transaction on it and passes the connection
     to function.
 
@@ -321,6 +466,7 @@ class MysqlDB(mysql_artifacts.MySQLDBArtifactsMixin,
     database error is raised, the operation may be repeated.
 
     Args:
+      pool: The mysql_pool.Pool to take the connection from.
       function: A function to be run, must accept a single MySQLdb.connection
         parameter.
       readonly: Indicates that only a readonly (snapshot) transaction is
@@ -336,10 +482,9 @@ class MysqlDB(mysql_artifacts.MySQLDBArtifactsMixin,
       start_query = "START TRANSACTION WITH CONSISTENT SNAPSHOT, READ ONLY;"
 
     for retry_count in range(_MAX_RETRY_COUNT):
-      with contextlib.closing(self.pool.get()) as connection:
+      with contextlib.closing(pool.get()) as connection:
         try:
           with contextlib.closing(connection.cursor()) as cursor:
-            self._SetBinlogFormat(cursor)
             cursor.execute(start_query)
 
           ret = function(connection)
@@ -1,5 +1,13 @@
 #!/usr/bin/env python
 """The MySQL database methods for blobs handling."""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import unicode_literals
+
+from future.utils import iteritems
+
+from grr_response_server.databases import mysql_utils
+from grr_response_server.rdfvalues import objects as rdf_objects
 
 
 class MySQLDBBlobsMixin(object):
@@ -14,8 +22,37 @@ class MySQLDBBlobsMixin(object):
   def CheckBlobsExist(self, blob_ids):
     raise NotImplementedError()
 
-  def WriteHashBlobReferences(self, references_by_hash):
-    raise NotImplementedError()
+  @mysql_utils.WithTransaction()
+  def WriteHashBlobReferences(self, references_by_hash, cursor=None):
+    """Writes blob references for a given set of hashes."""
+    if not references_by_hash:
+      return
 
-  def ReadHashBlobReferences(self, hashes):
-    raise NotImplementedError()
+    values = []
+    for hash_id, blob_refs in iteritems(references_by_hash):
+      refs = rdf_objects.BlobReferences(items=blob_refs)
+      values.extend([hash_id.AsBytes(), refs.SerializeToString()])
+
+    query = ("INSERT INTO hash_blob_references(hash_id, blob_references) "
+             "VALUES {} "
+             "ON DUPLICATE KEY UPDATE "
+             "blob_references = VALUES(blob_references)").format(
+                 mysql_utils.Placeholders(2, len(references_by_hash)))
+    cursor.execute(query, values)
+
+  @mysql_utils.WithTransaction(readonly=True)
+  def ReadHashBlobReferences(self, hashes, cursor=None):
+    """Reads blob references of a given set of hashes."""
+    result = {hash_id: None for hash_id in hashes}
+    if not result:
+      return result
+
+    query = ("SELECT hash_id, blob_references FROM hash_blob_references "
+             "WHERE hash_id IN ({})").format(", ".join(["%s"] * len(result)))
+    cursor.execute(query, [hash_id.AsBytes() for hash_id in result])
+
+    for hash_id, blob_references in cursor.fetchall():
+      refs = rdf_objects.BlobReferences.FromSerializedString(blob_references)
+      result[rdf_objects.SHA256HashID.FromBytes(hash_id)] = list(refs.items)
+
+    return result
@@ -9,6 +9,7 @@ import datetime
 import itertools
 
 
+from future.utils import iteritems
 from future.utils import iterkeys
 from future.utils import itervalues
 
@@ -41,39 +42,31 @@ class MySQLDBClientMixin(object):
                           last_foreman=None,
                           cursor=None):
     """Write metadata about the client."""
+    columns, values = _ClientMetadataColumns(
+        client_id,
+        certificate=certificate,
+        fleetspeak_enabled=fleetspeak_enabled,
+        first_seen=first_seen,
+        last_ping=last_ping,
+        last_clock=last_clock,
+        last_ip=last_ip,
+        last_foreman=last_foreman)
+    cursor.execute(_ClientMetadataUpsertQuery(columns, 1), values)
 
-    columns = ["client_id"]
-    values = [mysql_utils.ClientIDToInt(client_id)]
-    if certificate:
-      columns.append("certificate")
-      values.append(certificate.SerializeToString())
-    if fleetspeak_enabled is not None:
-      columns.append("fleetspeak_enabled")
-      values.append(int(fleetspeak_enabled))
-    if first_seen:
-      columns.append("first_seen")
-      values.append(mysql_utils.RDFDatetimeToMysqlString(first_seen))
-    if last_ping:
-      columns.append("last_ping")
-      values.append(mysql_utils.RDFDatetimeToMysqlString(last_ping))
-    if last_clock:
-      columns.append("last_clock")
-      values.append(mysql_utils.RDFDatetimeToMysqlString(last_clock))
-    if last_ip:
-      columns.append("last_ip")
-      values.append(last_ip.SerializeToString())
-    if last_foreman:
-      columns.append("last_foreman")
-      values.append(mysql_utils.RDFDatetimeToMysqlString(last_foreman))
-
-    query = ("INSERT INTO clients ({cols}) VALUES ({vals}) "
-             "ON DUPLICATE KEY UPDATE {updates}").format(
-                 cols=", ".join(columns),
-                 vals=", ".join(["%s"] * len(columns)),
-                 updates=", ".join([
-                     "{c} = VALUES ({c})".format(c=col) for col in columns[1:]
-                 ]))
-    cursor.execute(query, values)
+  @mysql_utils.WithTransaction()
+  def MultiWriteClientMetadata(self, metadatas, cursor=None):
+    """Writes metadata about multiple clients."""
+    # All rows of a multi-row insert have to set the same columns, so clients
+    # are grouped by the set of fields that are updated.
+    rows_by_columns = {}
+    for client_id, metadata in iteritems(metadatas):
+      columns, values = _ClientMetadataColumns(
+          client_id, **db.ClientMetadataWriteArgs(metadata))
+      rows_by_columns.setdefault(tuple(columns), []).append(values)
+
+    for columns, rows in iteritems(rows_by_columns):
+      query = _ClientMetadataUpsertQuery(columns, len(rows))
+      cursor.execute(query, list(itertools.chain.from_iterable(rows)))
 
   @mysql_utils.WithTransaction(readonly=True)
   def MultiReadClientMetadata(self, client_ids, cursor=None):
@@ -467,6 +460,61 @@ class MySQLDBClientMixin(object):
       result[hash_to_kw[kw_hash]].append(mysql_utils.IntToClientID(cid))
     return result
 
+  @mysql_utils.WithTransaction(readonly=True)
+  def ListClientsForAllKeywords(self,
+                                keywords,
+                                offset,
+                                count,
+                                start_time=None,
+                                cursor=None):
+    """Lists the clients associated with all of the given keywords."""
+    keywords = set(keywords)
+
+    # Client ids are ordered the same way as integers and as strings.
+    query = """
+      SELECT client_id
+      FROM client_keywords
+      WHERE keyword_hash IN ({})
+    """.format(", ".join(["%s"] * len(keywords)))
+    args = [mysql_utils.Hash(kw) for kw in keywords]
+    if start_time:
+      query += " AND timestamp >= %s"
+      args.append(mysql_utils.RDFDatetimeToMysqlString(start_time))
+    query += """
+      GROUP BY client_id
+      HAVING COUNT(*) = %s
+      ORDER BY client_id
+      LIMIT %s OFFSET %s
+    """
+    args.extend([len(keywords), count, offset])
+    cursor.execute(query, args)
+
+    return [mysql_utils.IntToClientID(cid) for cid, in cursor.fetchall()]
+
+  @mysql_utils.WithTransaction(readonly=True)
+  def EstimateClientsForAllKeywords(self, keywords, start_time=None,
+                                    cursor=None):
+    """Estimates the number of clients associated with all given keywords."""
+    keywords = set(keywords)
+
+    query = """
+      SELECT COUNT(*)
+      FROM client_keywords
+      WHERE keyword_hash IN ({})
+    """.format(", ".join(["%s"] * len(keywords)))
+    args = [mysql_utils.Hash(kw) for kw in keywords]
+    if start_time:
+      query += " AND timestamp >= %s"
+      args.append(mysql_utils.RDFDatetimeToMysqlString(start_time))
+    query += " GROUP BY keyword_hash"
+    cursor.execute(query, args)
+
+    counts = [count for count, in cursor.fetchall()]
+    # Keywords without any clients don't have a row.
+    if len(counts) < len(keywords):
+      return 0
+    return int(min(counts))
+
   @mysql_utils.WithTransaction()
   def AddClientLabels(self, client_id, owner, labels, cursor=None):
     """Attaches a list of user labels to a client."""
@@ -661,3 +709,50 @@ class MySQLDBClientMixin(object):
         "DELETE FROM client_stats WHERE timestamp < %s LIMIT %s",
         [mysql_utils.RDFDatetimeToMysqlString(retention_time), limit])
     return cursor.rowcount
+
+
+def _ClientMetadataColumns(client_id,
+                           certificate=None,
+                           fleetspeak_enabled=None,
+                           first_seen=None,
+                           last_ping=None,
+                           last_clock=None,
+                           last_ip=None,
+                           last_foreman=None):
+  """Returns columns and values of the clients table to write."""
+  columns = ["client_id"]
+  values = [mysql_utils.ClientIDToInt(client_id)]
+  if certificate:
+    columns.append("certificate")
+    values.append(certificate.SerializeToString())
+  if fleetspeak_enabled is not None:
+    columns.append("fleetspeak_enabled")
+    values.append(int(fleetspeak_enabled))
+  if first_seen:
+    columns.append("first_seen")
+    values.append(mysql_utils.RDFDatetimeToMysqlString(first_seen))
+  if last_ping:
+    columns.append("last_ping")
+    values.append(mysql_utils.RDFDatetimeToMysqlString(last_ping))
+  if last_clock:
+    columns.append("last_clock")
+    values.append(mysql_utils.RDFDatetimeToMysqlString(last_clock))
+  if last_ip:
+    columns.append("last_ip")
+    values.append(last_ip.SerializeToString())
+  if last_foreman:
+    columns.append("last_foreman")
+    values.append(mysql_utils.RDFDatetimeToMysqlString(last_foreman))
+
+  return columns, values
+
+
+def _ClientMetadataUpsertQuery(columns, row_count):
+  """Returns a query inserting or updating row_count rows of clients."""
+  row = "({})".format(", ".join(["%s"] * len(columns)))
+  return ("INSERT INTO clients ({cols}) VALUES {rows} "
+          "ON DUPLICATE KEY UPDATE {updates}").format(
+              cols=", ".join(columns),
+              rows=", ".join([row] * row_count),
+              updates=", ".join(
+                  ["{c} = VALUES ({c})".format(c=col) for col in columns[1:]]))
@@ -65,6 +65,9 @@ CREATE TABLE IF NOT EXISTS client_keywords(
     PRIMARY KEY (client_id, keyword_hash),
     FOREIGN KEY (client_id) REFERENCES clients(client_id)
 )""", """
+CREATE INDEX IF NOT EXISTS keyword_client_idx
+    ON client_keywords(keyword_hash, client_id, timestamp)
+""", """
 CREATE TABLE IF NOT EXISTS client_stats(
     client_id BIGINT UNSIGNED,
     payload MEDIUMBLOB,
@@ -130,6 +133,17 @@ ON api_audit_entry(timestamp)
 CREATE INDEX IF NOT EXISTS router_method_name_idx
 ON api_audit_entry(router_method_name)
 """, """
+CREATE TABLE IF NOT EXISTS api_audit_daily_counts(
+    day DATETIME(6),
+    username_hash BINARY(32),
+    username VARCHAR(254),
+    router_method_name VARCHAR(128),
+    entry_count INT UNSIGNED,
+    PRIMARY KEY (day, username_hash, router_method_name)
+)""", """
+CREATE TABLE IF NOT EXISTS api_audit_rolled_up_days(
+    day DATETIME(6) PRIMARY KEY
+)""", """
 CREATE TABLE IF NOT EXISTS message_handler_requests(
     handlername VARCHAR(128),
     timestamp DATETIME(6),
@@ -183,7 +197,12 @@ CREATE TABLE IF NOT EXISTS flows(
     flow_id BIGINT UNSIGNED,
     long_flow_id VARCHAR(255),
     parent_flow_id BIGINT UNSIGNED,
+    parent_hunt_id VARCHAR(128) CHARACTER SET ascii,
     flow BLOB,
+    -- Denormalized from the flow object to maintain hunt_flow_counts.
+    flow_state INT UNSIGNED NOT NULL DEFAULT 0,
+    crashed BOOL NOT NULL DEFAULT FALSE,
+    has_results BOOL NOT NULL DEFAULT FALSE,
     client_crash_info MEDIUMBLOB,
     next_request_to_process INT UNSIGNED,
     pending_termination MEDIUMBLOB,
@@ -197,6 +216,9 @@ CREATE TABLE IF NOT EXISTS flows(
 )""", """
 CREATE INDEX IF NOT EXISTS timestamp_idx ON flows(timestamp)
 """, """
+CREATE INDEX IF NOT EXISTS parent_hunt_id_idx
+    ON flows(parent_hunt_id, last_update)
+""", """
 CREATE TABLE IF NOT EXISTS flow_requests(
     client_id BIGINT UNSIGNED,
     flow_id BIGINT UNSIGNED,
@@ -231,5 +253,117 @@ CREATE TABLE IF NOT EXISTS flow_processing_requests(
     leased_by VARCHAR(128),
     PRIMARY KEY (client_id, flow_id, timestamp),
     FOREIGN KEY (client_id, flow_id) REFERENCES flows(client_id, flow_id)
+)""", """
+CREATE TABLE IF NOT EXISTS client_paths(
+    client_id BIGINT UNSIGNED NOT NULL,
+    path_type INT UNSIGNED NOT NULL,
+    path_id BINARY(32) NOT NULL,
+    -- Binary collation makes prefix ranges on `path` match component prefixes.
+    path TEXT CHARACTER SET utf8mb4 COLLATE utf8mb4_bin NOT NULL,
+    directory BOOL NOT NULL DEFAULT FALSE,
+    depth INT UNSIGNED NOT NULL,
+    timestamp DATETIME(6) NOT NULL,
+    last_stat_entry_timestamp DATETIME(6),
+    last_hash_entry_timestamp DATETIME(6),
+    PRIMARY KEY (client_id, path_type, path_id),
+    FOREIGN KEY (client_id) REFERENCES clients(client_id)
+)""", """
+CREATE INDEX IF NOT EXISTS client_path_depth_prefix_idx
+    -- Maximum index length is 767 bytes. The integer columns take 16 bytes,
+    -- which leaves 187 UTF-8 characters for the path prefix.
+    ON client_paths(client_id, path_type, depth, path(187))
+""", """
+CREATE TABLE IF NOT EXISTS client_path_stat_entries(
+    client_id BIGINT UNSIGNED NOT NULL,
+    path_type INT UNSIGNED NOT NULL,
+    path_id BINARY(32) NOT NULL,
+    timestamp DATETIME(6) NOT NULL,
+    stat_entry MEDIUMBLOB NOT NULL,
+    PRIMARY KEY (client_id, path_type, path_id, timestamp),
+    FOREIGN KEY (client_id, path_type, path_id)
+    REFERENCES client_paths(client_id, path_type, path_id)
+)""", """
+CREATE TABLE IF NOT EXISTS client_path_hash_entries(
+    client_id BIGINT UNSIGNED NOT NULL,
+    path_type INT UNSIGNED NOT NULL,
+    path_id BINARY(32) NOT NULL,
+    timestamp DATETIME(6) NOT NULL,
+    hash_entry MEDIUMBLOB NOT NULL,
+    sha256 BINARY(32),
+    PRIMARY KEY (client_id, path_type, path_id, timestamp),
+    FOREIGN KEY (client_id, path_type, path_id)
+    REFERENCES client_paths(client_id, path_type, path_id)
+)""", """
+CREATE INDEX IF NOT EXISTS sha256_idx ON client_path_hash_entries(sha256)
+""", """
+CREATE TABLE IF NOT EXISTS hash_blob_references(
+    hash_id BINARY(32) PRIMARY KEY,
+    blob_references MEDIUMBLOB NOT NULL
+)""", """
+CREATE TABLE IF NOT EXISTS flow_results(
+    result_id BIGINT UNSIGNED AUTO_INCREMENT PRIMARY KEY,
+    client_id BIGINT UNSIGNED NOT NULL,
+    flow_id BIGINT UNSIGNED NOT NULL,
+    hunt_id VARCHAR(128) CHARACTER SET ascii,
+    timestamp DATETIME(6) NOT NULL,
+    payload MEDIUMBLOB NOT NULL,
+    type VARCHAR(128) CHARACTER SET ascii NOT NULL,
+    tag VARCHAR(128),
+    FOREIGN KEY (client_id, flow_id) REFERENCES flows(client_id, flow_id)
+)""", """
+CREATE INDEX IF NOT EXISTS flow_results_flow_idx
+    ON flow_results(client_id, flow_id, timestamp)
+""", """
+CREATE INDEX IF NOT EXISTS flow_results_hunt_idx
+    ON flow_results(hunt_id, timestamp)
+""", """
+CREATE TABLE IF NOT EXISTS flow_log_entries(
+    log_id BIGINT UNSIGNED AUTO_INCREMENT PRIMARY KEY,
+    client_id BIGINT UNSIGNED NOT NULL,
+    flow_id BIGINT UNSIGNED NOT NULL,
+    hunt_id VARCHAR(128) CHARACTER SET ascii,
+    timestamp DATETIME(6) NOT NULL,
+    -- Binary collation makes substring filters case-sensitive.
+    message MEDIUMTEXT CHARACTER SET utf8mb4 COLLATE utf8mb4_bin NOT NULL,
+    FOREIGN KEY (client_id, flow_id) REFERENCES flows(client_id, flow_id)
+)""", """
+CREATE INDEX IF NOT EXISTS flow_log_entries_flow_idx
+    ON flow_log_entries(client_id, flow_id, timestamp)
+""", """
+CREATE INDEX IF NOT EXISTS flow_log_entries_hunt_idx
+    ON flow_log_entries(hunt_id, timestamp)
+""", """
+CREATE TABLE IF NOT EXISTS hunts(
+    hunt_id VARCHAR(128) CHARACTER SET ascii PRIMARY KEY,
+    hunt MEDIUMBLOB NOT NULL,
+    last_update DATETIME(6) NOT NULL,
+    -- Hunts are listed by reading their metadata and filtering by the
+    -- columns below, without reading the full hunt objects.
+    metadata MEDIUMBLOB NOT NULL,
+    create_time DATETIME(6) NOT NULL,
+    creator VARCHAR(128) CHARACTER SET utf8mb4 COLLATE utf8mb4_bin NOT NULL,
+    description TEXT CHARACTER SET utf8mb4 COLLATE utf8mb4_bin NOT NULL
+)""", """
+CREATE INDEX IF NOT EXISTS hunts_create_time_idx
+ON hunts(create_time)
+""", """
+CREATE INDEX IF NOT EXISTS hunts_creator_create_time_idx
+ON hunts(creator, create_time)
+""", """
+CREATE TABLE IF NOT EXISTS hunt_result_counts(
+    -- Maximum index length is 767 bytes, hence ASCII ids and a hashed tag.
+    hunt_id VARCHAR(128) CHARACTER SET ascii NOT NULL,
+    type VARCHAR(128) CHARACTER SET ascii NOT NULL,
+    tag_hash BINARY(32) NOT NULL,
+    num_results BIGINT NOT NULL,
+    PRIMARY KEY (hunt_id, type, tag_hash)
+)""", """
+CREATE TABLE IF NOT EXISTS hunt_flow_counts(
+    hunt_id VARCHAR(128) CHARACTER SET ascii NOT NULL,
+    flow_state INT UNSIGNED NOT NULL,
+    crashed BOOL NOT NULL,
+    has_results BOOL NOT NULL,
+    num_flows BIGINT NOT NULL,
+    PRIMARY KEY (hunt_id, flow_state, crashed, has_results)
 )"""
 ]
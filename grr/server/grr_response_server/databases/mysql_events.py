@@ -4,6 +4,8 @@ from __future__ import absolute_import
 from __future__ import division
 from __future__ import unicode_literals
 
+from future.utils import iteritems
+
 from grr_response_core.lib import rdfvalue
 from grr_response_server.databases import mysql_utils
 from grr_response_server.rdfvalues import objects as rdf_objects
@@ -83,3 +85,61 @@ class MySQLDBEventMixin(object):
         columns=mysql_utils.Columns(args),
         values=mysql_utils.NamedPlaceholders(args))
     cursor.execute(query, args)
+
+  @mysql_utils.WithTransaction()
+  def WriteAPIAuditDailyCounts(self, day, counts, cursor=None):
+    """Writes numbers of audit entries of a day, replacing existing ones."""
+    day_str = mysql_utils.RDFDatetimeToMysqlString(day)
+
+    cursor.execute("DELETE FROM api_audit_daily_counts WHERE day = %s",
+                   [day_str])
+
+    if counts:
+      query = ("INSERT INTO api_audit_daily_counts "
+               "(day, username_hash, username, router_method_name, "
+               "entry_count) VALUES ") + mysql_utils.Placeholders(
+                   num=5, values=len(counts))
+      args = []
+      for (username, router_method_name), count in iteritems(counts):
+        args.extend([
+            day_str,
+            mysql_utils.Hash(username), username, router_method_name, count
+        ])
+      cursor.execute(query, args)
+
+    cursor.execute(
+        "INSERT IGNORE INTO api_audit_rolled_up_days (day) VALUES (%s)",
+        [day_str])
+
+  @mysql_utils.WithTransaction(readonly=True)
+  def ReadAPIAuditDailyCounts(self, min_day=None, max_day=None, cursor=None):
+    """Returns numbers of audit entries of rolled up days."""
+    conditions = []
+    values = []
+
+    if min_day is not None:
+      conditions.append("day >= %s")
+      values.append(mysql_utils.RDFDatetimeToMysqlString(min_day))
+
+    if max_day is not None:
+      conditions.append("day <= %s")
+      values.append(mysql_utils.RDFDatetimeToMysqlString(max_day))
+
+    where = ""
+    if conditions:
+      where = " WHERE " + " AND ".join(conditions)
+
+    cursor.execute("SELECT day FROM api_audit_rolled_up_days" + where, values)
+    results = {
+        mysql_utils.MysqlToRDFDatetime(day): {}
+        for day, in cursor.fetchall()
+    }
+
+    cursor.execute(
+        "SELECT day, username, router_method_name, entry_count "
+        "FROM api_audit_daily_counts" + where, values)
+    for day, username, router_method_name, count in cursor.fetchall():
+      counts = results.setdefault(mysql_utils.MysqlToRDFDatetime(day), {})
+      counts[(username, router_method_name)] = count
+
+    return results
@@ -5,26 +5,78 @@ from __future__ import division
 
 from __future__ import unicode_literals
 
+import collections
+import functools
 import logging
 import threading
-import time
+
+from future.utils import iteritems
+from future.utils import itervalues
 import MySQLdb
 from typing import List, Optional, Text
 
+from grr_response_core import config
 from grr_response_core.lib import rdfvalue
 from grr_response_core.lib import utils
 from grr_response_core.lib.rdfvalues import client as rdf_client
 from grr_response_core.lib.rdfvalues import flows as rdf_flows
+from grr_response_core.lib.util import collection
+from grr_response_core.lib.util import compatibility
 from grr_response_server import db
 from grr_response_server import db_utils
 from grr_response_server.databases import mysql_utils
 from grr_response_server.rdfvalues import flow_objects as rdf_flow_objects
 from grr_response_server.rdfvalues import objects as rdf_objects
 
+# Maximum number of rows written by a single multi-row INSERT of flow results.
+_FLOW_RESULTS_INSERT_BATCH_SIZE = 1000
+
+
+def _FlowKeysCondition(flow_keys):
+  """Returns a WHERE condition matching given flows and its arguments.
+
+  Args:
+    flow_keys: An iterable of (client_id, flow_id) tuples of integers.
+
+  Returns:
+    A tuple with the condition string and the list of its arguments.
+  """
+  conditions = []
+  args = []
+  for client_id, flow_id in flow_keys:
+    conditions.append("(client_id = %s AND flow_id = %s)")
+    args.extend([client_id, flow_id])
+  return " OR ".join(conditions), args
+
+
+def _WakesUp(scheduler_name):
+  """Returns a decorator that wakes up a lease scheduler of the database.
+
+  The scheduler is woken up once the decorated method returns. For methods
+  decorated with @mysql_utils.WithTransaction this is after the commit, so the
+  woken up loop can lease the rows written by the method.
+
+  Args:
+    scheduler_name: Name of the database attribute holding the scheduler.
+  """
+
+  def Decorator(func):
+
+    @functools.wraps(func)
+    def Decorated(self, *args, **kwargs):
+      result = func(self, *args, **kwargs)
+      getattr(self, scheduler_name).Wake()
+      return result
+
+    return Decorated
+
+  return Decorator
+
 
 class MySQLDBFlowMixin(object):
   """MySQLDB mixin for flow handling."""
 
+  @_WakesUp("handler_scheduler")
   @mysql_utils.WithTransaction()
   def WriteMessageHandlerRequests(self, requests, cursor=None):
     """Writes a list of message handler requests to the database."""
@@ -41,7 +93,7 @@ class MySQLDBFlowMixin(object):
     query += ",".join(value_templates)
     cursor.execute(query, args)
 
-  @mysql_utils.WithTransaction(readonly=True)
+  @mysql_utils.WithTransaction(readonly=True, primary_only=True)
   def ReadMessageHandlerRequests(self, cursor=None):
     """Reads all message handler requests from the database."""
 
@@ -86,6 +138,7 @@ class MySQLDBFlowMixin(object):
     """Unregisters any registered message handler."""
     if self.handler_thread:
       self.handler_stop = True
+      self.handler_scheduler.Wake()
       self.handler_thread.join(timeout)
       if self.handler_thread.isAlive():
         raise RuntimeError("Message handler thread did not join in time.")
@@ -93,14 +146,14 @@ class MySQLDBFlowMixin(object):
 
   def _MessageHandlerLoop(self, handler, lease_time, limit):
     while not self.handler_stop:
+      msgs = None
       try:
         msgs = self._LeaseMessageHandlerRequests(lease_time, limit)
         if msgs:
           handler(msgs)
-        else:
-          time.sleep(5)
       except Exception as e:  # pylint: disable=broad-except
         logging.exception("_LeaseMessageHandlerRequests raised %s.", e)
+      self.handler_scheduler.Wait(bool(msgs))
 
   @mysql_utils.WithTransaction()
   def _LeaseMessageHandlerRequests(self, lease_time, limit, cursor=None):
@@ -138,7 +191,7 @@ class MySQLDBFlowMixin(object):
 
     return res
 
-  @mysql_utils.WithTransaction(readonly=True)
+  @mysql_utils.WithTransaction(readonly=True, primary_only=True)
   def ReadClientMessages(self, client_id, cursor=None):
     """Reads all client messages available for a given client_id."""
 
@@ -253,11 +306,15 @@ class MySQLDBFlowMixin(object):
     """Writes a flow object to the database."""
 
     query = ("INSERT INTO flows "
-             "(client_id, flow_id, long_flow_id, parent_flow_id, flow, "
+             "(client_id, flow_id, long_flow_id, parent_flow_id, "
+             "parent_hunt_id, flow, flow_state, crashed, "
              "next_request_to_process, timestamp, last_update) VALUES "
-             "(%s, %s, %s, %s, %s, %s, %s, %s) "
+             "(%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s) "
              "ON DUPLICATE KEY UPDATE "
+             "parent_hunt_id=VALUES(parent_hunt_id), "
              "flow=VALUES(flow), "
+             "flow_state=VALUES(flow_state), "
+             "crashed=(VALUES(crashed) OR client_crash_info IS NOT NULL), "
              "next_request_to_process=VALUES(next_request_to_process),"
              "last_update=VALUES(last_update)")
 
@@ -269,16 +326,85 @@ class MySQLDBFlowMixin(object):
     timestamp_str = mysql_utils.RDFDatetimeToMysqlString(flow_obj.create_time)
     now_str = mysql_utils.RDFDatetimeToMysqlString(rdfvalue.RDFDatetime.Now())
 
+    flow_key = (mysql_utils.ClientIDToInt(flow_obj.client_id),
+                mysql_utils.FlowIDToInt(flow_obj.flow_id))
     args = [
-        mysql_utils.ClientIDToInt(flow_obj.client_id),
-        mysql_utils.FlowIDToInt(flow_obj.flow_id), flow_obj.long_flow_id, pfi,
-        flow_obj.SerializeToString(), flow_obj.next_request_to_process,
-        timestamp_str, now_str
+        flow_key[0], flow_key[1], flow_obj.long_flow_id, pfi,
+        flow_obj.parent_hunt_id or None,
+        flow_obj.SerializeToString(),
+        int(flow_obj.flow_state),
+        flow_obj.HasField("client_crash_info"),
+        flow_obj.next_request_to_process,
+        timestamp_str,
+        now_str,
     ]
+
+    old_counter_keys = self._ReadHuntFlowCounterKeys([flow_key], cursor)
     try:
       cursor.execute(query, args)
     except MySQLdb.IntegrityError as e:
       raise db.UnknownClientError(flow_obj.client_id, cause=e)
+    new_counter_keys = self._ReadHuntFlowCounterKeys([flow_key], cursor)
+    self._UpdateHuntFlowCounts(old_counter_keys, new_counter_keys, cursor)
+
+  def _ReadHuntFlowCounterKeys(self, flow_keys, cursor):
+    """Reads hunt_flow_counts keys of given flows and locks their rows.
+
+    Args:
+      flow_keys: An iterable of (client_id, flow_id) tuples of integers.
+      cursor: MySQLdb cursor to use.
+
+    Returns:
+      A dict mapping (client_id, flow_id) tuples of existing flows to
+      (parent_hunt_id, flow_state, crashed, has_results) tuples.
+    """
+    condition, args = _FlowKeysCondition(flow_keys)
+    if not args:
+      return {}
+
+    query = ("SELECT client_id, flow_id, parent_hunt_id, flow_state, crashed, "
+             "has_results FROM flows WHERE {} FOR UPDATE").format(condition)
+    cursor.execute(query, args)
+
+    result = {}
+    for row in cursor.fetchall():
+      client_id, flow_id, hunt_id, flow_state, crashed, has_results = row
+      result[(client_id, flow_id)] = (hunt_id, flow_state, bool(crashed),
+                                      bool(has_results))
+    return result
+
+  def _UpdateHuntFlowCounts(self, old_counter_keys, new_counter_keys, cursor):
+    """Moves updated flows between hunt_flow_counts rows.
+
+    Args:
+      old_counter_keys: Counter keys of flows before the update, as returned
+        by _ReadHuntFlowCounterKeys.
+      new_counter_keys: Counter keys of the same flows after the update.
+      cursor: MySQLdb cursor to use.
+    """
+    deltas = collections.Counter()
+    for counter_key in itervalues(old_counter_keys):
+      deltas[counter_key] -= 1
+    for counter_key in itervalues(new_counter_keys):
+      deltas[counter_key] += 1
+
+    args = []
+    for counter_key, delta in iteritems(deltas):
+      hunt_id = counter_key[0]
+      # Only flows started by hunts are counted.
+      if hunt_id is not None and delta != 0:
+        args.extend(counter_key + (delta,))
+
+    if not args:
+      return
+
+    query = ("INSERT INTO hunt_flow_counts "
+             "(hunt_id, flow_state, crashed, has_results, num_flows) "
+             "VALUES {} "
+             "ON DUPLICATE KEY UPDATE "
+             "num_flows = num_flows + VALUES(num_flows)").format(
+                 mysql_utils.Placeholders(5, len(args) // 5))
+    cursor.execute(query, args)
 
   def _FlowObjectFromRow(self, row):
     """Generates a flow object from a database row."""
@@ -309,7 +435,7 @@ class MySQLDBFlowMixin(object):
                     "next_request_to_process, processing_deadline, "
                     "processing_on, processing_since, timestamp, last_update ")
 
-  @mysql_utils.WithTransaction(readonly=True)
+  @mysql_utils.WithTransaction(readonly=True, primary_only=True)
   def ReadFlowObject(self, client_id, flow_id, cursor=None):
     """Reads a flow object from the database."""
     query = ("SELECT " + self.FLOW_DB_FIELDS +
@@ -358,7 +484,7 @@ class MySQLDBFlowMixin(object):
     cursor.execute(query, args)
     return [self._FlowObjectFromRow(row) for row in cursor.fetchall()]
 
-  @mysql_utils.WithTransaction(readonly=True)
+  @mysql_utils.WithTransaction(readonly=True, primary_only=True)
   def ReadChildFlowObjects(self, client_id, flow_id, cursor=None):
     """Reads flows that were started by a given flow from the database."""
     query = ("SELECT " + self.FLOW_DB_FIELDS +
@@ -430,9 +556,15 @@ class MySQLDBFlowMixin(object):
     if flow_obj != db.Database.unchanged:
       updates.append("flow=%s")
       args.append(flow_obj.SerializeToString())
+      updates.append("flow_state=%s")
+      args.append(int(flow_obj.flow_state))
     if client_crash_info != db.Database.unchanged:
       updates.append("client_crash_info=%s")
       args.append(client_crash_info.SerializeToString())
+      updates.append("crashed=TRUE")
+    elif flow_obj != db.Database.unchanged:
+      updates.append("crashed=(client_crash_info IS NOT NULL OR %s)")
+      args.append(flow_obj.HasField("client_crash_info"))
     if pending_termination != db.Database.unchanged:
       updates.append("pending_termination=%s")
       args.append(pending_termination.SerializeToString())
@@ -453,12 +585,25 @@ class MySQLDBFlowMixin(object):
     query += ", ".join(updates)
     query += " WHERE client_id=%s AND flow_id=%s"
 
-    args.append(mysql_utils.ClientIDToInt(client_id))
-    args.append(mysql_utils.FlowIDToInt(flow_id))
+    flow_key = (mysql_utils.ClientIDToInt(client_id),
+                mysql_utils.FlowIDToInt(flow_id))
+    args.extend(flow_key)
+
+    # Only the flow object and crash info affect hunt flow counts.
+    updates_counts = (
+        flow_obj != db.Database.unchanged or
+        client_crash_info != db.Database.unchanged)
+    if updates_counts:
+      old_counter_keys = self._ReadHuntFlowCounterKeys([flow_key], cursor)
+
     updated = cursor.execute(query, args)
     if updated == 0:
       raise db.UnknownFlowError(client_id, flow_id)
 
+    if updates_counts:
+      new_counter_keys = self._ReadHuntFlowCounterKeys([flow_key], cursor)
+      self._UpdateHuntFlowCounts(old_counter_keys, new_counter_keys, cursor)
+
   @mysql_utils.WithTransaction()
   def UpdateFlows(self,
                   client_id_flow_id_pairs,
@@ -505,6 +650,7 @@ class MySQLDBFlowMixin(object):
     query += ", ".join(templates)
     cursor.execute(query, args)
 
+  @_WakesUp("flow_processing_request_handler_scheduler")
   @mysql_utils.WithTransaction()
   def WriteFlowRequests(self, requests, cursor=None):
     """Writes a list of flow requests to the database."""
@@ -728,6 +874,7 @@ class MySQLDBFlowMixin(object):
     query += " OR ".join(conditions)
     cursor.execute(query, args)
 
+  @_WakesUp("flow_processing_request_handler_scheduler")
   @mysql_utils.WithTransaction()
   def WriteFlowResponses(self, responses, cursor=None):
     """Writes a list of flow responses to the database."""
@@ -874,7 +1021,7 @@ class MySQLDBFlowMixin(object):
     cursor.execute(res_query, args)
     cursor.execute(req_query, args)
 
-  @mysql_utils.WithTransaction(readonly=True)
+  @mysql_utils.WithTransaction(readonly=True, primary_only=True)
   def ReadAllFlowRequestsAndResponses(self, client_id, flow_id, cursor=None):
     """Reads all requests and responses for a given flow from the database."""
     query = ("SELECT request, needs_processing, responses_expected, timestamp "
@@ -927,7 +1074,7 @@ class MySQLDBFlowMixin(object):
     req_query = "DELETE FROM flow_requests WHERE client_id=%s AND flow_id=%s"
     cursor.execute(req_query, args)
 
-  @mysql_utils.WithTransaction(readonly=True)
+  @mysql_utils.WithTransaction(readonly=True, primary_only=True)
   def ReadFlowRequestsReadyForProcessing(self,
                                          client_id,
                                          flow_id,
@@ -992,23 +1139,29 @@ class MySQLDBFlowMixin(object):
       if needs_processing:
         return False
 
-    update_query = ("UPDATE flows SET flow=%s, processing_on=%s, "
-                    "processing_since=%s, processing_deadline=%s, "
-                    "next_request_to_process=%s, last_update=%s "
-                    "WHERE client_id=%s AND flow_id=%s")
+    update_query = ("UPDATE flows SET flow=%s, flow_state=%s, "
+                    "crashed=(client_crash_info IS NOT NULL OR %s), "
+                    "processing_on=%s, processing_since=%s, "
+                    "processing_deadline=%s, next_request_to_process=%s, "
+                    "last_update=%s WHERE client_id=%s AND flow_id=%s")
     clone = flow_obj.Copy()
     clone.processing_on = None
     clone.processing_since = None
     clone.processing_deadline = None
     now = rdfvalue.RDFDatetime.Now()
     now_str = mysql_utils.RDFDatetimeToMysqlString(now)
+    flow_key = (mysql_utils.ClientIDToInt(flow_obj.client_id),
+                mysql_utils.FlowIDToInt(flow_obj.flow_id))
     args = [
-        clone.SerializeToString(), None, None, None,
-        flow_obj.next_request_to_process, now_str,
-        mysql_utils.ClientIDToInt(flow_obj.client_id),
-        mysql_utils.FlowIDToInt(flow_obj.flow_id)
+        clone.SerializeToString(),
+        int(flow_obj.flow_state),
+        flow_obj.HasField("client_crash_info"), None, None, None,
+        flow_obj.next_request_to_process, now_str, flow_key[0], flow_key[1]
     ]
+    old_counter_keys = self._ReadHuntFlowCounterKeys([flow_key], cursor)
     cursor.execute(update_query, args)
+    new_counter_keys = self._ReadHuntFlowCounterKeys([flow_key], cursor)
+    self._UpdateHuntFlowCounts(old_counter_keys, new_counter_keys, cursor)
 
     # This needs to happen after we are sure that the write has succeeded.
     flow_obj.processing_on = None
@@ -1017,12 +1170,13 @@ class MySQLDBFlowMixin(object):
 
     return True
 
+  @_WakesUp("flow_processing_request_handler_scheduler")
   @mysql_utils.WithTransaction()
   def WriteFlowProcessingRequests(self, requests, cursor=None):
     """Writes a list of flow processing requests to the database."""
     self._WriteFlowProcessingRequests(requests, cursor)
 
-  @mysql_utils.WithTransaction(readonly=True)
+  @mysql_utils.WithTransaction(readonly=True, primary_only=True)
   def ReadFlowProcessingRequests(self, cursor=None):
     """Reads all flow processing requests from the database."""
     query = "SELECT request, timestamp FROM flow_processing_requests"
@@ -1077,7 +1231,8 @@ class MySQLDBFlowMixin(object):
              "LIMIT %s")
 
     id_str = utils.ProcessIdString()
-    args = (expiry_str, id_str, now_str, now_str, 50)
+    args = (expiry_str, id_str, now_str, now_str,
+            config.CONFIG["Mysql.flow_processing_lease_batch_size"])
     updated = cursor.execute(query, args)
 
     if updated == 0:
@@ -1100,18 +1255,15 @@ class MySQLDBFlowMixin(object):
   def _FlowProcessingRequestHandlerLoop(self, handler):
     """The main loop for the flow processing request queue."""
     while not self.flow_processing_request_handler_stop:
+      msgs = None
       try:
         msgs = self._LeaseFlowProcessingReqests()
-        if msgs:
-          for m in msgs:
-            self.flow_processing_request_handler_pool.AddTask(
-                target=handler, args=(m,))
-        else:
-          time.sleep(5)
-
+        for m in msgs:
+          self.flow_processing_request_handler_pool.AddTask(
+              target=handler, args=(m,))
       except Exception as e:  # pylint: disable=broad-except
         logging.exception("_FlowProcessingRequestHandlerLoop raised %s.", e)
-        break
+      self.flow_processing_request_handler_scheduler.Wait(bool(msgs))
 
   def RegisterFlowProcessingHandler(self, handler):
     """Registers a handler to receive flow processing messages."""
@@ -1130,6 +1282,7 @@ class MySQLDBFlowMixin(object):
     """Unregisters any registered flow processing handler."""
     if self.flow_processing_request_handler_thread:
       self.flow_processing_request_handler_stop = True
+      self.flow_processing_request_handler_scheduler.Wake()
       self.flow_processing_request_handler_thread.join(timeout)
       if self.flow_processing_request_handler_thread.isAlive():
         raise RuntimeError("Flow processing handler did not join in time.")
@@ -1138,8 +1291,113 @@ class MySQLDBFlowMixin(object):
   @mysql_utils.WithTransaction()
   def WriteFlowResults(self, results, cursor=None):
     """Writes flow results for a given flow."""
+    results = list(results)
+    if not results:
+      return
 
-  @mysql_utils.WithTransaction()
+    flow_keys = set((mysql_utils.ClientIDToInt(r.client_id),
+                     mysql_utils.FlowIDToInt(r.flow_id)) for r in results)
+    old_counter_keys = self._ReadHuntFlowCounterKeys(flow_keys, cursor)
+    if len(old_counter_keys) != len(flow_keys):
+      raise db.AtLeastOneUnknownFlowError(
+          [(r.client_id, r.flow_id) for r in results])
+
+    timestamp_str = mysql_utils.RDFDatetimeToMysqlString(
+        rdfvalue.RDFDatetime.Now())
+
+    rows = []
+    result_counts = collections.Counter()
+    for r in results:
+      client_id = mysql_utils.ClientIDToInt(r.client_id)
+      flow_id = mysql_utils.FlowIDToInt(r.flow_id)
+      # Results belong to the hunt that started the flow.
+      hunt_id = old_counter_keys[(client_id, flow_id)][0]
+      type_name = compatibility.GetName(r.payload.__class__)
+      rows.append([
+          client_id, flow_id, hunt_id, timestamp_str,
+          r.payload.SerializeToString(), type_name, r.tag or None
+      ])
+      if hunt_id is not None:
+        result_counts[(hunt_id, type_name, mysql_utils.Hash(r.tag or ""))] += 1
+
+    for batch in collection.Batch(rows, _FLOW_RESULTS_INSERT_BATCH_SIZE):
+      query = ("INSERT INTO flow_results "
+               "(client_id, flow_id, hunt_id, timestamp, payload, type, tag) "
+               "VALUES {}").format(mysql_utils.Placeholders(7, len(batch)))
+      cursor.execute(query, [value for row in batch for value in row])
+
+    if result_counts:
+      args = []
+      for counter_key, count in iteritems(result_counts):
+        args.extend(counter_key + (count,))
+      query = ("INSERT INTO hunt_result_counts "
+               "(hunt_id, type, tag_hash, num_results) VALUES {} "
+               "ON DUPLICATE KEY UPDATE "
+               "num_results = num_results + VALUES(num_results)").format(
+                   mysql_utils.Placeholders(4, len(result_counts)))
+      cursor.execute(query, args)
+
+    new_counter_keys = {}
+    for flow_key, (hunt_id, flow_state, crashed, has_results) in iteritems(
+        old_counter_keys):
+      if not has_results:
+        new_counter_keys[flow_key] = (hunt_id, flow_state, crashed, True)
+
+    if new_counter_keys:
+      condition, args = _FlowKeysCondition(new_counter_keys)
+      cursor.execute("UPDATE flows SET has_results=TRUE WHERE " + condition,
+                     args)
+      self._UpdateHuntFlowCounts(
+          {k: old_counter_keys[k] for k in new_counter_keys}, new_counter_keys,
+          cursor)
+
+  FLOW_RESULT_DB_FIELDS = ("client_id, flow_id, hunt_id, timestamp, payload, "
+                           "type, tag ")
+
+  def _FlowResultFromRow(self, row):
+    """Generates a flow result from a database row."""
+    client_id, flow_id, hunt_id, timestamp, payload, type_name, tag = row
+
+    if type_name in rdfvalue.RDFValue.classes:
+      payload_cls = rdfvalue.RDFValue.classes[type_name]
+      payload = payload_cls.FromSerializedString(payload)
+    else:
+      # The type of the payload is no longer known to the system.
+      payload = rdf_objects.SerializedValueOfUnrecognizedType(
+          type_name=type_name, value=payload)
+
+    result = rdf_flow_objects.FlowResult(
+        client_id=mysql_utils.IntToClientID(client_id),
+        flow_id=mysql_utils.IntToFlowID(flow_id),
+        timestamp=mysql_utils.MysqlToRDFDatetime(timestamp),
+        payload=payload)
+    if hunt_id is not None:
+      result.hunt_id = hunt_id
+    if tag is not None:
+      result.tag = tag
+    return result
+
+  def _FlowResultsConditions(self, with_tag=None, with_type=None,
+                             with_substring=None):
+    """Returns WHERE conditions and arguments for flow results filters."""
+    conditions = []
+    args = []
+
+    if with_tag is not None:
+      conditions.append("tag = %s")
+      args.append(with_tag)
+
+    if with_type is not None:
+      conditions.append("type = %s")
+      args.append(with_type)
+
+    if with_substring is not None:
+      conditions.append("INSTR(payload, %s) > 0")
+      args.append(with_substring.encode("utf-8"))
+
+    return conditions, args
+
+  @mysql_utils.WithTransaction(readonly=True)
   def ReadFlowResults(self,
                       client_id,
                       flow_id,
@@ -1150,8 +1408,21 @@ class MySQLDBFlowMixin(object):
                       with_substring=None,
                       cursor=None):
     """Reads flow results of a given flow using given query options."""
+    conditions, args = self._FlowResultsConditions(
+        with_tag=with_tag, with_type=with_type, with_substring=with_substring)
+    conditions = ["client_id = %s", "flow_id = %s"] + conditions
+    args = [
+        mysql_utils.ClientIDToInt(client_id),
+        mysql_utils.FlowIDToInt(flow_id)
+    ] + args
 
-  @mysql_utils.WithTransaction()
+    query = ("SELECT " + self.FLOW_RESULT_DB_FIELDS + "FROM flow_results "
+             "WHERE " + " AND ".join(conditions) + " "
+             "ORDER BY timestamp, result_id LIMIT %s OFFSET %s")
+    cursor.execute(query, args + [count, offset])
+    return [self._FlowResultFromRow(row) for row in cursor.fetchall()]
+
+  @mysql_utils.WithTransaction(readonly=True)
   def CountFlowResults(self,
                        client_id,
                        flow_id,
@@ -1159,12 +1430,71 @@ class MySQLDBFlowMixin(object):
                        with_type=None,
                        cursor=None):
     """Counts flow results of a given flow using given query options."""
+    conditions, args = self._FlowResultsConditions(
+        with_tag=with_tag, with_type=with_type)
+    conditions = ["client_id = %s", "flow_id = %s"] + conditions
+    args = [
+        mysql_utils.ClientIDToInt(client_id),
+        mysql_utils.FlowIDToInt(flow_id)
+    ] + args
+
+    query = ("SELECT COUNT(*) FROM flow_results WHERE " +
+             " AND ".join(conditions))
+    cursor.execute(query, args)
+    count, = cursor.fetchone()
+    return count
 
   @mysql_utils.WithTransaction()
-  def WriteFlowLogEntries(self, client_id, flow_id, entries, cursor=None):
+  def WriteFlowLogEntries(self, entries, cursor=None):
     """Writes flow log entries for a given flow."""
+    entries = list(entries)
+    if not entries:
+      return
 
-  @mysql_utils.WithTransaction()
+    flow_keys = set((mysql_utils.ClientIDToInt(e.client_id),
+                     mysql_utils.FlowIDToInt(e.flow_id)) for e in entries)
+    condition, args = _FlowKeysCondition(flow_keys)
+
+    cursor.execute(
+        "SELECT client_id, flow_id, parent_hunt_id FROM flows WHERE " +
+        condition, args)
+    hunt_ids = {(client_id, flow_id): hunt_id
+                for client_id, flow_id, hunt_id in cursor.fetchall()}
+    if len(hunt_ids) != len(flow_keys):
+      raise db.AtLeastOneUnknownFlowError(
+          [(e.client_id, e.flow_id) for e in entries])
+
+    timestamp_str = mysql_utils.RDFDatetimeToMysqlString(
+        rdfvalue.RDFDatetime.Now())
+
+    args = []
+    for e in entries:
+      client_id = mysql_utils.ClientIDToInt(e.client_id)
+      flow_id = mysql_utils.FlowIDToInt(e.flow_id)
+      args.extend([
+          client_id, flow_id, hunt_ids[(client_id, flow_id)], timestamp_str,
+          e.message
+      ])
+
+    query = ("INSERT INTO flow_log_entries "
+             "(client_id, flow_id, hunt_id, timestamp, message) "
+             "VALUES {}").format(mysql_utils.Placeholders(5, len(entries)))
+    cursor.execute(query, args)
+
+  def _FlowLogEntryFromRow(self, row):
+    """Generates a flow log entry from a database row."""
+    client_id, flow_id, hunt_id, timestamp, message = row
+
+    entry = rdf_flow_objects.FlowLogEntry(
+        client_id=mysql_utils.IntToClientID(client_id),
+        flow_id=mysql_utils.IntToFlowID(flow_id),
+        timestamp=mysql_utils.MysqlToRDFDatetime(timestamp),
+        message=message)
+    if hunt_id is not None:
+      entry.hunt_id = hunt_id
+    return entry
+
+  @mysql_utils.WithTransaction(readonly=True)
   def ReadFlowLogEntries(self,
                          client_id,
                          flow_id,
@@ -1173,7 +1503,29 @@ class MySQLDBFlowMixin(object):
                          with_substring=None,
                          cursor=None):
     """Reads flow log entries of a given flow using given query options."""
+    query = ("SELECT client_id, flow_id, hunt_id, timestamp, message "
+             "FROM flow_log_entries WHERE client_id = %s AND flow_id = %s ")
+    args = [
+        mysql_utils.ClientIDToInt(client_id),
+        mysql_utils.FlowIDToInt(flow_id)
+    ]
 
-  @mysql_utils.WithTransaction()
+    if with_substring is not None:
+      query += "AND INSTR(message, %s) > 0 "
+      args.append(with_substring)
+
+    query += "ORDER BY timestamp, log_id LIMIT %s OFFSET %s"
+    cursor.execute(query, args + [count, offset])
+    return [self._FlowLogEntryFromRow(row) for row in cursor.fetchall()]
+
+  @mysql_utils.WithTransaction(readonly=True)
   def CountFlowLogEntries(self, client_id, flow_id, cursor=None):
     """Returns number of flow log entries of a given flow."""
+    query = ("SELECT COUNT(*) FROM flow_log_entries "
+             "WHERE client_id = %s AND flow_id = %s")
+    cursor.execute(query, [
+        mysql_utils.ClientIDToInt(client_id),
+        mysql_utils.FlowIDToInt(flow_id)
+    ])
+    count, = cursor.fetchone()
+    return count
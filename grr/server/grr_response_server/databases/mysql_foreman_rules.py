@@ -40,3 +40,12 @@ class MySQLDBForemanRulesMixin(object):
     now = rdfvalue.RDFDatetime.Now()
     cursor.execute("DELETE FROM foreman_rules WHERE expiration_time < %s",
                    [mysql_utils.RDFDatetimeToMysqlString(now)])
+
+  @mysql_utils.WithTransaction(readonly=True)
+  def ReadForemanRulesVersion(self, cursor=None):
+    # There are only a few rules, so checksumming them in the database is cheap
+    # compared to sending and deserializing them.
+    cursor.execute("SELECT COUNT(*), COALESCE(SUM(CRC32(rule)), 0) "
+                   "FROM foreman_rules")
+    count, checksum = cursor.fetchone()
+    return (int(count), int(checksum))
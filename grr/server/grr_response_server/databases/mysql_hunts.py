@@ -1,59 +1,305 @@
 #!/usr/bin/env python
-"""The MySQL database methods for flow handling."""
+"""The MySQL database methods for hunt handling."""
 from __future__ import absolute_import
 from __future__ import division
 from __future__ import unicode_literals
 
+from grr_response_core.lib import rdfvalue
 from grr_response_server import db
+from grr_response_server.databases import mysql_utils
+from grr_response_server.rdfvalues import flow_objects as rdf_flow_objects
+from grr_response_server.rdfvalues import hunt_objects as rdf_hunt_objects
+
+_ERROR = int(rdf_flow_objects.Flow.FlowState.ERROR)
+_FINISHED = int(rdf_flow_objects.Flow.FlowState.FINISHED)
+_RUNNING = int(rdf_flow_objects.Flow.FlowState.RUNNING)
+
+# WHERE conditions of hunt flows filters. They only use columns present in both
+# the flows and the hunt_flow_counts tables.
+_HUNT_FLOWS_CONDITIONS = {
+    db.HuntFlowsCondition.UNSET: "TRUE",
+    db.HuntFlowsCondition.FAILED_FLOWS_ONLY: "flow_state = %d" % _ERROR,
+    db.HuntFlowsCondition.SUCCEEDED_FLOWS_ONLY: "flow_state = %d" % _FINISHED,
+    db.HuntFlowsCondition.COMPLETED_FLOWS_ONLY:
+        "flow_state IN (%d, %d)" % (_ERROR, _FINISHED),
+    db.HuntFlowsCondition.FLOWS_IN_PROGRESS_ONLY: "flow_state = %d" % _RUNNING,
+    db.HuntFlowsCondition.CRASHED_FLOWS_ONLY: "crashed",
+    db.HuntFlowsCondition.FLOWS_WITH_RESULTS_ONLY: "has_results",
+}
+
+
+def _HuntFlowsCondition(filter_condition):
+  try:
+    return _HUNT_FLOWS_CONDITIONS[filter_condition]
+  except KeyError:
+    raise ValueError("Invalid filter condition: %d" % filter_condition)
 
 
 class MySQLDBHuntMixin(object):
-  """MySQLDB mixin for flow handling."""
+  """MySQLDB mixin for hunt handling."""
+
+  @mysql_utils.WithTransaction()
+  def WriteHuntObject(self, hunt_obj, cursor=None):
+    """Writes a hunt object to the database."""
+    query = ("INSERT INTO hunts (hunt_id, hunt, last_update, metadata, "
+             "create_time, creator, description) "
+             "VALUES (%s, %s, %s, %s, %s, %s, %s) "
+             "ON DUPLICATE KEY UPDATE "
+             "hunt=VALUES(hunt), last_update=VALUES(last_update), "
+             "metadata=VALUES(metadata), create_time=VALUES(create_time), "
+             "creator=VALUES(creator), description=VALUES(description)")
+    now_str = mysql_utils.RDFDatetimeToMysqlString(rdfvalue.RDFDatetime.Now())
+    metadata = rdf_hunt_objects.HuntMetadata.FromHunt(hunt_obj)
+    cursor.execute(query, [
+        hunt_obj.hunt_id,
+        hunt_obj.SerializeToString(), now_str,
+        metadata.SerializeToString(),
+        mysql_utils.RDFDatetimeToMysqlString(hunt_obj.create_time),
+        hunt_obj.creator, hunt_obj.description
+    ])
+
+  @mysql_utils.WithTransaction()
+  def UpdateHuntObject(self, hunt_id, update_fn, cursor=None):
+    """Updates the hunt object by applying the update function."""
+    query = "SELECT hunt, last_update FROM hunts WHERE hunt_id=%s FOR UPDATE"
+    cursor.execute(query, [hunt_id])
+    row = cursor.fetchone()
+    if row is None:
+      raise db.UnknownHuntError(hunt_id)
+
+    updated_hunt_obj = update_fn(self._HuntObjectFromRow(row))
+    if updated_hunt_obj is None:
+      raise ValueError("update_fn can't return None")
+
+    self.WriteHuntObject(updated_hunt_obj, cursor=cursor)
+    return updated_hunt_obj
 
-  def WriteHuntObject(self, hunt_obj):
-    raise NotImplementedError()
+  @mysql_utils.WithTransaction()
+  def DeleteHuntObject(self, hunt_id, cursor=None):
+    """Deletes a hunt object from the database."""
+    deleted = cursor.execute("DELETE FROM hunts WHERE hunt_id=%s", [hunt_id])
+    if deleted == 0:
+      raise db.UnknownHuntError(hunt_id)
 
-  def UpdateHuntObject(self, hunt_id, update_fn):
-    raise NotImplementedError()
+    cursor.execute("DELETE FROM hunt_result_counts WHERE hunt_id=%s", [hunt_id])
+    cursor.execute("DELETE FROM hunt_flow_counts WHERE hunt_id=%s", [hunt_id])
 
-  def DeleteHuntObject(self, hunt_id):
-    raise NotImplementedError()
+  def _HuntObjectFromRow(self, row):
+    """Generates a hunt object from a database row."""
+    hunt, last_update = row
 
-  def ReadHuntObject(self, hunt_id):
-    raise NotImplementedError()
+    hunt_obj = rdf_hunt_objects.Hunt.FromSerializedString(hunt)
+    hunt_obj.last_update_time = mysql_utils.MysqlToRDFDatetime(last_update)
+    return hunt_obj
 
-  def ReadAllHuntObjects(self):
-    raise NotImplementedError()
+  @mysql_utils.WithTransaction(readonly=True)
+  def ReadHuntObject(self, hunt_id, cursor=None):
+    """Reads a hunt object from the database."""
+    cursor.execute("SELECT hunt, last_update FROM hunts WHERE hunt_id=%s",
+                   [hunt_id])
+    row = cursor.fetchone()
+    if row is None:
+      raise db.UnknownHuntError(hunt_id)
 
-  def ReadHuntLogEntries(self, hunt_id, offset, count, with_substring=None):
-    raise NotImplementedError()
+    return self._HuntObjectFromRow(row)
 
-  def CountHuntLogEntries(self, hunt_id):
-    raise NotImplementedError()
+  @mysql_utils.WithTransaction(readonly=True)
+  def ReadAllHuntObjects(self, cursor=None):
+    """Reads all hunt objects from the database."""
+    cursor.execute("SELECT hunt, last_update FROM hunts")
+    return [self._HuntObjectFromRow(row) for row in cursor.fetchall()]
 
+  def _HuntObjectsConditions(self, with_creator, created_after,
+                             with_description_match):
+    """Returns a WHERE clause and its arguments for listing hunts."""
+    conditions = []
+    args = []
+
+    if with_creator is not None:
+      conditions.append("creator = %s")
+      args.append(with_creator)
+
+    if created_after is not None:
+      conditions.append("create_time > %s")
+      args.append(mysql_utils.RDFDatetimeToMysqlString(created_after))
+
+    if with_description_match is not None:
+      conditions.append("INSTR(description, %s) > 0")
+      args.append(with_description_match)
+
+    if not conditions:
+      return "", args
+    return "WHERE " + " AND ".join(conditions) + " ", args
+
+  @mysql_utils.WithTransaction(readonly=True)
+  def ListHuntObjects(self,
+                      offset,
+                      count,
+                      with_creator=None,
+                      created_after=None,
+                      with_description_match=None,
+                      cursor=None):
+    """Lists metadata of hunts matching given conditions."""
+    where, args = self._HuntObjectsConditions(with_creator, created_after,
+                                              with_description_match)
+    query = ("SELECT metadata, last_update FROM hunts " + where +
+             "ORDER BY create_time DESC, hunt_id DESC LIMIT %s OFFSET %s")
+    cursor.execute(query, args + [count, offset])
+
+    result = []
+    for metadata, last_update in cursor.fetchall():
+      hunt_metadata = rdf_hunt_objects.HuntMetadata.FromSerializedString(
+          metadata)
+      hunt_metadata.last_update_time = mysql_utils.MysqlToRDFDatetime(
+          last_update)
+      result.append(hunt_metadata)
+    return result
+
+  @mysql_utils.WithTransaction(readonly=True)
+  def CountHuntObjects(self,
+                       with_creator=None,
+                       created_after=None,
+                       with_description_match=None,
+                       cursor=None):
+    """Returns number of hunts matching given conditions."""
+    where, args = self._HuntObjectsConditions(with_creator, created_after,
+                                              with_description_match)
+    cursor.execute("SELECT COUNT(*) FROM hunts " + where, args)
+    count, = cursor.fetchone()
+    return count
+
+  @mysql_utils.WithTransaction(readonly=True)
+  def ReadHuntLogEntries(self,
+                         hunt_id,
+                         offset,
+                         count,
+                         with_substring=None,
+                         cursor=None):
+    """Reads hunt log entries of a given hunt using given query options."""
+    query = ("SELECT client_id, flow_id, hunt_id, timestamp, message "
+             "FROM flow_log_entries WHERE hunt_id = %s ")
+    args = [hunt_id]
+
+    if with_substring is not None:
+      query += "AND INSTR(message, %s) > 0 "
+      args.append(with_substring)
+
+    query += "ORDER BY timestamp, log_id LIMIT %s OFFSET %s"
+    cursor.execute(query, args + [count, offset])
+    return [self._FlowLogEntryFromRow(row) for row in cursor.fetchall()]
+
+  @mysql_utils.WithTransaction(readonly=True)
+  def CountHuntLogEntries(self, hunt_id, cursor=None):
+    """Returns number of hunt log entries of a given hunt."""
+    cursor.execute("SELECT COUNT(*) FROM flow_log_entries WHERE hunt_id = %s",
+                   [hunt_id])
+    count, = cursor.fetchone()
+    return count
+
+  @mysql_utils.WithTransaction(readonly=True)
   def ReadHuntResults(self,
                       hunt_id,
                       offset,
                       count,
                       with_tag=None,
                       with_type=None,
-                      with_substring=None):
-    raise NotImplementedError()
+                      with_substring=None,
+                      with_timestamp=None,
+                      cursor=None):
+    """Reads hunt results of a given hunt using given query options."""
+    conditions, args = self._FlowResultsConditions(
+        with_tag=with_tag, with_type=with_type, with_substring=with_substring)
+    conditions = ["hunt_id = %s"] + conditions
+    args = [hunt_id] + args
 
-  def CountHuntResults(self, hunt_id, with_tag=None, with_type=None):
-    raise NotImplementedError()
+    if with_timestamp is not None:
+      conditions.append("timestamp = %s")
+      args.append(mysql_utils.RDFDatetimeToMysqlString(with_timestamp))
 
-  def CountHuntResultsByType(self, hunt_id):
-    raise NotImplementedError()
+    query = ("SELECT " + self.FLOW_RESULT_DB_FIELDS + "FROM flow_results "
+             "WHERE " + " AND ".join(conditions) + " "
+             "ORDER BY timestamp, result_id LIMIT %s OFFSET %s")
+    cursor.execute(query, args + [count, offset])
+    return [self._FlowResultFromRow(row) for row in cursor.fetchall()]
 
+  @mysql_utils.WithTransaction(readonly=True)
+  def CountHuntResults(self,
+                       hunt_id,
+                       with_tag=None,
+                       with_type=None,
+                       cursor=None):
+    """Counts hunt results of a given hunt using given query options."""
+    query = ("SELECT COALESCE(SUM(num_results), 0) FROM hunt_result_counts "
+             "WHERE hunt_id = %s")
+    args = [hunt_id]
+
+    if with_tag is not None:
+      query += " AND tag_hash = %s"
+      args.append(mysql_utils.Hash(with_tag))
+
+    if with_type is not None:
+      query += " AND type = %s"
+      args.append(with_type)
+
+    cursor.execute(query, args)
+    count, = cursor.fetchone()
+    return int(count)
+
+  @mysql_utils.WithTransaction(readonly=True)
+  def CountHuntResultsByType(self, hunt_id, cursor=None):
+    """Counts number of hunts results per type."""
+    query = ("SELECT type, SUM(num_results) FROM hunt_result_counts "
+             "WHERE hunt_id = %s GROUP BY type")
+    cursor.execute(query, [hunt_id])
+    return {
+        type_name: int(count)
+        for type_name, count in cursor.fetchall()
+        if count
+    }
+
+  @mysql_utils.WithTransaction(readonly=True)
   def ReadHuntFlows(self,
                     hunt_id,
                     offset,
                     count,
-                    filter_condition=db.HuntFlowsCondition.UNSET):
-    raise NotImplementedError()
+                    filter_condition=db.HuntFlowsCondition.UNSET,
+                    cursor=None):
+    """Reads hunt flows matching given conditions."""
+    query = ("SELECT " + self.FLOW_DB_FIELDS + "FROM flows "
+             "WHERE parent_hunt_id = %s AND " +
+             _HuntFlowsCondition(filter_condition) + " "
+             "ORDER BY last_update LIMIT %s OFFSET %s")
+    cursor.execute(query, [hunt_id, count, offset])
+    return [self._FlowObjectFromRow(row) for row in cursor.fetchall()]
 
+  @mysql_utils.WithTransaction(readonly=True)
   def CountHuntFlows(self,
                      hunt_id,
-                     filter_condition=db.HuntFlowsCondition.UNSET):
-    raise NotImplementedError()
+                     filter_condition=db.HuntFlowsCondition.UNSET,
+                     cursor=None):
+    """Counts hunt flows matching given conditions."""
+    query = ("SELECT COALESCE(SUM(num_flows), 0) FROM hunt_flow_counts "
+             "WHERE hunt_id = %s AND " + _HuntFlowsCondition(filter_condition))
+    cursor.execute(query, [hunt_id])
+    count, = cursor.fetchone()
+    return int(count)
+
+  @mysql_utils.WithTransaction(readonly=True)
+  def ReadClientIdsWithHuntFlows(self, hunt_id, client_ids, cursor=None):
+    """Checks which of given clients have the flow of a given hunt."""
+    client_ids = list(client_ids)
+    if not client_ids:
+      return set()
+
+    # Flows started by a hunt have the hunt's id as their flow id, so the
+    # lookup only touches the flows table's primary key.
+    query = ("SELECT client_id FROM flows "
+             "WHERE client_id IN ({}) AND flow_id = %s "
+             "AND parent_hunt_id = %s").format(", ".join(["%s"] *
+                                                         len(client_ids)))
+    args = [mysql_utils.ClientIDToInt(client_id) for client_id in client_ids]
+    args.extend([mysql_utils.FlowIDToInt(hunt_id), hunt_id])
+    cursor.execute(query, args)
+    return set(
+        mysql_utils.IntToClientID(client_id)
+        for client_id, in cursor.fetchall())
@@ -1,51 +1,614 @@
 #!/usr/bin/env python
 """The MySQL database methods for path handling."""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import unicode_literals
+
+import collections
+import itertools
+
+from future.utils import iteritems
+from future.utils import iterkeys
+
+import MySQLdb
+from MySQLdb.constants import ER as mysql_error_constants
+
+from grr_response_core.lib import rdfvalue
+from grr_response_core.lib.rdfvalues import client_fs as rdf_client_fs
+from grr_response_core.lib.rdfvalues import crypto as rdf_crypto
+from grr_response_server import db
+from grr_response_server.databases import mysql_utils
+from grr_response_server.rdfvalues import objects as rdf_objects
+
+# Columns of `client_paths` rows followed by the stat and hash entries that
+# are current for them. Depending on the requested point in time, the entries
+# are either the latest ones (pointed to by the `last_*_timestamp` columns) or
+# the latest ones that are not newer than the given timestamp.
+_PATH_INFO_COLUMNS = """
+SELECT p.path, p.directory, p.timestamp,
+       s.timestamp, s.stat_entry, h.timestamp, h.hash_entry
+  FROM client_paths AS p
+"""
+
+_LATEST_ENTRIES_JOINS = """
+  LEFT JOIN client_path_stat_entries AS s
+         ON s.client_id = p.client_id AND s.path_type = p.path_type
+        AND s.path_id = p.path_id
+        AND s.timestamp = p.last_stat_entry_timestamp
+  LEFT JOIN client_path_hash_entries AS h
+         ON h.client_id = p.client_id AND h.path_type = p.path_type
+        AND h.path_id = p.path_id
+        AND h.timestamp = p.last_hash_entry_timestamp
+"""
+
+_TIMESTAMPED_ENTRIES_JOINS = """
+  LEFT JOIN client_path_stat_entries AS s
+         ON s.client_id = p.client_id AND s.path_type = p.path_type
+        AND s.path_id = p.path_id
+        AND s.timestamp = (SELECT MAX(timestamp)
+                             FROM client_path_stat_entries
+                            WHERE client_id = p.client_id
+                              AND path_type = p.path_type
+                              AND path_id = p.path_id
+                              AND timestamp <= %s)
+  LEFT JOIN client_path_hash_entries AS h
+         ON h.client_id = p.client_id AND h.path_type = p.path_type
+        AND h.path_id = p.path_id
+        AND h.timestamp = (SELECT MAX(timestamp)
+                             FROM client_path_hash_entries
+                            WHERE client_id = p.client_id
+                              AND path_type = p.path_type
+                              AND path_id = p.path_id
+                              AND timestamp <= %s)
+"""
+
+
+def _PathInfosQuery(timestamp):
+  """Returns a query prefix and arguments for reading path info rows.
+
+  Args:
+    timestamp: A point in time for which the stat and hash entries should be
+      retrieved or `None` for the latest ones.
+
+  Returns:
+    A tuple with a query string (to be followed by a WHERE clause) and a list
+    of arguments for it.
+  """
+  if timestamp is None:
+    return _PATH_INFO_COLUMNS + _LATEST_ENTRIES_JOINS, []
+
+  timestamp_str = mysql_utils.RDFDatetimeToMysqlString(timestamp)
+  return _PATH_INFO_COLUMNS + _TIMESTAMPED_ENTRIES_JOINS, [
+      timestamp_str, timestamp_str
+  ]
+
+
+def _PathInfoFromRow(path_type, row, timestamp=None):
+  """Builds a path info from a row returned by a `_PathInfosQuery` query."""
+  (path, directory, path_timestamp, stat_entry_timestamp, stat_entry_bytes,
+   hash_entry_timestamp, hash_entry_bytes) = row
+
+  stat_entry_timestamp = mysql_utils.MysqlToRDFDatetime(stat_entry_timestamp)
+  hash_entry_timestamp = mysql_utils.MysqlToRDFDatetime(hash_entry_timestamp)
+
+  if timestamp is None:
+    path_timestamp = mysql_utils.MysqlToRDFDatetime(path_timestamp)
+  else:
+    # Only the latest write time is stored for a path, so for a point in the
+    # past the time of the newest entry known at that point is reported.
+    entry_timestamps = [
+        entry_timestamp
+        for entry_timestamp in [stat_entry_timestamp, hash_entry_timestamp]
+        if entry_timestamp is not None
+    ]
+    path_timestamp = max(entry_timestamps) if entry_timestamps else None
+
+  result = rdf_objects.PathInfo(
+      path_type=path_type,
+      components=mysql_utils.PathToComponents(path),
+      directory=bool(directory),
+      timestamp=path_timestamp,
+      last_stat_entry_timestamp=stat_entry_timestamp,
+      last_hash_entry_timestamp=hash_entry_timestamp)
+
+  if stat_entry_bytes is not None:
+    result.stat_entry = rdf_client_fs.StatEntry.FromSerializedString(
+        stat_entry_bytes)
+  if hash_entry_bytes is not None:
+    result.hash_entry = rdf_crypto.Hash.FromSerializedString(hash_entry_bytes)
+
+  return result
+
+
+def _ClientPathKeysCondition(keys, table=None):
+  """Returns a WHERE condition and arguments matching given path keys.
+
+  Args:
+    keys: A non-empty list of (integer client id, path type, path id bytes)
+      tuples.
+    table: An optional table name or alias to qualify the columns with.
+
+  Returns:
+    A tuple with a condition string and a list of arguments for it.
+  """
+  columns = ["client_id", "path_type", "path_id"]
+  if table is not None:
+    columns = ["{}.{}".format(table, column) for column in columns]
+
+  condition = "({}) IN ({})".format(
+      ", ".join(columns), mysql_utils.Placeholders(3, len(keys)))
+  return condition, list(itertools.chain.from_iterable(keys))
+
+
+def _ClientPathKey(client_id, path_type, components):
+  return (mysql_utils.ClientIDToInt(client_id), int(path_type),
+          rdf_objects.PathID.FromComponents(components).AsBytes())
 
 
 class MySQLDBPathMixin(object):
   """MySQLDB mixin for path related functions."""
 
-  def ReadPathInfo(self, client_id, path_type, components, timestamp=None):
+  @mysql_utils.WithTransaction(readonly=True)
+  def ReadPathInfo(self,
+                   client_id,
+                   path_type,
+                   components,
+                   timestamp=None,
+                   cursor=None):
     """Retrieves a path info record for a given path."""
-    raise NotImplementedError()
+    query, args = _PathInfosQuery(timestamp)
+    query += """
+     WHERE p.client_id = %s AND p.path_type = %s AND p.path_id = %s
+    """
+    args.extend(_ClientPathKey(client_id, path_type, components))
+
+    cursor.execute(query, args)
+    row = cursor.fetchone()
+    if row is None:
+      raise db.UnknownPathError(
+          client_id=client_id, path_type=path_type, components=components)
+
+    return _PathInfoFromRow(path_type, row, timestamp=timestamp)
 
-  def ReadPathInfos(self, client_id, path_type, components_list):
+  @mysql_utils.WithTransaction(readonly=True)
+  def ReadPathInfos(self, client_id, path_type, components_list, cursor=None):
     """Retrieves path info records for given paths."""
-    raise NotImplementedError()
+    result = {components: None for components in components_list}
+    if not result:
+      return result
+
+    path_ids = [
+        rdf_objects.PathID.FromComponents(components).AsBytes()
+        for components in components_list
+    ]
+
+    query, args = _PathInfosQuery(None)
+    query += """
+     WHERE p.client_id = %s AND p.path_type = %s AND p.path_id IN ({})
+    """.format(", ".join(["%s"] * len(path_ids)))
+    args.extend([mysql_utils.ClientIDToInt(client_id), int(path_type)])
+    args.extend(path_ids)
 
-  def WritePathInfos(self, client_id, path_infos):
+    cursor.execute(query, args)
+    for row in cursor.fetchall():
+      path_info = _PathInfoFromRow(path_type, row)
+      result[tuple(path_info.components)] = path_info
+
+    return result
+
+  @mysql_utils.WithTransaction()
+  def WritePathInfos(self, client_id, path_infos, cursor=None):
     """Writes a collection of path_info records for a client."""
-    raise NotImplementedError()
+    try:
+      self._MultiWritePathInfos({client_id: path_infos}, cursor)
+    except MySQLdb.IntegrityError as error:
+      raise db.UnknownClientError(client_id=client_id, cause=error)
 
-  def MultiWritePathInfos(self, path_infos):
+  @mysql_utils.WithTransaction()
+  def MultiWritePathInfos(self, path_infos, cursor=None):
     """Writes a collection of path info records for specified clients."""
-    raise NotImplementedError()
+    try:
+      self._MultiWritePathInfos(path_infos, cursor)
+    except MySQLdb.IntegrityError as error:
+      client_ids = list(iterkeys(path_infos))
+      raise db.AtLeastOneUnknownClientError(client_ids=client_ids, cause=error)
+
+  def _MultiWritePathInfos(self, path_infos, cursor):
+    """Writes path infos of many clients with multi-row upserts."""
+    now = mysql_utils.RDFDatetimeToMysqlString(rdfvalue.RDFDatetime.Now())
+
+    # Paths (together with all their ancestors) are deduplicated, so that every
+    # row is upserted once. A path is a directory if any of the writes says so.
+    path_rows = collections.OrderedDict()
+    stat_entry_rows = []
+    hash_entry_rows = []
+
+    def AddPathRow(int_client_id, path_info, directory, explicit=False):
+      path_id = path_info.GetPathID().AsBytes()
+      key = (int_client_id, int(path_info.path_type), path_id)
+
+      row = path_rows.get(key)
+      if row is None:
+        path_rows[key] = row = {
+            "path": mysql_utils.ComponentsToPath(path_info.components),
+            "depth": len(path_info.components),
+            "directory": directory,
+            "stat_entry_timestamp": None,
+            "hash_entry_timestamp": None,
+        }
+      else:
+        row["directory"] |= directory
+
+      if explicit and path_info.HasField("stat_entry"):
+        row["stat_entry_timestamp"] = now
+        stat_entry_rows.append(
+            key + (now, path_info.stat_entry.SerializeToString()))
+
+      if explicit and path_info.HasField("hash_entry"):
+        hash_entry = path_info.hash_entry
+        if hash_entry.HasField("sha256"):
+          sha256 = hash_entry.sha256.AsBytes()
+        else:
+          sha256 = None
+
+        row["hash_entry_timestamp"] = now
+        hash_entry_rows.append(
+            key + (now, hash_entry.SerializeToString(), sha256))
+
+    for client_id, client_path_infos in iteritems(path_infos):
+      int_client_id = mysql_utils.ClientIDToInt(client_id)
+      for path_info in client_path_infos:
+        AddPathRow(
+            int_client_id, path_info, path_info.directory, explicit=True)
+        for ancestor_path_info in path_info.GetAncestors():
+          AddPathRow(int_client_id, ancestor_path_info, True)
+
+    if not path_rows:
+      return
+
+    args = []
+    for key, row in iteritems(path_rows):
+      args.extend(key)
+      args.extend([
+          row["path"], row["directory"], row["depth"], now,
+          row["stat_entry_timestamp"], row["hash_entry_timestamp"]
+      ])
+
+    query = """
+    INSERT INTO client_paths(client_id, path_type, path_id, path, directory,
+                             depth, timestamp, last_stat_entry_timestamp,
+                             last_hash_entry_timestamp)
+    VALUES {}
+    ON DUPLICATE KEY UPDATE
+      directory = VALUES(directory),
+      timestamp = VALUES(timestamp),
+      last_stat_entry_timestamp = COALESCE(VALUES(last_stat_entry_timestamp),
+                                           last_stat_entry_timestamp),
+      last_hash_entry_timestamp = COALESCE(VALUES(last_hash_entry_timestamp),
+                                           last_hash_entry_timestamp)
+    """.format(mysql_utils.Placeholders(9, len(path_rows)))
+    cursor.execute(query, args)
+
+    if stat_entry_rows:
+      query = """
+      INSERT INTO client_path_stat_entries(client_id, path_type, path_id,
+                                           timestamp, stat_entry)
+      VALUES {}
+      ON DUPLICATE KEY UPDATE stat_entry = VALUES(stat_entry)
+      """.format(mysql_utils.Placeholders(5, len(stat_entry_rows)))
+      cursor.execute(query,
+                     list(itertools.chain.from_iterable(stat_entry_rows)))
+
+    if hash_entry_rows:
+      query = """
+      INSERT INTO client_path_hash_entries(client_id, path_type, path_id,
+                                           timestamp, hash_entry, sha256)
+      VALUES {}
+      ON DUPLICATE KEY UPDATE
+        hash_entry = VALUES(hash_entry),
+        sha256 = VALUES(sha256)
+      """.format(mysql_utils.Placeholders(6, len(hash_entry_rows)))
+      cursor.execute(query,
+                     list(itertools.chain.from_iterable(hash_entry_rows)))
 
   def ClearPathHistory(self, client_id, path_infos):
     """Clears path history for specified paths of given client."""
-    raise NotImplementedError()
+    self.MultiClearPathHistory({client_id: path_infos})
 
-  def MultiClearPathHistory(self, path_infos):
+  @mysql_utils.WithTransaction()
+  def MultiClearPathHistory(self, path_infos, cursor=None):
     """Clears path history for specified paths of given clients."""
-    raise NotImplementedError()
+    keys = []
+    for client_id, client_path_infos in iteritems(path_infos):
+      for path_info in client_path_infos:
+        keys.append(
+            _ClientPathKey(client_id, path_info.path_type,
+                           path_info.components))
 
+    if not keys:
+      return
+
+    condition, args = _ClientPathKeysCondition(keys)
+    cursor.execute(
+        "DELETE FROM client_path_stat_entries WHERE {}".format(condition),
+        args)
+    cursor.execute(
+        "DELETE FROM client_path_hash_entries WHERE {}".format(condition),
+        args)
+    cursor.execute(
+        """
+        UPDATE client_paths
+           SET last_stat_entry_timestamp = NULL,
+               last_hash_entry_timestamp = NULL
+         WHERE {}
+        """.format(condition), args)
+
+  @mysql_utils.WithTransaction(readonly=True)
   def ListDescendentPathInfos(self,
                               client_id,
                               path_type,
                               components,
-                              max_depth=None):
+                              timestamp=None,
+                              max_depth=None,
+                              cursor=None):
     """Lists path info records that correspond to descendants of given path."""
-    raise NotImplementedError()
+    path = mysql_utils.ComponentsToPath(components)
+    depth = len(components)
+
+    # All descendants of a path have it (followed by a separator) as a prefix.
+    # The `path` column uses a binary collation, so the prefix corresponds to a
+    # range that ends right before the separator's successor. Together with the
+    # depth bounds this is a range scan over the depth-prefix index.
+    query, args = _PathInfosQuery(timestamp)
+    query += """
+     WHERE p.client_id = %s AND p.path_type = %s
+       AND p.path >= %s AND p.path < %s
+    """
+    args.extend([
+        mysql_utils.ClientIDToInt(client_id),
+        int(path_type),
+        path + "/",
+        path + "0",
+    ])
+
+    if max_depth is None:
+      query += " AND p.depth > %s"
+      args.append(depth)
+    else:
+      query += " AND p.depth BETWEEN %s AND %s"
+      args.extend([depth + 1, depth + max_depth])
+
+    cursor.execute(query, args)
+    results = [
+        _PathInfoFromRow(path_type, row, timestamp=timestamp)
+        for row in cursor.fetchall()
+    ]
+
+    # Implicit path infos are filtered out if a specific timestamp is given:
+    # only paths with a stat or hash entry at that time are listed, together
+    # with their ancestors.
+    if timestamp is not None:
+      listed = set()
+      for path_info in results:
+        if not (path_info.HasField("stat_entry") or
+                path_info.HasField("hash_entry")):
+          continue
+
+        explicit_components = tuple(path_info.components)
+        for i in range(depth + 1, len(explicit_components) + 1):
+          listed.add(explicit_components[:i])
+
+      results = [
+          path_info for path_info in results
+          if tuple(path_info.components) in listed
+      ]
+
+    results.sort(key=lambda path_info: tuple(path_info.components))
+    return results
+
+  @mysql_utils.WithTransaction()
+  def MultiWritePathHistory(self, client_path_histories, cursor=None):
+    """Writes a collection of hash and stat entries observed for given paths."""
+    stat_entry_rows = []
+    hash_entry_rows = []
+    path_updates = []
+
+    for client_path, client_path_history in iteritems(client_path_histories):
+      key = _ClientPathKey(client_path.client_id, client_path.path_type,
+                           client_path.components)
+
+      stat_entry_timestamps = []
+      for timestamp, stat_entry in iteritems(client_path_history.stat_entries):
+        timestamp_str = mysql_utils.RDFDatetimeToMysqlString(timestamp)
+        stat_entry_timestamps.append(timestamp)
+        stat_entry_rows.append(
+            key + (timestamp_str, stat_entry.SerializeToString()))
+
+      hash_entry_timestamps = []
+      for timestamp, hash_entry in iteritems(client_path_history.hash_entries):
+        timestamp_str = mysql_utils.RDFDatetimeToMysqlString(timestamp)
+        if hash_entry.HasField("sha256"):
+          sha256 = hash_entry.sha256.AsBytes()
+        else:
+          sha256 = None
+
+        hash_entry_timestamps.append(timestamp)
+        hash_entry_rows.append(
+            key + (timestamp_str, hash_entry.SerializeToString(), sha256))
+
+      if stat_entry_timestamps or hash_entry_timestamps:
+        last_stat_entry_timestamp = mysql_utils.RDFDatetimeToMysqlString(
+            max(stat_entry_timestamps or [None]))
+        last_hash_entry_timestamp = mysql_utils.RDFDatetimeToMysqlString(
+            max(hash_entry_timestamps or [None]))
+        last_timestamp = mysql_utils.RDFDatetimeToMysqlString(
+            max(stat_entry_timestamps + hash_entry_timestamps))
+        path_updates.append((last_stat_entry_timestamp,
+                             last_hash_entry_timestamp, last_timestamp) + key)
 
-  def MultiWritePathHistory(self, client_path_histories):
-    raise NotImplementedError()
+    client_path_ids = list(iterkeys(client_path_histories))
 
-  def ReadPathInfosHistories(self, client_id, path_type, components_list):
+    try:
+      if stat_entry_rows:
+        query = """
+        INSERT INTO client_path_stat_entries(client_id, path_type, path_id,
+                                             timestamp, stat_entry)
+        VALUES {}
+        """.format(mysql_utils.Placeholders(5, len(stat_entry_rows)))
+        cursor.execute(query,
+                       list(itertools.chain.from_iterable(stat_entry_rows)))
+
+      if hash_entry_rows:
+        query = """
+        INSERT INTO client_path_hash_entries(client_id, path_type, path_id,
+                                             timestamp, hash_entry, sha256)
+        VALUES {}
+        """.format(mysql_utils.Placeholders(6, len(hash_entry_rows)))
+        cursor.execute(query,
+                       list(itertools.chain.from_iterable(hash_entry_rows)))
+    except MySQLdb.IntegrityError as error:
+      if error.args[0] == mysql_error_constants.DUP_ENTRY:
+        raise db.Error("Duplicated history entry write", cause=error)
+      raise db.AtLeastOneUnknownPathError(client_path_ids, cause=error)
+
+    # `GREATEST` yields `NULL` if any of its arguments is `NULL`, hence the
+    # `COALESCE` calls for paths that had no entries so far or get no new ones.
+    query = """
+    UPDATE client_paths
+       SET last_stat_entry_timestamp = GREATEST(
+             COALESCE(last_stat_entry_timestamp, %(stat)s),
+             COALESCE(%(stat)s, last_stat_entry_timestamp)),
+           last_hash_entry_timestamp = GREATEST(
+             COALESCE(last_hash_entry_timestamp, %(hash)s),
+             COALESCE(%(hash)s, last_hash_entry_timestamp)),
+           timestamp = GREATEST(timestamp, %(timestamp)s)
+     WHERE client_id = %(client_id)s AND path_type = %(path_type)s
+       AND path_id = %(path_id)s
+    """
+    for (stat, hash_, timestamp, client_id, path_type,
+         path_id) in path_updates:
+      cursor.execute(
+          query, {
+              "stat": stat,
+              "hash": hash_,
+              "timestamp": timestamp,
+              "client_id": client_id,
+              "path_type": path_type,
+              "path_id": path_id,
+          })
+
+  @mysql_utils.WithTransaction(readonly=True)
+  def ReadPathInfosHistories(self,
+                             client_id,
+                             path_type,
+                             components_list,
+                             cursor=None):
     """Reads a collection of hash and stat entries for given paths."""
-    raise NotImplementedError()
+    results = {components: [] for components in components_list}
+    if not results:
+      return results
+
+    components_by_path_id = {
+        rdf_objects.PathID.FromComponents(components).AsBytes(): components
+        for components in components_list
+    }
+
+    args = [mysql_utils.ClientIDToInt(client_id), int(path_type)]
+    args.extend(components_by_path_id)
+    condition = """
+     WHERE client_id = %s AND path_type = %s AND path_id IN ({})
+    """.format(", ".join(["%s"] * len(components_by_path_id)))
+
+    path_infos_by_key = {}
+
+    def GetPathInfo(path_id, timestamp):
+      """Returns a history path info of a given path at a given time."""
+      key = (path_id, timestamp)
+      path_info = path_infos_by_key.get(key)
+      if path_info is None:
+        path_info = rdf_objects.PathInfo(
+            path_type=path_type,
+            components=components_by_path_id[path_id],
+            timestamp=mysql_utils.MysqlToRDFDatetime(timestamp))
+        path_infos_by_key[key] = path_info
+      return path_info
+
+    cursor.execute(
+        "SELECT path_id, timestamp, stat_entry "
+        "FROM client_path_stat_entries" + condition, args)
+    for path_id, timestamp, stat_entry_bytes in cursor.fetchall():
+      path_info = GetPathInfo(path_id, timestamp)
+      path_info.stat_entry = rdf_client_fs.StatEntry.FromSerializedString(
+          stat_entry_bytes)
+
+    cursor.execute(
+        "SELECT path_id, timestamp, hash_entry "
+        "FROM client_path_hash_entries" + condition, args)
+    for path_id, timestamp, hash_entry_bytes in cursor.fetchall():
+      path_info = GetPathInfo(path_id, timestamp)
+      path_info.hash_entry = rdf_crypto.Hash.FromSerializedString(
+          hash_entry_bytes)
+
+    for path_id, timestamp in sorted(iterkeys(path_infos_by_key)):
+      components = components_by_path_id[path_id]
+      results[components].append(path_infos_by_key[(path_id, timestamp)])
 
+    return results
+
+  @mysql_utils.WithTransaction(readonly=True)
   def ReadLatestPathInfosWithHashBlobReferences(self,
                                                 client_paths,
-                                                max_timestamp=None):
+                                                max_timestamp=None,
+                                                cursor=None):
     """Returns PathInfos that have corresponding HashBlobReferences."""
-    raise NotImplementedError()
+    results = {client_path: None for client_path in client_paths}
+    if not results:
+      return results
+
+    client_paths_by_key = {}
+    for client_path in results:
+      key = _ClientPathKey(client_path.client_id, client_path.path_type,
+                           client_path.components)
+      client_paths_by_key[key] = client_path
+
+    condition, args = _ClientPathKeysCondition(
+        list(client_paths_by_key), table="h")
+
+    # Hash entries without blob references are dropped by the inner join, so
+    # the newest remaining entry of every path is the one to be returned.
+    query = """
+    SELECT h.client_id, h.path_type, h.path_id, h.timestamp, h.hash_entry,
+           s.stat_entry
+      FROM client_path_hash_entries AS h
+      JOIN hash_blob_references AS b ON b.hash_id = h.sha256
+      LEFT JOIN client_path_stat_entries AS s
+             ON s.client_id = h.client_id AND s.path_type = h.path_type
+            AND s.path_id = h.path_id AND s.timestamp = h.timestamp
+     WHERE {}
+    """.format(condition)
+
+    if max_timestamp is not None:
+      query += " AND h.timestamp <= %s"
+      args.append(mysql_utils.RDFDatetimeToMysqlString(max_timestamp))
+
+    query += " ORDER BY h.timestamp DESC"
+
+    cursor.execute(query, args)
+    for (client_id, path_type, path_id, timestamp, hash_entry_bytes,
+         stat_entry_bytes) in cursor.fetchall():
+      client_path = client_paths_by_key[(client_id, path_type, path_id)]
+      if results[client_path] is not None:
+        continue
+
+      path_info = rdf_objects.PathInfo(
+          path_type=client_path.path_type,
+          components=client_path.components,
+          timestamp=mysql_utils.MysqlToRDFDatetime(timestamp),
+          hash_entry=rdf_crypto.Hash.FromSerializedString(hash_entry_bytes))
+      if stat_entry_bytes is not None:
+        path_info.stat_entry = rdf_client_fs.StatEntry.FromSerializedString(
+            stat_entry_bytes)
+
+      results[client_path] = path_info
+
+    return results
@@ -6,9 +6,18 @@ from __future__ import unicode_literals
 
 import logging
 import threading
+import time
 
 import MySQLdb
 
+from grr_response_core.stats import stats_collector_instance
+
+_WAIT_TIME_METRIC = "mysql_pool_wait_time"
+_CHECKOUT_LATENCY_METRIC = "mysql_pool_checkout_latency"
+_IN_USE_METRIC = "mysql_pool_connections_in_use"
+_CREATED_METRIC = "mysql_pool_connections_created"
+_CLOSED_METRIC = "mysql_pool_connections_closed"
+
 
 class Error(Exception):
   pass
@@ -28,22 +37,50 @@ class Pool(object):
   Intends to be thread safe in that multiple connections can be requested and
   used by multiple threads without synchronization, but operations on each
   connection (and its associated cursors) are assumed to be serial.
+
+  Idle connections are reused most recently returned first, so that the least
+  used ones run into the idle timeout and get closed.
   """
 
-  def __init__(self, connect_func, max_size=10):
+  def __init__(self,
+               connect_func,
+               max_size=10,
+               idle_timeout=None,
+               max_lifetime=None,
+               check_after_idle=None,
+               name="default"):
     """Creates a ConnectionPool.
 
     Args:
      connect_func: A closure which returns a new connection to the underlying
        database, i.e. a MySQLdb.Connection. Should raise or block if the
-       database is unavailable.
+       database is unavailable. Any per-session setup belongs here, as it runs
+       exactly once per connection.
      max_size: The maximum number of simultaneous connections.
+     idle_timeout: If set, connections idle for longer than this many seconds
+       are closed instead of being reused.
+     max_lifetime: If set, connections older than this many seconds are closed
+       instead of being reused.
+     check_after_idle: If set, connections idle for longer than this many
+       seconds are pinged before being handed out, and replaced if they turn
+       out to be dead.
+     name: The name of the pool, used as the field value of pool metrics.
     """
     self.connect_func = connect_func
     self.limiter = threading.BoundedSemaphore(max_size)
-    self.idle_conns = []  # Atomic access only!!
+    self.idle_timeout = idle_timeout
+    self.max_lifetime = max_lifetime
+    self.check_after_idle = check_after_idle
+    self.name = name
+
+    self.lock = threading.Lock()
+    self.idle_conns = []  # Guarded by lock.
+    self.in_use = 0  # Guarded by lock.
     self.closed = False
 
+    stats_collector_instance.Get().SetGaugeCallback(
+        _IN_USE_METRIC, lambda: self.in_use, fields=[self.name])
+
   def get(self, blocking=True):
     """Gets a connection.
 
@@ -61,29 +98,139 @@ class Pool(object):
     if self.closed:
       raise PoolAlreadyClosedError("Connection pool is already closed.")
 
+    start_time = time.time()
     # NOTE: Once we acquire capacity from the semaphore, it is essential that we
     # return it eventually. On success, this responsibility is delegated to
     # _ConnectionProxy.
     if not self.limiter.acquire(blocking=blocking):
       return None
-    c = None
-    # pop is atomic, but if we did a check first, it would not be atomic with
-    # the pop.
+    checkout_time = time.time()
+    stats_collector_instance.Get().RecordEvent(
+        _WAIT_TIME_METRIC, checkout_time - start_time, fields=[self.name])
+
     try:
-      c = self.idle_conns.pop()
-    except IndexError:
-      # Create a connection, release the pool allocation if it fails.
-      try:
-        c = self.connect_func()
-      except Exception:
-        self.limiter.release()
-        raise
-    return _ConnectionProxy(self, c)
+      pooled = self._CheckOut()
+    except Exception:
+      self.limiter.release()
+      raise
+
+    with self.lock:
+      self.in_use += 1
+    stats_collector_instance.Get().RecordEvent(
+        _CHECKOUT_LATENCY_METRIC,
+        time.time() - checkout_time,
+        fields=[self.name])
+    return _ConnectionProxy(self, pooled)
+
+  def _CheckOut(self):
+    """Returns a live idle connection or a new one if there is none."""
+    while True:
+      pooled = self._PopIdle()
+      if pooled is None:
+        break
+      if self._IsAlive(pooled):
+        pooled.idle_since = None
+        return pooled
+
+    con = self.connect_func()
+    stats_collector_instance.Get().IncrementCounter(
+        _CREATED_METRIC, fields=[self.name])
+    return _PooledConnection(con)
+
+  def _PopIdle(self):
+    """Evicts expired idle connections and pops the most recently used one."""
+    now = time.time()
+    expired = []
+    with self.lock:
+      idle_conns = []
+      for pooled in self.idle_conns:
+        reason = self._ExpiryReason(pooled, now)
+        if reason:
+          expired.append((pooled, reason))
+        else:
+          idle_conns.append(pooled)
+      self.idle_conns = idle_conns
+
+      pooled = self.idle_conns.pop() if self.idle_conns else None
+
+    for expired_pooled, reason in expired:
+      self._Close(expired_pooled, reason)
+    return pooled
+
+  def _ExpiryReason(self, pooled, now):
+    """Returns why a connection must not be reused anymore, if it must not."""
+    if (self.max_lifetime is not None and
+        now - pooled.create_time > self.max_lifetime):
+      return "max_lifetime"
+    if (self.idle_timeout is not None and pooled.idle_since is not None and
+        now - pooled.idle_since > self.idle_timeout):
+      return "idle_timeout"
+    return None
+
+  def _IsAlive(self, pooled):
+    """Pings a connection that has been idle for long, closing it if dead."""
+    if (self.check_after_idle is None or
+        time.time() - pooled.idle_since <= self.check_after_idle):
+      return True
+
+    try:
+      pooled.con.ping()
+      return True
+    except MySQLdb.Error as e:
+      logging.info("Dropping dead connection from the pool: %s", e)
+      self._Close(pooled, "failed_check")
+      return False
+
+  def _Close(self, pooled, reason):
+    try:
+      pooled.con.close()
+    except MySQLdb.Error as e:
+      logging.info("Closing connection failed: %s", e)
+    stats_collector_instance.Get().IncrementCounter(
+        _CLOSED_METRIC, fields=[self.name, reason])
+
+  def _Return(self, pooled, errored):
+    """Puts a connection back to the idle list, or closes it."""
+    try:
+      if errored:
+        self._Close(pooled, "error")
+      elif self.closed:
+        self._Close(pooled, "pool_closed")
+      elif self._ExpiryReason(pooled, time.time()) == "max_lifetime":
+        self._Close(pooled, "max_lifetime")
+      else:
+        try:
+          pooled.con.rollback()
+        except Exception:
+          # rollback raised and the connection didn't make it into the idle
+          # list, so close it.
+          self._Close(pooled, "error")
+          raise
+        pooled.idle_since = time.time()
+        with self.lock:
+          self.idle_conns.append(pooled)
+    finally:
+      with self.lock:
+        self.in_use -= 1
+      self.limiter.release()
 
   def close(self):
     self.closed = True
-    for conn in self.idle_conns:
-      conn.close()
+    with self.lock:
+      idle_conns = self.idle_conns
+      self.idle_conns = []
+    for pooled in idle_conns:
+      self._Close(pooled, "pool_closed")
+
+
+class _PooledConnection(object):
+  """An underlying database connection along with its pool bookkeeping."""
+
+  def __init__(self, con):
+    self.con = con
+    self.create_time = time.time()
+    # None while the connection is checked out.
+    self.idle_since = None
 
 
 class _ConnectionProxy(object):
@@ -94,9 +241,10 @@ class _ConnectionProxy(object):
   connection when it may be in an errored state.
   """
 
-  def __init__(self, pool, con):
-    self.con = con
+  def __init__(self, pool, pooled):
     self.pool = pool
+    self.pooled = pooled
+    self.con = pooled.con
     self.errored = False
 
   def __del__(self):
@@ -107,21 +255,12 @@ class _ConnectionProxy(object):
   def close(self):
     if self.con:
       try:
-        if not self.errored and not self.pool.closed:
-          try:
-            self.con.rollback()
-            # append is atomic.
-            self.pool.idle_conns.append(self.con)
-          except Exception:
-            # rollback raised and the connection didn't make it into the idle
-            # list, so close it.
-            self.con.close()
-            raise
-        else:
-          self.con.close()
+        # pylint: disable=protected-access
+        self.pool._Return(self.pooled, self.errored)
+        # pylint: enable=protected-access
       finally:
         self.con = None
-        self.pool.limiter.release()
+        self.pooled = None
 
   def commit(self):
     self.con.commit()
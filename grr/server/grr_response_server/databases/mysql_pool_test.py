@@ -137,6 +137,84 @@ class TestPool(absltest.TestCase):
         # whitebox: make sure the connection did end up on the idle list
         self.assertLen(pool.idle_conns, 1)
 
+  def testIdleConnectionsTimeOut(self):
+    mocks = []
+
+    def gen_mock():
+      c = mock.MagicMock()
+      mocks.append(c)
+      return c
+
+    pool = mysql_pool.Pool(gen_mock, max_size=5, idle_timeout=60)
+    with test_lib.FakeTime(1000):
+      pool.get().close()
+
+    with test_lib.FakeTime(1030):
+      pool.get().close()
+    self.assertLen(mocks, 1)
+    mocks[0].close.assert_not_called()
+
+    with test_lib.FakeTime(1100):
+      pool.get().close()
+    self.assertLen(mocks, 2)
+    mocks[0].close.assert_called_once()
+    mocks[1].close.assert_not_called()
+
+  def testOldConnectionsAreRecycled(self):
+    mocks = []
+
+    def gen_mock():
+      c = mock.MagicMock()
+      mocks.append(c)
+      return c
+
+    pool = mysql_pool.Pool(gen_mock, max_size=5, max_lifetime=60)
+    with test_lib.FakeTime(1000):
+      con = pool.get()
+
+    with test_lib.FakeTime(1100):
+      con.close()
+      mocks[0].close.assert_called_once()
+      self.assertFalse(pool.idle_conns)
+
+      pool.get().close()
+    self.assertLen(mocks, 2)
+
+  def testDeadIdleConnectionIsReplaced(self):
+    mocks = []
+
+    def gen_mock():
+      c = mock.MagicMock()
+      mocks.append(c)
+      return c
+
+    pool = mysql_pool.Pool(gen_mock, max_size=5, check_after_idle=10)
+    with test_lib.FakeTime(1000):
+      pool.get().close()
+    mocks[0].ping.side_effect = MySQLdb.OperationalError('Gone away')
+
+    # Recently used connections are not checked.
+    with test_lib.FakeTime(1005):
+      pool.get().close()
+    self.assertLen(mocks, 1)
+
+    with test_lib.FakeTime(1100):
+      con = pool.get()
+    self.assertLen(mocks, 2)
+    mocks[0].close.assert_called_once()
+    self.assertIs(con.con, mocks[1])
+    con.close()
+
+  def testCountsConnectionsInUse(self):
+    pool = mysql_pool.Pool(mock.MagicMock, max_size=5)
+    con_1 = pool.get()
+    con_2 = pool.get()
+    self.assertEqual(pool.in_use, 2)
+
+    con_1.close()
+    con_2.close()
+    self.assertEqual(pool.in_use, 0)
+
 
 if __name__ == '__main__':
   flags.StartMain(test_lib.main)
@@ -177,165 +177,53 @@ class TestMysqlDB(stats_test_lib.StatsTestMixin,
         1, "db_request_latency", fields=["ReadGRRUsers"]):
       self.db.ReadGRRUsers()
 
-  # Tests that we don't expect to pass yet.
-
-  # TODO(user): Finish implementation and enable these tests.
-  def testWritePathInfosRawValidates(self):
-    pass
-
-  def testWritePathInfosValidatesClient(self):
-    pass
-
-  def testWritePathInfosMetadata(self):
-    pass
-
-  def testWritePathInfosMetadataTimestampUpdate(self):
-    pass
-
-  def testWritePathInfosStatEntry(self):
-    pass
-
-  def testWritePathInfosExpansion(self):
-    pass
-
-  def testWritePathInfosTypeSeparated(self):
-    pass
-
-  def testWritePathInfosUpdates(self):
-    pass
-
-  def testWritePathInfosUpdatesAncestors(self):
-    pass
-
-  def testMultiWritePathInfos(self):
-    pass
-
-  def testWriteStatHistory(self):
-    pass
-
-  def testWriteHashHistory(self):
-    pass
-
-  def testMultiWriteHistoryEmpty(self):
-    pass
-
-  def testMultiWriteHistoryStatAndHash(self):
-    pass
-
-  def testMultiWriteHistoryTwoPathTypes(self):
-    pass
-
-  def testMultiWriteHistoryTwoPaths(self):
-    pass
-
-  def testMultiWriteHistoryTwoClients(self):
-    pass
-
-  def testMultiWriteHistoryDoesNotAllowOverridingStat(self):
-    pass
-
-  def testMultiWriteHistoryDoesNotAllowOverridingHash(self):
-    pass
-
-  def testMultiWriteHistoryRaisesOnNonExistingPathsForStat(self):
-    pass
-
-  def testMultiWriteHistoryRaisesOnNonExistingPathForHash(self):
-    pass
-
-  def testReadPathInfosNonExistent(self):
-    pass
-
-  def testReadPathInfoNonExistent(self):
-    pass
-
-  def testReadPathInfoTimestampStatEntry(self):
-    pass
-
-  def testReadPathInfosMany(self):
-    pass
-
-  def testWritePathInfosDuplicatedData(self):
-    pass
-
-  def testWritePathInfosStoresCopy(self):
-    pass
-
-  def testListDescendentPathInfosEmptyResult(self):
-    pass
-
-  def testListDescendentPathInfosSingleResult(self):
-    pass
-
-  def testListDescendentPathInfosSingle(self):
-    pass
-
-  def testListDescendentPathInfosBranching(self):
-    pass
-
-  def testListDescendentPathInfosLimited(self):
-    pass
-
-  def testListDescendentPathInfosTypeSeparated(self):
-    pass
-
-  def testListDescendentPathInfosAll(self):
-    pass
-
-  def testListDescendentPathInfosLimitedDirectory(self):
-    pass
-
-  def testListDescendentPathInfosTimestampNow(self):
-    pass
-
-  def testListDescendentPathInfosTimestampMultiple(self):
-    pass
-
-  def testListDescendentPathInfosTimestampStatValue(self):
-    pass
+  def _UseTestServerAsReplica(self, sticky_after_write):
+    # Routing does not depend on where the replica pool connects to, so the
+    # test server doubles as its own replica.
+    self.db.delegate.replica_pool = self.db.delegate.pool
+    self.db.delegate.replica_sticky_after_write = sticky_after_write
 
-  def testListDescendentPathInfosTimestampHashValue(self):
-    pass
-
-  def testListChildPathInfosRoot(self):
-    pass
-
-  def testListChildPathInfosRootDeeper(self):
-    pass
+  def testReadOnlyTransactionsAreRoutedToReplica(self):
+    self._UseTestServerAsReplica(0)
 
-  def testListChildPathInfosDetails(self):
-    pass
-
-  def testListChildPathInfosDeepSorted(self):
-    pass
+    with self.assertStatsCounterDelta(
+        1, "mysql_transaction_latency", fields=["replica"]):
+      self.db.ReadGRRUsers()
 
-  def testListChildPathInfosTimestamp(self):
-    pass
+    with self.assertStatsCounterDelta(
+        1, "mysql_transaction_latency", fields=["primary"]):
+      self.db.WriteGRRUser("foo")
 
-  def testListChildPathInfosTimestampStatAndHashValue(self):
-    pass
+  def testReadsStayOnPrimaryAfterWrite(self):
+    self._UseTestServerAsReplica(3600)
+    self.db.WriteGRRUser("foo")
 
-  # TODO(hanuszczak): Remove these once support for storing file hashes in
-  # the MySQL backend is ready.
+    with self.assertStatsCounterDelta(
+        1, "mysql_transaction_latency", fields=["primary"]):
+      self.db.ReadGRRUsers()
 
-  def testWritePathInfosHashEntry(self):
-    pass
+  def testReadsFromPrimary(self):
+    self._UseTestServerAsReplica(0)
 
-  def testWriteMultiplePathInfosHashEntry(self):
-    pass
+    with self.db.ReadsFromPrimary():
+      with self.assertStatsCounterDelta(
+          1, "mysql_transaction_latency", fields=["primary"]):
+        self.db.ReadGRRUsers()
 
-  def testWritePathInfosHashAndStatEntry(self):
-    pass
+    with self.assertStatsCounterDelta(
+        1, "mysql_transaction_latency", fields=["replica"]):
+      self.db.ReadGRRUsers()
 
-  def testWritePathInfoHashAndStatEntrySeparateWrites(self):
-    pass
+  def testFlowProcessingReadsFromPrimary(self):
+    self._UseTestServerAsReplica(0)
 
-  def testReadPathInfoTimestampHashEntry(self):
-    pass
+    with self.assertStatsCounterDelta(
+        1, "mysql_transaction_latency", fields=["primary"]):
+      self.db.ReadFlowProcessingRequests()
 
-  def testReadPathInfoTimestampStatAndHashEntry(self):
-    pass
+  # Tests that we don't expect to pass yet.
 
+  # TODO(user): Finish implementation and enable these tests.
   def testReadingNonExistentBlobReturnsNone(self):
     pass
 
@@ -351,178 +239,6 @@ class TestMysqlDB(stats_test_lib.StatsTestMixin,
   def testCheckBlobsExistCorrectlyReportsPresentAndMissingBlobs(self):
     pass
 
-  def testHashBlobReferenceCanBeWrittenAndReadBack(self):
-    pass
-
-  def testReportsNonExistingHashesAsNone(self):
-    pass
-
-  def testCorrectlyHandlesRequestWithOneExistingAndOneMissingHash(self):
-    pass
-
-  def testMultipleHashBlobReferencesCanBeWrittenAndReadBack(self):
-    pass
-
-  def testReadPathInfoOlder(self):
-    pass
-
-  def testReadPathInfosHistoriesEmpty(self):
-    pass
-
-  def testReadPathInfosHistoriesDoesNotRaiseOnUnknownClient(self):
-    pass
-
-  def testReadPathInfosHistoriesWithSingleFileWithSingleHistoryItem(self):
-    pass
-
-  def testReadPathInfosHistoriesWithTwoFilesWithSingleHistoryItemEach(self):
-    pass
-
-  def testReadPathInfosHistoriesWithTwoFilesWithTwoHistoryItems(self):
-    pass
-
-  def testInitPathInfosValidatesClient(self):
-    pass
-
-  def testInitPathInfosEmpty(self):
-    pass
-
-  def testInitPathInfosWriteSingle(self):
-    pass
-
-  def testInitPathInfosWriteMany(self):
-    pass
-
-  def testInitPathInfosTree(self):
-    pass
-
-  def testInitPathInfosClearsStatHistory(self):
-    pass
-
-  def testInitPathInfosClearsHashHistory(self):
-    pass
-
-  def testInitPathInfosRetainsIndirectPathHistory(self):
-    pass
-
-  def testMultiInitPathInfos(self):
-    pass
-
-  def testMultiInitPathInfosEmptyDoesNotThrow(self):
-    pass
-
-  def testMultiInitPathInfosNoPathsDoesNotThrow(self):
-    pass
-
-  def testClearPathHistoryEmpty(self):
-    pass
-
-  def testClearPathHistorySingle(self):
-    pass
-
-  def testClearPathHistoryManyRecords(self):
-    pass
-
-  def testClearPathHistoryOnlyDirect(self):
-    pass
-
-  def testMultiClearPathHistoryEmptyDoesNotRaise(self):
-    pass
-
-  def testMultiClearPathHistoryNoPathsDoesNotRaise(self):
-    pass
-
-  def testMultiClearPathHistoryClearsMultipleHistories(self):
-    pass
-
-  def testWritesAndReadsSingleFlowResultOfSingleType(self):
-    pass
-
-  def testWritesAndReadsMultipleFlowResultsOfSingleType(self):
-    pass
-
-  def testWritesAndReadsMultipleFlowResultsWithDifferentTimestamps(self):
-    pass
-
-  def testWritesAndReadsMultipleFlowResultsOfMultipleTypes(self):
-    pass
-
-  def testReadFlowResultsCorrectlyAppliesOffsetAndCountFilters(self):
-    pass
-
-  def testReadFlowResultsCorrectlyAppliesWithTagFilter(self):
-    pass
-
-  def testReadFlowResultsCorrectlyAppliesWithTypeFilter(self):
-    pass
-
-  def testReadFlowResultsCorrectlyAppliesWithSubstringFilter(self):
-    pass
-
-  def testReadFlowResultsCorrectlyAppliesVariousCombinationsOfFilters(self):
-    pass
-
-  def testReadFlowResultsReturnsPayloadWithMissingTypeAsSpecialValue(self):
-    pass
-
-  def testCountFlowResultsReturnsCorrectResultsCount(self):
-    pass
-
-  def testCountFlowResultsCorrectlyAppliesWithTagFilter(self):
-    pass
-
-  def testCountFlowResultsCorrectlyAppliesWithTypeFilter(self):
-    pass
-
-  def testCountFlowResultsCorrectlyAppliesWithTagAndWithTypeFilters(self):
-    pass
-
-  def testWritesAndReadsSingleFlowLogEntry(self):
-    pass
-
-  def testWritesAndReadsMultipleFlowLogEntries(self):
-    pass
-
-  def testReadFlowLogEntriesCorrectlyAppliesOffsetAndCountFilters(self):
-    pass
-
-  def testReadFlowLogEntriesCorrectlyAppliesWithSubstringFilter(self):
-    pass
-
-  def testReadFlowLogEntriesCorrectlyAppliesVariousCombinationsOfFilters(self):
-    pass
-
-  def testCountFlowLogEntriesReturnsCorrectFlowLogEntriesCount(self):
-    pass
-
-  def testReadLatestPathInfosReturnsNothingForNonExistingPaths(self):
-    pass
-
-  def testFlowLogsAndErrorsForUnknownFlowsRaise(self):
-    pass
-
-  def testReadLatestPathInfosReturnsNothingWhenNoFilesCollected(self):
-    pass
-
-  def testReadLatestPathInfosFindsTwoCollectedFilesWhenTheyAreTheOnlyEntries(
-      self):
-    pass
-
-  def testReadLatestPathInfosCorrectlyFindsCollectedFileWithNonLatestEntry(
-      self):
-    pass
-
-  def testReadLatestPathInfosCorrectlyFindsLatestOfTwoCollectedFiles(self):
-    pass
-
-  def testReadLatestPathInfosCorrectlyFindsLatestCollectedFileBeforeTimestamp(
-      self):
-    pass
-
-  def testReadLatestPathInfosIncludesStatEntryIfThereIsOneWithSameTimestamp(
-      self):
-    pass
-
   def testWriteStatsStoreEntriesValidation(self):
     pass
 
@@ -553,121 +269,6 @@ class TestMysqlDB(stats_test_lib.StatsTestMixin,
   def testDeleteStatsEntries_LowLimit(self):
     pass
 
-  # TODO(user): implement hunts support for MySQL
-  def testWritingAndReadingHuntObjectWorks(self):
-    pass
-
-  def testHuntObjectCanBeOverwritten(self):
-    pass
-
-  def testReadingNonExistentHuntObjectRaises(self):
-    pass
-
-  def testUpdateHuntObjectRaisesIfHuntDoesNotExist(self):
-    pass
-
-  def testUpdateHuntObjectCorrectlyUpdatesHuntObject(self):
-    pass
-
-  def testUpdateHuntObjectIsAtomic(self):
-    pass
-
-  def testUpdateHuntObjectPropagatesExceptions(self):
-    pass
-
-  def testDeletingHuntObjectWorks(self):
-    pass
-
-  def testReadAllHuntObjectsReturnsEmptyListWhenNoHunts(self):
-    pass
-
-  def testReadAllHuntObjectsReturnsAllWrittenObjects(self):
-    pass
-
-  def testReadHuntLogEntriesReturnsEntryFromSingleHuntFlow(self):
-    pass
-
-  def testReadHuntLogEntriesReturnsEntryFromMultipleHuntFlows(self):
-    pass
-
-  def testReadHuntLogEntriesCorrectlyAppliesOffsetAndCountFilters(self):
-    pass
-
-  def testReadHuntLogEntriesCorrectlyAppliesWithSubstringFilter(self):
-    pass
-
-  def testReadHuntLogEntriesCorrectlyAppliesCombinationOfFilters(self):
-    pass
-
-  def testCountHuntLogEntriesReturnsCorrectHuntLogEntriesCount(self):
-    pass
-
-  def testReadHuntResultsReadsSingleResultOfSingleType(self):
-    pass
-
-  def testReadHuntResultsReadsMultipleResultOfSingleType(self):
-    pass
-
-  def testReadHuntResultsReadsMultipleResultOfMultipleTypes(self):
-    pass
-
-  def testReadHuntResultsCorrectlyAppliedOffsetAndCountFilters(self):
-    pass
-
-  def testReadHuntResultsCorrectlyAppliesWithTagFilter(self):
-    pass
-
-  def testReadHuntResultsCorrectlyAppliesWithTypeFilter(self):
-    pass
-
-  def testReadHuntResultsCorrectlyAppliesWithSubstringFilter(self):
-    pass
-
-  def testReadHuntResultsCorrectlyAppliesVariousCombinationsOfFilters(self):
-    pass
-
-  def testReadHuntResultsReturnsPayloadWithMissingTypeAsSpecialValue(self):
-    pass
-
-  def testCountHuntResultsReturnsCorrectResultsCount(self):
-    pass
-
-  def testCountHuntResultsCorrectlyAppliesWithTagFilter(self):
-    pass
-
-  def testCountHuntResultsCorrectlyAppliesWithTypeFilter(self):
-    pass
-
-  def testCountHuntResultsCorrectlyAppliesWithTagAndWithTypeFilters(self):
-    pass
-
-  def testCountHuntResultsCorrectlyAppliesWithTimestampFilter(self):
-    pass
-
-  def testCountHuntResultsByTypeGroupsResultsCorrectly(self):
-    pass
-
-  def testReadHuntFlowsReturnsEmptyListWhenNoFlows(self):
-    pass
-
-  def testReadHuntFlowsReturnsAllHuntFlowsWhenNoFilterCondition(self):
-    pass
-
-  def testReadHuntFlowsAppliesFilterConditionCorrectly(self):
-    pass
-
-  def testReadHuntFlowsCorrectlyAppliesOffsetAndCountFilters(self):
-    pass
-
-  def testCountHuntFlowsReturnsEmptyListWhenNoFlows(self):
-    pass
-
-  def testCountHuntFlowsReturnsAllHuntFlowsWhenNoFilterCondition(self):
-    pass
-
-  def testCountHuntFlowsAppliesFilterConditionCorrectly(self):
-    pass
-
   def testReadSignedBinaryReferences(self):
     pass
 
@@ -9,6 +9,7 @@ import contextlib
 import functools
 import hashlib
 import inspect
+import threading
 
 from typing import Text, Iterable
 
@@ -118,6 +119,50 @@ def Columns(iterable):
   return "({})".format(", ".join(sorted(iterable)))
 
 
+def ComponentsToPath(components):
+  """Converts a list of path components to a canonical path representation.
+
+  Examples:
+    >>> ComponentsToPath(["foo", "bar"])
+    u'/foo/bar'
+
+    >>> ComponentsToPath([])
+    u''
+
+  Args:
+    components: A sequence of path components.
+
+  Returns:
+    A canonical MySQL path representation.
+
+  Raises:
+    ValueError: If one of the components contains a `/` character.
+  """
+  for component in components:
+    if "/" in component:
+      raise ValueError("Path component with '/' in: {}".format(components))
+
+  if components:
+    return "/" + "/".join(components)
+  else:
+    return ""
+
+
+def PathToComponents(path):
+  """Converts a canonical path representation to a tuple of components.
+
+  Args:
+    path: A canonical MySQL path representation.
+
+  Returns:
+    A tuple of path components.
+  """
+  if path:
+    return tuple(path.split("/")[1:])
+  else:
+    return ()
+
+
 # The MySQL driver accepts and returns Python datetime objects.
 def MysqlToRDFDatetime(dt):
   return dt if dt is None else rdfvalue.RDFDatetime.FromDatetime(dt)
@@ -149,17 +194,22 @@ class WithTransaction(object):
   process, the decorated function may be called again after a short delay.
   """
 
-  def __init__(self, readonly=False):
+  def __init__(self, readonly=False, primary_only=False):
     """Constructs a decorator.
 
     Args:
       readonly: Whether the decorated function only requires a readonly
         transaction. Has no effect when a connection is provided.
+      primary_only: Whether a readonly transaction has to run on the primary
+        database, e.g. because it must observe writes done by other processes
+        right before. Has no effect when a connection is provided.
     """
     self.readonly = readonly
+    self.primary_only = primary_only
 
   def __call__(self, func):
     readonly = self.readonly
+    primary_only = self.primary_only
 
     takes_args = inspect.getargspec(func).args
     takes_connection = "connection" in takes_args
@@ -184,7 +234,8 @@ class WithTransaction(object):
           new_kw["connection"] = connection
           return func(self, *args, **new_kw)
 
-        return self._RunInTransaction(Closure, readonly)
+        return self._RunInTransaction(
+            Closure, readonly, primary_only=primary_only)
 
       return Decorated
 
@@ -201,6 +252,49 @@ class WithTransaction(object):
           new_kw["cursor"] = cursor
           return func(self, *args, **new_kw)
 
-      return self._RunInTransaction(Closure, readonly)
+      return self._RunInTransaction(
+          Closure, readonly, primary_only=primary_only)
 
     return db_utils.CallLoggedAndAccounted(Decorated)
+
+
+class LeaseScheduler(object):
+  """Paces a loop that leases requests from a queue table.
+
+  As long as leases return requests, the loop leases again right away. While
+  the queue is empty, the time between leases doubles from `min_delay` up to
+  `max_delay`. `Wake()` cuts the current wait short, so that requests written
+  by this process are picked up without delay.
+  """
+
+  def __init__(self, min_delay, max_delay):
+    """Constructs a scheduler.
+
+    Args:
+      min_delay: Time in seconds to wait after the first empty lease.
+      max_delay: Maximum time in seconds to wait between leases.
+    """
+    self.min_delay = min_delay
+    self.max_delay = max_delay
+    self.delay = min_delay
+    self._wakeup = threading.Event()
+
+  def Wake(self):
+    """Ends the current or next wait."""
+    self._wakeup.set()
+
+  def Wait(self, leased):
+    """Waits until the next lease should happen.
+
+    Args:
+      leased: Whether the last lease returned any requests.
+    """
+    if leased:
+      self.delay = self.min_delay
+      return
+
+    if self._wakeup.wait(self.delay):
+      self.delay = self.min_delay
+    else:
+      self.delay = min(self.delay * 2, self.max_delay)
+    self._wakeup.clear()
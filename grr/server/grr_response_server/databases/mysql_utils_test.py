@@ -85,6 +85,62 @@ class ColumnsTest(absltest.TestCase):
         mysql_utils.Columns(["bar", "foo", "baz"]), "(bar, baz, foo)")
 
 
+class ComponentsToPathTest(absltest.TestCase):
+
+  def testRoot(self):
+    self.assertEqual(mysql_utils.ComponentsToPath([]), "")
+
+  def testMany(self):
+    self.assertEqual(
+        mysql_utils.ComponentsToPath(["foo", "bar", "baz"]), "/foo/bar/baz")
+
+  def testUnicode(self):
+    self.assertEqual(mysql_utils.ComponentsToPath(["zażółć"]), "/zażółć")
+
+  def testRaisesOnSlashInComponent(self):
+    with self.assertRaises(ValueError):
+      mysql_utils.ComponentsToPath(["foo/bar"])
+
+  def testRoundTrip(self):
+    components = ("foo", "bar", "baz")
+    path = mysql_utils.ComponentsToPath(components)
+    self.assertEqual(mysql_utils.PathToComponents(path), components)
+
+  def testRoundTripRoot(self):
+    self.assertEqual(mysql_utils.PathToComponents(""), ())
+
+
+class LeaseSchedulerTest(absltest.TestCase):
+
+  def testDoesNotWaitAfterSuccessfulLease(self):
+    scheduler = mysql_utils.LeaseScheduler(min_delay=60, max_delay=60)
+    scheduler.Wait(True)
+    self.assertEqual(scheduler.delay, 60)
+
+  def testDoublesDelayUpToMaximum(self):
+    scheduler = mysql_utils.LeaseScheduler(min_delay=0.001, max_delay=0.003)
+    scheduler.Wait(False)
+    self.assertEqual(scheduler.delay, 0.002)
+    scheduler.Wait(False)
+    self.assertEqual(scheduler.delay, 0.003)
+    scheduler.Wait(False)
+    self.assertEqual(scheduler.delay, 0.003)
+
+  def testSuccessfulLeaseResetsDelay(self):
+    scheduler = mysql_utils.LeaseScheduler(min_delay=0.001, max_delay=1)
+    scheduler.Wait(False)
+    scheduler.Wait(False)
+    scheduler.Wait(True)
+    self.assertEqual(scheduler.delay, 0.001)
+
+  def testWakeEndsWait(self):
+    scheduler = mysql_utils.LeaseScheduler(min_delay=60, max_delay=60)
+    scheduler.Wake()
+    # This would block for a minute without the wakeup.
+    scheduler.Wait(False)
+    self.assertEqual(scheduler.delay, 60)
+
+
 def main(argv):
   test_lib.main(argv)
 
@@ -7,11 +7,13 @@ from __future__ import unicode_literals
 import platform
 
 from grr_response_server.databases import mem
+from grr_response_server.databases import sqlite
 
 # All available databases go into this registry.
 REGISTRY = {}
 
 REGISTRY["InMemoryDB"] = mem.InMemoryDB
+REGISTRY["SqliteDB"] = sqlite.SqliteDB
 
 if platform.system() == "Linux":
   # When running end to end tests on Windows the MySQLDb package is not
@@ -0,0 +1,270 @@
+#!/usr/bin/env python
+"""SQLite implementation of the GRR relational database abstraction.
+
+See grr/server/db.py for interface.
+
+The SQLite database keeps all data in a single file and is meant for single
+node deployments, tests and benchmarks. Multiple processes may share the
+database file, but writes are serialized by SQLite.
+"""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import unicode_literals
+
+import contextlib
+import logging
+import math
+import random
+import sqlite3
+import threading
+import time
+import zlib
+
+from builtins import range  # pylint: disable=redefined-builtin
+
+from grr_response_core import config
+from grr_response_core.lib.util import compatibility
+from grr_response_server import db as db_module
+from grr_response_server import threadpool
+from grr_response_server.databases import mysql_utils
+from grr_response_server.databases import sqlite_artifacts
+from grr_response_server.databases import sqlite_blobs
+from grr_response_server.databases import sqlite_client_reports
+from grr_response_server.databases import sqlite_clients
+from grr_response_server.databases import sqlite_cronjobs
+from grr_response_server.databases import sqlite_ddl
+from grr_response_server.databases import sqlite_events
+from grr_response_server.databases import sqlite_flows
+from grr_response_server.databases import sqlite_foreman_rules
+from grr_response_server.databases import sqlite_hunts
+from grr_response_server.databases import sqlite_paths
+from grr_response_server.databases import sqlite_signed_binaries
+from grr_response_server.databases import sqlite_stats
+from grr_response_server.databases import sqlite_users
+
+# Maximum retry count:
+_MAX_RETRY_COUNT = 5
+
+
+def _BytesRowFactory(unused_cursor, row):
+  """Returns a row with BLOBs (buffers on Python 2) as byte strings."""
+  # pylint: disable=undefined-variable
+  return tuple(bytes(v) if isinstance(v, buffer) else v for v in row)
+  # pylint: enable=undefined-variable
+
+
+class Error(sqlite3.Error):
+  """Base Error for the SQLite datastore."""
+
+
+class SchemaInitializationError(Error):
+  """Raised when the setup of the SQLite schema fails."""
+
+
+def _IsRetryable(error):
+  """Returns whether error is likely to be retryable."""
+  if not isinstance(error, sqlite3.OperationalError):
+    return False
+  message = str(error)
+  return "locked" in message or "busy" in message
+
+
+def _Crc32(value):
+  """CRC32 of a BLOB as an unsigned integer, like the MySQL function."""
+  if value is None:
+    return None
+  return zlib.crc32(value) & 0xffffffff
+
+
+def _Rollback(connection):
+  try:
+    connection.execute("ROLLBACK")
+  except sqlite3.OperationalError:
+    # SQLite already rolled back the transaction on some errors.
+    pass
+
+
+# pyformat: disable
+class SqliteDB(sqlite_artifacts.SqliteDBArtifactsMixin,
+               sqlite_blobs.SqliteDBBlobsMixin,
+               sqlite_client_reports.SqliteDBClientReportsMixin,
+               sqlite_clients.SqliteDBClientMixin,
+               sqlite_cronjobs.SqliteDBCronJobMixin,
+               sqlite_events.SqliteDBEventMixin,
+               sqlite_flows.SqliteDBFlowMixin,
+               sqlite_foreman_rules.SqliteDBForemanRulesMixin,
+               sqlite_hunts.SqliteDBHuntMixin,
+               sqlite_paths.SqliteDBPathMixin,
+               sqlite_signed_binaries.SqliteDBSignedBinariesMixin,
+               sqlite_stats.SqliteDBStatsMixin,
+               sqlite_users.SqliteDBUsersMixin,
+               db_module.Database):
+  """Implements db_module.Database using SQLite.
+
+  # pyformat: enable
+
+  See server/db.py for a full description of the interface.
+  """
+
+  def __init__(self, path=None):
+    """Creates a datastore implementation.
+
+    Args:
+      path: Path of the database file, created if it does not exist. Defaults
+        to Sqlite.path.
+    """
+    if path is None:
+      path = config.CONFIG["Sqlite.path"]
+    self.path = path
+    self.busy_timeout = config.CONFIG["Sqlite.busy_timeout"]
+    self.cached_statements = config.CONFIG["Sqlite.cached_statements"]
+
+    # Connections are pooled, so that the prepared statement cache of each
+    # connection outlives transactions.
+    self._idle_connections = []  # Guarded by _lock.
+    self._lock = threading.Lock()
+    self._closed = False
+
+    with self._Connection() as connection:
+      # WAL mode is persistent and lets readers run concurrently with a
+      # writer. It can't be changed inside a transaction.
+      connection.execute("PRAGMA journal_mode=WAL")
+      self._InitializeSchema(connection)
+
+    self.handler_thread = None
+    self.handler_stop = True
+    self.handler_scheduler = mysql_utils.LeaseScheduler(
+        config.CONFIG["Sqlite.queue_poll_min_delay"],
+        config.CONFIG["Sqlite.queue_poll_max_delay"])
+
+    self.flow_processing_request_handler_thread = None
+    self.flow_processing_request_handler_stop = None
+    self.flow_processing_request_handler_scheduler = (
+        mysql_utils.LeaseScheduler(
+            config.CONFIG["Sqlite.queue_poll_min_delay"],
+            config.CONFIG["Sqlite.queue_poll_max_delay"]))
+    # Unlike the shared pools created by ThreadPool.Factory, this pool is owned
+    # by the database and stopped when it is closed.
+    self.flow_processing_request_handler_pool = threadpool.ThreadPool(
+        "sqlite_flow_processing_pool", min_threads=2, max_threads=50)
+    self.flow_processing_request_handler_pool.Start()
+
+  def _Connect(self):
+    """Opens and sets up a new connection to the database file."""
+    # Transactions are started explicitly in _RunInTransaction, so the
+    # implicit transaction handling of the sqlite3 module is disabled.
+    connection = sqlite3.connect(
+        self.path,
+        timeout=self.busy_timeout,
+        isolation_level=None,
+        check_same_thread=False,
+        cached_statements=self.cached_statements)
+    # Python 3 already returns BLOBs as byte strings. A converter can't be used
+    # on Python 2, since converters turn empty BLOBs into None.
+    if compatibility.PY2:
+      connection.row_factory = _BytesRowFactory
+    connection.execute("PRAGMA foreign_keys=ON")
+    # In WAL mode, NORMAL still protects against corruption and only loses
+    # the last transactions on power loss, not on application crashes.
+    connection.execute("PRAGMA synchronous=NORMAL")
+    connection.create_function("CRC32", 1, _Crc32)
+    return connection
+
+  @contextlib.contextmanager
+  def _Connection(self):
+    """Yields an idle or new connection and returns it to the pool after."""
+    if self._closed:
+      raise Error("Database is already closed.")
+
+    with self._lock:
+      connection = (
+          self._idle_connections.pop() if self._idle_connections else None)
+    if connection is None:
+      connection = self._Connect()
+
+    try:
+      yield connection
+    except sqlite3.OperationalError:
+      # The connection may be in an unknown state, don't reuse it.
+      connection.close()
+      raise
+    except:
+      with self._lock:
+        self._idle_connections.append(connection)
+      raise
+
+    with self._lock:
+      if not self._closed:
+        self._idle_connections.append(connection)
+        connection = None
+    if connection is not None:
+      connection.close()
+
+  def Close(self):
+    self._closed = True
+    self.flow_processing_request_handler_pool.Stop()
+    with self._lock:
+      idle_connections = self._idle_connections
+      self._idle_connections = []
+    for connection in idle_connections:
+      connection.close()
+
+  def _InitializeSchema(self, connection):
+    """Initialize the database's schema."""
+    for command in sqlite_ddl.SCHEMA_SETUP:
+      try:
+        connection.execute(command)
+      except sqlite3.Error as e:
+        raise SchemaInitializationError(
+            "{}. Error occurred during execution of {}"
+            .format(e, command.strip()))
+
+  def _RunInTransaction(self, function, readonly=False, primary_only=False):
+    """Runs function within a transaction.
+
+    Allocates a connection, begins a transaction on it and passes the connection
+    to function.
+
+    If function finishes without raising, the transaction is committed.
+
+    If function raises, the transaction will be rolled back, if the database
+    was locked by another connection, the operation may be repeated.
+
+    Args:
+      function: A function to be run, must accept a single sqlite3.Connection
+        parameter.
+      readonly: Indicates that only a readonly (snapshot) transaction is
+        required.
+      primary_only: Ignored, there are no read replicas of SQLite databases.
+
+    Returns:
+      The value returned by the last call to function.
+
+    Raises: Any exception raised by function.
+    """
+    # Writing transactions take the write lock right away. Upgrading a read
+    # lock later fails immediately, without waiting for the busy timeout, if
+    # another connection wrote in the meantime.
+    start_query = "BEGIN" if readonly else "BEGIN IMMEDIATE"
+
+    for retry_count in range(_MAX_RETRY_COUNT):
+      with self._Connection() as connection:
+        try:
+          connection.execute(start_query)
+          ret = function(connection)
+          connection.execute("COMMIT")
+          return ret
+        except sqlite3.OperationalError as e:
+          _Rollback(connection)
+          # Re-raise if this was the last attempt.
+          if retry_count + 1 >= _MAX_RETRY_COUNT or not _IsRetryable(e):
+            raise
+          logging.info("Retrying locked SQLite transaction: %s", e)
+        except:
+          _Rollback(connection)
+          raise
+      # Simple delay, with jitter.
+      time.sleep(random.uniform(0.1, 0.2) * math.pow(1.5, retry_count))
+    # Shouldn't happen, because we should have re-raised whatever caused the
+    # last try to fail.
+    raise Exception("Looped ended early - last exception swallowed.")  # pylint: disable=g-doc-exception
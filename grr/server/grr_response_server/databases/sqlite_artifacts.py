@@ -0,0 +1,63 @@
+#!/usr/bin/env python
+"""The SQLite database methods for handling artifacts."""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import unicode_literals
+
+import sqlite3
+
+from future.builtins import str
+
+from grr_response_core.lib.rdfvalues import artifacts as rdf_artifacts
+from grr_response_server import db
+from grr_response_server.databases import mysql_utils
+from grr_response_server.databases import sqlite_utils
+
+
+def _RowToArtifact(row):
+  return rdf_artifacts.Artifact.FromSerializedString(row[0])
+
+
+class SqliteDBArtifactsMixin(object):
+  """An SQLite database mixin with artifact-related methods.
+
+  SQLite has no index size limit, so unlike in MySQL the artifact name is used
+  as the primary key directly.
+  """
+
+  @mysql_utils.WithTransaction()
+  def WriteArtifact(self, artifact, cursor=None):
+    """Writes new artifact to the database."""
+    name = str(artifact.name)
+
+    try:
+      cursor.execute(
+          "INSERT INTO artifacts (name, definition) VALUES (?, ?)",
+          [name, sqlite_utils.Blob(artifact.SerializeToString())])
+    except sqlite3.IntegrityError as error:
+      raise db.DuplicatedArtifactError(name, cause=error)
+
+  @mysql_utils.WithTransaction(readonly=True)
+  def ReadArtifact(self, name, cursor=None):
+    """Looks up an artifact with given name from the database."""
+    cursor.execute("SELECT definition FROM artifacts WHERE name = ?", [name])
+
+    row = cursor.fetchone()
+    if row is None:
+      raise db.UnknownArtifactError(name)
+    else:
+      return _RowToArtifact(row)
+
+  @mysql_utils.WithTransaction(readonly=True)
+  def ReadAllArtifacts(self, cursor=None):
+    """Lists all artifacts that are stored in the database."""
+    cursor.execute("SELECT definition FROM artifacts")
+    return [_RowToArtifact(row) for row in cursor.fetchall()]
+
+  @mysql_utils.WithTransaction()
+  def DeleteArtifact(self, name, cursor=None):
+    """Deletes an artifact with given name from the database."""
+    cursor.execute("DELETE FROM artifacts WHERE name = ?", [name])
+
+    if cursor.rowcount == 0:
+      raise db.UnknownArtifactError(name)
@@ -0,0 +1,75 @@
+#!/usr/bin/env python
+"""The SQLite database methods for blobs handling."""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import unicode_literals
+
+from future.utils import iteritems
+
+from grr_response_server.databases import mysql_utils
+from grr_response_server.databases import sqlite_utils
+from grr_response_server.rdfvalues import objects as rdf_objects
+
+
+class SqliteDBBlobsMixin(object):
+  """SqliteDB mixin for blobs related functions."""
+
+  @mysql_utils.WithTransaction()
+  def WriteBlobs(self, blob_id_data_map, cursor=None):
+    """Writes given blobs."""
+    # Blobs are content-addressed, so rewriting one doesn't change it.
+    cursor.executemany(
+        "INSERT OR IGNORE INTO blobs (blob_id, blob_data) VALUES (?, ?)",
+        [(sqlite_utils.Blob(blob_id.AsBytes()), sqlite_utils.Blob(data))
+         for blob_id, data in iteritems(blob_id_data_map)])
+
+  @mysql_utils.WithTransaction(readonly=True)
+  def ReadBlobs(self, blob_ids, cursor=None):
+    """Reads given blobs."""
+    result = {}
+    for blob_id in blob_ids:
+      cursor.execute("SELECT blob_data FROM blobs WHERE blob_id = ?",
+                     [sqlite_utils.Blob(blob_id.AsBytes())])
+      row = cursor.fetchone()
+      result[blob_id] = row[0] if row is not None else None
+    return result
+
+  @mysql_utils.WithTransaction(readonly=True)
+  def CheckBlobsExist(self, blob_ids, cursor=None):
+    """Checks if given blobs exist."""
+    result = {}
+    for blob_id in blob_ids:
+      cursor.execute("SELECT 1 FROM blobs WHERE blob_id = ?",
+                     [sqlite_utils.Blob(blob_id.AsBytes())])
+      result[blob_id] = cursor.fetchone() is not None
+    return result
+
+  @mysql_utils.WithTransaction()
+  def WriteHashBlobReferences(self, references_by_hash, cursor=None):
+    """Writes blob references for a given set of hashes."""
+    rows = []
+    for hash_id, blob_refs in iteritems(references_by_hash):
+      refs = rdf_objects.BlobReferences(items=blob_refs)
+      rows.append((sqlite_utils.Blob(hash_id.AsBytes()),
+                   sqlite_utils.Blob(refs.SerializeToString())))
+
+    cursor.executemany(
+        "INSERT OR REPLACE INTO hash_blob_references "
+        "(hash_id, blob_references) VALUES (?, ?)", rows)
+
+  @mysql_utils.WithTransaction(readonly=True)
+  def ReadHashBlobReferences(self, hashes, cursor=None):
+    """Reads blob references of a given set of hashes."""
+    result = {hash_id: None for hash_id in hashes}
+    if not result:
+      return result
+
+    query = ("SELECT hash_id, blob_references FROM hash_blob_references "
+             "WHERE hash_id IN {}").format(sqlite_utils.Placeholders(
+                 len(result)))
+    cursor.execute(query,
+                   [sqlite_utils.Blob(hash_id.AsBytes()) for hash_id in result])
+    for hash_id, blob_references in cursor.fetchall():
+      refs = rdf_objects.BlobReferences.FromSerializedString(blob_references)
+      result[rdf_objects.SHA256HashID.FromBytes(hash_id)] = list(refs.items)
+    return result
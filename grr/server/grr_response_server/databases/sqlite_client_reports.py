@@ -0,0 +1,79 @@
+#!/usr/bin/env python
+"""SQLite implementation of DB methods for handling client-report data."""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import unicode_literals
+
+from typing import Dict, Optional, Text
+
+from grr_response_core.lib import rdfvalue
+from grr_response_core.lib import time_utils
+from grr_response_core.lib.rdfvalues import stats as rdf_stats
+from grr_response_core.lib.rdfvalues import structs as rdf_structs
+from grr_response_server.databases import mysql_utils
+from grr_response_server.databases import sqlite_utils
+
+
+class SqliteDBClientReportsMixin(object):
+  """Mixin providing an SQLite implementation of client-reports DB logic."""
+
+  @mysql_utils.WithTransaction()
+  def WriteClientGraphSeries(self,
+                             graph_series,
+                             client_label,
+                             timestamp = None,
+                             cursor=None):
+    """See db.Database."""
+    if timestamp is None:
+      timestamp = rdfvalue.RDFDatetime.Now()
+
+    cursor.execute(
+        "INSERT OR REPLACE INTO client_graph_series "
+        "(client_label, report_type, timestamp, graph_series) "
+        "VALUES (?, ?, ?, ?)", [
+            client_label,
+            int(graph_series.report_type),
+            sqlite_utils.RDFDatetimeToInt(timestamp),
+            sqlite_utils.Blob(graph_series.SerializeToString())
+        ])
+
+  @mysql_utils.WithTransaction(readonly=True)
+  def ReadAllClientGraphSeries(
+      self,
+      client_label,
+      report_type,
+      time_range = None,
+      cursor=None
+  ):
+    """See db.Database."""
+    query = ("SELECT timestamp, graph_series FROM client_graph_series "
+             "WHERE client_label = ? AND report_type = ?")
+    args = [client_label, int(report_type)]
+
+    if time_range is not None:
+      query += " AND timestamp >= ? AND timestamp <= ?"
+      args.extend([
+          sqlite_utils.RDFDatetimeToInt(time_range.start),
+          sqlite_utils.RDFDatetimeToInt(time_range.end)
+      ])
+
+    cursor.execute(query, args)
+    return {
+        sqlite_utils.IntToRDFDatetime(timestamp):
+        rdf_stats.ClientGraphSeries.FromSerializedString(graph_series)
+        for timestamp, graph_series in cursor.fetchall()
+    }
+
+  @mysql_utils.WithTransaction(readonly=True)
+  def ReadMostRecentClientGraphSeries(self, client_label,
+                                      report_type, cursor=None
+                                     ):
+    """See db.Database."""
+    cursor.execute(
+        "SELECT graph_series FROM client_graph_series "
+        "WHERE client_label = ? AND report_type = ? "
+        "ORDER BY timestamp DESC LIMIT 1", [client_label, int(report_type)])
+    row = cursor.fetchone()
+    if row is None:
+      return None
+    return rdf_stats.ClientGraphSeries.FromSerializedString(row[0])
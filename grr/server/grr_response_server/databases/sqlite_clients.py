@@ -0,0 +1,698 @@
+#!/usr/bin/env python
+"""The SQLite database methods for client handling."""
+from __future__ import absolute_import
+from __future__ import division
+
+from __future__ import unicode_literals
+
+import sqlite3
+
+from future.utils import iteritems
+from future.utils import itervalues
+
+from grr_response_core.lib.rdfvalues import client as rdf_client
+from grr_response_core.lib.rdfvalues import client_network as rdf_client_network
+from grr_response_core.lib.rdfvalues import client_stats as rdf_client_stats
+from grr_response_server import db
+from grr_response_server.databases import mysql_utils
+from grr_response_server.databases import sqlite_utils
+from grr_response_server.rdfvalues import objects as rdf_objects
+
+
+class SqliteDBClientMixin(object):
+  """SqliteDB mixin for client related functions."""
+
+  @mysql_utils.WithTransaction()
+  def WriteClientMetadata(self,
+                          client_id,
+                          certificate=None,
+                          fleetspeak_enabled=None,
+                          first_seen=None,
+                          last_ping=None,
+                          last_clock=None,
+                          last_ip=None,
+                          last_foreman=None,
+                          cursor=None):
+    """Write metadata about the client."""
+    columns, values = _ClientMetadataColumns(
+        client_id,
+        certificate=certificate,
+        fleetspeak_enabled=fleetspeak_enabled,
+        first_seen=first_seen,
+        last_ping=last_ping,
+        last_clock=last_clock,
+        last_ip=last_ip,
+        last_foreman=last_foreman)
+    _UpsertClientMetadata(columns, [values], cursor)
+
+  @mysql_utils.WithTransaction()
+  def MultiWriteClientMetadata(self, metadatas, cursor=None):
+    """Writes metadata about multiple clients."""
+    # All rows of a batched update have to set the same columns, so clients
+    # are grouped by the set of fields that are updated.
+    rows_by_columns = {}
+    for client_id, metadata in iteritems(metadatas):
+      columns, values = _ClientMetadataColumns(
+          client_id, **db.ClientMetadataWriteArgs(metadata))
+      rows_by_columns.setdefault(tuple(columns), []).append(values)
+
+    for columns, rows in iteritems(rows_by_columns):
+      _UpsertClientMetadata(columns, rows, cursor)
+
+  @mysql_utils.WithTransaction(readonly=True)
+  def MultiReadClientMetadata(self, client_ids, cursor=None):
+    """Reads ClientMetadata records for a list of clients."""
+    query = ("SELECT client_id, fleetspeak_enabled, certificate, last_ping, "
+             "last_clock, last_ip, last_foreman, first_seen, "
+             "last_crash_timestamp, last_startup_timestamp FROM "
+             "clients WHERE client_id IN ({})").format(", ".join(
+                 ["?"] * len(client_ids)))
+    ret = {}
+    cursor.execute(query, list(client_ids))
+    for row in cursor.fetchall():
+      cid, fs, crt, ping, clk, ip, foreman, first, lct, lst = row
+      ret[cid] = rdf_objects.ClientMetadata(
+          certificate=crt,
+          fleetspeak_enabled=fs,
+          first_seen=sqlite_utils.IntToRDFDatetime(first),
+          ping=sqlite_utils.IntToRDFDatetime(ping),
+          clock=sqlite_utils.IntToRDFDatetime(clk),
+          ip=mysql_utils.StringToRDFProto(rdf_client_network.NetworkAddress,
+                                          ip),
+          last_foreman_time=sqlite_utils.IntToRDFDatetime(foreman),
+          startup_info_timestamp=sqlite_utils.IntToRDFDatetime(lst),
+          last_crash_timestamp=sqlite_utils.IntToRDFDatetime(lct))
+    return ret
+
+  @mysql_utils.WithTransaction()
+  def WriteClientSnapshot(self, client, cursor=None):
+    """Write new client snapshot."""
+    startup_info = client.startup_info
+    client.startup_info = None
+
+    insert_history_query = (
+        "INSERT INTO client_snapshot_history(client_id, timestamp, "
+        "client_snapshot) VALUES (?, ?, ?)")
+    insert_startup_query = (
+        "INSERT INTO client_startup_history(client_id, timestamp, "
+        "startup_info) VALUES(?, ?, ?)")
+    update_query = ("UPDATE clients SET last_client_timestamp=?, "
+                    "last_startup_timestamp=? "
+                    "WHERE client_id = ?")
+
+    client_id = client.client_id
+    timestamp = sqlite_utils.NowInt()
+
+    try:
+      cursor.execute(
+          insert_history_query,
+          (client_id, timestamp, sqlite_utils.Blob(client.SerializeToString())))
+      cursor.execute(insert_startup_query,
+                     (client_id, timestamp,
+                      sqlite_utils.Blob(startup_info.SerializeToString())))
+      cursor.execute(update_query, (timestamp, timestamp, client_id))
+    except sqlite3.IntegrityError as e:
+      raise db.UnknownClientError(client_id, cause=e)
+    finally:
+      client.startup_info = startup_info
+
+  @mysql_utils.WithTransaction(readonly=True)
+  def MultiReadClientSnapshot(self, client_ids, cursor=None):
+    """Reads the latest client snapshots for a list of clients."""
+    query = (
+        "SELECT h.client_id, h.client_snapshot, h.timestamp, s.startup_info "
+        "FROM clients as c, client_snapshot_history as h, "
+        "client_startup_history as s "
+        "WHERE h.client_id = c.client_id "
+        "AND s.client_id = c.client_id "
+        "AND h.timestamp = c.last_client_timestamp "
+        "AND s.timestamp = c.last_startup_timestamp "
+        "AND c.client_id IN ({})").format(", ".join(["?"] * len(client_ids)))
+    ret = {cid: None for cid in client_ids}
+    cursor.execute(query, list(client_ids))
+    for cid, snapshot, timestamp, startup_info in cursor.fetchall():
+      client_obj = mysql_utils.StringToRDFProto(rdf_objects.ClientSnapshot,
+                                                snapshot)
+      client_obj.startup_info = mysql_utils.StringToRDFProto(
+          rdf_client.StartupInfo, startup_info)
+      client_obj.timestamp = sqlite_utils.IntToRDFDatetime(timestamp)
+      ret[cid] = client_obj
+    return ret
+
+  @mysql_utils.WithTransaction(readonly=True)
+  def ReadClientSnapshotHistory(self, client_id, timerange=None, cursor=None):
+    """Reads the full history for a particular client."""
+    query = ("SELECT sn.client_snapshot, st.startup_info, sn.timestamp FROM "
+             "client_snapshot_history AS sn, "
+             "client_startup_history AS st WHERE "
+             "sn.client_id = st.client_id AND "
+             "sn.timestamp = st.timestamp AND "
+             "sn.client_id=? ")
+
+    args = [client_id]
+    if timerange:
+      time_from, time_to = timerange  # pylint: disable=unpacking-non-sequence
+
+      if time_from is not None:
+        query += "AND sn.timestamp >= ? "
+        args.append(sqlite_utils.RDFDatetimeToInt(time_from))
+
+      if time_to is not None:
+        query += "AND sn.timestamp <= ? "
+        args.append(sqlite_utils.RDFDatetimeToInt(time_to))
+
+    query += "ORDER BY sn.timestamp DESC"
+
+    ret = []
+    cursor.execute(query, args)
+    for snapshot, startup_info, timestamp in cursor.fetchall():
+      client = rdf_objects.ClientSnapshot.FromSerializedString(snapshot)
+      client.startup_info = rdf_client.StartupInfo.FromSerializedString(
+          startup_info)
+      client.timestamp = sqlite_utils.IntToRDFDatetime(timestamp)
+
+      ret.append(client)
+    return ret
+
+  @mysql_utils.WithTransaction()
+  def WriteClientSnapshotHistory(self, clients, cursor=None):
+    """Writes the full history for a particular client."""
+    client_id = clients[0].client_id
+    snapshot_rows = []
+    startup_rows = []
+    for client in clients:
+      startup_info = client.startup_info
+      client.startup_info = None
+      try:
+        timestamp = sqlite_utils.RDFDatetimeToInt(client.timestamp)
+        snapshot_rows.append(
+            (client_id, timestamp,
+             sqlite_utils.Blob(client.SerializeToString())))
+        startup_rows.append(
+            (client_id, timestamp,
+             sqlite_utils.Blob(startup_info.SerializeToString())))
+      finally:
+        client.startup_info = startup_info
+
+    latest_timestamp = max(timestamp for _, timestamp, _ in snapshot_rows)
+    try:
+      cursor.executemany(
+          "INSERT INTO client_snapshot_history "
+          "(client_id, timestamp, client_snapshot) VALUES (?, ?, ?)",
+          snapshot_rows)
+      cursor.executemany(
+          "INSERT INTO client_startup_history "
+          "(client_id, timestamp, startup_info) VALUES (?, ?, ?)",
+          startup_rows)
+    except sqlite3.IntegrityError as e:
+      raise db.UnknownClientError(client_id, cause=e)
+
+    cursor.execute(
+        "UPDATE clients SET last_client_timestamp=? "
+        "WHERE client_id = ? AND "
+        "(last_client_timestamp IS NULL OR last_client_timestamp < ?)",
+        [latest_timestamp, client_id, latest_timestamp])
+    cursor.execute(
+        "UPDATE clients SET last_startup_timestamp=? "
+        "WHERE client_id = ? AND "
+        "(last_startup_timestamp IS NULL OR last_startup_timestamp < ?)",
+        [latest_timestamp, client_id, latest_timestamp])
+
+  @mysql_utils.WithTransaction()
+  def WriteClientStartupInfo(self, client_id, startup_info, cursor=None):
+    """Writes a new client startup record."""
+    now = sqlite_utils.NowInt()
+
+    try:
+      cursor.execute(
+          "INSERT INTO client_startup_history "
+          "(client_id, timestamp, startup_info) "
+          "VALUES (?, ?, ?)",
+          [client_id, now,
+           sqlite_utils.Blob(startup_info.SerializeToString())])
+      cursor.execute(
+          "UPDATE clients SET last_startup_timestamp = ? WHERE client_id=?",
+          [now, client_id])
+    except sqlite3.IntegrityError as e:
+      raise db.UnknownClientError(client_id, cause=e)
+
+  @mysql_utils.WithTransaction(readonly=True)
+  def ReadClientStartupInfo(self, client_id, cursor=None):
+    """Reads the latest client startup record for a single client."""
+    query = (
+        "SELECT startup_info, timestamp FROM clients, client_startup_history "
+        "WHERE clients.last_startup_timestamp=client_startup_history.timestamp "
+        "AND clients.client_id=client_startup_history.client_id "
+        "AND clients.client_id=?")
+    cursor.execute(query, [client_id])
+    row = cursor.fetchone()
+    if row is None:
+      return None
+
+    startup_info, timestamp = row
+    res = rdf_client.StartupInfo.FromSerializedString(startup_info)
+    res.timestamp = sqlite_utils.IntToRDFDatetime(timestamp)
+    return res
+
+  @mysql_utils.WithTransaction(readonly=True)
+  def ReadClientStartupInfoHistory(self, client_id, timerange=None,
+                                   cursor=None):
+    """Reads the full startup history for a particular client."""
+    query = ("SELECT startup_info, timestamp FROM client_startup_history "
+             "WHERE client_id=? ")
+    args = [client_id]
+
+    if timerange:
+      time_from, time_to = timerange  # pylint: disable=unpacking-non-sequence
+
+      if time_from is not None:
+        query += "AND timestamp >= ? "
+        args.append(sqlite_utils.RDFDatetimeToInt(time_from))
+
+      if time_to is not None:
+        query += "AND timestamp <= ? "
+        args.append(sqlite_utils.RDFDatetimeToInt(time_to))
+
+    query += "ORDER BY timestamp DESC "
+
+    ret = []
+    cursor.execute(query, args)
+
+    for startup_info, timestamp in cursor.fetchall():
+      si = rdf_client.StartupInfo.FromSerializedString(startup_info)
+      si.timestamp = sqlite_utils.IntToRDFDatetime(timestamp)
+      ret.append(si)
+    return ret
+
+  def _ResponseToClientsFullInfo(self, response):
+    """Creates a ClientFullInfo object from a database response."""
+    c_full_info = None
+    prev_cid = None
+    for row in response:
+      (cid, fs, crt, ping, clk, ip, foreman, first, last_client_ts,
+       last_crash_ts, last_startup_ts, client_obj, client_startup_obj,
+       last_startup_obj, label_owner, label_name) = row
+
+      if cid != prev_cid:
+        if c_full_info:
+          yield prev_cid, c_full_info
+
+        metadata = rdf_objects.ClientMetadata(
+            certificate=crt,
+            fleetspeak_enabled=fs,
+            first_seen=sqlite_utils.IntToRDFDatetime(first),
+            ping=sqlite_utils.IntToRDFDatetime(ping),
+            clock=sqlite_utils.IntToRDFDatetime(clk),
+            ip=mysql_utils.StringToRDFProto(rdf_client_network.NetworkAddress,
+                                            ip),
+            last_foreman_time=sqlite_utils.IntToRDFDatetime(foreman),
+            startup_info_timestamp=sqlite_utils.IntToRDFDatetime(
+                last_startup_ts),
+            last_crash_timestamp=sqlite_utils.IntToRDFDatetime(last_crash_ts))
+
+        if client_obj is not None:
+          l_snapshot = rdf_objects.ClientSnapshot.FromSerializedString(
+              client_obj)
+          l_snapshot.timestamp = sqlite_utils.IntToRDFDatetime(last_client_ts)
+          l_snapshot.startup_info = rdf_client.StartupInfo.FromSerializedString(
+              client_startup_obj)
+          l_snapshot.startup_info.timestamp = l_snapshot.timestamp
+        else:
+          l_snapshot = rdf_objects.ClientSnapshot(client_id=cid)
+
+        if last_startup_obj is not None:
+          startup_info = rdf_client.StartupInfo.FromSerializedString(
+              last_startup_obj)
+          startup_info.timestamp = sqlite_utils.IntToRDFDatetime(
+              last_startup_ts)
+        else:
+          startup_info = None
+
+        prev_cid = cid
+        c_full_info = rdf_objects.ClientFullInfo(
+            metadata=metadata,
+            labels=[],
+            last_snapshot=l_snapshot,
+            last_startup_info=startup_info)
+
+      if label_owner and label_name:
+        c_full_info.labels.append(
+            rdf_objects.ClientLabel(name=label_name, owner=label_owner))
+
+    if c_full_info:
+      yield prev_cid, c_full_info
+
+  @mysql_utils.WithTransaction(readonly=True)
+  def MultiReadClientFullInfo(self, client_ids, min_last_ping=None,
+                              cursor=None):
+    """Reads full client information for a list of clients."""
+    query = (
+        "SELECT "
+        "c.client_id, c.fleetspeak_enabled, c.certificate, c.last_ping, "
+        "c.last_clock, c.last_ip, c.last_foreman, c.first_seen, "
+        "c.last_client_timestamp, c.last_crash_timestamp, "
+        "c.last_startup_timestamp, h.client_snapshot, s.startup_info, "
+        "s_last.startup_info, l.owner_username, l.label "
+        "FROM clients as c "
+        "LEFT JOIN client_snapshot_history as h ON ( "
+        "c.client_id = h.client_id AND h.timestamp = c.last_client_timestamp) "
+        "LEFT JOIN client_startup_history as s ON ( "
+        "c.client_id = s.client_id AND s.timestamp = c.last_client_timestamp) "
+        "LEFT JOIN client_startup_history as s_last ON ( "
+        "c.client_id = s_last.client_id "
+        "AND s_last.timestamp = c.last_startup_timestamp) "
+        "LEFT JOIN client_labels AS l ON (c.client_id = l.client_id) ")
+
+    query += "WHERE c.client_id IN (%s) " % ", ".join(["?"] * len(client_ids))
+
+    values = list(client_ids)
+    if min_last_ping is not None:
+      query += "AND c.last_ping >= ? "
+      values.append(sqlite_utils.RDFDatetimeToInt(min_last_ping))
+
+    # _ResponseToClientsFullInfo expects the rows of a client to be adjacent.
+    query += "ORDER BY c.client_id"
+
+    cursor.execute(query, values)
+    ret = {}
+    for c_id, c_info in self._ResponseToClientsFullInfo(cursor.fetchall()):
+      ret[c_id] = c_info
+
+    return ret
+
+  @mysql_utils.WithTransaction(readonly=True)
+  def ReadAllClientIDs(self, min_last_ping=None, cursor=None):
+    """Reads client ids for all clients in the database."""
+    query = "SELECT client_id FROM clients "
+    query_values = []
+    if min_last_ping is not None:
+      query += "WHERE last_ping >= ?"
+      query_values.append(sqlite_utils.RDFDatetimeToInt(min_last_ping))
+    cursor.execute(query, query_values)
+    return [res[0] for res in cursor.fetchall()]
+
+  @mysql_utils.WithTransaction()
+  def AddClientKeywords(self, client_id, keywords, cursor=None):
+    """Associates the provided keywords with the client."""
+    now = sqlite_utils.NowInt()
+    try:
+      cursor.executemany(
+          "INSERT OR REPLACE INTO client_keywords "
+          "(client_id, keyword, timestamp) VALUES (?, ?, ?)",
+          [(client_id, kw, now) for kw in set(keywords)])
+    except sqlite3.IntegrityError as e:
+      raise db.UnknownClientError(client_id, cause=e)
+
+  @mysql_utils.WithTransaction()
+  def RemoveClientKeyword(self, client_id, keyword, cursor=None):
+    """Removes the association of a particular client to a keyword."""
+    cursor.execute(
+        "DELETE FROM client_keywords WHERE client_id = ? AND keyword = ?",
+        [client_id, keyword])
+
+  @mysql_utils.WithTransaction(readonly=True)
+  def ListClientsForKeywords(self, keywords, start_time=None, cursor=None):
+    """Lists the clients associated with keywords."""
+    keywords = set(keywords)
+    result = {kw: [] for kw in keywords}
+
+    query = ("SELECT keyword, client_id FROM client_keywords "
+             "WHERE keyword IN ({})").format(", ".join(["?"] * len(result)))
+    args = list(keywords)
+    if start_time:
+      query += " AND timestamp >= ?"
+      args.append(sqlite_utils.RDFDatetimeToInt(start_time))
+    cursor.execute(query, args)
+
+    for kw, cid in cursor.fetchall():
+      result[kw].append(cid)
+    return result
+
+  @mysql_utils.WithTransaction(readonly=True)
+  def ListClientsForAllKeywords(self,
+                                keywords,
+                                offset,
+                                count,
+                                start_time=None,
+                                cursor=None):
+    """Lists the clients associated with all of the given keywords."""
+    keywords = set(keywords)
+
+    query = ("SELECT client_id FROM client_keywords "
+             "WHERE keyword IN ({})").format(", ".join(["?"] * len(keywords)))
+    args = list(keywords)
+    if start_time:
+      query += " AND timestamp >= ?"
+      args.append(sqlite_utils.RDFDatetimeToInt(start_time))
+    query += (" GROUP BY client_id HAVING COUNT(*) = ? "
+              "ORDER BY client_id LIMIT ? OFFSET ?")
+    args.extend([len(keywords), count, offset])
+    cursor.execute(query, args)
+
+    return [cid for cid, in cursor.fetchall()]
+
+  @mysql_utils.WithTransaction(readonly=True)
+  def EstimateClientsForAllKeywords(self, keywords, start_time=None,
+                                    cursor=None):
+    """Estimates the number of clients associated with all given keywords."""
+    keywords = set(keywords)
+
+    query = ("SELECT COUNT(*) FROM client_keywords "
+             "WHERE keyword IN ({})").format(", ".join(["?"] * len(keywords)))
+    args = list(keywords)
+    if start_time:
+      query += " AND timestamp >= ?"
+      args.append(sqlite_utils.RDFDatetimeToInt(start_time))
+    query += " GROUP BY keyword"
+    cursor.execute(query, args)
+
+    counts = [count for count, in cursor.fetchall()]
+    # Keywords without any clients don't have a row.
+    if len(counts) < len(keywords):
+      return 0
+    return min(counts)
+
+  @mysql_utils.WithTransaction()
+  def AddClientLabels(self, client_id, owner, labels, cursor=None):
+    """Attaches a list of user labels to a client."""
+    try:
+      cursor.executemany(
+          "INSERT OR IGNORE INTO client_labels "
+          "(client_id, owner_username, label) VALUES (?, ?, ?)",
+          [(client_id, owner, label) for label in set(labels)])
+    except sqlite3.IntegrityError as e:
+      raise db.UnknownClientError(client_id, cause=e)
+
+  @mysql_utils.WithTransaction(readonly=True)
+  def MultiReadClientLabels(self, client_ids, cursor=None):
+    """Reads the user labels for a list of clients."""
+    query = ("SELECT client_id, owner_username, label "
+             "FROM client_labels "
+             "WHERE client_id IN ({})").format(", ".join(
+                 ["?"] * len(client_ids)))
+
+    ret = {client_id: [] for client_id in client_ids}
+    cursor.execute(query, list(client_ids))
+    for client_id, owner, label in cursor.fetchall():
+      ret[client_id].append(rdf_objects.ClientLabel(name=label, owner=owner))
+
+    for r in itervalues(ret):
+      r.sort(key=lambda label: (label.owner, label.name))
+    return ret
+
+  @mysql_utils.WithTransaction()
+  def RemoveClientLabels(self, client_id, owner, labels, cursor=None):
+    """Removes a list of user labels from a given client."""
+    query = ("DELETE FROM client_labels "
+             "WHERE client_id = ? AND owner_username = ? "
+             "AND label IN ({})").format(", ".join(["?"] * len(labels)))
+    cursor.execute(query, [client_id, owner] + list(labels))
+
+  @mysql_utils.WithTransaction(readonly=True)
+  def ReadAllClientLabels(self, cursor=None):
+    """Reads the user labels for a list of clients."""
+    cursor.execute("SELECT DISTINCT owner_username, label FROM client_labels")
+
+    result = []
+    for owner, label in cursor.fetchall():
+      result.append(rdf_objects.ClientLabel(name=label, owner=owner))
+
+    result.sort(key=lambda label: (label.owner, label.name))
+    return result
+
+  @mysql_utils.WithTransaction()
+  def WriteClientCrashInfo(self, client_id, crash_info, cursor=None):
+    """Writes a new client crash record."""
+    now = sqlite_utils.NowInt()
+    try:
+      cursor.execute(
+          "INSERT INTO client_crash_history (client_id, timestamp, crash_info) "
+          "VALUES (?, ?, ?)",
+          [client_id, now, sqlite_utils.Blob(crash_info.SerializeToString())])
+      cursor.execute(
+          "UPDATE clients SET last_crash_timestamp = ? WHERE client_id=?",
+          [now, client_id])
+    except sqlite3.IntegrityError as e:
+      raise db.UnknownClientError(client_id, cause=e)
+
+  @mysql_utils.WithTransaction(readonly=True)
+  def ReadClientCrashInfo(self, client_id, cursor=None):
+    """Reads the latest client crash record for a single client."""
+    cursor.execute(
+        "SELECT timestamp, crash_info FROM clients, client_crash_history WHERE "
+        "clients.client_id = client_crash_history.client_id AND "
+        "clients.last_crash_timestamp = client_crash_history.timestamp AND "
+        "clients.client_id = ?", [client_id])
+    row = cursor.fetchone()
+    if not row:
+      return None
+
+    timestamp, crash_info = row
+    res = rdf_client.ClientCrash.FromSerializedString(crash_info)
+    res.timestamp = sqlite_utils.IntToRDFDatetime(timestamp)
+    return res
+
+  @mysql_utils.WithTransaction(readonly=True)
+  def ReadClientCrashInfoHistory(self, client_id, cursor=None):
+    """Reads the full crash history for a particular client."""
+    cursor.execute(
+        "SELECT timestamp, crash_info FROM client_crash_history "
+        "WHERE client_id = ? ORDER BY timestamp DESC", [client_id])
+    ret = []
+    for timestamp, crash_info in cursor.fetchall():
+      ci = rdf_client.ClientCrash.FromSerializedString(crash_info)
+      ci.timestamp = sqlite_utils.IntToRDFDatetime(timestamp)
+      ret.append(ci)
+    return ret
+
+  @mysql_utils.WithTransaction()
+  def WriteClientStats(self,
+                       client_id,
+                       stats,
+                       cursor = None):
+    """Stores a ClientStats instance."""
+    try:
+      cursor.execute(
+          "INSERT OR REPLACE INTO client_stats (client_id, payload, timestamp) "
+          "VALUES (?, ?, ?)", [
+              client_id,
+              sqlite_utils.Blob(stats.SerializeToString()),
+              sqlite_utils.RDFDatetimeToInt(stats.create_time)
+          ])
+    except sqlite3.IntegrityError as e:
+      raise db.UnknownClientError(client_id, cause=e)
+
+  @mysql_utils.WithTransaction(readonly=True)
+  def ReadClientStats(self,
+                      client_id,
+                      min_timestamp,
+                      max_timestamp,
+                      cursor = None
+                     ):
+    """Reads ClientStats for a given client and time range."""
+    cursor.execute(
+        "SELECT payload FROM client_stats "
+        "WHERE client_id = ? AND timestamp BETWEEN ? AND ? "
+        "ORDER BY timestamp ASC", [
+            client_id,
+            sqlite_utils.RDFDatetimeToInt(min_timestamp),
+            sqlite_utils.RDFDatetimeToInt(max_timestamp)
+        ])
+    return [
+        rdf_client_stats.ClientStats.FromSerializedString(stats_bytes)
+        for stats_bytes, in cursor.fetchall()
+    ]
+
+  # DeleteOldClientStats does not use a single transaction, since it runs for
+  # a long time. Instead, it uses multiple transactions internally.
+  def DeleteOldClientStats(
+      self, yield_after_count,
+      retention_time):
+    """Deletes ClientStats older than a given timestamp."""
+
+    yielded = False
+
+    while True:
+      deleted_count = self._DeleteClientStats(
+          limit=yield_after_count, retention_time=retention_time)
+
+      # Do not yield a trailing 0 after any non-zero count has been yielded.
+      # A trailing zero occurs, when an exact multiple of `yield_after_count`
+      # rows were in the table.
+      if not yielded or deleted_count > 0:
+        yield deleted_count
+        yielded = True
+
+      # Return, when no more rows can be deleted, indicated by a transaction
+      # that does not reach the deletion limit.
+      if deleted_count < yield_after_count:
+        return
+
+  @mysql_utils.WithTransaction()
+  def _DeleteClientStats(
+      self,
+      limit,
+      retention_time,
+      cursor = None):
+    """Deletes up to `limit` ClientStats older than `retention_time`."""
+    # DELETE ... LIMIT is a compile time option of SQLite.
+    cursor.execute(
+        "DELETE FROM client_stats WHERE rowid IN ("
+        "SELECT rowid FROM client_stats WHERE timestamp < ? LIMIT ?)",
+        [sqlite_utils.RDFDatetimeToInt(retention_time), limit])
+    return cursor.rowcount
+
+
+def _ClientMetadataColumns(client_id,
+                           certificate=None,
+                           fleetspeak_enabled=None,
+                           first_seen=None,
+                           last_ping=None,
+                           last_clock=None,
+                           last_ip=None,
+                           last_foreman=None):
+  """Returns columns and values of the clients table to write."""
+  columns = ["client_id"]
+  values = [client_id]
+  if certificate:
+    columns.append("certificate")
+    values.append(sqlite_utils.Blob(certificate.SerializeToString()))
+  if fleetspeak_enabled is not None:
+    columns.append("fleetspeak_enabled")
+    values.append(int(fleetspeak_enabled))
+  if first_seen:
+    columns.append("first_seen")
+    values.append(sqlite_utils.RDFDatetimeToInt(first_seen))
+  if last_ping:
+    columns.append("last_ping")
+    values.append(sqlite_utils.RDFDatetimeToInt(last_ping))
+  if last_clock:
+    columns.append("last_clock")
+    values.append(sqlite_utils.RDFDatetimeToInt(last_clock))
+  if last_ip:
+    columns.append("last_ip")
+    values.append(sqlite_utils.Blob(last_ip.SerializeToString()))
+  if last_foreman:
+    columns.append("last_foreman")
+    values.append(sqlite_utils.RDFDatetimeToInt(last_foreman))
+
+  return columns, values
+
+
+def _UpsertClientMetadata(columns, rows, cursor):
+  """Inserts or updates rows of the clients table setting given columns.
+
+  The clients table is referenced by most other tables, so rows are never
+  replaced, which would delete the referencing rows.
+
+  Args:
+    columns: Names of the columns to set, the first one is client_id.
+    rows: Lists of values of the columns.
+    cursor: sqlite3.Cursor to use.
+  """
+  cursor.executemany("INSERT OR IGNORE INTO clients (client_id) VALUES (?)",
+                     [row[:1] for row in rows])
+  if len(columns) > 1:
+    query = "UPDATE clients SET {} WHERE client_id = ?".format(", ".join(
+        "{} = ?".format(col) for col in columns[1:]))
+    cursor.executemany(query, [row[1:] + row[:1] for row in rows])
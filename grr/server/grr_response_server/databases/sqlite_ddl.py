@@ -0,0 +1,401 @@
+#!/usr/bin/env python
+"""A collection of DDL for use by the SQLite database implementation.
+
+Unlike in the MySQL schema, ids and names are stored as they are: SQLite has
+no index length limit that would require hashing them. Timestamps are integer
+microseconds since epoch and binary columns are declared as BYTES (see
+sqlite_utils.BYTES_TYPE).
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+
+SCHEMA_SETUP = [
+    """
+CREATE TABLE IF NOT EXISTS artifacts(
+    name TEXT PRIMARY KEY,
+    definition BYTES NOT NULL
+)""", """
+CREATE TABLE IF NOT EXISTS clients(
+    client_id TEXT PRIMARY KEY,
+    last_client_timestamp INTEGER,
+    last_startup_timestamp INTEGER,
+    last_crash_timestamp INTEGER,
+    fleetspeak_enabled INTEGER,
+    certificate BYTES,
+    last_ping INTEGER,
+    last_clock INTEGER,
+    last_ip BYTES,
+    last_foreman INTEGER,
+    first_seen INTEGER
+)""", """
+CREATE INDEX IF NOT EXISTS clients_last_ping_idx ON clients(last_ping)
+""", """
+CREATE TABLE IF NOT EXISTS client_labels(
+    client_id TEXT NOT NULL REFERENCES clients(client_id) ON DELETE CASCADE,
+    owner_username TEXT NOT NULL,
+    label TEXT NOT NULL,
+    PRIMARY KEY (client_id, owner_username, label)
+)""", """
+CREATE INDEX IF NOT EXISTS client_labels_owner_label_idx
+    ON client_labels(owner_username, label)
+""", """
+CREATE TABLE IF NOT EXISTS client_snapshot_history(
+    client_id TEXT NOT NULL REFERENCES clients(client_id) ON DELETE CASCADE,
+    timestamp INTEGER NOT NULL,
+    client_snapshot BYTES NOT NULL,
+    PRIMARY KEY (client_id, timestamp)
+)""", """
+CREATE TABLE IF NOT EXISTS client_startup_history(
+    client_id TEXT NOT NULL REFERENCES clients(client_id) ON DELETE CASCADE,
+    timestamp INTEGER NOT NULL,
+    startup_info BYTES NOT NULL,
+    PRIMARY KEY (client_id, timestamp)
+)""", """
+CREATE TABLE IF NOT EXISTS client_crash_history(
+    client_id TEXT NOT NULL REFERENCES clients(client_id) ON DELETE CASCADE,
+    timestamp INTEGER NOT NULL,
+    crash_info BYTES NOT NULL,
+    PRIMARY KEY (client_id, timestamp)
+)""", """
+CREATE TABLE IF NOT EXISTS client_keywords(
+    client_id TEXT NOT NULL REFERENCES clients(client_id) ON DELETE CASCADE,
+    keyword TEXT NOT NULL,
+    timestamp INTEGER NOT NULL,
+    PRIMARY KEY (client_id, keyword)
+)""", """
+CREATE INDEX IF NOT EXISTS client_keywords_keyword_idx
+    ON client_keywords(keyword, client_id, timestamp)
+""", """
+CREATE TABLE IF NOT EXISTS client_stats(
+    client_id TEXT NOT NULL REFERENCES clients(client_id) ON DELETE CASCADE,
+    timestamp INTEGER NOT NULL,
+    payload BYTES NOT NULL,
+    PRIMARY KEY (client_id, timestamp)
+)""", """
+CREATE INDEX IF NOT EXISTS client_stats_timestamp_idx
+    ON client_stats(timestamp)
+""", """
+CREATE TABLE IF NOT EXISTS grr_users(
+    username TEXT PRIMARY KEY,
+    password BYTES,
+    ui_mode INTEGER,
+    canary_mode INTEGER,
+    user_type INTEGER
+)""", """
+CREATE TABLE IF NOT EXISTS approval_requests(
+    username TEXT NOT NULL REFERENCES grr_users(username) ON DELETE CASCADE,
+    -- Approval ids are unsigned 64 bit integers, which do not fit SQLite's
+    -- signed integers, so their hex representation is stored.
+    approval_id TEXT NOT NULL,
+    approval_type INTEGER NOT NULL,
+    subject_id TEXT,
+    timestamp INTEGER NOT NULL,
+    expiration_time INTEGER,
+    approval_request BYTES NOT NULL,
+    PRIMARY KEY (username, approval_id)
+)""", """
+CREATE INDEX IF NOT EXISTS approval_requests_type_subject_idx
+    ON approval_requests(username, approval_type, subject_id)
+""", """
+CREATE TABLE IF NOT EXISTS approval_grants(
+    username TEXT NOT NULL,
+    approval_id TEXT NOT NULL,
+    grantor_username TEXT NOT NULL,
+    timestamp INTEGER NOT NULL,
+    PRIMARY KEY (username, approval_id, grantor_username, timestamp),
+    FOREIGN KEY (username, approval_id)
+    REFERENCES approval_requests(username, approval_id) ON DELETE CASCADE
+)""", """
+CREATE TABLE IF NOT EXISTS user_notifications(
+    username TEXT NOT NULL REFERENCES grr_users(username) ON DELETE CASCADE,
+    timestamp INTEGER NOT NULL,
+    notification_state INTEGER NOT NULL,
+    notification BYTES NOT NULL,
+    PRIMARY KEY (username, timestamp)
+)""", """
+CREATE TABLE IF NOT EXISTS api_audit_entries(
+    entry_id INTEGER PRIMARY KEY,
+    username TEXT NOT NULL,
+    router_method_name TEXT,
+    timestamp INTEGER NOT NULL,
+    details BYTES NOT NULL
+)""", """
+CREATE INDEX IF NOT EXISTS api_audit_entries_timestamp_idx
+    ON api_audit_entries(timestamp)
+""", """
+CREATE INDEX IF NOT EXISTS api_audit_entries_username_idx
+    ON api_audit_entries(username, timestamp)
+""", """
+CREATE TABLE IF NOT EXISTS api_audit_daily_counts(
+    day INTEGER NOT NULL,
+    username TEXT NOT NULL,
+    router_method_name TEXT NOT NULL,
+    entry_count INTEGER NOT NULL,
+    PRIMARY KEY (day, username, router_method_name)
+)""", """
+CREATE TABLE IF NOT EXISTS api_audit_rolled_up_days(
+    day INTEGER PRIMARY KEY
+)""", """
+CREATE TABLE IF NOT EXISTS message_handler_requests(
+    handler_name TEXT NOT NULL,
+    request_id INTEGER NOT NULL,
+    timestamp INTEGER NOT NULL,
+    request BYTES NOT NULL,
+    leased_until INTEGER,
+    leased_by TEXT,
+    PRIMARY KEY (handler_name, request_id)
+)""", """
+CREATE INDEX IF NOT EXISTS message_handler_requests_leased_until_idx
+    ON message_handler_requests(leased_until)
+""", """
+CREATE TABLE IF NOT EXISTS foreman_rules(
+    hunt_id TEXT PRIMARY KEY,
+    expiration_time INTEGER,
+    rule BYTES NOT NULL
+)""", """
+CREATE TABLE IF NOT EXISTS cron_jobs(
+    job_id TEXT PRIMARY KEY,
+    job BYTES NOT NULL,
+    create_time INTEGER,
+    current_run_id TEXT,
+    enabled INTEGER,
+    forced_run_requested INTEGER,
+    last_run_time INTEGER,
+    last_run_status INTEGER,
+    state BYTES,
+    leased_until INTEGER,
+    leased_by TEXT
+)""", """
+CREATE TABLE IF NOT EXISTS cron_job_runs(
+    job_id TEXT NOT NULL REFERENCES cron_jobs(job_id) ON DELETE CASCADE,
+    run_id TEXT NOT NULL,
+    write_time INTEGER NOT NULL,
+    run BYTES NOT NULL,
+    PRIMARY KEY (job_id, run_id)
+)""", """
+CREATE INDEX IF NOT EXISTS cron_job_runs_write_time_idx
+    ON cron_job_runs(write_time)
+""", """
+CREATE TABLE IF NOT EXISTS client_messages(
+    client_id TEXT NOT NULL REFERENCES clients(client_id) ON DELETE CASCADE,
+    message_id INTEGER NOT NULL,
+    timestamp INTEGER NOT NULL,
+    message BYTES NOT NULL,
+    leased_until INTEGER,
+    leased_by TEXT,
+    leased_count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (client_id, message_id)
+)""", """
+CREATE TABLE IF NOT EXISTS flows(
+    client_id TEXT NOT NULL REFERENCES clients(client_id) ON DELETE CASCADE,
+    flow_id TEXT NOT NULL,
+    long_flow_id TEXT,
+    parent_flow_id TEXT,
+    parent_hunt_id TEXT,
+    flow BYTES NOT NULL,
+    -- Denormalized from the flow object to maintain hunt_flow_counts.
+    flow_state INTEGER NOT NULL DEFAULT 0,
+    crashed INTEGER NOT NULL DEFAULT 0,
+    has_results INTEGER NOT NULL DEFAULT 0,
+    client_crash_info BYTES,
+    next_request_to_process INTEGER,
+    pending_termination BYTES,
+    processing_deadline INTEGER,
+    processing_on TEXT,
+    processing_since INTEGER,
+    timestamp INTEGER,
+    last_update INTEGER,
+    PRIMARY KEY (client_id, flow_id)
+)""", """
+CREATE INDEX IF NOT EXISTS flows_timestamp_idx ON flows(timestamp)
+""", """
+CREATE INDEX IF NOT EXISTS flows_parent_flow_id_idx
+    ON flows(client_id, parent_flow_id)
+""", """
+CREATE INDEX IF NOT EXISTS flows_parent_hunt_id_idx
+    ON flows(parent_hunt_id, last_update)
+""", """
+CREATE TABLE IF NOT EXISTS flow_requests(
+    client_id TEXT NOT NULL,
+    flow_id TEXT NOT NULL,
+    request_id INTEGER NOT NULL,
+    needs_processing INTEGER NOT NULL DEFAULT 0,
+    responses_expected INTEGER,
+    request BYTES NOT NULL,
+    timestamp INTEGER NOT NULL,
+    PRIMARY KEY (client_id, flow_id, request_id),
+    FOREIGN KEY (client_id, flow_id)
+    REFERENCES flows(client_id, flow_id) ON DELETE CASCADE
+)""", """
+CREATE TABLE IF NOT EXISTS flow_responses(
+    client_id TEXT NOT NULL,
+    flow_id TEXT NOT NULL,
+    request_id INTEGER NOT NULL,
+    response_id INTEGER NOT NULL,
+    response BYTES,
+    status BYTES,
+    iterator BYTES,
+    timestamp INTEGER NOT NULL,
+    PRIMARY KEY (client_id, flow_id, request_id, response_id),
+    FOREIGN KEY (client_id, flow_id, request_id)
+    REFERENCES flow_requests(client_id, flow_id, request_id) ON DELETE CASCADE
+)""", """
+CREATE TABLE IF NOT EXISTS flow_processing_requests(
+    client_id TEXT NOT NULL,
+    flow_id TEXT NOT NULL,
+    timestamp INTEGER NOT NULL,
+    request BYTES NOT NULL,
+    delivery_time INTEGER,
+    leased_until INTEGER,
+    leased_by TEXT,
+    PRIMARY KEY (client_id, flow_id, timestamp),
+    FOREIGN KEY (client_id, flow_id)
+    REFERENCES flows(client_id, flow_id) ON DELETE CASCADE
+)""", """
+CREATE INDEX IF NOT EXISTS flow_processing_requests_leased_until_idx
+    ON flow_processing_requests(leased_until)
+""", """
+CREATE TABLE IF NOT EXISTS client_paths(
+    client_id TEXT NOT NULL REFERENCES clients(client_id) ON DELETE CASCADE,
+    path_type INTEGER NOT NULL,
+    path_id BYTES NOT NULL,
+    -- The default BINARY collation makes prefix ranges on `path` match
+    -- component prefixes.
+    path TEXT NOT NULL,
+    directory INTEGER NOT NULL DEFAULT 0,
+    depth INTEGER NOT NULL,
+    timestamp INTEGER NOT NULL,
+    last_stat_entry_timestamp INTEGER,
+    last_hash_entry_timestamp INTEGER,
+    PRIMARY KEY (client_id, path_type, path_id)
+)""", """
+CREATE INDEX IF NOT EXISTS client_paths_path_idx
+    ON client_paths(client_id, path_type, path)
+""", """
+CREATE TABLE IF NOT EXISTS client_path_stat_entries(
+    client_id TEXT NOT NULL,
+    path_type INTEGER NOT NULL,
+    path_id BYTES NOT NULL,
+    timestamp INTEGER NOT NULL,
+    stat_entry BYTES NOT NULL,
+    PRIMARY KEY (client_id, path_type, path_id, timestamp),
+    FOREIGN KEY (client_id, path_type, path_id)
+    REFERENCES client_paths(client_id, path_type, path_id) ON DELETE CASCADE
+)""", """
+CREATE TABLE IF NOT EXISTS client_path_hash_entries(
+    client_id TEXT NOT NULL,
+    path_type INTEGER NOT NULL,
+    path_id BYTES NOT NULL,
+    timestamp INTEGER NOT NULL,
+    hash_entry BYTES NOT NULL,
+    sha256 BYTES,
+    PRIMARY KEY (client_id, path_type, path_id, timestamp),
+    FOREIGN KEY (client_id, path_type, path_id)
+    REFERENCES client_paths(client_id, path_type, path_id) ON DELETE CASCADE
+)""", """
+CREATE INDEX IF NOT EXISTS client_path_hash_entries_sha256_idx
+    ON client_path_hash_entries(sha256)
+""", """
+CREATE TABLE IF NOT EXISTS hash_blob_references(
+    hash_id BYTES PRIMARY KEY,
+    blob_references BYTES NOT NULL
+)""", """
+CREATE TABLE IF NOT EXISTS blobs(
+    blob_id BYTES PRIMARY KEY,
+    blob_data BYTES NOT NULL
+)""", """
+CREATE TABLE IF NOT EXISTS flow_results(
+    result_id INTEGER PRIMARY KEY,
+    client_id TEXT NOT NULL,
+    flow_id TEXT NOT NULL,
+    hunt_id TEXT,
+    timestamp INTEGER NOT NULL,
+    payload BYTES NOT NULL,
+    type TEXT NOT NULL,
+    tag TEXT,
+    FOREIGN KEY (client_id, flow_id)
+    REFERENCES flows(client_id, flow_id) ON DELETE CASCADE
+)""", """
+CREATE INDEX IF NOT EXISTS flow_results_flow_idx
+    ON flow_results(client_id, flow_id, timestamp)
+""", """
+CREATE INDEX IF NOT EXISTS flow_results_hunt_idx
+    ON flow_results(hunt_id, timestamp)
+""", """
+CREATE TABLE IF NOT EXISTS flow_log_entries(
+    log_id INTEGER PRIMARY KEY,
+    client_id TEXT NOT NULL,
+    flow_id TEXT NOT NULL,
+    hunt_id TEXT,
+    timestamp INTEGER NOT NULL,
+    message TEXT NOT NULL,
+    FOREIGN KEY (client_id, flow_id)
+    REFERENCES flows(client_id, flow_id) ON DELETE CASCADE
+)""", """
+CREATE INDEX IF NOT EXISTS flow_log_entries_flow_idx
+    ON flow_log_entries(client_id, flow_id, timestamp)
+""", """
+CREATE INDEX IF NOT EXISTS flow_log_entries_hunt_idx
+    ON flow_log_entries(hunt_id, timestamp)
+""", """
+CREATE TABLE IF NOT EXISTS hunts(
+    hunt_id TEXT PRIMARY KEY,
+    hunt BYTES NOT NULL,
+    last_update INTEGER NOT NULL,
+    -- Hunts are listed by reading their metadata and filtering by the
+    -- columns below, without reading the full hunt objects.
+    metadata BYTES NOT NULL,
+    create_time INTEGER NOT NULL,
+    creator TEXT NOT NULL,
+    description TEXT NOT NULL
+)""", """
+CREATE INDEX IF NOT EXISTS hunts_create_time_idx ON hunts(create_time)
+""", """
+CREATE INDEX IF NOT EXISTS hunts_creator_create_time_idx
+    ON hunts(creator, create_time)
+""", """
+CREATE TABLE IF NOT EXISTS hunt_result_counts(
+    hunt_id TEXT NOT NULL,
+    type TEXT NOT NULL,
+    -- Results without a tag are counted with an empty one.
+    tag TEXT NOT NULL,
+    num_results INTEGER NOT NULL,
+    PRIMARY KEY (hunt_id, type, tag)
+)""", """
+CREATE TABLE IF NOT EXISTS hunt_flow_counts(
+    hunt_id TEXT NOT NULL,
+    flow_state INTEGER NOT NULL,
+    crashed INTEGER NOT NULL,
+    has_results INTEGER NOT NULL,
+    num_flows INTEGER NOT NULL,
+    PRIMARY KEY (hunt_id, flow_state, crashed, has_results)
+)""", """
+CREATE TABLE IF NOT EXISTS stats_store_entries(
+    entry_id BYTES PRIMARY KEY,
+    process_id TEXT NOT NULL,
+    metric_name TEXT NOT NULL,
+    timestamp INTEGER NOT NULL,
+    entry BYTES NOT NULL
+)""", """
+CREATE INDEX IF NOT EXISTS stats_store_entries_metric_idx
+    ON stats_store_entries(metric_name, process_id, timestamp)
+""", """
+CREATE INDEX IF NOT EXISTS stats_store_entries_timestamp_idx
+    ON stats_store_entries(timestamp)
+""", """
+CREATE TABLE IF NOT EXISTS signed_binary_references(
+    binary_type INTEGER NOT NULL,
+    binary_path TEXT NOT NULL,
+    timestamp INTEGER NOT NULL,
+    blob_references BYTES NOT NULL,
+    PRIMARY KEY (binary_type, binary_path)
+)""", """
+CREATE TABLE IF NOT EXISTS client_graph_series(
+    client_label TEXT NOT NULL,
+    report_type INTEGER NOT NULL,
+    timestamp INTEGER NOT NULL,
+    graph_series BYTES NOT NULL,
+    PRIMARY KEY (client_label, report_type, timestamp)
+)"""
+]
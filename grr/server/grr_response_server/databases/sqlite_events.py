@@ -0,0 +1,122 @@
+#!/usr/bin/env python
+"""The SQLite database methods for event handling."""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import unicode_literals
+
+from future.utils import iteritems
+
+from grr_response_server.databases import mysql_utils
+from grr_response_server.databases import sqlite_utils
+from grr_response_server.rdfvalues import objects as rdf_objects
+
+
+def _AuditEntryFromRow(details, timestamp):
+  entry = rdf_objects.APIAuditEntry.FromSerializedString(details)
+  entry.timestamp = sqlite_utils.IntToRDFDatetime(timestamp)
+  return entry
+
+
+class SqliteDBEventMixin(object):
+  """SqliteDB mixin for event handling."""
+
+  @mysql_utils.WithTransaction(readonly=True)
+  def ReadAPIAuditEntries(self,
+                          username=None,
+                          router_method_names=None,
+                          min_timestamp=None,
+                          max_timestamp=None,
+                          cursor=None):
+    """Returns audit entries stored in the database."""
+    conditions = []
+    values = []
+
+    if username is not None:
+      conditions.append("username = ?")
+      values.append(username)
+
+    if router_method_names:
+      conditions.append("router_method_name IN {}".format(
+          sqlite_utils.Placeholders(len(router_method_names))))
+      values.extend(router_method_names)
+
+    if min_timestamp is not None:
+      conditions.append("timestamp >= ?")
+      values.append(sqlite_utils.RDFDatetimeToInt(min_timestamp))
+
+    if max_timestamp is not None:
+      conditions.append("timestamp <= ?")
+      values.append(sqlite_utils.RDFDatetimeToInt(max_timestamp))
+
+    query = "SELECT details, timestamp FROM api_audit_entries"
+    if conditions:
+      query += " WHERE " + " AND ".join(conditions)
+    query += " ORDER BY timestamp ASC"
+
+    cursor.execute(query, values)
+    return [
+        _AuditEntryFromRow(details, timestamp)
+        for details, timestamp in cursor.fetchall()
+    ]
+
+  @mysql_utils.WithTransaction()
+  def WriteAPIAuditEntry(self, entry, cursor=None):
+    """Writes an audit entry to the database."""
+    cursor.execute(
+        "INSERT INTO api_audit_entries "
+        "(username, router_method_name, timestamp, details) "
+        "VALUES (?, ?, ?, ?)", [
+            entry.username, entry.router_method_name,
+            sqlite_utils.NowInt(),
+            sqlite_utils.Blob(entry.SerializeToString())
+        ])
+
+  @mysql_utils.WithTransaction()
+  def WriteAPIAuditDailyCounts(self, day, counts, cursor=None):
+    """Writes numbers of audit entries of a day, replacing existing ones."""
+    day_int = sqlite_utils.RDFDatetimeToInt(day)
+
+    cursor.execute("DELETE FROM api_audit_daily_counts WHERE day = ?",
+                   [day_int])
+    cursor.executemany(
+        "INSERT INTO api_audit_daily_counts "
+        "(day, username, router_method_name, entry_count) "
+        "VALUES (?, ?, ?, ?)",
+        [[day_int, username, router_method_name, count]
+         for (username, router_method_name), count in iteritems(counts)])
+    cursor.execute(
+        "INSERT OR IGNORE INTO api_audit_rolled_up_days (day) VALUES (?)",
+        [day_int])
+
+  @mysql_utils.WithTransaction(readonly=True)
+  def ReadAPIAuditDailyCounts(self, min_day=None, max_day=None, cursor=None):
+    """Returns numbers of audit entries of rolled up days."""
+    conditions = []
+    values = []
+
+    if min_day is not None:
+      conditions.append("day >= ?")
+      values.append(sqlite_utils.RDFDatetimeToInt(min_day))
+
+    if max_day is not None:
+      conditions.append("day <= ?")
+      values.append(sqlite_utils.RDFDatetimeToInt(max_day))
+
+    where = ""
+    if conditions:
+      where = " WHERE " + " AND ".join(conditions)
+
+    cursor.execute("SELECT day FROM api_audit_rolled_up_days" + where, values)
+    results = {
+        sqlite_utils.IntToRDFDatetime(day): {}
+        for day, in cursor.fetchall()
+    }
+
+    cursor.execute(
+        "SELECT day, username, router_method_name, entry_count "
+        "FROM api_audit_daily_counts" + where, values)
+    for day, username, router_method_name, count in cursor.fetchall():
+      counts = results.setdefault(sqlite_utils.IntToRDFDatetime(day), {})
+      counts[(username, router_method_name)] = count
+
+    return results
@@ -0,0 +1,1298 @@
+#!/usr/bin/env python
+"""The SQLite database methods for flow handling."""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import unicode_literals
+
+import collections
+import functools
+import logging
+import sqlite3
+import threading
+
+from future.utils import iteritems
+from future.utils import itervalues
+
+from grr_response_core import config
+from grr_response_core.lib import rdfvalue
+from grr_response_core.lib import utils
+from grr_response_core.lib.rdfvalues import client as rdf_client
+from grr_response_core.lib.rdfvalues import flows as rdf_flows
+from grr_response_core.lib.util import compatibility
+from grr_response_server import db
+from grr_response_server import db_utils
+from grr_response_server.databases import mysql_utils
+from grr_response_server.databases import sqlite_utils
+from grr_response_server.rdfvalues import flow_objects as rdf_flow_objects
+from grr_response_server.rdfvalues import objects as rdf_objects
+
+_FLOW_KEY_CONDITION = "client_id = ? AND flow_id = ?"
+_REQUEST_KEY_CONDITION = "client_id = ? AND flow_id = ? AND request_id = ?"
+
+
+def _WakesUp(scheduler_name):
+  """Returns a decorator that wakes up a lease scheduler of the database.
+
+  The scheduler is woken up once the decorated method returns. For methods
+  decorated with @mysql_utils.WithTransaction this is after the commit, so the
+  woken up loop can lease the rows written by the method.
+
+  Args:
+    scheduler_name: Name of the database attribute holding the scheduler.
+  """
+
+  def Decorator(func):
+
+    @functools.wraps(func)
+    def Decorated(self, *args, **kwargs):
+      result = func(self, *args, **kwargs)
+      getattr(self, scheduler_name).Wake()
+      return result
+
+    return Decorated
+
+  return Decorator
+
+
+def _ResponseFromRow(row):
+  """Generates a flow response, status or iterator from a database row."""
+  res, status, iterator, timestamp = row
+  if status:
+    response = rdf_flow_objects.FlowStatus.FromSerializedString(status)
+  elif iterator:
+    response = rdf_flow_objects.FlowIterator.FromSerializedString(iterator)
+  else:
+    response = rdf_flow_objects.FlowResponse.FromSerializedString(res)
+  response.timestamp = sqlite_utils.IntToRDFDatetime(timestamp)
+  return response
+
+
+class SqliteDBFlowMixin(object):
+  """SqliteDB mixin for flow handling."""
+
+  @_WakesUp("handler_scheduler")
+  @mysql_utils.WithTransaction()
+  def WriteMessageHandlerRequests(self, requests, cursor=None):
+    """Writes a list of message handler requests to the database."""
+    now = sqlite_utils.NowInt()
+    cursor.executemany(
+        "INSERT OR IGNORE INTO message_handler_requests "
+        "(handler_name, timestamp, request_id, request) VALUES (?, ?, ?, ?)",
+        [(r.handler_name, now, r.request_id,
+          sqlite_utils.Blob(r.SerializeToString())) for r in requests])
+
+  @mysql_utils.WithTransaction(readonly=True)
+  def ReadMessageHandlerRequests(self, cursor=None):
+    """Reads all message handler requests from the database."""
+    cursor.execute("SELECT timestamp, request, leased_until, leased_by "
+                   "FROM message_handler_requests "
+                   "ORDER BY timestamp DESC")
+
+    res = []
+    for timestamp, request, leased_until, leased_by in cursor.fetchall():
+      req = rdf_objects.MessageHandlerRequest.FromSerializedString(request)
+      req.timestamp = sqlite_utils.IntToRDFDatetime(timestamp)
+      req.leased_by = leased_by
+      req.leased_until = sqlite_utils.IntToRDFDatetime(leased_until)
+      res.append(req)
+    return res
+
+  @mysql_utils.WithTransaction()
+  def DeleteMessageHandlerRequests(self, requests, cursor=None):
+    """Deletes a list of message handler requests from the database."""
+    request_ids = set([r.request_id for r in requests])
+    cursor.executemany(
+        "DELETE FROM message_handler_requests WHERE request_id = ?",
+        [(request_id,) for request_id in request_ids])
+
+  def RegisterMessageHandler(self, handler, lease_time, limit=1000):
+    """Leases a number of message handler requests up to the indicated limit."""
+    self.UnregisterMessageHandler()
+
+    if handler:
+      self.handler_stop = False
+      self.handler_thread = threading.Thread(
+          name="message_handler",
+          target=self._MessageHandlerLoop,
+          args=(handler, lease_time, limit))
+      self.handler_thread.daemon = True
+      self.handler_thread.start()
+
+  def UnregisterMessageHandler(self, timeout=None):
+    """Unregisters any registered message handler."""
+    if self.handler_thread:
+      self.handler_stop = True
+      self.handler_scheduler.Wake()
+      self.handler_thread.join(timeout)
+      if self.handler_thread.isAlive():
+        raise RuntimeError("Message handler thread did not join in time.")
+      self.handler_thread = None
+
+  def _MessageHandlerLoop(self, handler, lease_time, limit):
+    while not self.handler_stop:
+      msgs = None
+      try:
+        msgs = self._LeaseMessageHandlerRequests(lease_time, limit)
+        if msgs:
+          handler(msgs)
+      except Exception as e:  # pylint: disable=broad-except
+        logging.exception("_LeaseMessageHandlerRequests raised %s.", e)
+      self.handler_scheduler.Wait(bool(msgs))
+
+  @mysql_utils.WithTransaction()
+  def _LeaseMessageHandlerRequests(self, lease_time, limit, cursor=None):
+    """Leases a number of message handler requests up to the indicated limit."""
+    now = rdfvalue.RDFDatetime.Now()
+    expiry = now + lease_time
+    expiry_int = sqlite_utils.RDFDatetimeToInt(expiry)
+    id_str = utils.ProcessIdString()
+
+    # UPDATE ... LIMIT is a compile time option of SQLite.
+    cursor.execute(
+        "UPDATE message_handler_requests "
+        "SET leased_until=?, leased_by=? "
+        "WHERE rowid IN (SELECT rowid FROM message_handler_requests "
+        "WHERE leased_until IS NULL OR leased_until < ? LIMIT ?)",
+        [expiry_int, id_str,
+         sqlite_utils.RDFDatetimeToInt(now), limit])
+    if cursor.rowcount == 0:
+      return []
+
+    cursor.execute(
+        "SELECT timestamp, request FROM message_handler_requests "
+        "WHERE leased_by=? AND leased_until=?", [id_str, expiry_int])
+    res = []
+    for timestamp, request in cursor.fetchall():
+      req = rdf_objects.MessageHandlerRequest.FromSerializedString(request)
+      req.timestamp = sqlite_utils.IntToRDFDatetime(timestamp)
+      req.leased_until = expiry
+      req.leased_by = id_str
+      res.append(req)
+
+    return res
+
+  @mysql_utils.WithTransaction(readonly=True)
+  def ReadClientMessages(self, client_id, cursor=None):
+    """Reads all client messages available for a given client_id."""
+    cursor.execute(
+        "SELECT message, leased_until, leased_by FROM client_messages "
+        "WHERE client_id = ?", [client_id])
+
+    ret = []
+    for msg, leased_until, leased_by in cursor.fetchall():
+      message = rdf_flows.GrrMessage.FromSerializedString(msg)
+      if leased_until:
+        message.leased_by = leased_by
+        message.leased_until = sqlite_utils.IntToRDFDatetime(leased_until)
+      ret.append(message)
+
+    return sorted(ret, key=lambda msg: msg.task_id)
+
+  @mysql_utils.WithTransaction()
+  def DeleteClientMessages(self, messages, cursor=None):
+    """Deletes a list of client messages from the db."""
+    if not messages:
+      return
+
+    to_delete = []
+    for m in messages:
+      to_delete.append((db_utils.ClientIdFromGrrMessage(m), m.task_id))
+
+    if len(set(to_delete)) != len(to_delete):
+      raise ValueError(
+          "Received multiple copies of the same message to delete.")
+
+    self._DeleteClientMessages(to_delete, cursor=cursor)
+
+  @mysql_utils.WithTransaction()
+  def LeaseClientMessages(self,
+                          client_id,
+                          lease_time=None,
+                          limit=None,
+                          cursor=None):
+    """Leases available client messages for the client with the given id."""
+    now = rdfvalue.RDFDatetime.Now()
+    expiry = now + lease_time
+    expiry_int = sqlite_utils.RDFDatetimeToInt(expiry)
+    proc_id_str = utils.ProcessIdString()
+
+    cursor.execute(
+        "UPDATE client_messages "
+        "SET leased_until=?, leased_by=?, leased_count=leased_count+1 "
+        "WHERE rowid IN (SELECT rowid FROM client_messages "
+        "WHERE client_id=? AND (leased_until IS NULL OR leased_until < ?) "
+        "LIMIT ?)", [
+            expiry_int, proc_id_str, client_id,
+            sqlite_utils.RDFDatetimeToInt(now), -1 if limit is None else limit
+        ])
+    if cursor.rowcount == 0:
+      return []
+
+    cursor.execute(
+        "SELECT message, leased_count FROM client_messages "
+        "WHERE client_id=? AND leased_until=? AND leased_by=?",
+        [client_id, expiry_int, proc_id_str])
+
+    ret = []
+    expired = []
+    for msg, leased_count in cursor.fetchall():
+      message = rdf_flows.GrrMessage.FromSerializedString(msg)
+      message.leased_by = proc_id_str
+      message.leased_until = expiry
+      # > comparison since this check happens after the lease.
+      if leased_count > db.Database.CLIENT_MESSAGES_TTL:
+        expired.append((client_id, message.task_id))
+      else:
+        ret.append(message)
+
+    if expired:
+      self._DeleteClientMessages(expired, cursor=cursor)
+
+    return sorted(ret, key=lambda msg: msg.task_id)
+
+  @mysql_utils.WithTransaction()
+  def WriteClientMessages(self, messages, cursor=None):
+    """Writes messages that should go to the client to the db."""
+    now = sqlite_utils.NowInt()
+
+    client_ids = set()
+    rows = []
+    for m in messages:
+      cid = db_utils.ClientIdFromGrrMessage(m)
+      client_ids.add(cid)
+      rows.append((now, sqlite_utils.Blob(m.SerializeToString()), cid,
+                   m.task_id))
+
+    # Rewriting a message keeps its lease.
+    try:
+      cursor.executemany(
+          "INSERT OR IGNORE INTO client_messages "
+          "(timestamp, message, client_id, message_id) VALUES (?, ?, ?, ?)",
+          rows)
+      cursor.executemany(
+          "UPDATE client_messages SET timestamp=?, message=? "
+          "WHERE client_id=? AND message_id=?", rows)
+    except sqlite3.IntegrityError as e:
+      raise db.AtLeastOneUnknownClientError(client_ids=client_ids, cause=e)
+
+  @mysql_utils.WithTransaction()
+  def WriteFlowObject(self, flow_obj, cursor=None):
+    """Writes a flow object to the database."""
+    flow_key = (flow_obj.client_id, flow_obj.flow_id)
+    now = sqlite_utils.NowInt()
+    serialized_flow = sqlite_utils.Blob(flow_obj.SerializeToString())
+    crashed = flow_obj.HasField("client_crash_info")
+
+    old_counter_keys = self._ReadHuntFlowCounterKeys([flow_key], cursor)
+    # Flows are referenced by their requests, results and logs, so existing
+    # rows are updated instead of replaced.
+    try:
+      cursor.execute(
+          "INSERT OR IGNORE INTO flows "
+          "(client_id, flow_id, long_flow_id, parent_flow_id, "
+          "parent_hunt_id, flow, flow_state, crashed, "
+          "next_request_to_process, timestamp, last_update) VALUES "
+          "(?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", [
+              flow_obj.client_id, flow_obj.flow_id, flow_obj.long_flow_id,
+              flow_obj.parent_flow_id or None, flow_obj.parent_hunt_id or None,
+              serialized_flow,
+              int(flow_obj.flow_state),
+              int(crashed), flow_obj.next_request_to_process,
+              sqlite_utils.RDFDatetimeToInt(flow_obj.create_time), now
+          ])
+    except sqlite3.IntegrityError as e:
+      raise db.UnknownClientError(flow_obj.client_id, cause=e)
+
+    if cursor.rowcount == 0:
+      cursor.execute(
+          "UPDATE flows SET parent_hunt_id=?, flow=?, flow_state=?, "
+          "crashed=(? OR client_crash_info IS NOT NULL), "
+          "next_request_to_process=?, last_update=? "
+          "WHERE " + _FLOW_KEY_CONDITION, [
+              flow_obj.parent_hunt_id or None, serialized_flow,
+              int(flow_obj.flow_state),
+              int(crashed), flow_obj.next_request_to_process, now
+          ] + list(flow_key))
+
+    new_counter_keys = self._ReadHuntFlowCounterKeys([flow_key], cursor)
+    self._UpdateHuntFlowCounts(old_counter_keys, new_counter_keys, cursor)
+
+  def _ReadHuntFlowCounterKeys(self, flow_keys, cursor):
+    """Reads hunt_flow_counts keys of given flows.
+
+    Writing transactions hold the database's write lock, so unlike in MySQL
+    the rows don't need to be locked.
+
+    Args:
+      flow_keys: An iterable of (client_id, flow_id) tuples.
+      cursor: sqlite3.Cursor to use.
+
+    Returns:
+      A dict mapping (client_id, flow_id) tuples of existing flows to
+      (parent_hunt_id, flow_state, crashed, has_results) tuples.
+    """
+    query = ("SELECT parent_hunt_id, flow_state, crashed, has_results "
+             "FROM flows WHERE " + _FLOW_KEY_CONDITION)
+
+    result = {}
+    for flow_key in flow_keys:
+      cursor.execute(query, flow_key)
+      row = cursor.fetchone()
+      if row is not None:
+        hunt_id, flow_state, crashed, has_results = row
+        result[flow_key] = (hunt_id, flow_state, bool(crashed),
+                            bool(has_results))
+    return result
+
+  def _UpdateHuntFlowCounts(self, old_counter_keys, new_counter_keys, cursor):
+    """Moves updated flows between hunt_flow_counts rows.
+
+    Args:
+      old_counter_keys: Counter keys of flows before the update, as returned
+        by _ReadHuntFlowCounterKeys.
+      new_counter_keys: Counter keys of the same flows after the update.
+      cursor: sqlite3.Cursor to use.
+    """
+    deltas = collections.Counter()
+    for counter_key in itervalues(old_counter_keys):
+      deltas[counter_key] -= 1
+    for counter_key in itervalues(new_counter_keys):
+      deltas[counter_key] += 1
+
+    rows = []
+    for (hunt_id, flow_state, crashed, has_results), delta in iteritems(deltas):
+      # Only flows started by hunts are counted.
+      if hunt_id is not None and delta != 0:
+        rows.append((delta, hunt_id, flow_state, int(crashed),
+                     int(has_results)))
+
+    if not rows:
+      return
+
+    cursor.executemany(
+        "INSERT OR IGNORE INTO hunt_flow_counts "
+        "(num_flows, hunt_id, flow_state, crashed, has_results) "
+        "VALUES (0, ?, ?, ?, ?)", [row[1:] for row in rows])
+    cursor.executemany(
+        "UPDATE hunt_flow_counts SET num_flows = num_flows + ? "
+        "WHERE hunt_id = ? AND flow_state = ? AND crashed = ? "
+        "AND has_results = ?", rows)
+
+  def _FlowObjectFromRow(self, row):
+    """Generates a flow object from a database row."""
+
+    flow, cci, pt, nr, pd, po, ps, ts, lut = row
+
+    flow_obj = rdf_flow_objects.Flow.FromSerializedString(flow)
+    if cci is not None:
+      cc_cls = rdf_client.ClientCrash
+      flow_obj.client_crash_info = cc_cls.FromSerializedString(cci)
+    if pt is not None:
+      pt_cls = rdf_flow_objects.PendingFlowTermination
+      flow_obj.pending_termination = pt_cls.FromSerializedString(pt)
+    if nr:
+      flow_obj.next_request_to_process = nr
+    if pd is not None:
+      flow_obj.processing_deadline = sqlite_utils.IntToRDFDatetime(pd)
+    if po is not None:
+      flow_obj.processing_on = po
+    if ps is not None:
+      flow_obj.processing_since = sqlite_utils.IntToRDFDatetime(ps)
+    flow_obj.timestamp = sqlite_utils.IntToRDFDatetime(ts)
+    flow_obj.last_update_time = sqlite_utils.IntToRDFDatetime(lut)
+
+    return flow_obj
+
+  FLOW_DB_FIELDS = ("flow, client_crash_info, pending_termination, "
+                    "next_request_to_process, processing_deadline, "
+                    "processing_on, processing_since, timestamp, last_update ")
+
+  @mysql_utils.WithTransaction(readonly=True)
+  def ReadFlowObject(self, client_id, flow_id, cursor=None):
+    """Reads a flow object from the database."""
+    query = ("SELECT " + self.FLOW_DB_FIELDS + "FROM flows WHERE " +
+             _FLOW_KEY_CONDITION)
+    cursor.execute(query, [client_id, flow_id])
+    row = cursor.fetchone()
+    if row is None:
+      raise db.UnknownFlowError(client_id, flow_id)
+    return self._FlowObjectFromRow(row)
+
+  @mysql_utils.WithTransaction(readonly=True)
+  def ReadAllFlowObjects(self,
+                         client_id = None,
+                         min_create_time = None,
+                         max_create_time = None,
+                         include_child_flows = True,
+                         cursor = None
+                        ):
+    """Returns all flow objects."""
+    conditions = []
+    args = []
+
+    if client_id is not None:
+      conditions.append("client_id = ?")
+      args.append(client_id)
+
+    if min_create_time is not None:
+      conditions.append("timestamp >= ?")
+      args.append(sqlite_utils.RDFDatetimeToInt(min_create_time))
+
+    if max_create_time is not None:
+      conditions.append("timestamp <= ?")
+      args.append(sqlite_utils.RDFDatetimeToInt(max_create_time))
+
+    if not include_child_flows:
+      conditions.append("parent_flow_id IS NULL")
+
+    query = "SELECT {} FROM flows".format(self.FLOW_DB_FIELDS)
+    if conditions:
+      query += " WHERE " + " AND ".join(conditions)
+
+    cursor.execute(query, args)
+    return [self._FlowObjectFromRow(row) for row in cursor.fetchall()]
+
+  @mysql_utils.WithTransaction(readonly=True)
+  def ReadChildFlowObjects(self, client_id, flow_id, cursor=None):
+    """Reads flows that were started by a given flow from the database."""
+    query = ("SELECT " + self.FLOW_DB_FIELDS +
+             "FROM flows WHERE client_id=? AND parent_flow_id=?")
+    cursor.execute(query, [client_id, flow_id])
+    return [self._FlowObjectFromRow(row) for row in cursor.fetchall()]
+
+  @mysql_utils.WithTransaction()
+  def ReadFlowForProcessing(self,
+                            client_id,
+                            flow_id,
+                            processing_time,
+                            cursor=None):
+    """Marks a flow as being processed on this worker and returns it."""
+    query = ("SELECT " + self.FLOW_DB_FIELDS + "FROM flows WHERE " +
+             _FLOW_KEY_CONDITION)
+    cursor.execute(query, [client_id, flow_id])
+    row = cursor.fetchone()
+    if row is None:
+      raise db.UnknownFlowError(client_id, flow_id)
+
+    rdf_flow = self._FlowObjectFromRow(row)
+
+    now = rdfvalue.RDFDatetime.Now()
+    if rdf_flow.processing_on and rdf_flow.processing_deadline > now:
+      raise ValueError("Flow %s on client %s is already being processed." %
+                       (client_id, flow_id))
+    processing_deadline = now + processing_time
+    process_id_string = utils.ProcessIdString()
+
+    cursor.execute(
+        "UPDATE flows SET processing_on=?, processing_since=?, "
+        "processing_deadline=? WHERE " + _FLOW_KEY_CONDITION, [
+            process_id_string,
+            sqlite_utils.RDFDatetimeToInt(now),
+            sqlite_utils.RDFDatetimeToInt(processing_deadline), client_id,
+            flow_id
+        ])
+
+    # This needs to happen after we are sure that the write has succeeded.
+    rdf_flow.processing_on = process_id_string
+    rdf_flow.processing_since = now
+    rdf_flow.processing_deadline = processing_deadline
+    return rdf_flow
+
+  @mysql_utils.WithTransaction()
+  def UpdateFlow(self,
+                 client_id,
+                 flow_id,
+                 flow_obj=db.Database.unchanged,
+                 client_crash_info=db.Database.unchanged,
+                 pending_termination=db.Database.unchanged,
+                 processing_on=db.Database.unchanged,
+                 processing_since=db.Database.unchanged,
+                 processing_deadline=db.Database.unchanged,
+                 cursor=None):
+    """Updates flow objects in the database."""
+    updates = []
+    args = []
+    if flow_obj != db.Database.unchanged:
+      updates.append("flow=?")
+      args.append(sqlite_utils.Blob(flow_obj.SerializeToString()))
+      updates.append("flow_state=?")
+      args.append(int(flow_obj.flow_state))
+    if client_crash_info != db.Database.unchanged:
+      updates.append("client_crash_info=?")
+      args.append(sqlite_utils.Blob(client_crash_info.SerializeToString()))
+      updates.append("crashed=1")
+    elif flow_obj != db.Database.unchanged:
+      updates.append("crashed=(client_crash_info IS NOT NULL OR ?)")
+      args.append(int(flow_obj.HasField("client_crash_info")))
+    if pending_termination != db.Database.unchanged:
+      updates.append("pending_termination=?")
+      args.append(sqlite_utils.Blob(pending_termination.SerializeToString()))
+    if processing_on != db.Database.unchanged:
+      updates.append("processing_on=?")
+      args.append(processing_on)
+    if processing_since != db.Database.unchanged:
+      updates.append("processing_since=?")
+      args.append(sqlite_utils.RDFDatetimeToInt(processing_since))
+    if processing_deadline != db.Database.unchanged:
+      updates.append("processing_deadline=?")
+      args.append(sqlite_utils.RDFDatetimeToInt(processing_deadline))
+
+    if not updates:
+      return
+
+    query = "UPDATE flows SET "
+    query += ", ".join(updates)
+    query += " WHERE " + _FLOW_KEY_CONDITION
+
+    flow_key = (client_id, flow_id)
+    args.extend(flow_key)
+
+    # Only the flow object and crash info affect hunt flow counts.
+    updates_counts = (
+        flow_obj != db.Database.unchanged or
+        client_crash_info != db.Database.unchanged)
+    if updates_counts:
+      old_counter_keys = self._ReadHuntFlowCounterKeys([flow_key], cursor)
+
+    cursor.execute(query, args)
+    if cursor.rowcount == 0:
+      raise db.UnknownFlowError(client_id, flow_id)
+
+    if updates_counts:
+      new_counter_keys = self._ReadHuntFlowCounterKeys([flow_key], cursor)
+      self._UpdateHuntFlowCounts(old_counter_keys, new_counter_keys, cursor)
+
+  @mysql_utils.WithTransaction()
+  def UpdateFlows(self,
+                  client_id_flow_id_pairs,
+                  pending_termination=db.Database.unchanged,
+                  cursor=None):
+    """Updates flow objects in the database."""
+
+    if pending_termination == db.Database.unchanged:
+      return
+
+    serialized_termination = sqlite_utils.Blob(
+        pending_termination.SerializeToString())
+    cursor.executemany(
+        "UPDATE flows SET pending_termination=? WHERE " + _FLOW_KEY_CONDITION,
+        [(serialized_termination, client_id, flow_id)
+         for client_id, flow_id in client_id_flow_id_pairs])
+
+  def _WriteFlowProcessingRequests(self, requests, cursor):
+    """Inserts the given flow processing requests."""
+    timestamp = rdfvalue.RDFDatetime.Now()
+    timestamp_int = sqlite_utils.RDFDatetimeToInt(timestamp)
+
+    rows = []
+    for req in requests:
+      req = req.Copy()
+      req.timestamp = timestamp
+      if req.delivery_time:
+        delivery_time = sqlite_utils.RDFDatetimeToInt(req.delivery_time)
+      else:
+        delivery_time = None
+      rows.append((req.client_id, req.flow_id, timestamp_int,
+                   sqlite_utils.Blob(req.SerializeToString()), delivery_time))
+
+    cursor.executemany(
+        "INSERT INTO flow_processing_requests "
+        "(client_id, flow_id, timestamp, request, delivery_time) "
+        "VALUES (?, ?, ?, ?, ?)", rows)
+
+  @_WakesUp("flow_processing_request_handler_scheduler")
+  @mysql_utils.WithTransaction()
+  def WriteFlowRequests(self, requests, cursor=None):
+    """Writes a list of flow requests to the database."""
+    rows = []
+    flow_keys = []
+    needs_processing = {}
+    now = sqlite_utils.NowInt()
+    for r in requests:
+      if r.needs_processing:
+        needs_processing.setdefault((r.client_id, r.flow_id),
+                                    []).append(r.request_id)
+
+      flow_keys.append((r.client_id, r.flow_id))
+      rows.append((r.client_id, r.flow_id, r.request_id,
+                   int(r.needs_processing),
+                   sqlite_utils.Blob(r.SerializeToString()), now))
+
+    if needs_processing:
+      flow_processing_requests = []
+      nr_query = ("SELECT next_request_to_process FROM flows WHERE " +
+                  _FLOW_KEY_CONDITION)
+      for (client_id, flow_id), request_ids in iteritems(needs_processing):
+        cursor.execute(nr_query, [client_id, flow_id])
+        row = cursor.fetchone()
+        if row is not None and row[0] in request_ids:
+          flow_processing_requests.append(
+              rdf_flows.FlowProcessingRequest(
+                  client_id=client_id, flow_id=flow_id))
+
+      if flow_processing_requests:
+        self._WriteFlowProcessingRequests(flow_processing_requests, cursor)
+
+    try:
+      cursor.executemany(
+          "INSERT INTO flow_requests "
+          "(client_id, flow_id, request_id, needs_processing, request, "
+          "timestamp) VALUES (?, ?, ?, ?, ?, ?)", rows)
+    except sqlite3.IntegrityError as e:
+      raise db.AtLeastOneUnknownFlowError(flow_keys, cause=e)
+
+  def _ReadCurrentFlowInfo(self, responses, currently_available_requests,
+                           next_request_by_flow, responses_expected_by_request,
+                           current_responses_by_request, cursor):
+    """Reads stored data for flows we want to modify."""
+    flow_keys = set((r.client_id, r.flow_id) for r in responses)
+    request_keys = set((r.client_id, r.flow_id, r.request_id)
+                       for r in responses)
+
+    for flow_key in flow_keys:
+      cursor.execute(
+          "SELECT next_request_to_process FROM flows WHERE " +
+          _FLOW_KEY_CONDITION, flow_key)
+      row = cursor.fetchone()
+      if row is not None:
+        next_request_by_flow[flow_key] = row[0]
+
+    for request_key in request_keys:
+      cursor.execute(
+          "SELECT responses_expected FROM flow_requests WHERE " +
+          _REQUEST_KEY_CONDITION, request_key)
+      row = cursor.fetchone()
+      if row is None:
+        continue
+
+      currently_available_requests.add(request_key)
+      responses_expected, = row
+      if responses_expected:
+        responses_expected_by_request[request_key] = responses_expected
+
+      cursor.execute(
+          "SELECT response_id FROM flow_responses WHERE " +
+          _REQUEST_KEY_CONDITION, request_key)
+      for response_id, in cursor.fetchall():
+        current_responses_by_request.setdefault(request_key,
+                                                set()).add(response_id)
+
+  def _WriteResponses(self, responses, timestamp, cursor):
+    """Stores the given responses in the db."""
+    rows = []
+    for r in responses:
+      serialized = sqlite_utils.Blob(r.SerializeToString())
+      empty = sqlite_utils.Blob(b"")
+      if isinstance(r, rdf_flow_objects.FlowResponse):
+        columns = (serialized, empty, empty)
+      elif isinstance(r, rdf_flow_objects.FlowStatus):
+        columns = (empty, serialized, empty)
+      elif isinstance(r, rdf_flow_objects.FlowIterator):
+        columns = (empty, empty, serialized)
+      else:
+        # This can't really happen due to db api type checking.
+        raise ValueError("Got unexpected response type: %s %s" % (type(r), r))
+      rows.append((r.client_id, r.flow_id, r.request_id, r.response_id) +
+                  columns + (timestamp,))
+
+    cursor.executemany(
+        "INSERT OR IGNORE INTO flow_responses "
+        "(client_id, flow_id, request_id, response_id, "
+        "response, status, iterator, timestamp) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+
+  def _UpdateRequests(self, needs_processing_update, needs_expected_update,
+                      cursor):
+    """Updates for a number of requests."""
+    if needs_expected_update:
+      cursor.executemany(
+          "UPDATE flow_requests SET responses_expected=? WHERE " +
+          _REQUEST_KEY_CONDITION,
+          [(expected,) + request_key
+           for request_key, expected in iteritems(needs_expected_update)])
+
+    if needs_processing_update:
+      cursor.executemany(
+          "UPDATE flow_requests SET needs_processing=1 WHERE " +
+          _REQUEST_KEY_CONDITION, list(needs_processing_update))
+
+  def _DeleteClientMessages(self, to_delete, cursor):
+    """Deletes client messages given as (client id, task id) tuples."""
+    cursor.executemany(
+        "DELETE FROM client_messages WHERE client_id=? AND message_id=?",
+        to_delete)
+
+  @_WakesUp("flow_processing_request_handler_scheduler")
+  @mysql_utils.WithTransaction()
+  def WriteFlowResponses(self, responses, cursor=None):
+    """Writes a list of flow responses to the database."""
+
+    if not responses:
+      return
+
+    # In addition to just writing responses, this function needs to also
+
+    # - Update the expected nr of response for each request that received a
+    #   status.
+    # - Set the needs_processing flag for all requests that now have all
+    #   responses.
+    # - Send FlowProcessingRequests for all flows that are waiting on a request
+    #   whose needs_processing flag was just set.
+
+    # To achieve this, we need to get the next request each flow is waiting for.
+    next_request_by_flow = {}
+
+    # And the number of responses each affected request is waiting for (if
+    # available).
+    responses_expected_by_request = {}
+
+    # As well as the ids of the currently available responses for each request.
+    current_responses_by_request = {}
+
+    # We also store all requests we have in the db so we can discard responses
+    # for unknown requests right away.
+    currently_available_requests = set()
+
+    self._ReadCurrentFlowInfo(
+        responses, currently_available_requests, next_request_by_flow,
+        responses_expected_by_request, current_responses_by_request, cursor)
+
+    # For some requests we will need to update the number of expected responses.
+    needs_expected_update = {}
+
+    # For some we will need to update the needs_processing flag.
+    needs_processing_update = set()
+
+    # Some completed requests will trigger a flow processing request, we collect
+    # them in:
+    flow_processing_requests = []
+
+    task_ids_by_request = {}
+
+    for r in responses:
+      request_key = (r.client_id, r.flow_id, r.request_id)
+
+      try:
+        # If this is a response coming from a client, a task_id will be set. We
+        # store it in case the request is complete and we can remove the client
+        # messages.
+        task_ids_by_request[request_key] = r.task_id
+      except AttributeError:
+        pass
+
+      if not isinstance(r, rdf_flow_objects.FlowStatus):
+        continue
+
+      current = responses_expected_by_request.get(request_key)
+      if current:
+        logging.error("Got duplicate status message for request %s/%s/%d",
+                      r.client_id, r.flow_id, r.request_id)
+        # If there is already responses_expected information, we need to make
+        # sure the current status doesn't disagree.
+        if current != r.response_id:
+          raise ValueError(
+              "Got conflicting status information for request %s: %s" %
+              (request_key, r))
+      else:
+        needs_expected_update[request_key] = r.response_id
+
+      responses_expected_by_request[request_key] = r.response_id
+
+    responses_to_write = []
+    client_messages_to_delete = []
+    for r in responses:
+      request_key = (r.client_id, r.flow_id, r.request_id)
+
+      if request_key not in currently_available_requests:
+        logging.info("Dropping response for unknown request %s/%s/%d",
+                     r.client_id, r.flow_id, r.request_id)
+        continue
+
+      responses_to_write.append(r)
+
+      current_responses = current_responses_by_request.setdefault(
+          request_key, set())
+      if r.response_id in current_responses:
+        # We have this response already, nothing further to do.
+        continue
+
+      current_responses.add(r.response_id)
+      expected_responses = responses_expected_by_request.get(request_key, 0)
+      if len(current_responses) == expected_responses:
+        # This response was the one that was missing, time to set the
+        # needs_processing flag.
+        needs_processing_update.add(request_key)
+        if r.request_id == next_request_by_flow[(r.client_id, r.flow_id)]:
+          # The request that is now ready for processing was also the one the
+          # flow was waiting for.
+          req = rdf_flows.FlowProcessingRequest(
+              client_id=r.client_id, flow_id=r.flow_id)
+          flow_processing_requests.append(req)
+
+        # Since this request is now complete, we can remove the corresponding
+        # client messages if there are any.
+        task_id = task_ids_by_request.get(request_key, None)
+        if task_id is not None:
+          client_messages_to_delete.append((r.client_id, task_id))
+
+    if responses_to_write:
+      self._WriteResponses(responses_to_write, sqlite_utils.NowInt(), cursor)
+
+    self._UpdateRequests(needs_processing_update, needs_expected_update, cursor)
+
+    if client_messages_to_delete:
+      self._DeleteClientMessages(client_messages_to_delete, cursor)
+
+    if flow_processing_requests:
+      self._WriteFlowProcessingRequests(flow_processing_requests, cursor)
+
+  @mysql_utils.WithTransaction()
+  def DeleteFlowRequests(self, requests, cursor=None):
+    """Deletes a list of flow requests from the database."""
+    if not requests:
+      return
+
+    # Responses are deleted by the foreign key cascade.
+    cursor.executemany(
+        "DELETE FROM flow_requests WHERE " + _REQUEST_KEY_CONDITION,
+        [(r.client_id, r.flow_id, r.request_id) for r in requests])
+
+  @mysql_utils.WithTransaction(readonly=True)
+  def ReadAllFlowRequestsAndResponses(self, client_id, flow_id, cursor=None):
+    """Reads all requests and responses for a given flow from the database."""
+    args = [client_id, flow_id]
+    cursor.execute(
+        "SELECT request, needs_processing, responses_expected, timestamp "
+        "FROM flow_requests WHERE " + _FLOW_KEY_CONDITION, args)
+
+    requests = []
+    for req, needs_processing, resp_expected, ts in cursor.fetchall():
+      request = rdf_flow_objects.FlowRequest.FromSerializedString(req)
+      request.needs_processing = needs_processing
+      request.nr_responses_expected = resp_expected
+      request.timestamp = sqlite_utils.IntToRDFDatetime(ts)
+      requests.append(request)
+
+    cursor.execute(
+        "SELECT response, status, iterator, timestamp "
+        "FROM flow_responses WHERE " + _FLOW_KEY_CONDITION, args)
+
+    responses = {}
+    for row in cursor.fetchall():
+      response = _ResponseFromRow(row)
+      responses.setdefault(response.request_id,
+                           {})[response.response_id] = response
+
+    ret = []
+    for req in sorted(requests, key=lambda r: r.request_id):
+      ret.append((req, responses.get(req.request_id, {})))
+    return ret
+
+  @mysql_utils.WithTransaction()
+  def DeleteAllFlowRequestsAndResponses(self, client_id, flow_id, cursor=None):
+    """Deletes all requests and responses for a given flow from the database."""
+    # Responses are deleted by the foreign key cascade.
+    cursor.execute("DELETE FROM flow_requests WHERE " + _FLOW_KEY_CONDITION,
+                   [client_id, flow_id])
+
+  @mysql_utils.WithTransaction(readonly=True)
+  def ReadFlowRequestsReadyForProcessing(self,
+                                         client_id,
+                                         flow_id,
+                                         next_needed_request,
+                                         cursor=None):
+    """Reads all requests for a flow that can be processed by the worker."""
+    args = [client_id, flow_id]
+    cursor.execute(
+        "SELECT request, timestamp FROM flow_requests "
+        "WHERE needs_processing = 1 AND " + _FLOW_KEY_CONDITION, args)
+
+    requests = {}
+    for req, ts in cursor.fetchall():
+      request = rdf_flow_objects.FlowRequest.FromSerializedString(req)
+      request.needs_processing = True
+      request.timestamp = sqlite_utils.IntToRDFDatetime(ts)
+      requests[request.request_id] = request
+
+    cursor.execute(
+        "SELECT response, status, iterator, timestamp FROM flow_responses "
+        "WHERE " + _FLOW_KEY_CONDITION, args)
+
+    responses = {}
+    for row in cursor.fetchall():
+      response = _ResponseFromRow(row)
+      responses.setdefault(response.request_id, []).append(response)
+
+    res = {}
+    while next_needed_request in requests:
+      req = requests[next_needed_request]
+      sorted_responses = sorted(
+          responses.get(next_needed_request, []), key=lambda r: r.response_id)
+      res[req.request_id] = (req, sorted_responses)
+      next_needed_request += 1
+
+    return res
+
+  @mysql_utils.WithTransaction()
+  def ReturnProcessedFlow(self, flow_obj, cursor=None):
+    """Returns a flow that the worker was processing to the database."""
+    cursor.execute(
+        "SELECT needs_processing FROM flow_requests WHERE " +
+        _REQUEST_KEY_CONDITION, [
+            flow_obj.client_id, flow_obj.flow_id,
+            flow_obj.next_request_to_process
+        ])
+    for needs_processing, in cursor.fetchall():
+      if needs_processing:
+        return False
+
+    clone = flow_obj.Copy()
+    clone.processing_on = None
+    clone.processing_since = None
+    clone.processing_deadline = None
+    flow_key = (flow_obj.client_id, flow_obj.flow_id)
+    args = [
+        sqlite_utils.Blob(clone.SerializeToString()),
+        int(flow_obj.flow_state),
+        int(flow_obj.HasField("client_crash_info")),
+        flow_obj.next_request_to_process,
+        sqlite_utils.NowInt()
+    ] + list(flow_key)
+
+    old_counter_keys = self._ReadHuntFlowCounterKeys([flow_key], cursor)
+    cursor.execute(
+        "UPDATE flows SET flow=?, flow_state=?, "
+        "crashed=(client_crash_info IS NOT NULL OR ?), "
+        "processing_on=NULL, processing_since=NULL, "
+        "processing_deadline=NULL, next_request_to_process=?, "
+        "last_update=? WHERE " + _FLOW_KEY_CONDITION, args)
+    new_counter_keys = self._ReadHuntFlowCounterKeys([flow_key], cursor)
+    self._UpdateHuntFlowCounts(old_counter_keys, new_counter_keys, cursor)
+
+    # This needs to happen after we are sure that the write has succeeded.
+    flow_obj.processing_on = None
+    flow_obj.processing_since = None
+    flow_obj.processing_deadline = None
+
+    return True
+
+  @_WakesUp("flow_processing_request_handler_scheduler")
+  @mysql_utils.WithTransaction()
+  def WriteFlowProcessingRequests(self, requests, cursor=None):
+    """Writes a list of flow processing requests to the database."""
+    self._WriteFlowProcessingRequests(requests, cursor)
+
+  @mysql_utils.WithTransaction(readonly=True)
+  def ReadFlowProcessingRequests(self, cursor=None):
+    """Reads all flow processing requests from the database."""
+    cursor.execute("SELECT request, timestamp FROM flow_processing_requests")
+
+    res = []
+    for serialized_request, ts in cursor.fetchall():
+      req = rdf_flows.FlowProcessingRequest.FromSerializedString(
+          serialized_request)
+      req.timestamp = sqlite_utils.IntToRDFDatetime(ts)
+      res.append(req)
+    return res
+
+  @mysql_utils.WithTransaction()
+  def AckFlowProcessingRequests(self, requests, cursor=None):
+    """Deletes a list of flow processing requests from the database."""
+    if not requests:
+      return
+
+    cursor.executemany(
+        "DELETE FROM flow_processing_requests "
+        "WHERE client_id=? AND flow_id=? AND timestamp=?",
+        [(r.client_id, r.flow_id, sqlite_utils.RDFDatetimeToInt(r.timestamp))
+         for r in requests])
+
+  @mysql_utils.WithTransaction()
+  def DeleteAllFlowProcessingRequests(self, cursor=None):
+    """Deletes all flow processing requests from the database."""
+    cursor.execute("DELETE FROM flow_processing_requests")
+
+  @mysql_utils.WithTransaction()
+  def _LeaseFlowProcessingReqests(self, cursor=None):
+    """Leases a number of flow processing requests."""
+    now = rdfvalue.RDFDatetime.Now()
+    now_int = sqlite_utils.RDFDatetimeToInt(now)
+    expiry = now + rdfvalue.Duration("10m")
+    expiry_int = sqlite_utils.RDFDatetimeToInt(expiry)
+    id_str = utils.ProcessIdString()
+
+    cursor.execute(
+        "UPDATE flow_processing_requests "
+        "SET leased_until=?, leased_by=? "
+        "WHERE rowid IN (SELECT rowid FROM flow_processing_requests "
+        "WHERE (delivery_time IS NULL OR delivery_time <= ?) AND "
+        "(leased_until IS NULL OR leased_until < ?) LIMIT ?)", [
+            expiry_int, id_str, now_int, now_int,
+            config.CONFIG["Sqlite.flow_processing_lease_batch_size"]
+        ])
+    if cursor.rowcount == 0:
+      return []
+
+    cursor.execute(
+        "SELECT timestamp, request FROM flow_processing_requests "
+        "WHERE leased_by=? AND leased_until=?", [id_str, expiry_int])
+    res = []
+    for timestamp, request in cursor.fetchall():
+      req = rdf_flows.FlowProcessingRequest.FromSerializedString(request)
+      req.timestamp = sqlite_utils.IntToRDFDatetime(timestamp)
+      req.leased_until = expiry
+      req.leased_by = id_str
+      res.append(req)
+
+    return res
+
+  def _FlowProcessingRequestHandlerLoop(self, handler):
+    """The main loop for the flow processing request queue."""
+    while not self.flow_processing_request_handler_stop:
+      msgs = None
+      try:
+        msgs = self._LeaseFlowProcessingReqests()
+        for m in msgs:
+          self.flow_processing_request_handler_pool.AddTask(
+              target=handler, args=(m,))
+      except Exception as e:  # pylint: disable=broad-except
+        logging.exception("_FlowProcessingRequestHandlerLoop raised %s.", e)
+      self.flow_processing_request_handler_scheduler.Wait(bool(msgs))
+
+  def RegisterFlowProcessingHandler(self, handler):
+    """Registers a handler to receive flow processing messages."""
+    self.UnregisterFlowProcessingHandler()
+
+    if handler:
+      self.flow_processing_request_handler_stop = False
+      self.flow_processing_request_handler_thread = threading.Thread(
+          name="flow_processing_request_handler",
+          target=self._FlowProcessingRequestHandlerLoop,
+          args=(handler,))
+      self.flow_processing_request_handler_thread.daemon = True
+      self.flow_processing_request_handler_thread.start()
+
+  def UnregisterFlowProcessingHandler(self, timeout=None):
+    """Unregisters any registered flow processing handler."""
+    if self.flow_processing_request_handler_thread:
+      self.flow_processing_request_handler_stop = True
+      self.flow_processing_request_handler_scheduler.Wake()
+      self.flow_processing_request_handler_thread.join(timeout)
+      if self.flow_processing_request_handler_thread.isAlive():
+        raise RuntimeError("Flow processing handler did not join in time.")
+      self.flow_processing_request_handler_thread = None
+
+  @mysql_utils.WithTransaction()
+  def WriteFlowResults(self, results, cursor=None):
+    """Writes flow results for a given flow."""
+    results = list(results)
+    if not results:
+      return
+
+    flow_keys = set((r.client_id, r.flow_id) for r in results)
+    old_counter_keys = self._ReadHuntFlowCounterKeys(flow_keys, cursor)
+    if len(old_counter_keys) != len(flow_keys):
+      raise db.AtLeastOneUnknownFlowError(
+          [(r.client_id, r.flow_id) for r in results])
+
+    timestamp = sqlite_utils.NowInt()
+
+    rows = []
+    result_counts = collections.Counter()
+    for r in results:
+      # Results belong to the hunt that started the flow.
+      hunt_id = old_counter_keys[(r.client_id, r.flow_id)][0]
+      type_name = compatibility.GetName(r.payload.__class__)
+      rows.append((r.client_id, r.flow_id, hunt_id, timestamp,
+                   sqlite_utils.Blob(r.payload.SerializeToString()), type_name,
+                   r.tag or None))
+      if hunt_id is not None:
+        result_counts[(hunt_id, type_name, r.tag or "")] += 1
+
+    cursor.executemany(
+        "INSERT INTO flow_results "
+        "(client_id, flow_id, hunt_id, timestamp, payload, type, tag) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+
+    if result_counts:
+      cursor.executemany(
+          "INSERT OR IGNORE INTO hunt_result_counts "
+          "(hunt_id, type, tag, num_results) VALUES (?, ?, ?, 0)",
+          list(result_counts))
+      cursor.executemany(
+          "UPDATE hunt_result_counts SET num_results = num_results + ? "
+          "WHERE hunt_id = ? AND type = ? AND tag = ?",
+          [(count,) + counter_key
+           for counter_key, count in iteritems(result_counts)])
+
+    new_counter_keys = {}
+    for flow_key, (hunt_id, flow_state, crashed, has_results) in iteritems(
+        old_counter_keys):
+      if not has_results:
+        new_counter_keys[flow_key] = (hunt_id, flow_state, crashed, True)
+
+    if new_counter_keys:
+      cursor.executemany(
+          "UPDATE flows SET has_results=1 WHERE " + _FLOW_KEY_CONDITION,
+          list(new_counter_keys))
+      self._UpdateHuntFlowCounts(
+          {k: old_counter_keys[k] for k in new_counter_keys}, new_counter_keys,
+          cursor)
+
+  FLOW_RESULT_DB_FIELDS = ("client_id, flow_id, hunt_id, timestamp, payload, "
+                           "type, tag ")
+
+  def _FlowResultFromRow(self, row):
+    """Generates a flow result from a database row."""
+    client_id, flow_id, hunt_id, timestamp, payload, type_name, tag = row
+
+    if type_name in rdfvalue.RDFValue.classes:
+      payload_cls = rdfvalue.RDFValue.classes[type_name]
+      payload = payload_cls.FromSerializedString(payload)
+    else:
+      # The type of the payload is no longer known to the system.
+      payload = rdf_objects.SerializedValueOfUnrecognizedType(
+          type_name=type_name, value=payload)
+
+    result = rdf_flow_objects.FlowResult(
+        client_id=client_id,
+        flow_id=flow_id,
+        timestamp=sqlite_utils.IntToRDFDatetime(timestamp),
+        payload=payload)
+    if hunt_id is not None:
+      result.hunt_id = hunt_id
+    if tag is not None:
+      result.tag = tag
+    return result
+
+  def _FlowResultsConditions(self, with_tag=None, with_type=None,
+                             with_substring=None):
+    """Returns WHERE conditions and arguments for flow results filters."""
+    conditions = []
+    args = []
+
+    if with_tag is not None:
+      conditions.append("tag = ?")
+      args.append(with_tag)
+
+    if with_type is not None:
+      conditions.append("type = ?")
+      args.append(with_type)
+
+    if with_substring is not None:
+      # INSTR compares bytes if both of its arguments are BLOBs.
+      conditions.append("INSTR(payload, ?) > 0")
+      args.append(sqlite_utils.Blob(with_substring.encode("utf-8")))
+
+    return conditions, args
+
+  @mysql_utils.WithTransaction(readonly=True)
+  def ReadFlowResults(self,
+                      client_id,
+                      flow_id,
+                      offset,
+                      count,
+                      with_tag=None,
+                      with_type=None,
+                      with_substring=None,
+                      cursor=None):
+    """Reads flow results of a given flow using given query options."""
+    conditions, args = self._FlowResultsConditions(
+        with_tag=with_tag, with_type=with_type, with_substring=with_substring)
+    conditions = ["client_id = ?", "flow_id = ?"] + conditions
+    args = [client_id, flow_id] + args
+
+    query = ("SELECT " + self.FLOW_RESULT_DB_FIELDS + "FROM flow_results "
+             "WHERE " + " AND ".join(conditions) + " "
+             "ORDER BY timestamp, result_id LIMIT ? OFFSET ?")
+    cursor.execute(query, args + [count, offset])
+    return [self._FlowResultFromRow(row) for row in cursor.fetchall()]
+
+  @mysql_utils.WithTransaction(readonly=True)
+  def CountFlowResults(self,
+                       client_id,
+                       flow_id,
+                       with_tag=None,
+                       with_type=None,
+                       cursor=None):
+    """Counts flow results of a given flow using given query options."""
+    conditions, args = self._FlowResultsConditions(
+        with_tag=with_tag, with_type=with_type)
+    conditions = ["client_id = ?", "flow_id = ?"] + conditions
+    args = [client_id, flow_id] + args
+
+    query = ("SELECT COUNT(*) FROM flow_results WHERE " +
+             " AND ".join(conditions))
+    cursor.execute(query, args)
+    count, = cursor.fetchone()
+    return count
+
+  @mysql_utils.WithTransaction()
+  def WriteFlowLogEntries(self, entries, cursor=None):
+    """Writes flow log entries for a given flow."""
+    entries = list(entries)
+    if not entries:
+      return
+
+    flow_keys = set((e.client_id, e.flow_id) for e in entries)
+    hunt_ids = {}
+    for flow_key in flow_keys:
+      cursor.execute(
+          "SELECT parent_hunt_id FROM flows WHERE " + _FLOW_KEY_CONDITION,
+          flow_key)
+      row = cursor.fetchone()
+      if row is None:
+        raise db.AtLeastOneUnknownFlowError(
+            [(e.client_id, e.flow_id) for e in entries])
+      hunt_ids[flow_key] = row[0]
+
+    timestamp = sqlite_utils.NowInt()
+    cursor.executemany(
+        "INSERT INTO flow_log_entries "
+        "(client_id, flow_id, hunt_id, timestamp, message) "
+        "VALUES (?, ?, ?, ?, ?)",
+        [(e.client_id, e.flow_id, hunt_ids[(e.client_id, e.flow_id)],
+          timestamp, e.message) for e in entries])
+
+  def _FlowLogEntryFromRow(self, row):
+    """Generates a flow log entry from a database row."""
+    client_id, flow_id, hunt_id, timestamp, message = row
+
+    entry = rdf_flow_objects.FlowLogEntry(
+        client_id=client_id,
+        flow_id=flow_id,
+        timestamp=sqlite_utils.IntToRDFDatetime(timestamp),
+        message=message)
+    if hunt_id is not None:
+      entry.hunt_id = hunt_id
+    return entry
+
+  @mysql_utils.WithTransaction(readonly=True)
+  def ReadFlowLogEntries(self,
+                         client_id,
+                         flow_id,
+                         offset,
+                         count,
+                         with_substring=None,
+                         cursor=None):
+    """Reads flow log entries of a given flow using given query options."""
+    query = ("SELECT client_id, flow_id, hunt_id, timestamp, message "
+             "FROM flow_log_entries WHERE client_id = ? AND flow_id = ? ")
+    args = [client_id, flow_id]
+
+    if with_substring is not None:
+      query += "AND INSTR(message, ?) > 0 "
+      args.append(with_substring)
+
+    query += "ORDER BY timestamp, log_id LIMIT ? OFFSET ?"
+    cursor.execute(query, args + [count, offset])
+    return [self._FlowLogEntryFromRow(row) for row in cursor.fetchall()]
+
+  @mysql_utils.WithTransaction(readonly=True)
+  def CountFlowLogEntries(self, client_id, flow_id, cursor=None):
+    """Returns number of flow log entries of a given flow."""
+    cursor.execute(
+        "SELECT COUNT(*) FROM flow_log_entries "
+        "WHERE client_id = ? AND flow_id = ?", [client_id, flow_id])
+    count, = cursor.fetchone()
+    return count
@@ -0,0 +1,50 @@
+#!/usr/bin/env python
+"""The SQLite database methods for foreman rule handling."""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import unicode_literals
+
+from grr_response_core.lib import rdfvalue
+from grr_response_server import foreman_rules
+from grr_response_server.databases import mysql_utils
+from grr_response_server.databases import sqlite_utils
+
+
+class SqliteDBForemanRulesMixin(object):
+  """SqliteDB mixin for foreman rules related functions."""
+
+  @mysql_utils.WithTransaction()
+  def WriteForemanRule(self, rule, cursor=None):
+    cursor.execute(
+        "INSERT OR REPLACE INTO foreman_rules "
+        "(hunt_id, expiration_time, rule) VALUES (?, ?, ?)", [
+            rule.hunt_id,
+            sqlite_utils.RDFDatetimeToInt(rule.expiration_time),
+            sqlite_utils.Blob(rule.SerializeToString())
+        ])
+
+  @mysql_utils.WithTransaction()
+  def RemoveForemanRule(self, hunt_id, cursor=None):
+    cursor.execute("DELETE FROM foreman_rules WHERE hunt_id=?", [hunt_id])
+
+  @mysql_utils.WithTransaction(readonly=True)
+  def ReadAllForemanRules(self, cursor=None):
+    cursor.execute("SELECT rule FROM foreman_rules")
+    res = []
+    for rule, in cursor.fetchall():
+      res.append(foreman_rules.ForemanCondition.FromSerializedString(rule))
+    return res
+
+  @mysql_utils.WithTransaction()
+  def RemoveExpiredForemanRules(self, cursor=None):
+    now = rdfvalue.RDFDatetime.Now()
+    cursor.execute("DELETE FROM foreman_rules WHERE expiration_time < ?",
+                   [sqlite_utils.RDFDatetimeToInt(now)])
+
+  @mysql_utils.WithTransaction(readonly=True)
+  def ReadForemanRulesVersion(self, cursor=None):
+    # CRC32 is registered on every connection by SqliteDB.
+    cursor.execute("SELECT COUNT(*), COALESCE(SUM(CRC32(rule)), 0) "
+                   "FROM foreman_rules")
+    count, checksum = cursor.fetchone()
+    return (int(count), int(checksum))
@@ -0,0 +1,300 @@
+#!/usr/bin/env python
+"""The SQLite database methods for hunt handling."""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import unicode_literals
+
+from grr_response_server import db
+from grr_response_server.databases import mysql_utils
+from grr_response_server.databases import sqlite_utils
+from grr_response_server.rdfvalues import flow_objects as rdf_flow_objects
+from grr_response_server.rdfvalues import hunt_objects as rdf_hunt_objects
+
+_ERROR = int(rdf_flow_objects.Flow.FlowState.ERROR)
+_FINISHED = int(rdf_flow_objects.Flow.FlowState.FINISHED)
+_RUNNING = int(rdf_flow_objects.Flow.FlowState.RUNNING)
+
+# WHERE conditions of hunt flows filters. They only use columns present in both
+# the flows and the hunt_flow_counts tables.
+_HUNT_FLOWS_CONDITIONS = {
+    db.HuntFlowsCondition.UNSET: "1",
+    db.HuntFlowsCondition.FAILED_FLOWS_ONLY: "flow_state = %d" % _ERROR,
+    db.HuntFlowsCondition.SUCCEEDED_FLOWS_ONLY: "flow_state = %d" % _FINISHED,
+    db.HuntFlowsCondition.COMPLETED_FLOWS_ONLY:
+        "flow_state IN (%d, %d)" % (_ERROR, _FINISHED),
+    db.HuntFlowsCondition.FLOWS_IN_PROGRESS_ONLY: "flow_state = %d" % _RUNNING,
+    db.HuntFlowsCondition.CRASHED_FLOWS_ONLY: "crashed",
+    db.HuntFlowsCondition.FLOWS_WITH_RESULTS_ONLY: "has_results",
+}
+
+
+def _HuntFlowsCondition(filter_condition):
+  try:
+    return _HUNT_FLOWS_CONDITIONS[filter_condition]
+  except KeyError:
+    raise ValueError("Invalid filter condition: %d" % filter_condition)
+
+
+class SqliteDBHuntMixin(object):
+  """SqliteDB mixin for hunt handling."""
+
+  @mysql_utils.WithTransaction()
+  def WriteHuntObject(self, hunt_obj, cursor=None):
+    """Writes a hunt object to the database."""
+    metadata = rdf_hunt_objects.HuntMetadata.FromHunt(hunt_obj)
+    cursor.execute(
+        "INSERT OR REPLACE INTO hunts (hunt_id, hunt, last_update, metadata, "
+        "create_time, creator, description) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?)", [
+            hunt_obj.hunt_id,
+            sqlite_utils.Blob(hunt_obj.SerializeToString()),
+            sqlite_utils.NowInt(),
+            sqlite_utils.Blob(metadata.SerializeToString()),
+            sqlite_utils.RDFDatetimeToInt(hunt_obj.create_time),
+            hunt_obj.creator,
+            hunt_obj.description,
+        ])
+
+  @mysql_utils.WithTransaction()
+  def UpdateHuntObject(self, hunt_id, update_fn, cursor=None):
+    """Updates the hunt object by applying the update function."""
+    # The write lock is held for the whole transaction, so the row doesn't
+    # need to be locked for the update.
+    cursor.execute("SELECT hunt, last_update FROM hunts WHERE hunt_id=?",
+                   [hunt_id])
+    row = cursor.fetchone()
+    if row is None:
+      raise db.UnknownHuntError(hunt_id)
+
+    updated_hunt_obj = update_fn(self._HuntObjectFromRow(row))
+    if updated_hunt_obj is None:
+      raise ValueError("update_fn can't return None")
+
+    self.WriteHuntObject(updated_hunt_obj, cursor=cursor)
+    return updated_hunt_obj
+
+  @mysql_utils.WithTransaction()
+  def DeleteHuntObject(self, hunt_id, cursor=None):
+    """Deletes a hunt object from the database."""
+    cursor.execute("DELETE FROM hunts WHERE hunt_id=?", [hunt_id])
+    if cursor.rowcount == 0:
+      raise db.UnknownHuntError(hunt_id)
+
+    cursor.execute("DELETE FROM hunt_result_counts WHERE hunt_id=?", [hunt_id])
+    cursor.execute("DELETE FROM hunt_flow_counts WHERE hunt_id=?", [hunt_id])
+
+  def _HuntObjectFromRow(self, row):
+    """Generates a hunt object from a database row."""
+    hunt, last_update = row
+
+    hunt_obj = rdf_hunt_objects.Hunt.FromSerializedString(hunt)
+    hunt_obj.last_update_time = sqlite_utils.IntToRDFDatetime(last_update)
+    return hunt_obj
+
+  @mysql_utils.WithTransaction(readonly=True)
+  def ReadHuntObject(self, hunt_id, cursor=None):
+    """Reads a hunt object from the database."""
+    cursor.execute("SELECT hunt, last_update FROM hunts WHERE hunt_id=?",
+                   [hunt_id])
+    row = cursor.fetchone()
+    if row is None:
+      raise db.UnknownHuntError(hunt_id)
+
+    return self._HuntObjectFromRow(row)
+
+  @mysql_utils.WithTransaction(readonly=True)
+  def ReadAllHuntObjects(self, cursor=None):
+    """Reads all hunt objects from the database."""
+    cursor.execute("SELECT hunt, last_update FROM hunts")
+    return [self._HuntObjectFromRow(row) for row in cursor.fetchall()]
+
+  def _HuntObjectsConditions(self, with_creator, created_after,
+                             with_description_match):
+    """Returns a WHERE clause and its arguments for listing hunts."""
+    conditions = []
+    args = []
+
+    if with_creator is not None:
+      conditions.append("creator = ?")
+      args.append(with_creator)
+
+    if created_after is not None:
+      conditions.append("create_time > ?")
+      args.append(sqlite_utils.RDFDatetimeToInt(created_after))
+
+    if with_description_match is not None:
+      conditions.append("INSTR(description, ?) > 0")
+      args.append(with_description_match)
+
+    if not conditions:
+      return "", args
+    return "WHERE " + " AND ".join(conditions) + " ", args
+
+  @mysql_utils.WithTransaction(readonly=True)
+  def ListHuntObjects(self,
+                      offset,
+                      count,
+                      with_creator=None,
+                      created_after=None,
+                      with_description_match=None,
+                      cursor=None):
+    """Lists metadata of hunts matching given conditions."""
+    where, args = self._HuntObjectsConditions(with_creator, created_after,
+                                              with_description_match)
+    query = ("SELECT metadata, last_update FROM hunts " + where +
+             "ORDER BY create_time DESC, hunt_id DESC LIMIT ? OFFSET ?")
+    cursor.execute(query, args + [count, offset])
+
+    result = []
+    for metadata, last_update in cursor.fetchall():
+      hunt_metadata = rdf_hunt_objects.HuntMetadata.FromSerializedString(
+          metadata)
+      hunt_metadata.last_update_time = sqlite_utils.IntToRDFDatetime(
+          last_update)
+      result.append(hunt_metadata)
+    return result
+
+  @mysql_utils.WithTransaction(readonly=True)
+  def CountHuntObjects(self,
+                       with_creator=None,
+                       created_after=None,
+                       with_description_match=None,
+                       cursor=None):
+    """Returns number of hunts matching given conditions."""
+    where, args = self._HuntObjectsConditions(with_creator, created_after,
+                                              with_description_match)
+    cursor.execute("SELECT COUNT(*) FROM hunts " + where, args)
+    count, = cursor.fetchone()
+    return count
+
+  @mysql_utils.WithTransaction(readonly=True)
+  def ReadHuntLogEntries(self,
+                         hunt_id,
+                         offset,
+                         count,
+                         with_substring=None,
+                         cursor=None):
+    """Reads hunt log entries of a given hunt using given query options."""
+    query = ("SELECT client_id, flow_id, hunt_id, timestamp, message "
+             "FROM flow_log_entries WHERE hunt_id = ? ")
+    args = [hunt_id]
+
+    if with_substring is not None:
+      query += "AND INSTR(message, ?) > 0 "
+      args.append(with_substring)
+
+    query += "ORDER BY timestamp, log_id LIMIT ? OFFSET ?"
+    cursor.execute(query, args + [count, offset])
+    return [self._FlowLogEntryFromRow(row) for row in cursor.fetchall()]
+
+  @mysql_utils.WithTransaction(readonly=True)
+  def CountHuntLogEntries(self, hunt_id, cursor=None):
+    """Returns number of hunt log entries of a given hunt."""
+    cursor.execute("SELECT COUNT(*) FROM flow_log_entries WHERE hunt_id = ?",
+                   [hunt_id])
+    count, = cursor.fetchone()
+    return count
+
+  @mysql_utils.WithTransaction(readonly=True)
+  def ReadHuntResults(self,
+                      hunt_id,
+                      offset,
+                      count,
+                      with_tag=None,
+                      with_type=None,
+                      with_substring=None,
+                      with_timestamp=None,
+                      cursor=None):
+    """Reads hunt results of a given hunt using given query options."""
+    conditions, args = self._FlowResultsConditions(
+        with_tag=with_tag, with_type=with_type, with_substring=with_substring)
+    conditions = ["hunt_id = ?"] + conditions
+    args = [hunt_id] + args
+
+    if with_timestamp is not None:
+      conditions.append("timestamp = ?")
+      args.append(sqlite_utils.RDFDatetimeToInt(with_timestamp))
+
+    query = ("SELECT " + self.FLOW_RESULT_DB_FIELDS + "FROM flow_results "
+             "WHERE " + " AND ".join(conditions) + " "
+             "ORDER BY timestamp, result_id LIMIT ? OFFSET ?")
+    cursor.execute(query, args + [count, offset])
+    return [self._FlowResultFromRow(row) for row in cursor.fetchall()]
+
+  @mysql_utils.WithTransaction(readonly=True)
+  def CountHuntResults(self,
+                       hunt_id,
+                       with_tag=None,
+                       with_type=None,
+                       cursor=None):
+    """Counts hunt results of a given hunt using given query options."""
+    query = ("SELECT COALESCE(SUM(num_results), 0) FROM hunt_result_counts "
+             "WHERE hunt_id = ?")
+    args = [hunt_id]
+
+    if with_tag is not None:
+      query += " AND tag = ?"
+      args.append(with_tag)
+
+    if with_type is not None:
+      query += " AND type = ?"
+      args.append(with_type)
+
+    cursor.execute(query, args)
+    count, = cursor.fetchone()
+    return int(count)
+
+  @mysql_utils.WithTransaction(readonly=True)
+  def CountHuntResultsByType(self, hunt_id, cursor=None):
+    """Counts number of hunts results per type."""
+    query = ("SELECT type, SUM(num_results) FROM hunt_result_counts "
+             "WHERE hunt_id = ? GROUP BY type")
+    cursor.execute(query, [hunt_id])
+    return {
+        type_name: int(count)
+        for type_name, count in cursor.fetchall()
+        if count
+    }
+
+  @mysql_utils.WithTransaction(readonly=True)
+  def ReadHuntFlows(self,
+                    hunt_id,
+                    offset,
+                    count,
+                    filter_condition=db.HuntFlowsCondition.UNSET,
+                    cursor=None):
+    """Reads hunt flows matching given conditions."""
+    query = ("SELECT " + self.FLOW_DB_FIELDS + "FROM flows "
+             "WHERE parent_hunt_id = ? AND " +
+             _HuntFlowsCondition(filter_condition) + " "
+             "ORDER BY last_update LIMIT ? OFFSET ?")
+    cursor.execute(query, [hunt_id, count, offset])
+    return [self._FlowObjectFromRow(row) for row in cursor.fetchall()]
+
+  @mysql_utils.WithTransaction(readonly=True)
+  def CountHuntFlows(self,
+                     hunt_id,
+                     filter_condition=db.HuntFlowsCondition.UNSET,
+                     cursor=None):
+    """Counts hunt flows matching given conditions."""
+    query = ("SELECT COALESCE(SUM(num_flows), 0) FROM hunt_flow_counts "
+             "WHERE hunt_id = ? AND " + _HuntFlowsCondition(filter_condition))
+    cursor.execute(query, [hunt_id])
+    count, = cursor.fetchone()
+    return int(count)
+
+  @mysql_utils.WithTransaction(readonly=True)
+  def ReadClientIdsWithHuntFlows(self, hunt_id, client_ids, cursor=None):
+    """Checks which of given clients have the flow of a given hunt."""
+    client_ids = list(client_ids)
+    if not client_ids:
+      return set()
+
+    # Flows started by a hunt have the hunt's id as their flow id, so the
+    # lookup only touches the flows table's primary key.
+    query = ("SELECT client_id FROM flows "
+             "WHERE client_id IN ({}) AND flow_id = ? "
+             "AND parent_hunt_id = ?").format(", ".join(["?"] *
+                                                       len(client_ids)))
+    cursor.execute(query, client_ids + [hunt_id, hunt_id])
+    return set(client_id for client_id, in cursor.fetchall())
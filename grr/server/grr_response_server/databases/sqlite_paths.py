@@ -0,0 +1,588 @@
+#!/usr/bin/env python
+"""The SQLite database methods for path handling."""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import unicode_literals
+
+import collections
+import sqlite3
+
+from future.utils import iteritems
+from future.utils import iterkeys
+
+from grr_response_core.lib.rdfvalues import client_fs as rdf_client_fs
+from grr_response_core.lib.rdfvalues import crypto as rdf_crypto
+from grr_response_server import db
+from grr_response_server.databases import mysql_utils
+from grr_response_server.databases import sqlite_utils
+from grr_response_server.rdfvalues import objects as rdf_objects
+
+# Columns of `client_paths` rows followed by the stat and hash entries that
+# are current for them. Depending on the requested point in time, the entries
+# are either the latest ones (pointed to by the `last_*_timestamp` columns) or
+# the latest ones that are not newer than the given timestamp.
+_PATH_INFO_COLUMNS = """
+SELECT p.path, p.directory, p.timestamp,
+       s.timestamp, s.stat_entry, h.timestamp, h.hash_entry
+  FROM client_paths AS p
+"""
+
+_LATEST_ENTRIES_JOINS = """
+  LEFT JOIN client_path_stat_entries AS s
+         ON s.client_id = p.client_id AND s.path_type = p.path_type
+        AND s.path_id = p.path_id
+        AND s.timestamp = p.last_stat_entry_timestamp
+  LEFT JOIN client_path_hash_entries AS h
+         ON h.client_id = p.client_id AND h.path_type = p.path_type
+        AND h.path_id = p.path_id
+        AND h.timestamp = p.last_hash_entry_timestamp
+"""
+
+_TIMESTAMPED_ENTRIES_JOINS = """
+  LEFT JOIN client_path_stat_entries AS s
+         ON s.client_id = p.client_id AND s.path_type = p.path_type
+        AND s.path_id = p.path_id
+        AND s.timestamp = (SELECT MAX(timestamp)
+                             FROM client_path_stat_entries
+                            WHERE client_id = p.client_id
+                              AND path_type = p.path_type
+                              AND path_id = p.path_id
+                              AND timestamp <= ?)
+  LEFT JOIN client_path_hash_entries AS h
+         ON h.client_id = p.client_id AND h.path_type = p.path_type
+        AND h.path_id = p.path_id
+        AND h.timestamp = (SELECT MAX(timestamp)
+                             FROM client_path_hash_entries
+                            WHERE client_id = p.client_id
+                              AND path_type = p.path_type
+                              AND path_id = p.path_id
+                              AND timestamp <= ?)
+"""
+
+_KEY_CONDITION = "client_id = ? AND path_type = ? AND path_id = ?"
+
+
+def _PathInfosQuery(timestamp):
+  """Returns a query prefix and arguments for reading path info rows.
+
+  Args:
+    timestamp: A point in time for which the stat and hash entries should be
+      retrieved or `None` for the latest ones.
+
+  Returns:
+    A tuple with a query string (to be followed by a WHERE clause) and a list
+    of arguments for it.
+  """
+  if timestamp is None:
+    return _PATH_INFO_COLUMNS + _LATEST_ENTRIES_JOINS, []
+
+  timestamp_int = sqlite_utils.RDFDatetimeToInt(timestamp)
+  return _PATH_INFO_COLUMNS + _TIMESTAMPED_ENTRIES_JOINS, [
+      timestamp_int, timestamp_int
+  ]
+
+
+def _PathInfoFromRow(path_type, row, timestamp=None):
+  """Builds a path info from a row returned by a `_PathInfosQuery` query."""
+  (path, directory, path_timestamp, stat_entry_timestamp, stat_entry_bytes,
+   hash_entry_timestamp, hash_entry_bytes) = row
+
+  stat_entry_timestamp = sqlite_utils.IntToRDFDatetime(stat_entry_timestamp)
+  hash_entry_timestamp = sqlite_utils.IntToRDFDatetime(hash_entry_timestamp)
+
+  if timestamp is None:
+    path_timestamp = sqlite_utils.IntToRDFDatetime(path_timestamp)
+  else:
+    # Only the latest write time is stored for a path, so for a point in the
+    # past the time of the newest entry known at that point is reported.
+    entry_timestamps = [
+        entry_timestamp
+        for entry_timestamp in [stat_entry_timestamp, hash_entry_timestamp]
+        if entry_timestamp is not None
+    ]
+    path_timestamp = max(entry_timestamps) if entry_timestamps else None
+
+  result = rdf_objects.PathInfo(
+      path_type=path_type,
+      components=mysql_utils.PathToComponents(path),
+      directory=bool(directory),
+      timestamp=path_timestamp,
+      last_stat_entry_timestamp=stat_entry_timestamp,
+      last_hash_entry_timestamp=hash_entry_timestamp)
+
+  if stat_entry_bytes is not None:
+    result.stat_entry = rdf_client_fs.StatEntry.FromSerializedString(
+        stat_entry_bytes)
+  if hash_entry_bytes is not None:
+    result.hash_entry = rdf_crypto.Hash.FromSerializedString(hash_entry_bytes)
+
+  return result
+
+
+def _ClientPathKey(client_id, path_type, components):
+  return (client_id, int(path_type),
+          rdf_objects.PathID.FromComponents(components).AsBytes())
+
+
+def _KeyArgs(key):
+  """Returns query arguments for a (client id, path type, path id) key."""
+  client_id, path_type, path_id = key
+  return [client_id, path_type, sqlite_utils.Blob(path_id)]
+
+
+class SqliteDBPathMixin(object):
+  """SqliteDB mixin for path related functions."""
+
+  @mysql_utils.WithTransaction(readonly=True)
+  def ReadPathInfo(self,
+                   client_id,
+                   path_type,
+                   components,
+                   timestamp=None,
+                   cursor=None):
+    """Retrieves a path info record for a given path."""
+    query, args = _PathInfosQuery(timestamp)
+    query += """
+     WHERE p.client_id = ? AND p.path_type = ? AND p.path_id = ?
+    """
+    args.extend(_KeyArgs(_ClientPathKey(client_id, path_type, components)))
+
+    cursor.execute(query, args)
+    row = cursor.fetchone()
+    if row is None:
+      raise db.UnknownPathError(
+          client_id=client_id, path_type=path_type, components=components)
+
+    return _PathInfoFromRow(path_type, row, timestamp=timestamp)
+
+  @mysql_utils.WithTransaction(readonly=True)
+  def ReadPathInfos(self, client_id, path_type, components_list, cursor=None):
+    """Retrieves path info records for given paths."""
+    result = {components: None for components in components_list}
+    if not result:
+      return result
+
+    path_ids = [
+        sqlite_utils.Blob(
+            rdf_objects.PathID.FromComponents(components).AsBytes())
+        for components in components_list
+    ]
+
+    query, args = _PathInfosQuery(None)
+    query += """
+     WHERE p.client_id = ? AND p.path_type = ? AND p.path_id IN ({})
+    """.format(", ".join(["?"] * len(path_ids)))
+    args.extend([client_id, int(path_type)])
+    args.extend(path_ids)
+
+    cursor.execute(query, args)
+    for row in cursor.fetchall():
+      path_info = _PathInfoFromRow(path_type, row)
+      result[tuple(path_info.components)] = path_info
+
+    return result
+
+  @mysql_utils.WithTransaction()
+  def WritePathInfos(self, client_id, path_infos, cursor=None):
+    """Writes a collection of path_info records for a client."""
+    try:
+      self._MultiWritePathInfos({client_id: path_infos}, cursor)
+    except sqlite3.IntegrityError as error:
+      raise db.UnknownClientError(client_id=client_id, cause=error)
+
+  @mysql_utils.WithTransaction()
+  def MultiWritePathInfos(self, path_infos, cursor=None):
+    """Writes a collection of path info records for specified clients."""
+    try:
+      self._MultiWritePathInfos(path_infos, cursor)
+    except sqlite3.IntegrityError as error:
+      client_ids = list(iterkeys(path_infos))
+      raise db.AtLeastOneUnknownClientError(client_ids=client_ids, cause=error)
+
+  def _MultiWritePathInfos(self, path_infos, cursor):
+    """Writes path infos of many clients with batched upserts."""
+    now = sqlite_utils.NowInt()
+
+    # Paths (together with all their ancestors) are deduplicated, so that every
+    # row is upserted once. A path is a directory if any of the writes says so.
+    path_rows = collections.OrderedDict()
+    stat_entry_rows = []
+    hash_entry_rows = []
+
+    def AddPathRow(client_id, path_info, directory, explicit=False):
+      key = (client_id, int(path_info.path_type),
+             path_info.GetPathID().AsBytes())
+
+      row = path_rows.get(key)
+      if row is None:
+        path_rows[key] = row = {
+            "path": mysql_utils.ComponentsToPath(path_info.components),
+            "depth": len(path_info.components),
+            "directory": directory,
+            "stat_entry_timestamp": None,
+            "hash_entry_timestamp": None,
+        }
+      else:
+        row["directory"] |= directory
+
+      if explicit and path_info.HasField("stat_entry"):
+        row["stat_entry_timestamp"] = now
+        stat_entry_rows.append(
+            _KeyArgs(key) +
+            [now, sqlite_utils.Blob(path_info.stat_entry.SerializeToString())])
+
+      if explicit and path_info.HasField("hash_entry"):
+        hash_entry = path_info.hash_entry
+        if hash_entry.HasField("sha256"):
+          sha256 = sqlite_utils.Blob(hash_entry.sha256.AsBytes())
+        else:
+          sha256 = None
+
+        row["hash_entry_timestamp"] = now
+        hash_entry_rows.append(
+            _KeyArgs(key) +
+            [now, sqlite_utils.Blob(hash_entry.SerializeToString()), sha256])
+
+    for client_id, client_path_infos in iteritems(path_infos):
+      for path_info in client_path_infos:
+        AddPathRow(client_id, path_info, path_info.directory, explicit=True)
+        for ancestor_path_info in path_info.GetAncestors():
+          AddPathRow(client_id, ancestor_path_info, True)
+
+    if not path_rows:
+      return
+
+    insert_rows = []
+    update_rows = []
+    for key, row in iteritems(path_rows):
+      values = [
+          int(row["directory"]), now, row["stat_entry_timestamp"],
+          row["hash_entry_timestamp"]
+      ]
+      insert_rows.append(_KeyArgs(key) + [row["path"], row["depth"]] + values)
+      update_rows.append(values + _KeyArgs(key))
+
+    # Paths are referenced by their stat and hash entries, so existing rows
+    # are updated instead of replaced.
+    cursor.executemany(
+        """
+        INSERT OR IGNORE INTO client_paths(client_id, path_type, path_id,
+                                           path, depth, directory, timestamp,
+                                           last_stat_entry_timestamp,
+                                           last_hash_entry_timestamp)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, insert_rows)
+    cursor.executemany(
+        """
+        UPDATE client_paths
+           SET directory = ?,
+               timestamp = ?,
+               last_stat_entry_timestamp = COALESCE(?,
+                                                    last_stat_entry_timestamp),
+               last_hash_entry_timestamp = COALESCE(?,
+                                                    last_hash_entry_timestamp)
+         WHERE """ + _KEY_CONDITION, update_rows)
+
+    if stat_entry_rows:
+      cursor.executemany(
+          """
+          INSERT OR REPLACE INTO client_path_stat_entries(client_id, path_type,
+                                                          path_id, timestamp,
+                                                          stat_entry)
+          VALUES (?, ?, ?, ?, ?)
+          """, stat_entry_rows)
+
+    if hash_entry_rows:
+      cursor.executemany(
+          """
+          INSERT OR REPLACE INTO client_path_hash_entries(client_id, path_type,
+                                                          path_id, timestamp,
+                                                          hash_entry, sha256)
+          VALUES (?, ?, ?, ?, ?, ?)
+          """, hash_entry_rows)
+
+  def ClearPathHistory(self, client_id, path_infos):
+    """Clears path history for specified paths of given client."""
+    self.MultiClearPathHistory({client_id: path_infos})
+
+  @mysql_utils.WithTransaction()
+  def MultiClearPathHistory(self, path_infos, cursor=None):
+    """Clears path history for specified paths of given clients."""
+    keys = []
+    for client_id, client_path_infos in iteritems(path_infos):
+      for path_info in client_path_infos:
+        keys.append(
+            _KeyArgs(
+                _ClientPathKey(client_id, path_info.path_type,
+                               path_info.components)))
+
+    if not keys:
+      return
+
+    cursor.executemany(
+        "DELETE FROM client_path_stat_entries WHERE " + _KEY_CONDITION, keys)
+    cursor.executemany(
+        "DELETE FROM client_path_hash_entries WHERE " + _KEY_CONDITION, keys)
+    cursor.executemany(
+        """
+        UPDATE client_paths
+           SET last_stat_entry_timestamp = NULL,
+               last_hash_entry_timestamp = NULL
+         WHERE """ + _KEY_CONDITION, keys)
+
+  @mysql_utils.WithTransaction(readonly=True)
+  def ListDescendentPathInfos(self,
+                              client_id,
+                              path_type,
+                              components,
+                              timestamp=None,
+                              max_depth=None,
+                              cursor=None):
+    """Lists path info records that correspond to descendants of given path."""
+    path = mysql_utils.ComponentsToPath(components)
+    depth = len(components)
+
+    # All descendants of a path have it (followed by a separator) as a prefix.
+    # The `path` column uses the binary collation, so the prefix corresponds to
+    # a range that ends right before the separator's successor, which is a
+    # range scan over the path index.
+    query, args = _PathInfosQuery(timestamp)
+    query += """
+     WHERE p.client_id = ? AND p.path_type = ?
+       AND p.path >= ? AND p.path < ?
+    """
+    args.extend([
+        client_id,
+        int(path_type),
+        path + "/",
+        path + "0",
+    ])
+
+    if max_depth is None:
+      query += " AND p.depth > ?"
+      args.append(depth)
+    else:
+      query += " AND p.depth BETWEEN ? AND ?"
+      args.extend([depth + 1, depth + max_depth])
+
+    cursor.execute(query, args)
+    results = [
+        _PathInfoFromRow(path_type, row, timestamp=timestamp)
+        for row in cursor.fetchall()
+    ]
+
+    # Implicit path infos are filtered out if a specific timestamp is given:
+    # only paths with a stat or hash entry at that time are listed, together
+    # with their ancestors.
+    if timestamp is not None:
+      listed = set()
+      for path_info in results:
+        if not (path_info.HasField("stat_entry") or
+                path_info.HasField("hash_entry")):
+          continue
+
+        explicit_components = tuple(path_info.components)
+        for i in range(depth + 1, len(explicit_components) + 1):
+          listed.add(explicit_components[:i])
+
+      results = [
+          path_info for path_info in results
+          if tuple(path_info.components) in listed
+      ]
+
+    results.sort(key=lambda path_info: tuple(path_info.components))
+    return results
+
+  @mysql_utils.WithTransaction()
+  def MultiWritePathHistory(self, client_path_histories, cursor=None):
+    """Writes a collection of hash and stat entries observed for given paths."""
+    stat_entry_rows = []
+    hash_entry_rows = []
+    path_updates = []
+
+    for client_path, client_path_history in iteritems(client_path_histories):
+      key_args = _KeyArgs(
+          _ClientPathKey(client_path.client_id, client_path.path_type,
+                         client_path.components))
+
+      stat_entry_timestamps = []
+      for timestamp, stat_entry in iteritems(client_path_history.stat_entries):
+        timestamp = sqlite_utils.RDFDatetimeToInt(timestamp)
+        stat_entry_timestamps.append(timestamp)
+        stat_entry_rows.append(
+            key_args +
+            [timestamp,
+             sqlite_utils.Blob(stat_entry.SerializeToString())])
+
+      hash_entry_timestamps = []
+      for timestamp, hash_entry in iteritems(client_path_history.hash_entries):
+        timestamp = sqlite_utils.RDFDatetimeToInt(timestamp)
+        if hash_entry.HasField("sha256"):
+          sha256 = sqlite_utils.Blob(hash_entry.sha256.AsBytes())
+        else:
+          sha256 = None
+
+        hash_entry_timestamps.append(timestamp)
+        hash_entry_rows.append(key_args + [
+            timestamp,
+            sqlite_utils.Blob(hash_entry.SerializeToString()), sha256
+        ])
+
+      if stat_entry_timestamps or hash_entry_timestamps:
+        last_stat_entry_timestamp = (
+            max(stat_entry_timestamps) if stat_entry_timestamps else None)
+        last_hash_entry_timestamp = (
+            max(hash_entry_timestamps) if hash_entry_timestamps else None)
+        last_timestamp = max(stat_entry_timestamps + hash_entry_timestamps)
+        path_updates.append([
+            last_stat_entry_timestamp, last_stat_entry_timestamp,
+            last_hash_entry_timestamp, last_hash_entry_timestamp,
+            last_timestamp
+        ] + key_args)
+
+    client_path_ids = list(iterkeys(client_path_histories))
+
+    try:
+      if stat_entry_rows:
+        cursor.executemany(
+            """
+            INSERT INTO client_path_stat_entries(client_id, path_type, path_id,
+                                                 timestamp, stat_entry)
+            VALUES (?, ?, ?, ?, ?)
+            """, stat_entry_rows)
+
+      if hash_entry_rows:
+        cursor.executemany(
+            """
+            INSERT INTO client_path_hash_entries(client_id, path_type, path_id,
+                                                 timestamp, hash_entry, sha256)
+            VALUES (?, ?, ?, ?, ?, ?)
+            """, hash_entry_rows)
+    except sqlite3.IntegrityError as error:
+      if "UNIQUE" in str(error):
+        raise db.Error("Duplicated history entry write", cause=error)
+      raise db.AtLeastOneUnknownPathError(client_path_ids, cause=error)
+
+    # The multi-argument `MAX` yields `NULL` if any of its arguments is `NULL`,
+    # hence the `COALESCE` calls for paths that had no entries so far or get
+    # no new ones.
+    cursor.executemany(
+        """
+        UPDATE client_paths
+           SET last_stat_entry_timestamp = MAX(
+                 COALESCE(last_stat_entry_timestamp, ?),
+                 COALESCE(?, last_stat_entry_timestamp)),
+               last_hash_entry_timestamp = MAX(
+                 COALESCE(last_hash_entry_timestamp, ?),
+                 COALESCE(?, last_hash_entry_timestamp)),
+               timestamp = MAX(timestamp, ?)
+         WHERE """ + _KEY_CONDITION, path_updates)
+
+  @mysql_utils.WithTransaction(readonly=True)
+  def ReadPathInfosHistories(self,
+                             client_id,
+                             path_type,
+                             components_list,
+                             cursor=None):
+    """Reads a collection of hash and stat entries for given paths."""
+    results = {components: [] for components in components_list}
+    if not results:
+      return results
+
+    components_by_path_id = {
+        rdf_objects.PathID.FromComponents(components).AsBytes(): components
+        for components in components_list
+    }
+
+    args = [client_id, int(path_type)]
+    args.extend(sqlite_utils.Blob(path_id) for path_id in components_by_path_id)
+    condition = """
+     WHERE client_id = ? AND path_type = ? AND path_id IN ({})
+    """.format(", ".join(["?"] * len(components_by_path_id)))
+
+    path_infos_by_key = {}
+
+    def GetPathInfo(path_id, timestamp):
+      """Returns a history path info of a given path at a given time."""
+      key = (path_id, timestamp)
+      path_info = path_infos_by_key.get(key)
+      if path_info is None:
+        path_info = rdf_objects.PathInfo(
+            path_type=path_type,
+            components=components_by_path_id[path_id],
+            timestamp=sqlite_utils.IntToRDFDatetime(timestamp))
+        path_infos_by_key[key] = path_info
+      return path_info
+
+    cursor.execute(
+        "SELECT path_id, timestamp, stat_entry "
+        "FROM client_path_stat_entries" + condition, args)
+    for path_id, timestamp, stat_entry_bytes in cursor.fetchall():
+      path_info = GetPathInfo(path_id, timestamp)
+      path_info.stat_entry = rdf_client_fs.StatEntry.FromSerializedString(
+          stat_entry_bytes)
+
+    cursor.execute(
+        "SELECT path_id, timestamp, hash_entry "
+        "FROM client_path_hash_entries" + condition, args)
+    for path_id, timestamp, hash_entry_bytes in cursor.fetchall():
+      path_info = GetPathInfo(path_id, timestamp)
+      path_info.hash_entry = rdf_crypto.Hash.FromSerializedString(
+          hash_entry_bytes)
+
+    for path_id, timestamp in sorted(iterkeys(path_infos_by_key)):
+      components = components_by_path_id[path_id]
+      results[components].append(path_infos_by_key[(path_id, timestamp)])
+
+    return results
+
+  @mysql_utils.WithTransaction(readonly=True)
+  def ReadLatestPathInfosWithHashBlobReferences(self,
+                                                client_paths,
+                                                max_timestamp=None,
+                                                cursor=None):
+    """Returns PathInfos that have corresponding HashBlobReferences."""
+    results = {client_path: None for client_path in client_paths}
+
+    # Hash entries without blob references are dropped by the inner join, so
+    # the newest remaining entry of a path is the one to be returned.
+    query = """
+    SELECT h.timestamp, h.hash_entry, s.stat_entry
+      FROM client_path_hash_entries AS h
+      JOIN hash_blob_references AS b ON b.hash_id = h.sha256
+      LEFT JOIN client_path_stat_entries AS s
+             ON s.client_id = h.client_id AND s.path_type = h.path_type
+            AND s.path_id = h.path_id AND s.timestamp = h.timestamp
+     WHERE h.client_id = ? AND h.path_type = ? AND h.path_id = ?
+    """
+    if max_timestamp is not None:
+      query += " AND h.timestamp <= ?"
+    query += " ORDER BY h.timestamp DESC LIMIT 1"
+
+    # Every path is looked up with the same prepared statement, which uses the
+    # primary key of the hash entries.
+    for client_path in results:
+      args = _KeyArgs(
+          _ClientPathKey(client_path.client_id, client_path.path_type,
+                         client_path.components))
+      if max_timestamp is not None:
+        args.append(sqlite_utils.RDFDatetimeToInt(max_timestamp))
+
+      cursor.execute(query, args)
+      row = cursor.fetchone()
+      if row is None:
+        continue
+
+      timestamp, hash_entry_bytes, stat_entry_bytes = row
+      path_info = rdf_objects.PathInfo(
+          path_type=client_path.path_type,
+          components=client_path.components,
+          timestamp=sqlite_utils.IntToRDFDatetime(timestamp),
+          hash_entry=rdf_crypto.Hash.FromSerializedString(hash_entry_bytes))
+      if stat_entry_bytes is not None:
+        path_info.stat_entry = rdf_client_fs.StatEntry.FromSerializedString(
+            stat_entry_bytes)
+
+      results[client_path] = path_info
+
+    return results
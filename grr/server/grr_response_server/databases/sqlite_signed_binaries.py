@@ -0,0 +1,68 @@
+#!/usr/bin/env python
+"""SQLite implementation of DB methods for handling signed binaries."""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import unicode_literals
+
+from typing import Sequence, Tuple
+
+from grr_response_server import db
+from grr_response_server.databases import mysql_utils
+from grr_response_server.databases import sqlite_utils
+from grr_response_server.rdfvalues import objects as rdf_objects
+
+
+class SqliteDBSignedBinariesMixin(object):
+  """Mixin providing an SQLite implementation of signed binaries DB logic."""
+
+  @mysql_utils.WithTransaction()
+  def WriteSignedBinaryReferences(self, binary_id,
+                                  references, cursor=None):
+    """See db.Database."""
+    cursor.execute(
+        "INSERT OR REPLACE INTO signed_binary_references "
+        "(binary_type, binary_path, timestamp, blob_references) "
+        "VALUES (?, ?, ?, ?)", [
+            int(binary_id.binary_type), binary_id.path,
+            sqlite_utils.NowInt(),
+            sqlite_utils.Blob(references.SerializeToString())
+        ])
+
+  @mysql_utils.WithTransaction(readonly=True)
+  def ReadSignedBinaryReferences(
+      self, binary_id, cursor=None
+  ):
+    """See db.Database."""
+    cursor.execute(
+        "SELECT blob_references, timestamp FROM signed_binary_references "
+        "WHERE binary_type = ? AND binary_path = ?",
+        [int(binary_id.binary_type), binary_id.path])
+    row = cursor.fetchone()
+    if row is None:
+      raise db.UnknownSignedBinaryError(binary_id)
+
+    serialized_references, timestamp = row
+    references = rdf_objects.BlobReferences.FromSerializedString(
+        serialized_references)
+    return references, sqlite_utils.IntToRDFDatetime(timestamp)
+
+  @mysql_utils.WithTransaction(readonly=True)
+  def ReadIDsForAllSignedBinaries(self, cursor=None
+                                 ):
+    """See db.Database."""
+    cursor.execute(
+        "SELECT binary_type, binary_path FROM signed_binary_references")
+    return [
+        rdf_objects.SignedBinaryID(binary_type=binary_type, path=binary_path)
+        for binary_type, binary_path in cursor.fetchall()
+    ]
+
+  @mysql_utils.WithTransaction()
+  def DeleteSignedBinaryReferences(self, binary_id,
+                                   cursor=None):
+    """See db.Database."""
+    # Deleting a missing entry is not an error.
+    cursor.execute(
+        "DELETE FROM signed_binary_references "
+        "WHERE binary_type = ? AND binary_path = ?",
+        [int(binary_id.binary_type), binary_id.path])
@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+"""SQLite implementation of DB methods for handling server metrics."""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import unicode_literals
+
+import sqlite3
+
+from future.builtins import int
+from typing import Iterable, Optional, Text, Sequence, Tuple
+
+from grr_response_core.lib import rdfvalue
+from grr_response_server import db
+from grr_response_server import db_utils
+from grr_response_server import stats_values
+from grr_response_server.databases import mysql_utils
+from grr_response_server.databases import sqlite_utils
+
+# Type alias representing a time-range.
+# TODO: pylint: disable=invalid-name
+_TimeRange = Tuple[rdfvalue.RDFDatetime, rdfvalue.RDFDatetime]
+# TODO: pylint: enable=invalid-name
+
+
+class SqliteDBStatsMixin(object):
+  """Mixin providing an SQLite implementation of stats-related DB logic."""
+
+  @mysql_utils.WithTransaction()
+  def WriteStatsStoreEntries(
+      self, stats_entries,
+      cursor=None):
+    """See db.Database."""
+    rows = []
+    for stats_entry in stats_entries:
+      rows.append((sqlite_utils.Blob(
+          db_utils.GenerateStatsEntryId(stats_entry)), stats_entry.process_id,
+                   stats_entry.metric_name,
+                   sqlite_utils.RDFDatetimeToInt(stats_entry.timestamp),
+                   sqlite_utils.Blob(stats_entry.SerializeToString())))
+
+    try:
+      cursor.executemany(
+          "INSERT INTO stats_store_entries "
+          "(entry_id, process_id, metric_name, timestamp, entry) "
+          "VALUES (?, ?, ?, ?, ?)", rows)
+    except sqlite3.IntegrityError as e:
+      raise db.DuplicateMetricValueError(cause=e)
+
+  @mysql_utils.WithTransaction(readonly=True)
+  def ReadStatsStoreEntries(
+      self,
+      process_id_prefix,
+      metric_name,
+      time_range = None,
+      max_results = 0,
+      cursor=None):
+    """See db.Database."""
+    # SUBSTR avoids escaping LIKE wildcards in the prefix.
+    query = ("SELECT entry FROM stats_store_entries "
+             "WHERE metric_name = ? AND SUBSTR(process_id, 1, ?) = ?")
+    args = [metric_name, len(process_id_prefix), process_id_prefix]
+
+    if time_range is not None:
+      query += " AND timestamp >= ? AND timestamp <= ?"
+      args.extend(sqlite_utils.RDFDatetimeToInt(t) for t in time_range)
+
+    query += " ORDER BY timestamp LIMIT ?"
+    args.append(max_results or -1)
+
+    cursor.execute(query, args)
+    return [
+        stats_values.StatsStoreEntry.FromSerializedString(entry)
+        for entry, in cursor.fetchall()
+    ]
+
+  @mysql_utils.WithTransaction()
+  def DeleteStatsStoreEntriesOlderThan(self, cutoff,
+                                       limit, cursor=None):
+    """See db.Database."""
+    cursor.execute(
+        "DELETE FROM stats_store_entries WHERE rowid IN "
+        "(SELECT rowid FROM stats_store_entries WHERE timestamp < ? LIMIT ?)",
+        [sqlite_utils.RDFDatetimeToInt(cutoff), limit])
+    return cursor.rowcount
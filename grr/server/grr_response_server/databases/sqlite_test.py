@@ -0,0 +1,145 @@
+#!/usr/bin/env python
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import unicode_literals
+
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+
+from absl.testing import absltest
+
+from grr_response_core.lib import flags
+from grr_response_core.lib import utils
+from grr_response_server import db_test_mixin
+from grr_response_server.databases import sqlite
+from grr.test_lib import stats_test_lib
+from grr.test_lib import test_lib
+
+
+class TestSqliteDB(stats_test_lib.StatsTestMixin,
+                   db_test_mixin.DatabaseTestMixin, absltest.TestCase):
+  """Test the sqlite.SqliteDB class.
+
+  Most of the tests in this suite are general blackbox tests of the db.Database
+  interface brought in by the db_test.DatabaseTestMixin.
+  """
+
+  flow_processing_req_func = "_WriteFlowProcessingRequests"
+
+  def CreateDatabase(self):
+    temp_dir = tempfile.mkdtemp()
+    conn = sqlite.SqliteDB(path=os.path.join(temp_dir, "grr.sqlite"))
+
+    def Fin():
+      conn.Close()
+      shutil.rmtree(temp_dir)
+
+    return conn, Fin
+
+  def testIsRetryable(self):
+    self.assertFalse(sqlite._IsRetryable(Exception("Some general error.")))
+    self.assertFalse(
+        sqlite._IsRetryable(sqlite3.OperationalError("no such table: foo")))
+    self.assertTrue(
+        sqlite._IsRetryable(sqlite3.OperationalError("database is locked")))
+
+  def AddUser(self, connection, user, passwd):
+    connection.execute(
+        "INSERT INTO grr_users (username, password) VALUES (?, ?)",
+        (user, sqlite3.Binary(passwd)))
+
+  def ListUsers(self, connection):
+    cursor = connection.execute("SELECT username, password FROM grr_users")
+    return [(username, bytes(password))
+            for username, password in cursor.fetchall()]
+
+  def testRunInTransaction(self):
+
+    def AddUserFn(con):
+      self.AddUser(con, "AzureDiamond", b"hunter2")
+
+    self.db.delegate._RunInTransaction(AddUserFn)
+
+    users = self.db.delegate._RunInTransaction(self.ListUsers, readonly=True)
+    self.assertEqual(users, [(u"AzureDiamond", b"hunter2")])
+
+  def testRunInTransactionRollsBackOnError(self):
+
+    def AddUserAndFailFn(con):
+      self.AddUser(con, "AzureDiamond", b"hunter2")
+      raise ValueError()
+
+    with self.assertRaises(ValueError):
+      self.db.delegate._RunInTransaction(AddUserAndFailFn)
+
+    users = self.db.delegate._RunInTransaction(self.ListUsers, readonly=True)
+    self.assertEqual(users, [])
+
+  def testRunInTransactionConcurrentWrites(self):
+    """Concurrent writing transactions wait for each other."""
+    t1_started = threading.Event()
+
+    def Transaction1(connection):
+      t1_started.set()
+      self.AddUser(connection, "user1", b"pw1")
+
+    def Transaction2(connection):
+      self.AddUser(connection, "user2", b"pw2")
+
+    thread_1 = threading.Thread(
+        target=lambda: self.db.delegate._RunInTransaction(Transaction1))
+    thread_2 = threading.Thread(
+        target=lambda: self.db.delegate._RunInTransaction(Transaction2))
+
+    thread_1.start()
+    self.assertTrue(t1_started.wait(5))
+    thread_2.start()
+
+    thread_1.join()
+    thread_2.join()
+
+    users = self.db.delegate._RunInTransaction(self.ListUsers, readonly=True)
+    self.assertEqual(
+        sorted(users), [(u"user1", b"pw1"), (u"user2", b"pw2")])
+
+  def testConnectionsArePooled(self):
+    self.db.ReadGRRUsers()
+    self.db.ReadGRRUsers()
+    self.assertLen(self.db.delegate._idle_connections, 1)
+
+  def testSuccessfulCallsAreCorrectlyAccounted(self):
+    with self.assertStatsCounterDelta(
+        1, "db_request_latency", fields=["ReadGRRUsers"]):
+      self.db.ReadGRRUsers()
+
+  def testFlowProcessingLoopWaitsAfterLeaseErrors(self):
+    delegate = self.db.delegate
+    waits = []
+
+    def Lease():
+      raise sqlite3.OperationalError("disk I/O error")
+
+    def Wait(leased):
+      waits.append(leased)
+      if len(waits) == 2:
+        delegate.flow_processing_request_handler_stop = True
+
+    delegate.flow_processing_request_handler_stop = False
+    with utils.Stubber(delegate, "_LeaseFlowProcessingReqests", Lease):
+      with utils.Stubber(delegate.flow_processing_request_handler_scheduler,
+                         "Wait", Wait):
+        delegate._FlowProcessingRequestHandlerLoop(lambda _: None)
+
+    # The loop survives failed leases and backs off after each of them.
+    self.assertEqual(waits, [False, False])
+
+
+def main(argv):
+  test_lib.main(argv)
+
+
+if __name__ == "__main__":
+  flags.StartMain(main)
@@ -0,0 +1,345 @@
+#!/usr/bin/env python
+"""The SQLite database methods for GRR users and approval handling."""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import unicode_literals
+
+import sqlite3
+
+from grr_response_core.lib import rdfvalue
+from grr_response_core.lib.util import random
+from grr_response_server import db
+from grr_response_server.databases import mysql_utils
+from grr_response_server.databases import sqlite_utils
+from grr_response_server.rdfvalues import objects as rdf_objects
+
+
+# Approval ids are random unsigned 64 bit integers, which SQLite can't store
+# as INTEGER. They are stored in the hex form used by the API instead.
+def _NewApprovalID():
+  return "%016x" % random.UInt64()
+
+
+def _ResponseToApprovalsWithGrants(response):
+  """Converts a generator with approval rows into ApprovalRequest objects."""
+  prev_triplet = None
+  cur_approval_request = None
+  for (approval_id, approval_timestamp, approval_request_bytes,
+       grantor_username, grant_timestamp) in response:
+
+    cur_triplet = (approval_id, approval_timestamp, approval_request_bytes)
+
+    if cur_triplet != prev_triplet:
+      prev_triplet = cur_triplet
+
+      if cur_approval_request:
+        yield cur_approval_request
+
+      cur_approval_request = mysql_utils.StringToRDFProto(
+          rdf_objects.ApprovalRequest, approval_request_bytes)
+      cur_approval_request.approval_id = approval_id
+      cur_approval_request.timestamp = sqlite_utils.IntToRDFDatetime(
+          approval_timestamp)
+
+    if grantor_username and grant_timestamp:
+      cur_approval_request.grants.append(
+          rdf_objects.ApprovalGrant(
+              grantor_username=grantor_username,
+              timestamp=sqlite_utils.IntToRDFDatetime(grant_timestamp)))
+
+  if cur_approval_request:
+    yield cur_approval_request
+
+
+class SqliteDBUsersMixin(object):
+  """SqliteDB mixin for GRR users and approval related functions."""
+
+  @mysql_utils.WithTransaction()
+  def WriteGRRUser(self,
+                   username,
+                   password=None,
+                   ui_mode=None,
+                   canary_mode=None,
+                   user_type=None,
+                   cursor=None):
+    """Writes user object for a user with a given name."""
+    values = {}
+    if password is not None:
+      values["password"] = sqlite_utils.Blob(password.SerializeToString())
+    if ui_mode is not None:
+      values["ui_mode"] = int(ui_mode)
+    if canary_mode is not None:
+      values["canary_mode"] = int(bool(canary_mode))
+    if user_type is not None:
+      values["user_type"] = int(user_type)
+
+    # Users are referenced by approvals and notifications, so existing rows
+    # are updated instead of replaced.
+    cursor.execute("INSERT OR IGNORE INTO grr_users (username) VALUES (?)",
+                   [username])
+    if values:
+      columns = sorted(values)
+      query = "UPDATE grr_users SET {} WHERE username = ?".format(", ".join(
+          "{} = ?".format(col) for col in columns))
+      cursor.execute(query, [values[col] for col in columns] + [username])
+
+  def _RowToGRRUser(self, row):
+    """Creates a GRR user object from a database result row."""
+    username, password, ui_mode, canary_mode, user_type = row
+    result = rdf_objects.GRRUser(
+        username=username,
+        ui_mode=ui_mode,
+        canary_mode=canary_mode,
+        user_type=user_type)
+
+    if password:
+      result.password.ParseFromString(password)
+
+    return result
+
+  @mysql_utils.WithTransaction(readonly=True)
+  def ReadGRRUser(self, username, cursor=None):
+    """Reads a user object corresponding to a given name."""
+    cursor.execute(
+        "SELECT username, password, ui_mode, canary_mode, user_type "
+        "FROM grr_users WHERE username = ?", [username])
+
+    row = cursor.fetchone()
+    if row is None:
+      raise db.UnknownGRRUserError(username)
+
+    return self._RowToGRRUser(row)
+
+  @mysql_utils.WithTransaction(readonly=True)
+  def ReadGRRUsers(self, offset=0, count=None, cursor=None):
+    """Reads GRR users with optional pagination, sorted by username."""
+    if count is None:
+      count = -1  # A negative LIMIT means no limit in SQLite.
+
+    cursor.execute(
+        "SELECT username, password, ui_mode, canary_mode, user_type "
+        "FROM grr_users ORDER BY username ASC "
+        "LIMIT ? OFFSET ?", [count, offset])
+    return [self._RowToGRRUser(row) for row in cursor.fetchall()]
+
+  @mysql_utils.WithTransaction(readonly=True)
+  def CountGRRUsers(self, cursor=None):
+    """Returns the total count of GRR users."""
+    cursor.execute("SELECT COUNT(*) FROM grr_users")
+    return cursor.fetchone()[0]
+
+  @mysql_utils.WithTransaction()
+  def DeleteGRRUser(self, username, cursor=None):
+    """Deletes the user with the given username."""
+    cursor.execute("DELETE FROM grr_users WHERE username = ?", [username])
+
+    if cursor.rowcount == 0:
+      raise db.UnknownGRRUserError(username)
+
+  @mysql_utils.WithTransaction()
+  def WriteApprovalRequest(self, approval_request, cursor=None):
+    """Writes an approval request object."""
+    # Copy the approval_request to ensure we don't modify the source object.
+    approval_request = approval_request.Copy()
+    approval_id = _NewApprovalID()
+    now = sqlite_utils.NowInt()
+
+    grants = approval_request.grants
+    approval_request.grants = None
+
+    cursor.execute(
+        "INSERT INTO approval_requests (username, approval_id, approval_type, "
+        "subject_id, timestamp, expiration_time, approval_request) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?)", [
+            approval_request.requestor_username, approval_id,
+            int(approval_request.approval_type), approval_request.subject_id,
+            now,
+            sqlite_utils.RDFDatetimeToInt(approval_request.expiration_time),
+            sqlite_utils.Blob(approval_request.SerializeToString())
+        ])
+
+    for grant in grants:
+      self._GrantApproval(approval_request.requestor_username, approval_id,
+                          grant.grantor_username, now, cursor)
+
+    return approval_id
+
+  def _GrantApproval(self, requestor_username, approval_id, grantor_username,
+                     timestamp, cursor):
+    """Grants approval for a given request."""
+    cursor.execute(
+        "INSERT INTO approval_grants "
+        "(username, approval_id, grantor_username, timestamp) "
+        "VALUES (?, ?, ?, ?)",
+        [requestor_username, approval_id, grantor_username, timestamp])
+
+  @mysql_utils.WithTransaction()
+  def GrantApproval(self,
+                    requestor_username,
+                    approval_id,
+                    grantor_username,
+                    cursor=None):
+    """Grants approval for a given request using given username."""
+    self._GrantApproval(requestor_username, approval_id, grantor_username,
+                        sqlite_utils.NowInt(), cursor)
+
+  @mysql_utils.WithTransaction(readonly=True)
+  def ReadApprovalRequest(self, requestor_username, approval_id, cursor=None):
+    """Reads an approval request object with a given id."""
+
+    query = ("""
+        SELECT
+            ar.approval_id,
+            ar.timestamp,
+            ar.approval_request,
+            u.username,
+            ag.timestamp
+        FROM approval_requests ar
+        LEFT JOIN approval_grants ag USING (username, approval_id)
+        LEFT JOIN grr_users u ON u.username = ag.grantor_username
+        WHERE ar.approval_id = ? AND ar.username = ?
+        """)
+
+    cursor.execute(query, [approval_id, requestor_username])
+    res = cursor.fetchall()
+    if not res:
+      raise db.UnknownApprovalRequestError(
+          "Approval '%s' not found." % approval_id)
+
+    approval_id, timestamp, approval_request_bytes, _, _ = res[0]
+
+    approval_request = mysql_utils.StringToRDFProto(rdf_objects.ApprovalRequest,
+                                                    approval_request_bytes)
+    approval_request.approval_id = approval_id
+    approval_request.timestamp = sqlite_utils.IntToRDFDatetime(timestamp)
+
+    for _, _, _, grantor_username, timestamp in res:
+      if not grantor_username:
+        continue
+
+      # Note: serialized approval_request objects are guaranteed to not
+      # have any grants.
+      approval_request.grants.append(
+          rdf_objects.ApprovalGrant(
+              grantor_username=grantor_username,
+              timestamp=sqlite_utils.IntToRDFDatetime(timestamp)))
+
+    return approval_request
+
+  @mysql_utils.WithTransaction(readonly=True)
+  def ReadApprovalRequests(self,
+                           requestor_username,
+                           approval_type,
+                           subject_id=None,
+                           include_expired=False,
+                           cursor=None):
+    """Reads approval requests of a given type for a given user."""
+
+    query = """
+        SELECT
+            ar.approval_id,
+            ar.timestamp,
+            ar.approval_request,
+            u.username,
+            ag.timestamp
+        FROM approval_requests ar
+        LEFT JOIN approval_grants AS ag USING (username, approval_id)
+        LEFT JOIN grr_users u ON u.username = ag.grantor_username
+        WHERE ar.username = ? AND ar.approval_type = ?
+        """
+
+    args = [requestor_username, int(approval_type)]
+
+    if subject_id:
+      query += " AND ar.subject_id = ?"
+      args.append(subject_id)
+
+    query += " ORDER BY ar.approval_id"
+
+    ret = []
+    now = rdfvalue.RDFDatetime.Now()
+    cursor.execute(query, args)
+    for approval_request in _ResponseToApprovalsWithGrants(cursor.fetchall()):
+      if include_expired or approval_request.expiration_time >= now:
+        ret.append(approval_request)
+    return ret
+
+  @mysql_utils.WithTransaction()
+  def WriteUserNotification(self, notification, cursor=None):
+    """Writes a notification for a given user."""
+    # Copy the notification to ensure we don't modify the source object.
+    notification = notification.Copy()
+
+    if not notification.timestamp:
+      notification.timestamp = rdfvalue.RDFDatetime.Now()
+
+    try:
+      cursor.execute(
+          "INSERT INTO user_notifications "
+          "(username, timestamp, notification_state, notification) "
+          "VALUES (?, ?, ?, ?)", [
+              notification.username,
+              sqlite_utils.RDFDatetimeToInt(notification.timestamp),
+              int(notification.state),
+              sqlite_utils.Blob(notification.SerializeToString())
+          ])
+    except sqlite3.IntegrityError:
+      raise db.UnknownGRRUserError(notification.username)
+
+  @mysql_utils.WithTransaction(readonly=True)
+  def ReadUserNotifications(self,
+                            username,
+                            state=None,
+                            timerange=None,
+                            cursor=None):
+    """Reads notifications scheduled for a user within a given timerange."""
+
+    query = ("SELECT timestamp, notification_state, notification "
+             "FROM user_notifications "
+             "WHERE username = ? ")
+    args = [username]
+
+    if state is not None:
+      query += "AND notification_state = ? "
+      args.append(int(state))
+
+    if timerange is not None:
+      time_from, time_to = timerange  # pylint: disable=unpacking-non-sequence
+
+      if time_from is not None:
+        query += "AND timestamp >= ? "
+        args.append(sqlite_utils.RDFDatetimeToInt(time_from))
+
+      if time_to is not None:
+        query += "AND timestamp <= ? "
+        args.append(sqlite_utils.RDFDatetimeToInt(time_to))
+
+    query += "ORDER BY timestamp DESC "
+
+    ret = []
+    cursor.execute(query, args)
+
+    for timestamp, state, notification_ser in cursor.fetchall():
+      n = rdf_objects.UserNotification.FromSerializedString(notification_ser)
+      n.timestamp = sqlite_utils.IntToRDFDatetime(timestamp)
+      n.state = state
+      ret.append(n)
+
+    return ret
+
+  @mysql_utils.WithTransaction()
+  def UpdateUserNotifications(self,
+                              username,
+                              timestamps,
+                              state=None,
+                              cursor=None):
+    """Updates existing user notification objects."""
+
+    query = ("UPDATE user_notifications "
+             "SET notification_state = ? "
+             "WHERE username = ? AND timestamp IN {}").format(
+                 sqlite_utils.Placeholders(len(timestamps)))
+
+    args = [int(state), username]
+    args.extend(sqlite_utils.RDFDatetimeToInt(t) for t in timestamps)
+    cursor.execute(query, args)
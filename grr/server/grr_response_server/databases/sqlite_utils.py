@@ -0,0 +1,77 @@
+#!/usr/bin/env python
+"""Utilities used by the SQLite database.
+
+Helpers that do not depend on the SQL dialect (e.g. the WithTransaction
+decorator or path conversions) are shared with the MySQL database and live in
+mysql_utils.
+"""
+from __future__ import absolute_import
+from __future__ import division
+
+from __future__ import unicode_literals
+
+import sqlite3
+
+from grr_response_core.lib import rdfvalue
+
+# Columns declared with this type hold serialized protobufs and other binary
+# data. Python 2 returns BLOBs as `buffer` objects, the row factory set up in
+# sqlite.py turns them into byte strings.
+BYTES_TYPE = "BYTES"
+
+
+def Blob(value):
+  """Wraps bytes, so that they are bound as a BLOB parameter.
+
+  Python 2 binds byte strings as TEXT, which truncates them at the first NUL
+  byte.
+
+  Args:
+    value: Bytes or None.
+
+  Returns:
+    A value to pass as a query parameter.
+  """
+  return value if value is None else sqlite3.Binary(value)
+
+
+def Placeholders(num, values=1):
+  """Returns a string of placeholders for SQLite INSERTs.
+
+  Examples:
+    >>> Placeholders(3)
+    u'(?, ?, ?)'
+
+    >>> Placeholders(num=3, values=2)
+    u'(?, ?, ?), (?, ?, ?)'
+
+  Args:
+    num: The number of ? placeholders for each value.
+    values: The number of values to be INSERTed
+
+  Returns:
+    a string with `values` comma-separated tuples containing `num`
+    comma-separated placeholders each.
+  """
+  value = "(" + ", ".join(["?"] * num) + ")"
+  return ", ".join([value] * values)
+
+
+# Timestamps are stored as integer microseconds since epoch, which keeps them
+# sortable and exact.
+def IntToRDFDatetime(value):
+  return value if value is None else rdfvalue.RDFDatetime(value)
+
+
+def RDFDatetimeToInt(rdf):
+  if rdf is None:
+    return None
+  if not isinstance(rdf, rdfvalue.RDFDatetime):
+    raise ValueError(
+        "time value must be rdfvalue.RDFDatetime, got: %s" % type(rdf))
+  return rdf.AsMicrosecondsSinceEpoch()
+
+
+def NowInt():
+  """Returns the current time as integer microseconds since epoch."""
+  return rdfvalue.RDFDatetime.Now().AsMicrosecondsSinceEpoch()
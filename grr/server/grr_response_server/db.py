@@ -35,6 +35,7 @@ from grr_response_core.lib.rdfvalues import flows as rdf_flows
 from grr_response_core.lib.rdfvalues import stats as rdf_stats
 from grr_response_core.lib.util import collection
 from grr_response_core.lib.util import compatibility
+from grr_response_core.lib.util import context
 from grr_response_core.lib.util import precondition
 from grr_response_core.stats import stats_collector_instance
 from grr_response_server import foreman_rules
@@ -390,6 +391,19 @@ class Database(with_metaclass(abc.ABCMeta, object)):
 
   unchanged = "__unchanged__"
 
+  def ReadsFromPrimary(self):
+    """Returns a context sending the current thread's reads to the primary.
+
+    Databases with read replicas may serve read-only transactions from a
+    replica that lags behind the primary. Reads done within this context see
+    all writes committed before, e.g. by other processes. The default
+    implementation is a no-op for databases without replicas.
+
+    Returns:
+      A context manager.
+    """
+    return context.NullContext(None)
+
   @abc.abstractmethod
   def WriteArtifact(self, artifact):
     """Writes new artifact to the database.
@@ -464,6 +478,20 @@ class Database(with_metaclass(abc.ABCMeta, object)):
         client sent a foreman message to the server.
     """
 
+  def MultiWriteClientMetadata(self, metadatas):
+    """Writes metadata about multiple clients.
+
+    Only the fields that are set in the given ClientMetadata objects are
+    updated. Database implementations are expected to override this method
+    with a more efficient bulk write.
+
+    Args:
+      metadatas: A dict mapping GRR client id strings to
+        rdfvalues.objects.ClientMetadata objects.
+    """
+    for client_id, metadata in iteritems(metadatas):
+      self.WriteClientMetadata(client_id, **ClientMetadataWriteArgs(metadata))
+
   @abc.abstractmethod
   def MultiReadClientMetadata(self, client_ids):
     """Reads ClientMetadata records for a list of clients.
@@ -718,6 +746,39 @@ class Database(with_metaclass(abc.ABCMeta, object)):
         ids.
     """
 
+  @abc.abstractmethod
+  def ListClientsForAllKeywords(self, keywords, offset, count, start_time=None):
+    """Lists the clients associated with all of the given keywords.
+
+    Args:
+      keywords: An iterable container of keyword strings to look for.
+      offset: An integer specifying an offset to be used when reading client
+        ids. "offset" is applied after the keywords are intersected.
+      count: Number of client ids to read.
+      start_time: If set, should be an rdfvalue.RDFDatime and the function will
+        only consider keywords associated after this time.
+
+    Returns:
+      A list of ids of clients associated with every keyword, sorted in
+      ascending order.
+    """
+
+  @abc.abstractmethod
+  def EstimateClientsForAllKeywords(self, keywords, start_time=None):
+    """Estimates the number of clients associated with all given keywords.
+
+    The estimate is the number of clients associated with the least common
+    keyword. It is exact for a single keyword and an upper bound otherwise.
+
+    Args:
+      keywords: An iterable container of keyword strings to look for.
+      start_time: If set, should be an rdfvalue.RDFDatime and the function will
+        only consider keywords associated after this time.
+
+    Returns:
+      An upper bound of the number of clients associated with every keyword.
+    """
+
   @abc.abstractmethod
   def RemoveClientKeyword(self, client_id, keyword):
     """Removes the association of a particular client to a keyword.
@@ -870,6 +931,18 @@ class Database(with_metaclass(abc.ABCMeta, object)):
   def RemoveExpiredForemanRules(self):
     """Removes all expired foreman rules from the database."""
 
+  @abc.abstractmethod
+  def ReadForemanRulesVersion(self):
+    """Reads a version stamp of the foreman rules.
+
+    Reading the version is much cheaper than reading the rules, so it can be
+    used to decide whether cached rules are still current.
+
+    Returns:
+      An opaque value that changes whenever foreman rules are written or
+      removed.
+    """
+
   @abc.abstractmethod
   def WriteGRRUser(self,
                    username,
@@ -1330,6 +1403,31 @@ class Database(with_metaclass(abc.ABCMeta, object)):
       entry: An `audit.APIAuditEntry` instance.
     """
 
+  @abc.abstractmethod
+  def WriteAPIAuditDailyCounts(self, day, counts):
+    """Writes numbers of audit entries of a day, replacing existing ones.
+
+    The day is marked as rolled up, even if `counts` is empty.
+
+    Args:
+      day: An rdfvalue.RDFDatetime of the start (midnight UTC) of the day.
+      counts: A dict mapping (username, router_method_name) tuples to numbers
+        of audit entries written during the day.
+    """
+
+  @abc.abstractmethod
+  def ReadAPIAuditDailyCounts(self, min_day=None, max_day=None):
+    """Returns numbers of audit entries of rolled up days.
+
+    Args:
+      min_day: Minimum day (rdfvalue.RDFDatetime of its start, inclusive).
+      max_day: Maximum day (rdfvalue.RDFDatetime of its start, inclusive).
+
+    Returns:
+      A dict mapping starts of every rolled up day to dicts mapping
+      (username, router_method_name) tuples to numbers of audit entries.
+    """
+
   @abc.abstractmethod
   def WriteMessageHandlerRequests(self, requests):
     """Writes a list of message handler requests to the database.
@@ -2111,6 +2209,51 @@ class Database(with_metaclass(abc.ABCMeta, object)):
       A list of rdf_hunt_objects.Hunt objects.
     """
 
+  @abc.abstractmethod
+  def ListHuntObjects(self,
+                      offset,
+                      count,
+                      with_creator=None,
+                      created_after=None,
+                      with_description_match=None):
+    """Lists metadata of hunts matching given conditions.
+
+    Args:
+      offset: An integer specifying an offset to be used when listing hunts.
+        "offset" is applied after the filters are applied.
+      count: Number of hunts to list. "count" is applied after the filters are
+        applied.
+      with_creator: (Optional) When specified, only hunts created by the given
+        user are listed.
+      created_after: (Optional) When specified, only hunts created after the
+        given rdfvalue.RDFDatetime (exclusive) are listed.
+      with_description_match: (Optional) When specified, only hunts having the
+        given string as a description substring are listed.
+
+    Returns:
+      A list of rdf_hunt_objects.HuntMetadata objects sorted by creation time
+      in descending order.
+    """
+
+  @abc.abstractmethod
+  def CountHuntObjects(self,
+                       with_creator=None,
+                       created_after=None,
+                       with_description_match=None):
+    """Returns number of hunts matching given conditions.
+
+    Args:
+      with_creator: (Optional) When specified, only hunts created by the given
+        user are counted.
+      created_after: (Optional) When specified, only hunts created after the
+        given rdfvalue.RDFDatetime (exclusive) are counted.
+      with_description_match: (Optional) When specified, only hunts having the
+        given string as a description substring are counted.
+
+    Returns:
+      Number of matching hunts.
+    """
+
   @abc.abstractmethod
   def ReadHuntLogEntries(self, hunt_id, offset, count, with_substring=None):
     """Reads hunt log entries of a given hunt using given query options.
@@ -2247,6 +2390,18 @@ class Database(with_metaclass(abc.ABCMeta, object)):
       A number of flows matching the specified condition.
     """
 
+  @abc.abstractmethod
+  def ReadClientIdsWithHuntFlows(self, hunt_id, client_ids):
+    """Checks which of given clients have the flow of a given hunt.
+
+    Args:
+      hunt_id: The id of the hunt.
+      client_ids: An iterable of client ids to check.
+
+    Returns:
+      A set of ids of the given clients that have the hunt's flow.
+    """
+
   @abc.abstractmethod
   def WriteSignedBinaryReferences(self, binary_id, references):
     """Writes blob references for a signed binary to the DB.
@@ -2337,6 +2492,12 @@ class DatabaseValidationWrapper(Database):
   def __init__(self, delegate):
     super(DatabaseValidationWrapper, self).__init__()
     self.delegate = delegate
+    # A client_bitmap_index.ClientBitmapIndex that this process' client writes
+    # are mirrored into, set once the index is first used.
+    self.client_bitmap_index = None
+
+  def ReadsFromPrimary(self):
+    return self.delegate.ReadsFromPrimary()
 
   def WriteArtifact(self, artifact):
     precondition.AssertType(artifact, rdf_artifacts.Artifact)
@@ -2369,7 +2530,7 @@ class DatabaseValidationWrapper(Database):
     precondition.AssertOptionalType(certificate, rdf_crypto.RDFX509Cert)
     precondition.AssertOptionalType(last_ip, rdf_client_network.NetworkAddress)
 
-    return self.delegate.WriteClientMetadata(
+    result = self.delegate.WriteClientMetadata(
         client_id,
         certificate=certificate,
         fleetspeak_enabled=fleetspeak_enabled,
@@ -2379,13 +2540,36 @@ class DatabaseValidationWrapper(Database):
         last_ip=last_ip,
         last_foreman=last_foreman)
 
+    if self.client_bitmap_index is not None:
+      self.client_bitmap_index.AddClient(client_id)
+      if last_ping is not None:
+        self.client_bitmap_index.UpdatePing(client_id, last_ping)
+    return result
+
+  def MultiWriteClientMetadata(self, metadatas):
+    precondition.AssertDictType(metadatas, Text, rdf_objects.ClientMetadata)
+    _ValidateClientIds(metadatas)
+
+    result = self.delegate.MultiWriteClientMetadata(metadatas)
+
+    if self.client_bitmap_index is not None:
+      for client_id, metadata in iteritems(metadatas):
+        self.client_bitmap_index.AddClient(client_id)
+        if metadata.HasField("ping"):
+          self.client_bitmap_index.UpdatePing(client_id, metadata.ping)
+    return result
+
   def MultiReadClientMetadata(self, client_ids):
     _ValidateClientIds(client_ids)
     return self.delegate.MultiReadClientMetadata(client_ids)
 
   def WriteClientSnapshot(self, client):
     precondition.AssertType(client, rdf_objects.ClientSnapshot)
-    return self.delegate.WriteClientSnapshot(client)
+    result = self.delegate.WriteClientSnapshot(client)
+
+    if self.client_bitmap_index is not None:
+      self.client_bitmap_index.UpdateSnapshot(client)
+    return result
 
   def MultiReadClientSnapshot(self, client_ids):
     _ValidateClientIds(client_ids)
@@ -2429,7 +2613,11 @@ class DatabaseValidationWrapper(Database):
     precondition.AssertType(startup_info, rdf_client.StartupInfo)
     _ValidateClientId(client_id)
 
-    return self.delegate.WriteClientStartupInfo(client_id, startup_info)
+    result = self.delegate.WriteClientStartupInfo(client_id, startup_info)
+
+    if self.client_bitmap_index is not None:
+      self.client_bitmap_index.UpdateStartupInfo(client_id, startup_info)
+    return result
 
   def ReadClientStartupInfo(self, client_id):
     _ValidateClientId(client_id)
@@ -2478,6 +2666,28 @@ class DatabaseValidationWrapper(Database):
 
     return self.delegate.ListClientsForKeywords(keywords, start_time=start_time)
 
+  def ListClientsForAllKeywords(self, keywords, offset, count, start_time=None):
+    keywords = set(keywords)
+    if not keywords:
+      raise ValueError("At least one keyword has to be provided.")
+
+    if start_time:
+      _ValidateTimestamp(start_time)
+
+    return self.delegate.ListClientsForAllKeywords(
+        keywords, offset, count, start_time=start_time)
+
+  def EstimateClientsForAllKeywords(self, keywords, start_time=None):
+    keywords = set(keywords)
+    if not keywords:
+      raise ValueError("At least one keyword has to be provided.")
+
+    if start_time:
+      _ValidateTimestamp(start_time)
+
+    return self.delegate.EstimateClientsForAllKeywords(
+        keywords, start_time=start_time)
+
   def RemoveClientKeyword(self, client_id, keyword):
     _ValidateClientId(client_id)
 
@@ -2489,7 +2699,11 @@ class DatabaseValidationWrapper(Database):
     for label in labels:
       _ValidateLabel(label)
 
-    return self.delegate.AddClientLabels(client_id, owner, labels)
+    result = self.delegate.AddClientLabels(client_id, owner, labels)
+
+    if self.client_bitmap_index is not None:
+      self.client_bitmap_index.AddClientLabels(client_id, owner, labels)
+    return result
 
   def MultiReadClientLabels(self, client_ids):
     _ValidateClientIds(client_ids)
@@ -2500,7 +2714,11 @@ class DatabaseValidationWrapper(Database):
     for label in labels:
       _ValidateLabel(label)
 
-    return self.delegate.RemoveClientLabels(client_id, owner, labels)
+    result = self.delegate.RemoveClientLabels(client_id, owner, labels)
+
+    if self.client_bitmap_index is not None:
+      self.client_bitmap_index.RemoveClientLabels(client_id, owner, labels)
+    return result
 
   def ReadAllClientLabels(self):
     return self.delegate.ReadAllClientLabels()
@@ -2574,6 +2792,9 @@ class DatabaseValidationWrapper(Database):
   def RemoveExpiredForemanRules(self):
     return self.delegate.RemoveExpiredForemanRules()
 
+  def ReadForemanRulesVersion(self):
+    return self.delegate.ReadForemanRulesVersion()
+
   def WriteGRRUser(self,
                    username,
                    password=None,
@@ -2830,6 +3051,19 @@ class DatabaseValidationWrapper(Database):
     precondition.AssertType(entry, rdf_objects.APIAuditEntry)
     return self.delegate.WriteAPIAuditEntry(entry)
 
+  def WriteAPIAuditDailyCounts(self, day, counts):
+    _ValidateDay(day)
+    precondition.AssertDictType(counts, tuple, int)
+    return self.delegate.WriteAPIAuditDailyCounts(day, counts)
+
+  def ReadAPIAuditDailyCounts(self, min_day=None, max_day=None):
+    if min_day is not None:
+      _ValidateDay(min_day)
+    if max_day is not None:
+      _ValidateDay(max_day)
+    return self.delegate.ReadAPIAuditDailyCounts(
+        min_day=min_day, max_day=max_day)
+
   def WriteMessageHandlerRequests(self, requests):
     precondition.AssertIterableType(requests, rdf_objects.MessageHandlerRequest)
     return self.delegate.WriteMessageHandlerRequests(requests)
@@ -3248,6 +3482,36 @@ class DatabaseValidationWrapper(Database):
   def ReadAllHuntObjects(self):
     return self.delegate.ReadAllHuntObjects()
 
+  def ListHuntObjects(self,
+                      offset,
+                      count,
+                      with_creator=None,
+                      created_after=None,
+                      with_description_match=None):
+    precondition.AssertOptionalType(with_creator, Text)
+    precondition.AssertOptionalType(created_after, rdfvalue.RDFDatetime)
+    precondition.AssertOptionalType(with_description_match, Text)
+
+    return self.delegate.ListHuntObjects(
+        offset,
+        count,
+        with_creator=with_creator,
+        created_after=created_after,
+        with_description_match=with_description_match)
+
+  def CountHuntObjects(self,
+                       with_creator=None,
+                       created_after=None,
+                       with_description_match=None):
+    precondition.AssertOptionalType(with_creator, Text)
+    precondition.AssertOptionalType(created_after, rdfvalue.RDFDatetime)
+    precondition.AssertOptionalType(with_description_match, Text)
+
+    return self.delegate.CountHuntObjects(
+        with_creator=with_creator,
+        created_after=created_after,
+        with_description_match=with_description_match)
+
   def ReadHuntLogEntries(self, hunt_id, offset, count, with_substring=None):
     _ValidateHuntId(hunt_id)
     precondition.AssertOptionalType(with_substring, Text)
@@ -3308,6 +3572,13 @@ class DatabaseValidationWrapper(Database):
     return self.delegate.CountHuntFlows(
         hunt_id, filter_condition=filter_condition)
 
+  def ReadClientIdsWithHuntFlows(self, hunt_id, client_ids):
+    _ValidateHuntId(hunt_id)
+    client_ids = list(client_ids)
+    for client_id in client_ids:
+      _ValidateClientId(client_id)
+    return self.delegate.ReadClientIdsWithHuntFlows(hunt_id, client_ids)
+
   def WriteSignedBinaryReferences(self, binary_id, references):
     precondition.AssertType(binary_id, rdf_objects.SignedBinaryID)
     precondition.AssertType(references, rdf_objects.BlobReferences)
@@ -3358,6 +3629,36 @@ class DatabaseValidationWrapper(Database):
         client_label, report_type)
 
 
+# Maps ClientMetadata fields to the corresponding WriteClientMetadata
+# arguments.
+_CLIENT_METADATA_WRITE_ARGS = [
+    ("certificate", "certificate"),
+    ("fleetspeak_enabled", "fleetspeak_enabled"),
+    ("first_seen", "first_seen"),
+    ("ping", "last_ping"),
+    ("clock", "last_clock"),
+    ("ip", "last_ip"),
+    ("last_foreman_time", "last_foreman"),
+]
+
+
+def ClientMetadataWriteArgs(metadata):
+  """Converts a ClientMetadata object to WriteClientMetadata arguments.
+
+  Args:
+    metadata: An rdfvalues.objects.ClientMetadata object.
+
+  Returns:
+    A dict of keyword arguments for WriteClientMetadata, containing only the
+    fields that are set in the metadata object.
+  """
+  return {
+      arg: metadata.Get(field)
+      for field, arg in _CLIENT_METADATA_WRITE_ARGS
+      if metadata.HasField(field)
+  }
+
+
 def _ValidateEnumType(value, expected_enum_type):
   if value not in expected_enum_type.reverse_enum:
     message = "Expected one of `%s` but got `%s` instead"
@@ -3506,6 +3807,12 @@ def _ValidateTimestamp(timestamp):
   precondition.AssertType(timestamp, rdfvalue.RDFDatetime)
 
 
+def _ValidateDay(day):
+  _ValidateTimestamp(day)
+  if day != day.Floor(rdfvalue.Duration("1d")):
+    raise ValueError("Not a start of a day: %s." % day)
+
+
 def _ValidateClientPathID(client_path_id):
   precondition.AssertType(client_path_id, rdf_objects.ClientPathID)
 
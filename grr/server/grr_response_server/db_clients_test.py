@@ -160,6 +160,50 @@ class DatabaseTestClientsMixin(object):
         rdf_client_network.NetworkAddress(human_readable_address="8.8.8.8"))
     self.assertEqual(m1.last_foreman_time, rdfvalue.RDFDatetime(220000000000))
 
+  def testMultiWriteClientMetadata(self):
+    d = self.db
+
+    client_id_1 = self.InitializeClient()
+    client_id_2 = self.InitializeClient()
+    client_id_3 = self.InitializeClient()
+
+    d.MultiWriteClientMetadata({
+        client_id_1:
+            rdf_objects.ClientMetadata(
+                ping=rdfvalue.RDFDatetime(200000000000),
+                clock=rdfvalue.RDFDatetime(210000000000)),
+        client_id_2:
+            rdf_objects.ClientMetadata(
+                ping=rdfvalue.RDFDatetime(300000000000),
+                clock=rdfvalue.RDFDatetime(310000000000)),
+        client_id_3:
+            rdf_objects.ClientMetadata(
+                ping=rdfvalue.RDFDatetime(400000000000),
+                ip=rdf_client_network.NetworkAddress(
+                    human_readable_address="8.8.8.8")),
+    })
+
+    res = d.MultiReadClientMetadata([client_id_1, client_id_2, client_id_3])
+    self.assertLen(res, 3)
+
+    self.assertTrue(res[client_id_1].fleetspeak_enabled)
+    self.assertEqual(res[client_id_1].ping, rdfvalue.RDFDatetime(200000000000))
+    self.assertEqual(res[client_id_1].clock,
+                     rdfvalue.RDFDatetime(210000000000))
+    self.assertEqual(res[client_id_2].ping, rdfvalue.RDFDatetime(300000000000))
+    self.assertEqual(res[client_id_2].clock,
+                     rdfvalue.RDFDatetime(310000000000))
+    self.assertEqual(res[client_id_3].ping, rdfvalue.RDFDatetime(400000000000))
+    self.assertEqual(
+        res[client_id_3].ip,
+        rdf_client_network.NetworkAddress(human_readable_address="8.8.8.8"))
+
+  def testMultiWriteClientMetadataValidatesTypes(self):
+    with self.assertRaises(TypeError):
+      self.db.MultiWriteClientMetadata({
+          "C.fc413187fefa1dcf": rdfvalue.RDFDatetime(200000000000),
+      })
+
   def testClientMetadataValidatesIP(self):
     d = self.db
     client_id = "C.fc413187fefa1dcf"
@@ -638,6 +682,94 @@ class DatabaseTestClientsMixin(object):
     self.assertEqual(d.ListClientsForKeywords([temporary_kw])[temporary_kw], [])
     self.assertEqual(d.ListClientsForKeywords(["joe"])["joe"], [client_id])
 
+  def testListClientsForAllKeywords(self):
+    d = self.db
+    client_ids = sorted(self.InitializeClient() for _ in range(5))
+    for i, client_id in enumerate(client_ids):
+      keywords = ["machine", "host%d" % i]
+      if i % 2 == 0:
+        keywords.append("even")
+      d.AddClientKeywords(client_id, keywords)
+
+    self.assertEqual(
+        d.ListClientsForAllKeywords(["machine"], 0, 10), client_ids)
+    self.assertEqual(
+        d.ListClientsForAllKeywords(["machine", "even"], 0, 10),
+        client_ids[::2])
+    self.assertEqual(
+        d.ListClientsForAllKeywords(["even", "host2"], 0, 10), [client_ids[2]])
+    self.assertEqual(d.ListClientsForAllKeywords(["even", "host1"], 0, 10), [])
+    self.assertEqual(d.ListClientsForAllKeywords(["machine", "missing"], 0, 10),
+                     [])
+
+  def testListClientsForAllKeywordsRespectsOffsetAndCount(self):
+    d = self.db
+    client_ids = sorted(self.InitializeClient() for _ in range(10))
+    for client_id in client_ids:
+      d.AddClientKeywords(client_id, ["machine", "linux"])
+
+    for offset, count in [(0, 3), (3, 3), (8, 5), (10, 1), (0, 0)]:
+      self.assertEqual(
+          d.ListClientsForAllKeywords(["machine", "linux"], offset, count),
+          client_ids[offset:offset + count])
+
+  def testListClientsForAllKeywordsTimeRanges(self):
+    d = self.db
+    client_id_1 = self.InitializeClient()
+    client_id_2 = self.InitializeClient()
+
+    d.AddClientKeywords(client_id_1, ["machine", "linux"])
+    d.AddClientKeywords(client_id_2, ["machine"])
+    change_time = rdfvalue.RDFDatetime.Now()
+    d.AddClientKeywords(client_id_2, ["linux"])
+
+    self.assertEqual(
+        d.ListClientsForAllKeywords(["machine", "linux"],
+                                    0,
+                                    10,
+                                    start_time=change_time), [])
+    self.assertEqual(
+        d.ListClientsForAllKeywords(["linux"], 0, 10, start_time=change_time),
+        [client_id_2])
+
+  def testListClientsForAllKeywordsAfterRemoval(self):
+    d = self.db
+    client_ids = sorted(self.InitializeClient() for _ in range(3))
+    for client_id in client_ids:
+      d.AddClientKeywords(client_id, ["machine", "investigation42"])
+
+    d.RemoveClientKeyword(client_ids[1], "investigation42")
+    self.assertEqual(
+        d.ListClientsForAllKeywords(["machine", "investigation42"], 0, 10),
+        [client_ids[0], client_ids[2]])
+
+    d.AddClientKeywords(client_ids[1], ["investigation42"])
+    self.assertEqual(
+        d.ListClientsForAllKeywords(["machine", "investigation42"], 0, 10),
+        client_ids)
+
+  def testListClientsForAllKeywordsRaisesWithoutKeywords(self):
+    with self.assertRaises(ValueError):
+      self.db.ListClientsForAllKeywords([], 0, 10)
+
+  def testEstimateClientsForAllKeywords(self):
+    d = self.db
+    client_ids = [self.InitializeClient() for _ in range(5)]
+    for i, client_id in enumerate(client_ids):
+      keywords = ["machine"]
+      if i < 2:
+        keywords.append("windows")
+      d.AddClientKeywords(client_id, keywords)
+
+    self.assertEqual(d.EstimateClientsForAllKeywords(["machine"]), 5)
+    self.assertEqual(d.EstimateClientsForAllKeywords(["machine", "windows"]), 2)
+    self.assertEqual(d.EstimateClientsForAllKeywords(["machine", "missing"]), 0)
+
+    change_time = rdfvalue.RDFDatetime.Now()
+    d.AddClientKeywords(client_ids[4], ["machine"])
+    self.assertEqual(
+        d.EstimateClientsForAllKeywords(["machine"], start_time=change_time), 1)
+
   def testClientLabels(self):
     d = self.db
     client_id = self.InitializeClient()
@@ -115,3 +115,65 @@ class DatabaseEventsTestMixin(object):
     entries = self.db.ReadAPIAuditEntries(
         min_timestamp=timestamps[1], max_timestamp=timestamps[1])
     self.assertEqual([e.response_code for e in entries], ["ERROR"])
+
+  def testReadDailyCountsEmpty(self):
+    self.assertEqual(self.db.ReadAPIAuditDailyCounts(), {})
+
+  def testWriteDailyCounts(self):
+    day1 = rdfvalue.RDFDatetime.FromHumanReadable("2018-01-01")
+    day2 = rdfvalue.RDFDatetime.FromHumanReadable("2018-01-02")
+    counts1 = {("foo", "GetClient"): 3, ("bar", "GetClient"): 1}
+    counts2 = {("foo", "ListFlows"): 2}
+
+    self.db.WriteAPIAuditDailyCounts(day1, counts1)
+    self.db.WriteAPIAuditDailyCounts(day2, counts2)
+
+    self.assertEqual(
+        self.db.ReadAPIAuditDailyCounts(), {
+            day1: counts1,
+            day2: counts2
+        })
+
+  def testWriteDailyCountsReplacesExistingCounts(self):
+    day = rdfvalue.RDFDatetime.FromHumanReadable("2018-01-01")
+    self.db.WriteAPIAuditDailyCounts(day, {("foo", "GetClient"): 3})
+    self.db.WriteAPIAuditDailyCounts(day, {("bar", "ListFlows"): 1})
+
+    self.assertEqual(
+        self.db.ReadAPIAuditDailyCounts(), {day: {
+            ("bar", "ListFlows"): 1
+        }})
+
+  def testWriteEmptyDailyCountsMarksDayAsRolledUp(self):
+    day = rdfvalue.RDFDatetime.FromHumanReadable("2018-01-01")
+    self.db.WriteAPIAuditDailyCounts(day, {("foo", "GetClient"): 3})
+    self.db.WriteAPIAuditDailyCounts(day, {})
+
+    self.assertEqual(self.db.ReadAPIAuditDailyCounts(), {day: {}})
+
+  def testWriteDailyCountsRaisesForTimestampWithinDay(self):
+    timestamp = rdfvalue.RDFDatetime.FromHumanReadable("2018-01-01 12:00")
+    with self.assertRaises(ValueError):
+      self.db.WriteAPIAuditDailyCounts(timestamp, {})
+
+  def testReadDailyCountsFilterDay(self):
+    days = [
+        rdfvalue.RDFDatetime.FromHumanReadable("2018-01-0%d" % i)
+        for i in range(1, 5)
+    ]
+    for i, day in enumerate(days):
+      self.db.WriteAPIAuditDailyCounts(day, {("foo", "GetClient"): i + 1})
+
+    self.assertEqual(
+        sorted(self.db.ReadAPIAuditDailyCounts(min_day=days[1])), days[1:])
+    self.assertEqual(
+        sorted(self.db.ReadAPIAuditDailyCounts(max_day=days[1])), days[:2])
+    self.assertEqual(
+        self.db.ReadAPIAuditDailyCounts(min_day=days[1], max_day=days[2]), {
+            days[1]: {
+                ("foo", "GetClient"): 2
+            },
+            days[2]: {
+                ("foo", "GetClient"): 3
+            }
+        })
@@ -9,6 +9,7 @@ import threading
 
 from grr_response_core.lib import rdfvalue
 from grr_response_core.lib.rdfvalues import client as rdf_client
+from grr_response_core.lib.rdfvalues import client_stats as rdf_client_stats
 from grr_response_core.lib.util import compatibility
 from grr_response_server import db
 from grr_response_server import flow
@@ -148,6 +149,22 @@ class DatabaseTestHuntMixin(object):
     with self.assertRaises(db.UnknownHuntError):
       self.db.ReadHuntObject(hunt_obj.hunt_id)
 
+  def testDeletingHuntObjectDeletesItsCounts(self):
+    hunt_obj = rdf_hunt_objects.Hunt(description="foo")
+    self.db.WriteHuntObject(hunt_obj)
+
+    client_id, flow_id = self._SetupHuntClientAndFlow(hunt_id=hunt_obj.hunt_id)
+    sample_results = self._SampleSingleTypeHuntResults(
+        client_id=client_id, flow_id=flow_id, hunt_id=hunt_obj.hunt_id)
+    self._WriteHuntResults(sample_results)
+    self.assertEqual(self.db.CountHuntFlows(hunt_obj.hunt_id), 1)
+
+    self.db.DeleteHuntObject(hunt_obj.hunt_id)
+
+    self.assertEqual(self.db.CountHuntResults(hunt_obj.hunt_id), 0)
+    self.assertEqual(self.db.CountHuntResultsByType(hunt_obj.hunt_id), {})
+    self.assertEqual(self.db.CountHuntFlows(hunt_obj.hunt_id), 0)
+
   def testReadAllHuntObjectsReturnsEmptyListWhenNoHunts(self):
     self.assertEqual(self.db.ReadAllHuntObjects(), [])
 
@@ -163,6 +180,134 @@ class DatabaseTestHuntMixin(object):
     self.assertCountEqual(["foo", "bar"],
                           [h.description for h in read_hunt_objs])
 
+  def _WriteHuntsForListing(self):
+    hunt_ids = []
+    for i, (creator, description) in enumerate([("user1", "foo"),
+                                                ("user2", "foobar"),
+                                                ("user1", "bar"),
+                                                ("user2", "barfoo")]):
+      hunt_obj = rdf_hunt_objects.Hunt(
+          create_time=rdfvalue.RDFDatetime.FromSecondsSinceEpoch(i + 1),
+          creator=creator,
+          description=description)
+      self.db.WriteHuntObject(hunt_obj)
+      hunt_ids.append(hunt_obj.hunt_id)
+    return hunt_ids
+
+  def testListHuntObjectsReturnsEmptyListWhenNoHunts(self):
+    self.assertEqual(self.db.ListHuntObjects(offset=0, count=db.MAX_COUNT), [])
+    self.assertEqual(self.db.CountHuntObjects(), 0)
+
+  def testListHuntObjectsReturnsMetadataOfAllHuntsNewestFirst(self):
+    hunt_obj = rdf_hunt_objects.Hunt(
+        creator="user1", description="foo", num_results=42)
+    hunt_obj.client_resources_stats.RegisterResources(
+        rdf_client_stats.ClientResources(
+            cpu_usage=rdf_client_stats.CpuSeconds(
+                user_cpu_time=1.5, system_cpu_time=2),
+            network_bytes_sent=10))
+    self.db.WriteHuntObject(hunt_obj)
+
+    metadata, = self.db.ListHuntObjects(offset=0, count=db.MAX_COUNT)
+    self.assertEqual(metadata.hunt_id, hunt_obj.hunt_id)
+    self.assertEqual(metadata.creator, "user1")
+    self.assertEqual(metadata.description, "foo")
+    self.assertEqual(metadata.create_time, hunt_obj.create_time)
+    self.assertEqual(metadata.hunt_state, hunt_obj.hunt_state)
+    self.assertEqual(metadata.num_results, 42)
+    self.assertEqual(metadata.total_cpu_usage, 3.5)
+    self.assertEqual(metadata.total_network_bytes_sent, 10)
+    self.assertEqual(metadata.last_update_time,
+                     self.db.ReadHuntObject(hunt_obj.hunt_id).last_update_time)
+
+    hunt_ids = self._WriteHuntsForListing()
+    listed = self.db.ListHuntObjects(offset=0, count=db.MAX_COUNT)
+    self.assertEqual([m.hunt_id for m in listed],
+                     [hunt_obj.hunt_id] + hunt_ids[::-1])
+
+  def testListHuntObjectsReflectsUpdatesAndDeletions(self):
+    hunt_ids = self._WriteHuntsForListing()
+
+    def UpdateFn(hunt_obj):
+      hunt_obj.hunt_state = hunt_obj.HuntState.STARTED
+      hunt_obj.num_clients = 5
+      return hunt_obj
+
+    self.db.UpdateHuntObject(hunt_ids[0], UpdateFn)
+    self.db.DeleteHuntObject(hunt_ids[1])
+
+    listed = self.db.ListHuntObjects(offset=0, count=db.MAX_COUNT)
+    self.assertEqual([m.hunt_id for m in listed],
+                     [hunt_ids[3], hunt_ids[2], hunt_ids[0]])
+    self.assertEqual(listed[2].hunt_state,
+                     rdf_hunt_objects.Hunt.HuntState.STARTED)
+    self.assertEqual(listed[2].num_clients, 5)
+
+  def testListHuntObjectsAppliesOffsetAndCount(self):
+    hunt_ids = self._WriteHuntsForListing()
+
+    listed = self.db.ListHuntObjects(offset=1, count=2)
+    self.assertEqual([m.hunt_id for m in listed], [hunt_ids[2], hunt_ids[1]])
+
+    listed = self.db.ListHuntObjects(offset=3, count=2)
+    self.assertEqual([m.hunt_id for m in listed], [hunt_ids[0]])
+
+  def testListHuntObjectsFiltersByCreator(self):
+    hunt_ids = self._WriteHuntsForListing()
+
+    listed = self.db.ListHuntObjects(
+        offset=0, count=db.MAX_COUNT, with_creator="user1")
+    self.assertEqual([m.hunt_id for m in listed], [hunt_ids[2], hunt_ids[0]])
+    self.assertEqual(self.db.CountHuntObjects(with_creator="user1"), 2)
+    self.assertEqual(self.db.CountHuntObjects(with_creator="user3"), 0)
+
+  def testListHuntObjectsFiltersByCreationTime(self):
+    hunt_ids = self._WriteHuntsForListing()
+
+    created_after = rdfvalue.RDFDatetime.FromSecondsSinceEpoch(2)
+    listed = self.db.ListHuntObjects(
+        offset=0, count=db.MAX_COUNT, created_after=created_after)
+    self.assertEqual([m.hunt_id for m in listed], [hunt_ids[3], hunt_ids[2]])
+    self.assertEqual(self.db.CountHuntObjects(created_after=created_after), 2)
+
+  def testListHuntObjectsFiltersByDescriptionMatch(self):
+    hunt_ids = self._WriteHuntsForListing()
+
+    listed = self.db.ListHuntObjects(
+        offset=0, count=db.MAX_COUNT, with_description_match="foo")
+    self.assertEqual([m.hunt_id for m in listed],
+                     [hunt_ids[3], hunt_ids[1], hunt_ids[0]])
+    self.assertEqual(self.db.CountHuntObjects(with_description_match="foo"), 3)
+
+  def testListHuntObjectsFiltersAreCaseSensitive(self):
+    self._WriteHuntsForListing()
+    hunt_obj = rdf_hunt_objects.Hunt(
+        create_time=rdfvalue.RDFDatetime.FromSecondsSinceEpoch(5),
+        creator="User1",
+        description="FOO")
+    self.db.WriteHuntObject(hunt_obj)
+
+    listed = self.db.ListHuntObjects(
+        offset=0, count=db.MAX_COUNT, with_creator="User1")
+    self.assertEqual([m.hunt_id for m in listed], [hunt_obj.hunt_id])
+    self.assertEqual(self.db.CountHuntObjects(with_creator="user1"), 2)
+
+    listed = self.db.ListHuntObjects(
+        offset=0, count=db.MAX_COUNT, with_description_match="FO")
+    self.assertEqual([m.hunt_id for m in listed], [hunt_obj.hunt_id])
+    self.assertEqual(self.db.CountHuntObjects(with_description_match="fo"), 3)
+
+  def testListHuntObjectsCombinesFilters(self):
+    hunt_ids = self._WriteHuntsForListing()
+
+    kwargs = dict(
+        with_creator="user2",
+        created_after=rdfvalue.RDFDatetime.FromSecondsSinceEpoch(1),
+        with_description_match="foo")
+    listed = self.db.ListHuntObjects(offset=1, count=db.MAX_COUNT, **kwargs)
+    self.assertEqual([m.hunt_id for m in listed], [hunt_ids[1]])
+    self.assertEqual(self.db.CountHuntObjects(**kwargs), 2)
+
   def testReadHuntLogEntriesReturnsEntryFromSingleHuntFlow(self):
     hunt_obj = rdf_hunt_objects.Hunt(description="foo")
     self.db.WriteHuntObject(hunt_obj)
@@ -788,3 +933,86 @@ class DatabaseTestHuntMixin(object):
           result, len(expected), "Result count does not match for "
           "(filter_condition=%d): %d vs %d" % (filter_condition, len(expected),
                                                result))
+
+  def testCountHuntFlowsReflectsFlowUpdates(self):
+    hunt_obj = rdf_hunt_objects.Hunt(description="foo")
+    self.db.WriteHuntObject(hunt_obj)
+
+    client_id, flow_id = self._SetupHuntClientAndFlow(
+        flow_state=rdf_flow_objects.Flow.FlowState.RUNNING,
+        hunt_id=hunt_obj.hunt_id)
+
+    flow_obj = self.db.ReadFlowObject(client_id, flow_id)
+    flow_obj.flow_state = flow_obj.FlowState.FINISHED
+    self.db.UpdateFlow(client_id, flow_id, flow_obj=flow_obj)
+    self.db.UpdateFlow(
+        client_id, flow_id, client_crash_info=rdf_client.ClientCrash())
+
+    expected_counts = {
+        db.HuntFlowsCondition.UNSET: 1,
+        db.HuntFlowsCondition.FAILED_FLOWS_ONLY: 0,
+        db.HuntFlowsCondition.SUCCEEDED_FLOWS_ONLY: 1,
+        db.HuntFlowsCondition.COMPLETED_FLOWS_ONLY: 1,
+        db.HuntFlowsCondition.FLOWS_IN_PROGRESS_ONLY: 0,
+        db.HuntFlowsCondition.CRASHED_FLOWS_ONLY: 1,
+        db.HuntFlowsCondition.FLOWS_WITH_RESULTS_ONLY: 0,
+    }
+    for filter_condition, expected in expected_counts.items():
+      self.assertEqual(
+          self.db.CountHuntFlows(
+              hunt_obj.hunt_id, filter_condition=filter_condition), expected)
+
+  def testReadClientIdsWithHuntFlowsReturnsClientsWithHuntFlows(self):
+    hunt_obj = rdf_hunt_objects.Hunt(description="foo")
+    self.db.WriteHuntObject(hunt_obj)
+    other_hunt_obj = rdf_hunt_objects.Hunt(description="bar")
+    self.db.WriteHuntObject(other_hunt_obj)
+
+    client_ids = []
+    for _ in range(4):
+      client_id = self.InitializeClient()
+      self.db.WriteClientMetadata(client_id, fleetspeak_enabled=False)
+      client_ids.append(client_id)
+
+    for client_id in client_ids[:2]:
+      self.db.WriteFlowObject(
+          rdf_flow_objects.Flow(
+              client_id=client_id,
+              flow_id=hunt_obj.hunt_id,
+              parent_hunt_id=hunt_obj.hunt_id,
+              create_time=rdfvalue.RDFDatetime.Now()))
+    self.db.WriteFlowObject(
+        rdf_flow_objects.Flow(
+            client_id=client_ids[2],
+            flow_id=other_hunt_obj.hunt_id,
+            parent_hunt_id=other_hunt_obj.hunt_id,
+            create_time=rdfvalue.RDFDatetime.Now()))
+
+    self.assertEqual(
+        self.db.ReadClientIdsWithHuntFlows(hunt_obj.hunt_id, client_ids),
+        set(client_ids[:2]))
+    self.assertEqual(
+        self.db.ReadClientIdsWithHuntFlows(hunt_obj.hunt_id, client_ids[1:]),
+        set(client_ids[1:2]))
+    self.assertEqual(
+        self.db.ReadClientIdsWithHuntFlows(hunt_obj.hunt_id, []), set())
+
+  def testReadHuntResultsIgnoresResultsOfOtherHunts(self):
+    hunt_obj_1 = rdf_hunt_objects.Hunt(description="foo")
+    self.db.WriteHuntObject(hunt_obj_1)
+    hunt_obj_2 = rdf_hunt_objects.Hunt(description="bar")
+    self.db.WriteHuntObject(hunt_obj_2)
+
+    client_id, flow_id = self._SetupHuntClientAndFlow(
+        hunt_id=hunt_obj_1.hunt_id)
+    self._WriteHuntResults(
+        self._SampleSingleTypeHuntResults(
+            client_id=client_id,
+            flow_id=flow_id,
+            hunt_id=hunt_obj_1.hunt_id,
+            count=3))
+
+    self.assertLen(self.db.ReadHuntResults(hunt_obj_1.hunt_id, 0, 10), 3)
+    self.assertEmpty(self.db.ReadHuntResults(hunt_obj_2.hunt_id, 0, 10))
+    self.assertEqual(self.db.CountHuntResults(hunt_obj_2.hunt_id), 0)
+    self.assertEqual(self.db.CountHuntResultsByType(hunt_obj_2.hunt_id), {})
@@ -1149,6 +1149,35 @@ class DatabaseTestPathsMixin(object):
     self.assertEqual(results[2].components, ("foo", "norf"))
     self.assertEqual(results[1].stat_entry.st_mode, 1337)
 
+  def testListDescendentPathInfosTimestampLimitedSubtree(self):
+    client_id = self.InitializeClient()
+
+    path_info_1 = rdf_objects.PathInfo.OS(components=["foo", "bar", "baz"])
+    path_info_1.stat_entry.st_size = 1
+
+    path_info_2 = rdf_objects.PathInfo.OS(
+        components=["foo", "quux", "norf", "thud"])
+    path_info_2.stat_entry.st_size = 2
+
+    path_info_3 = rdf_objects.PathInfo.OS(components=["foobar", "blargh"])
+    path_info_3.stat_entry.st_size = 3
+
+    self.db.WritePathInfos(client_id, [path_info_1, path_info_2, path_info_3])
+
+    results = self.db.ListDescendentPathInfos(
+        client_id=client_id,
+        path_type=rdf_objects.PathInfo.PathType.OS,
+        components=("foo",),
+        timestamp=rdfvalue.RDFDatetime.Now(),
+        max_depth=2)
+
+    # Paths that only have explicit descendants deeper than the maximum depth
+    # are not listed.
+    self.assertLen(results, 2)
+    self.assertEqual(results[0].components, ("foo", "bar"))
+    self.assertEqual(results[1].components, ("foo", "bar", "baz"))
+    self.assertEqual(results[1].stat_entry.st_size, 1)
+
   def testListDescendentPathInfosTimestampNow(self):
     client_id = self.InitializeClient()
 
@@ -6,10 +6,13 @@ from __future__ import division
 from __future__ import unicode_literals
 
 import abc
+import bisect
 import collections
 import hashlib
 import io
 import os
+import threading
+import time
 
 from future.utils import iteritems
 from future.utils import iterkeys
@@ -23,8 +26,10 @@ from grr_response_core import config
 from grr_response_core.lib import utils
 from grr_response_core.lib.util import collection
 from grr_response_core.lib.util import precondition
+from grr_response_core.stats import stats_collector_instance
 from grr_response_server import data_store
 from grr_response_server import db
+from grr_response_server import threadpool
 from grr_response_server.rdfvalues import objects as rdf_objects
 
 
@@ -104,45 +109,99 @@ class CompositeExternalFileStore(ExternalFileStore):
 EXTERNAL_FILE_STORE = CompositeExternalFileStore()
 
 
-# TODO(user): this is a naive implementation as it reads one chunk
-# per REL_DB call. It has to be optimized.
+BLOB_STREAM_READ_AHEAD = 8
+BLOB_STREAM_CACHE_SIZE = 16
+
+
 class BlobStream(object):
-  """File-like object for reading from blobs."""
+  """File-like object for reading from blobs.
+
+  Blob references are looked up by offset using a binary search. Whenever a
+  blob that is not cached is needed, the stream fetches it together with a
+  number of blobs that follow it (read-ahead) using a single ReadBlobs call.
+  Fetched blobs are kept in a small LRU cache, so that seeking back and forth
+  (a common pattern for parsers) doesn't result in the same blob being read
+  from the blob store again.
+  """
 
-  def __init__(self, client_path, blob_refs, hash_id):
+  def __init__(self,
+               client_path,
+               blob_refs,
+               hash_id,
+               read_ahead=None,
+               cache_size=None):
+    """Initializes BlobStream object.
+
+    Args:
+      client_path: db.ClientPath identifying the file.
+      blob_refs: A list of rdf_objects.BlobReference objects, sorted by offset.
+      hash_id: rdf_objects.SHA256HashID identifying the file contents.
+      read_ahead: Number of blobs (including the requested one) to fetch with a
+        single ReadBlobs call. Defaults to BLOB_STREAM_READ_AHEAD.
+      cache_size: Maximum number of blobs kept in memory. Defaults to
+        BLOB_STREAM_CACHE_SIZE.
+    """
     self._client_path = client_path
     self._blob_refs = blob_refs
     self._hash_id = hash_id
 
+    if read_ahead is None:
+      read_ahead = BLOB_STREAM_READ_AHEAD
+    if cache_size is None:
+      cache_size = BLOB_STREAM_CACHE_SIZE
+    self._read_ahead = max(1, read_ahead)
+    self._chunks_cache = utils.FastStore(max_size=max(1, cache_size))
+
     self._max_unbound_read = config.CONFIG["Server.max_unbound_read_size"]
 
     self._offset = 0
     self._length = self._blob_refs[-1].offset + self._blob_refs[-1].size
-
-    self._current_ref = None
-    self._current_chunk = None
+    self._ref_offsets = [ref.offset for ref in self._blob_refs]
+
+  def _FindRefIndex(self, offset):
+    """Returns an index of the blob ref covering given offset (or None)."""
+    index = bisect.bisect_right(self._ref_offsets, offset) - 1
+    if index < 0:
+      return None
+
+    ref = self._blob_refs[index]
+    if offset >= ref.offset + ref.size:
+      return None
+
+    return index
+
+  def _FetchChunks(self, index):
+    """Fetches the chunk at given index and the read-ahead ones following it."""
+    refs = self._blob_refs[index:index + self._read_ahead]
+    blob_ids = []
+    for ref in refs:
+      if ref.blob_id not in self._chunks_cache and ref.blob_id not in blob_ids:
+        blob_ids.append(ref.blob_id)
+
+    blobs = data_store.BLOBS.ReadBlobs(blob_ids)
+    # Put the read-ahead blobs first so that the requested one is the most
+    # recently used entry and can't be evicted by its followers.
+    for blob_id in reversed(blob_ids):
+      data = blobs.get(blob_id)
+      if data is not None:
+        self._chunks_cache.Put(blob_id, data)
+
+    return blobs.get(refs[0].blob_id)
 
   def _GetChunk(self):
     """Fetches a chunk corresponding to the current offset."""
 
-    found_ref = None
-    for ref in self._blob_refs:
-      if self._offset >= ref.offset and self._offset < (ref.offset + ref.size):
-        found_ref = ref
-        break
-
-    if not found_ref:
+    index = self._FindRefIndex(self._offset)
+    if index is None:
       return None, None
 
-    # If self._current_ref == found_ref, then simply return previously found
-    # chunk. Otherwise, update self._current_chunk value.
-    if self._current_ref != found_ref:
-      self._current_ref = found_ref
-
-      data = data_store.BLOBS.ReadBlobs([found_ref.blob_id])
-      self._current_chunk = data[found_ref.blob_id]
+    ref = self._blob_refs[index]
+    try:
+      chunk = self._chunks_cache.Get(ref.blob_id)
+    except KeyError:
+      chunk = self._FetchChunks(index)
 
-    return self._current_chunk, self._current_ref
+    return chunk, ref
 
   def Read(self, length=None):
     """Reads data."""
@@ -161,14 +220,15 @@ class BlobStream(object):
       if not chunk:
         break
 
-      part = chunk[self._offset - ref.offset:]
+      start = self._offset - ref.offset
+      part = chunk[start:start + length - result.tell()]
       if not part:
         break
 
       result.write(part)
-      self._offset += min(length, len(part))
+      self._offset += len(part)
 
-    return result.getvalue()[:length]
+    return result.getvalue()
 
   def Tell(self):
     """Returns current reading cursor position."""
@@ -368,7 +428,19 @@ def OpenFile(client_path, max_timestamp=None):
   return BlobStream(client_path, blob_references, hash_id)
 
 
+# Maximum number of blobs fetched with a single ReadBlobs call when streaming.
 STREAM_CHUNKS_READ_AHEAD = 500
+# Maximum number of blob batches that are being fetched while the consumer
+# processes already fetched chunks.
+STREAM_CHUNKS_MAX_BATCHES_IN_FLIGHT = 4
+# Maximum total size of blob batches that are being fetched or consumed. A
+# single batch that is larger than the limit is still fetched on its own.
+STREAM_CHUNKS_MAX_BYTES_IN_FLIGHT = 256 * 1024 * 1024
+# Number of client paths for which path infos and blob references are read
+# with a single REL_DB call.
+STREAM_CHUNKS_PATHS_BATCH_SIZE = 1000
+
+_STREAM_CHUNKS_POOL_NAME = "StreamFilesChunks"
 
 
 class StreamedFileChunk(object):
@@ -395,6 +467,122 @@ class StreamedFileChunk(object):
     self.total_chunks = total_chunks
 
 
+_ChunkDescriptor = NamedTuple("_ChunkDescriptor", [
+    ("client_path", db.ClientPath),
+    ("blob_id", rdf_objects.BlobID),
+    ("chunk_index", int),
+    ("total_chunks", int),
+    ("offset", int),
+    ("size", int),
+    ("total_size", int),
+])
+
+
+def _GenerateChunkDescriptors(client_paths, max_timestamp=None, max_size=None):
+  """Lazily yields descriptors of chunks of given files.
+
+  Path infos and blob references are read in batches of
+  STREAM_CHUNKS_PATHS_BATCH_SIZE client paths, so that descriptors of all
+  the chunks don't have to be kept in memory at once.
+
+  Args:
+    client_paths: db.ClientPath objects describing paths to files.
+    max_timestamp: See StreamFilesChunks.
+    max_size: See StreamFilesChunks.
+
+  Yields:
+    _ChunkDescriptor objects. Their order corresponds to the client_paths
+    order.
+  """
+  for cp_batch in collection.Batch(client_paths,
+                                   STREAM_CHUNKS_PATHS_BATCH_SIZE):
+    path_infos_by_cp = (
+        data_store.REL_DB.ReadLatestPathInfosWithHashBlobReferences(
+            cp_batch, max_timestamp=max_timestamp))
+
+    hash_ids_by_cp = {
+        cp: rdf_objects.SHA256HashID.FromBytes(pi.hash_entry.sha256.AsBytes())
+        for cp, pi in iteritems(path_infos_by_cp)
+        if pi
+    }
+
+    blob_refs_by_hash_id = data_store.REL_DB.ReadHashBlobReferences(
+        hash_ids_by_cp.values())
+
+    for cp in cp_batch:
+      try:
+        hash_id = hash_ids_by_cp[cp]
+      except KeyError:
+        continue
+
+      blob_refs = blob_refs_by_hash_id.get(hash_id)
+      if not blob_refs:
+        continue
+
+      num_blobs = len(blob_refs)
+      total_size = 0
+      for ref in blob_refs:
+        total_size += ref.size
+
+      cur_size = 0
+      for i, ref in enumerate(blob_refs):
+        yield _ChunkDescriptor(
+            client_path=cp,
+            blob_id=ref.blob_id,
+            chunk_index=i,
+            total_chunks=num_blobs,
+            offset=ref.offset,
+            size=ref.size,
+            total_size=total_size)
+
+        cur_size += ref.size
+        if max_size is not None and cur_size >= max_size:
+          break
+
+
+class _BlobsBatchFetch(object):
+  """A batch of blobs that is fetched on a thread pool."""
+
+  def __init__(self, descriptors):
+    self.descriptors = descriptors
+    self.size = sum(d.size for d in descriptors)
+
+    self._blobs = None
+    self._exception = None
+    self._done = threading.Event()
+
+  def Run(self):
+    """Reads the blobs. Meant to be called on a thread pool worker."""
+    start_time = time.time()
+    try:
+      self._blobs = data_store.BLOBS.ReadBlobs(
+          [d.blob_id for d in self.descriptors])
+    except Exception as e:  # pylint: disable=broad-except
+      # The thread pool swallows exceptions raised by tasks, so we keep it
+      # and reraise it on the consumer's thread.
+      self._exception = e
+    finally:
+      stats_collector_instance.Get().RecordEvent(
+          "file_store_stream_batch_latency",
+          time.time() - start_time)
+      self._done.set()
+
+  def Chunks(self):
+    """Waits for the batch to be fetched and returns its chunks."""
+    self._done.wait()
+    if self._exception is not None:
+      raise self._exception  # pylint: disable=raising-bad-type
+
+    stats_collector_instance.Get().IncrementCounter(
+        "file_store_stream_batch_bytes", delta=self.size)
+
+    return [
+        StreamedFileChunk(d.client_path, self._blobs[d.blob_id],
+                          d.chunk_index, d.total_chunks, d.offset,
+                          d.total_size) for d in self.descriptors
+    ]
+
+
 def StreamFilesChunks(client_paths, max_timestamp=None, max_size=None):
   """Streams contents of given files.
 
@@ -407,53 +595,64 @@ def StreamFilesChunks(client_paths, max_timestamp=None, max_size=None):
     max_size: If specified, only the chunks covering max_size bytes will be
       returned.
 
+  Blobs are fetched in batches of STREAM_CHUNKS_READ_AHEAD on a thread pool.
+  Up to STREAM_CHUNKS_MAX_BATCHES_IN_FLIGHT batches are prefetched while the
+  caller processes already returned chunks. The prefetched batches and the
+  batch being processed take up to STREAM_CHUNKS_MAX_BYTES_IN_FLIGHT bytes in
+  total.
+
   Yields:
     StreamedFileChunk objects for every file read. Chunks will be returned
     sequentially, their order will correspond to the client_paths order.
     Files having no content will simply be ignored.
   """
 
-  path_infos_by_cp = (
-      data_store.REL_DB.ReadLatestPathInfosWithHashBlobReferences(
-          client_paths, max_timestamp=max_timestamp))
-
-  hash_ids_by_cp = {
-      cp: rdf_objects.SHA256HashID.FromBytes(pi.hash_entry.sha256.AsBytes())
-      for cp, pi in iteritems(path_infos_by_cp)
-      if pi
-  }
-
-  blob_refs_by_hash_id = data_store.REL_DB.ReadHashBlobReferences(
-      hash_ids_by_cp.values())
-
-  all_chunks = []
-  for cp in client_paths:
-    try:
-      hash_id = hash_ids_by_cp[cp]
-    except KeyError:
-      continue
-
-    try:
-      blob_refs = blob_refs_by_hash_id[hash_id]
-    except KeyError:
-      continue
-
-    num_blobs = len(blob_refs)
-    total_size = 0
-    for ref in blob_refs:
-      total_size += ref.size
-
-    cur_size = 0
-    for i, ref in enumerate(blob_refs):
-      all_chunks.append((cp, ref.blob_id, i, num_blobs, ref.offset, total_size))
-
-      cur_size += ref.size
-      if max_size is not None and cur_size >= max_size:
-        break
-
-  for batch in collection.Batch(all_chunks, STREAM_CHUNKS_READ_AHEAD):
-    blobs = data_store.BLOBS.ReadBlobs(
-        [blob_id for cp, blob_id, i, num_blobs, offset, total_size in batch])
-    for cp, blob_id, i, num_blobs, offset, total_size in batch:
-      yield StreamedFileChunk(cp, blobs[blob_id], i, num_blobs, offset,
-                              total_size)
+  descriptors = _GenerateChunkDescriptors(
+      client_paths, max_timestamp=max_timestamp, max_size=max_size)
+  batches = collection.Batch(descriptors, STREAM_CHUNKS_READ_AHEAD)
+
+  in_flight = collections.deque()
+  # Size of the fetched batches, including the one being consumed.
+  in_flight_size = [0]
+  # A batch that did not fit into the limits yet.
+  pending = [None]
+
+  # The shared pool is stopped once no stream uses it, so that no idle workers
+  # are left behind once all chunks are consumed (or the generator is closed).
+  with threadpool.ThreadPool.Shared(
+      _STREAM_CHUNKS_POOL_NAME,
+      min_threads=1,
+      max_threads=STREAM_CHUNKS_MAX_BATCHES_IN_FLIGHT) as pool:
+
+    def _Submit():
+      """Schedules batches fetching as long as the limits allow it."""
+      while len(in_flight) < STREAM_CHUNKS_MAX_BATCHES_IN_FLIGHT:
+        if pending[0] is None:
+          try:
+            pending[0] = _BlobsBatchFetch(next(batches))
+          except StopIteration:
+            return
+
+        fetch = pending[0]
+        if (in_flight_size[0] and in_flight_size[0] + fetch.size >
+            STREAM_CHUNKS_MAX_BYTES_IN_FLIGHT):
+          return
+
+        pending[0] = None
+        in_flight.append(fetch)
+        in_flight_size[0] += fetch.size
+        pool.AddTask(fetch.Run, name="StreamFilesChunks")
+
+    _Submit()
+    while in_flight:
+      fetch = in_flight.popleft()
+      chunks = fetch.Chunks()
+
+      # Schedule next batches before handing chunks to the consumer, so that
+      # they are fetched while the consumer processes the current batch.
+      _Submit()
+      for chunk in chunks:
+        yield chunk
+
+      in_flight_size[0] -= fetch.size
+      _Submit()
@@ -16,6 +16,7 @@ from grr_response_server import data_store
 from grr_response_server import db
 from grr_response_server import file_store
 from grr_response_server.rdfvalues import objects as rdf_objects
+from grr.test_lib import stats_test_lib
 from grr.test_lib import test_lib
 
 
@@ -58,6 +59,61 @@ class BlobStreamTest(test_lib.GRRBaseTest):
   def testReadsWholeFile(self):
     self.assertEqual(self.blob_stream.read(), b"".join(self.blob_data))
 
+  def testReadsAcrossChunksFromTheMiddleOfChunk(self):
+    self.blob_stream.seek(self.blob_size // 2)
+    self.assertEqual(
+        self.blob_stream.read(self.blob_size * 2),
+        b"a" * (self.blob_size // 2) + b"b" * self.blob_size + b"c" *
+        (self.blob_size // 2))
+    self.assertEqual(self.blob_stream.tell(),
+                     self.blob_size * 2 + self.blob_size // 2)
+
+  def testReadsPastTheEnd(self):
+    self.blob_stream.seek(-1, 2)
+    self.assertEqual(self.blob_stream.read(10), b"5")
+    self.assertEqual(self.blob_stream.read(10), b"")
+
+  def testFetchesReadAheadBlobsInSingleCall(self):
+    blob_stream = file_store.BlobStream(
+        None, self.blob_refs, None, read_ahead=5, cache_size=10)
+
+    with mock.patch.object(
+        data_store.BLOBS, "ReadBlobs",
+        wraps=data_store.BLOBS.ReadBlobs) as read_blobs_mock:
+      self.assertEqual(blob_stream.read(), b"".join(self.blob_data))
+
+    self.assertEqual(read_blobs_mock.call_count, 2)
+    self.assertEqual(read_blobs_mock.call_args_list[0][0][0],
+                     self.blob_ids[:5])
+    self.assertEqual(read_blobs_mock.call_args_list[1][0][0],
+                     self.blob_ids[5:])
+
+  def testDoesNotFetchCachedBlobsAgain(self):
+    blob_stream = file_store.BlobStream(
+        None, self.blob_refs, None, read_ahead=1, cache_size=10)
+
+    with mock.patch.object(
+        data_store.BLOBS, "ReadBlobs",
+        wraps=data_store.BLOBS.ReadBlobs) as read_blobs_mock:
+      blob_stream.read()
+      blob_stream.seek(0)
+      self.assertEqual(blob_stream.read(), b"".join(self.blob_data))
+
+    self.assertEqual(read_blobs_mock.call_count, len(self.blob_ids))
+
+  def testRefetchesBlobsEvictedFromCache(self):
+    blob_stream = file_store.BlobStream(
+        None, self.blob_refs, None, read_ahead=1, cache_size=1)
+
+    with mock.patch.object(
+        data_store.BLOBS, "ReadBlobs",
+        wraps=data_store.BLOBS.ReadBlobs) as read_blobs_mock:
+      blob_stream.read()
+      blob_stream.seek(0)
+      self.assertEqual(blob_stream.read(), b"".join(self.blob_data))
+
+    self.assertEqual(read_blobs_mock.call_count, len(self.blob_ids) * 2)
+
   def testRaisesWhenTryingToReadTooMuchDataAtOnce(self):
     with test_lib.ConfigOverrider(
         {"Server.max_unbound_read_size": self.blob_size}):
@@ -344,7 +400,8 @@ class OpenFileTest(test_lib.GRRBaseTest):
     self.assertEqual(fd.read(), self.data)
 
 
-class StreamFilesChunksTest(test_lib.GRRBaseTest):
+class StreamFilesChunksTest(stats_test_lib.StatsTestMixin,
+                            test_lib.GRRBaseTest):
   """Tests for StreamFilesChunks."""
 
   def _WriteFile(self, client_path, blobs_range=None):
@@ -535,6 +592,76 @@ class StreamFilesChunksTest(test_lib.GRRBaseTest):
     self.assertEqual(chunks[0].data, self.blob_data[0])
     self.assertEqual(chunks[1].data, self.blob_data[1])
 
+  def _WriteManyFiles(self, num_files):
+    client_paths = []
+    for i in range(num_files):
+      client_path = db.ClientPath.OS(self.client_id, ("foo", str(i)))
+      self._WriteFile(client_path, (i % 5, i % 5 + 2))
+      client_paths.append(client_path)
+    return client_paths
+
+  def testStreamsManyFilesInManyBatchesInOrder(self):
+    client_paths = self._WriteManyFiles(20)
+
+    with mock.patch.object(file_store, "STREAM_CHUNKS_READ_AHEAD", 3):
+      with mock.patch.object(file_store, "STREAM_CHUNKS_PATHS_BATCH_SIZE", 7):
+        chunks = list(file_store.StreamFilesChunks(client_paths))
+
+    self.assertLen(chunks, 40)
+    for i, client_path in enumerate(client_paths):
+      self.assertEqual(chunks[i * 2].client_path, client_path)
+      self.assertEqual(chunks[i * 2].data, self.blob_data[i % 5])
+      self.assertEqual(chunks[i * 2].chunk_index, 0)
+      self.assertEqual(chunks[i * 2 + 1].client_path, client_path)
+      self.assertEqual(chunks[i * 2 + 1].data, self.blob_data[i % 5 + 1])
+      self.assertEqual(chunks[i * 2 + 1].chunk_index, 1)
+
+  def testStreamsWhenBytesInFlightLimitIsLowerThanBatchSize(self):
+    client_paths = self._WriteManyFiles(10)
+
+    with mock.patch.object(file_store, "STREAM_CHUNKS_READ_AHEAD", 3):
+      with mock.patch.object(file_store, "STREAM_CHUNKS_MAX_BYTES_IN_FLIGHT",
+                             1):
+        chunks = list(file_store.StreamFilesChunks(client_paths))
+
+    self.assertLen(chunks, 20)
+    self.assertEqual([c.client_path for c in chunks[::2]], client_paths)
+
+  def testBytesInFlightLimitIncludesConsumedBatch(self):
+    client_paths = self._WriteManyFiles(3)
+
+    with mock.patch.object(
+        data_store.BLOBS, "ReadBlobs",
+        wraps=data_store.BLOBS.ReadBlobs) as read_mock:
+      # Two batches of two blobs don't fit into the limit.
+      with mock.patch.object(file_store, "STREAM_CHUNKS_READ_AHEAD", 2):
+        with mock.patch.object(file_store, "STREAM_CHUNKS_MAX_BYTES_IN_FLIGHT",
+                               3 * self.blob_size):
+          chunks = file_store.StreamFilesChunks(client_paths)
+          next(chunks)
+          next(chunks)
+          self.assertEqual(read_mock.call_count, 1)
+
+          next(chunks)
+          self.assertEqual(read_mock.call_count, 2)
+          self.assertLen(list(chunks), 3)
+
+  def testRecordsLatencyOfEveryBatch(self):
+    client_paths = self._WriteManyFiles(5)
+
+    with self.assertStatsCounterDelta(4, "file_store_stream_batch_latency"):
+      with mock.patch.object(file_store, "STREAM_CHUNKS_READ_AHEAD", 3):
+        list(file_store.StreamFilesChunks(client_paths))
+
+  def testRaisesWhenReadingBlobsFails(self):
+    client_path = db.ClientPath.OS(self.client_id, ("foo", "bar"))
+    self._WriteFile(client_path, (0, 2))
+
+    with mock.patch.object(
+        data_store.BLOBS, "ReadBlobs", side_effect=ValueError("foo")):
+      with self.assertRaises(ValueError):
+        list(file_store.StreamFilesChunks([client_path]))
+
 
 def main(argv):
   # Run the full test suite
@@ -223,6 +223,15 @@ class GeneralFlowsTest(notification_test_lib.NotificationTestMixin,
 
     self.assertEqual(CallStateFlow.success, True)
 
+  def testFlowProcessingReadsFromPrimary(self):
+    with mock.patch.object(
+        data_store.REL_DB,
+        "ReadsFromPrimary",
+        wraps=data_store.REL_DB.ReadsFromPrimary) as reads_from_primary_mock:
+      flow_test_lib.StartAndRunFlow(CallStateFlow, client_id=self.client_id)
+
+    reads_from_primary_mock.assert_called_with()
+
   def testChainedFlow(self):
     """Test the ability to chain flows."""
     ParentFlow.success = False
@@ -5,16 +5,24 @@ from __future__ import division
 from __future__ import unicode_literals
 
 import bisect
+import collections
+import functools
+import json
 import logging
+import sys
+import threading
 
 
 from builtins import zip  # pylint: disable=redefined-builtin
 from future.utils import iteritems
 from future.utils import itervalues
+from future.utils import with_metaclass
 
 from grr_response_core import config
 from grr_response_core.lib import rdfvalue
+from grr_response_core.lib import registry
 from grr_response_core.lib import utils
+from grr_response_core.lib.rdfvalues import protodict as rdf_protodict
 from grr_response_core.lib.rdfvalues import stats as rdf_stats
 from grr_response_core.lib.util import collection
 from grr_response_server import aff4
@@ -23,6 +31,8 @@ from grr_response_server import cronjobs
 from grr_response_server import data_store
 from grr_response_server import db
 from grr_response_server import export_utils
+from grr_response_server import hunt
+from grr_response_server import threadpool
 from grr_response_server.aff4_objects import aff4_grr
 from grr_response_server.aff4_objects import cronjobs as aff4_cronjobs
 from grr_response_server.aff4_objects import stats as aff4_stats
@@ -30,6 +40,7 @@ from grr_response_server.flows.general import discovery as flows_discovery
 from grr_response_server.hunts import implementation as hunts_implementation
 from grr_response_server.hunts import standard as hunts_standard
 from grr_response_server.rdfvalues import flow_runner as rdf_flow_runner
+from grr_response_server.rdfvalues import hunt_objects as rdf_hunt_objects
 
 # Maximum number of old stats entries to delete in a single db call.
 _STATS_DELETION_BATCH_SIZE = 10000
@@ -37,6 +48,14 @@ _STATS_DELETION_BATCH_SIZE = 10000
 # How often to save progress to the DB when deleting stats.
 _stats_checkpoint_period = rdfvalue.Duration("15m")
 
+# API audit entries of a day are rolled up only this long after the day ends,
+# so that entries of requests still in flight at midnight are not missed.
+_AUDIT_ROLLUP_DELAY = rdfvalue.Duration("1h")
+
+# How many days the first run of APIAuditDailyCountsCronJob rolls up. Reports
+# read raw audit entries of older days.
+_AUDIT_ROLLUP_BACKFILL = rdfvalue.Duration("30d")
+
 
 class _ActiveCounter(object):
   """Helper class to count the number of times a specific category occurred.
@@ -49,14 +68,17 @@ class _ActiveCounter(object):
 
   active_days = [1, 7, 14, 30]
 
-  def __init__(self, report_type):
+  def __init__(self, report_type, now=None):
     """Constructor.
 
     Args:
        report_type: rdf_stats.ClientGraphSeries.ReportType for the client stats
          to track.
+       now: rdfvalue.RDFDatetime to compute ages against. If None, the current
+         time at every Add() call is used.
     """
     self._report_type = report_type
+    self._now = now
     self.categories = dict([(x, {}) for x in self.active_days])
 
   def Add(self, category, label, age):
@@ -72,7 +94,7 @@ class _ActiveCounter(object):
       label: Client label to which this should be applied.
       age: When this instance occurred.
     """
-    now = rdfvalue.RDFDatetime.Now()
+    now = self._now or rdfvalue.RDFDatetime.Now()
     category = utils.SmartUnicode(category)
 
     for active_time in self.active_days:
@@ -81,6 +103,25 @@ class _ActiveCounter(object):
         self.categories[active_time][label][
             category] = self.categories[active_time][label].get(category, 0) + 1
 
+  def GetState(self):
+    """Returns the counts as a JSON-serializable list of rows."""
+    rows = []
+    for active_time, counts_by_label in iteritems(self.categories):
+      for label, counts in iteritems(counts_by_label):
+        # Labels without any counts still get (empty) graphs.
+        rows.append([active_time, label, None, 0])
+        for category, count in iteritems(counts):
+          rows.append([active_time, label, category, count])
+    return rows
+
+  def SetState(self, rows):
+    """Restores the counts from rows returned by GetState()."""
+    self.categories = dict([(x, {}) for x in self.active_days])
+    for active_time, label, category, count in rows:
+      counts = self.categories[active_time].setdefault(label, {})
+      if category is not None:
+        counts[category] = count
+
   def Save(self, token=None):
     """Generate a histogram object and store in the specified attribute."""
     graph_series_by_label = {}
@@ -100,6 +141,11 @@ class _ActiveCounter(object):
 
 CLIENT_READ_BATCH_SIZE = 50000
 
+# Maximum number of client batches read concurrently by fleet stats scans.
+CLIENT_READ_MAX_BATCHES_IN_FLIGHT = 3
+
+_CLIENT_READ_POOL_NAME = "FleetStatsClientReads"
+
 
 def _IterateAllClients(recency_window=None):
   """Fetches client data from the relational db.
@@ -124,85 +170,143 @@ def _IterateAllClients(recency_window=None):
     yield list(itervalues(client_info_dict))
 
 
-class AbstractClientStatsCronJob(cronjobs.SystemCronJobBase):
-  """Base class for all stats processing cron jobs."""
+class _ClientsBatchFetch(object):
+  """A batch of clients that is read on a thread pool."""
 
-  CLIENT_STATS_URN = rdfvalue.RDFURN("aff4:/stats/ClientFleetStats")
+  def __init__(self, client_ids):
+    self.client_ids = client_ids
 
-  # An rdfvalue.Duration specifying a window of last-ping
-  # timestamps to analyze. Clients that haven't communicated with GRR servers
-  # longer than the given period will be skipped.
-  recency_window = None
+    self._infos = None
+    self._exception = None
+    self._done = threading.Event()
 
-  def BeginProcessing(self):
-    pass
+  def Run(self):
+    """Reads the clients. Meant to be called on a thread pool worker."""
+    try:
+      self._infos = data_store.REL_DB.MultiReadClientFullInfo(self.client_ids)
+    except Exception as e:  # pylint: disable=broad-except
+      # The thread pool swallows exceptions raised by tasks, so we keep it
+      # and reraise it on the consumer's thread.
+      self._exception = e
+    finally:
+      self._done.set()
+
+  def ClientFullInfos(self):
+    """Waits for the batch to be read and returns it in client id order."""
+    self._done.wait()
+    if self._exception is not None:
+      raise self._exception  # pylint: disable=raising-bad-type
+
+    return [
+        self._infos[client_id]
+        for client_id in self.client_ids
+        if client_id in self._infos
+    ]
 
-  def ProcessClientFullInfo(self, client_full_info):
-    raise NotImplementedError()
 
-  def FinishProcessing(self):
-    pass
+def _StreamClientBatches(client_ids):
+  """Reads given clients in batches.
 
-  def _GetClientLabelsList(self, client):
-    """Get set of labels applied to this client."""
-    return set(["All"] + list(client.GetLabelsNames(owner="GRR")))
+  Up to CLIENT_READ_MAX_BATCHES_IN_FLIGHT batches of CLIENT_READ_BATCH_SIZE
+  clients are read concurrently on a thread pool while the caller processes
+  already returned batches.
 
-  def _StatsForLabel(self, label):
-    if label not in self.stats:
-      self.stats[label] = aff4.FACTORY.Create(
-          self.CLIENT_STATS_URN.Add(label),
-          aff4_stats.ClientFleetStats,
-          mode="w",
-          token=self.token)
-    return self.stats[label]
+  Args:
+    client_ids: Ids of clients to read.
 
-  def Run(self):
-    """Retrieve all the clients for the AbstractClientStatsCollectors."""
-    try:
+  Yields:
+    Pairs of a list of client ids and a list of ClientFullInfo objects of those
+    clients that still exist, in the order of the given ids.
+  """
+  batches = collection.Batch(client_ids, CLIENT_READ_BATCH_SIZE)
 
-      self.stats = {}
+  in_flight = collections.deque()
 
-      self.BeginProcessing()
+  with threadpool.ThreadPool.Shared(
+      _CLIENT_READ_POOL_NAME,
+      min_threads=1,
+      max_threads=CLIENT_READ_MAX_BATCHES_IN_FLIGHT) as pool:
 
-      processed_count = 0
+    def _Submit():
+      while len(in_flight) < CLIENT_READ_MAX_BATCHES_IN_FLIGHT:
+        try:
+          batch = next(batches)
+        except StopIteration:
+          return
 
-      for client_info_batch in _IterateAllClients(
-          recency_window=self.recency_window):
-        for client_info in client_info_batch:
-          self.ProcessClientFullInfo(client_info)
-        processed_count += len(client_info_batch)
-        self.Log("Processed %d clients.", processed_count)
-        self.HeartBeat()
+        fetch = _ClientsBatchFetch(batch)
+        in_flight.append(fetch)
+        pool.AddTask(fetch.Run, name="FleetStatsClientRead")
 
-      self.FinishProcessing()
-      for fd in itervalues(self.stats):
-        fd.Close()
+    _Submit()
+    while in_flight:
+      fetch = in_flight.popleft()
+      infos = fetch.ClientFullInfos()
 
-      logging.info("%s: processed %d clients.", self.__class__.__name__,
-                   processed_count)
-    except Exception as e:  # pylint: disable=broad-except
-      logging.exception("Error while calculating stats: %s", e)
-      raise
+      # Schedule next batches before handing clients to the consumer, so that
+      # they are read while the consumer processes the current batch.
+      _Submit()
+      yield fetch.client_ids, infos
 
 
-class GRRVersionBreakDownCronJob(AbstractClientStatsCronJob):
+def _GetClientLabelsList(client):
+  """Get set of labels applied to this client."""
+  return set(["All"] + list(client.GetLabelsNames(owner="GRR")))
+
+
+class AbstractClientStatsAggregator(
+    with_metaclass(registry.MetaclassRegistry, object)):
+  """Base class for client reports computed by a scan of the whole fleet.
+
+  Concrete subclasses are registered automatically and fed by
+  FleetStatsCronJob, which reads every client once for all of them.
+  """
+
+  # An rdfvalue.Duration specifying a window of last-ping
+  # timestamps to analyze. Clients that haven't communicated with GRR servers
+  # longer than the given period will be skipped.
+  recency_window = None
+
+  def __init__(self, now):
+    """Constructor.
+
+    Args:
+      now: rdfvalue.RDFDatetime at which the scan started. Client ages are
+        computed relative to it, so that a resumed scan yields the same
+        results.
+    """
+    self.now = now
+
+  def ProcessClientFullInfo(self, client_full_info):
+    raise NotImplementedError()
+
+  def GetState(self):
+    """Returns the partial results as a JSON-serializable object."""
+    raise NotImplementedError()
+
+  def SetState(self, state):
+    """Restores the partial results returned by GetState()."""
+    raise NotImplementedError()
+
+  def Save(self, token=None):
+    """Writes the report once all clients are processed."""
+    raise NotImplementedError()
+
+
+class GRRVersionBreakDownAggregator(AbstractClientStatsAggregator):
   """Records relative ratios of GRR versions in 7 day actives."""
 
-  frequency = rdfvalue.Duration("6h")
-  lifetime = rdfvalue.Duration("6h")
   recency_window = rdfvalue.Duration("30d")
 
-  def BeginProcessing(self):
+  def __init__(self, now):
+    super(GRRVersionBreakDownAggregator, self).__init__(now)
     self.counter = _ActiveCounter(
-        rdf_stats.ClientGraphSeries.ReportType.GRR_VERSION)
-
-  def FinishProcessing(self):
-    self.counter.Save(token=self.token)
+        rdf_stats.ClientGraphSeries.ReportType.GRR_VERSION, now=now)
 
   def ProcessClientFullInfo(self, client_full_info):
     c_info = client_full_info.last_startup_info.client_info
     ping = client_full_info.metadata.ping
-    labels = self._GetClientLabelsList(client_full_info)
+    labels = _GetClientLabelsList(client_full_info)
 
     if not (c_info and ping):
       return
@@ -215,27 +319,32 @@ class GRRVersionBreakDownCronJob(AbstractClientStatsCronJob):
     for label in labels:
       self.counter.Add(category, label, ping)
 
+  def GetState(self):
+    return self.counter.GetState()
 
-class OSBreakDownCronJob(AbstractClientStatsCronJob):
+  def SetState(self, state):
+    self.counter.SetState(state)
+
+  def Save(self, token=None):
+    self.counter.Save(token=token)
+
+
+class OSBreakDownAggregator(AbstractClientStatsAggregator):
   """Records relative ratios of OS versions in 7 day actives."""
 
-  frequency = rdfvalue.Duration("1d")
-  lifetime = rdfvalue.Duration("20h")
   recency_window = rdfvalue.Duration("30d")
 
-  def BeginProcessing(self):
+  def __init__(self, now):
+    super(OSBreakDownAggregator, self).__init__(now)
     self.counters = [
-        _ActiveCounter(rdf_stats.ClientGraphSeries.ReportType.OS_TYPE),
-        _ActiveCounter(rdf_stats.ClientGraphSeries.ReportType.OS_RELEASE),
+        _ActiveCounter(
+            rdf_stats.ClientGraphSeries.ReportType.OS_TYPE, now=now),
+        _ActiveCounter(
+            rdf_stats.ClientGraphSeries.ReportType.OS_RELEASE, now=now),
     ]
 
-  def FinishProcessing(self):
-    # Write all the counter attributes.
-    for counter in self.counters:
-      counter.Save(token=self.token)
-
   def ProcessClientFullInfo(self, client_full_info):
-    labels = self._GetClientLabelsList(client_full_info)
+    labels = _GetClientLabelsList(client_full_info)
     ping = client_full_info.metadata.ping
     system = client_full_info.last_snapshot.knowledge_base.os
     uname = client_full_info.last_snapshot.Uname()
@@ -251,28 +360,61 @@ class OSBreakDownCronJob(AbstractClientStatsCronJob):
       # Darwin-OSX-10.9.3
       self.counters[1].Add(uname, label, ping)
 
+  def GetState(self):
+    return [counter.GetState() for counter in self.counters]
 
-class LastAccessStatsCronJob(AbstractClientStatsCronJob):
+  def SetState(self, state):
+    for counter, counter_state in zip(self.counters, state):
+      counter.SetState(counter_state)
+
+  def Save(self, token=None):
+    # Write all the counter attributes.
+    for counter in self.counters:
+      counter.Save(token=token)
+
+
+class LastAccessStatsAggregator(AbstractClientStatsAggregator):
   """Calculates a histogram statistics of clients last contacted times."""
 
-  frequency = rdfvalue.Duration("1d")
-  lifetime = rdfvalue.Duration("20h")
   recency_window = rdfvalue.Duration("60d")
 
   # The number of clients fall into these bins (number of days ago)
   _bins = [1, 2, 3, 7, 14, 30, 60]
 
+  def __init__(self, now):
+    super(LastAccessStatsAggregator, self).__init__(now)
+    self._bins = [int(x * 1e6 * 24 * 60 * 60) for x in self._bins]
+    self.values = {}
+
   def _ValuesForLabel(self, label):
     if label not in self.values:
       self.values[label] = [0] * len(self._bins)
     return self.values[label]
 
-  def BeginProcessing(self):
-    self._bins = [long(x * 1e6 * 24 * 60 * 60) for x in self._bins]
+  def ProcessClientFullInfo(self, client_full_info):
+    labels = _GetClientLabelsList(client_full_info)
+    ping = client_full_info.metadata.ping
 
-    self.values = {}
+    if not ping:
+      return
 
-  def FinishProcessing(self):
+    for label in labels:
+      time_ago = self.now - ping
+      pos = bisect.bisect(self._bins, time_ago.microseconds)
+
+      # If clients are older than the last bin forget them.
+      try:
+        self._ValuesForLabel(label)[pos] += 1
+      except IndexError:
+        pass
+
+  def GetState(self):
+    return self.values
+
+  def SetState(self, state):
+    self.values = dict(state)
+
+  def Save(self, token=None):
     # Build and store the graph now. Day actives are cumulative.
     for label in self.values:
       cumulative_count = 0
@@ -282,26 +424,174 @@ class LastAccessStatsCronJob(AbstractClientStatsCronJob):
       for x, y in zip(self._bins, self.values[label]):
         cumulative_count += y
         graph_series.graphs[0].Append(x_value=x, y_value=cumulative_count)
-      client_report_utils.WriteGraphSeries(
-          graph_series, label, token=self.token)
+      client_report_utils.WriteGraphSeries(graph_series, label, token=token)
 
-  def ProcessClientFullInfo(self, client_full_info):
-    labels = self._GetClientLabelsList(client_full_info)
-    ping = client_full_info.metadata.ping
 
-    if not ping:
-      return
+class AbstractClientStatsCronJob(cronjobs.SystemCronJobBase):
+  """Base class for cron jobs feeding client stats aggregators.
 
-    now = rdfvalue.RDFDatetime.Now()
-    for label in labels:
-      time_ago = now - ping
-      pos = bisect.bisect(self._bins, time_ago.microseconds)
+  Clients are read once, in batches ordered by client id, and every client is
+  passed to all aggregators whose recency window it falls into. Progress is
+  checkpointed in the cron job state after every batch, so that a run that is
+  interrupted (e.g. by exceeding its lifetime) is resumed by the next one.
+  """
 
-      # If clients are older than the last bin forget them.
-      try:
-        self._ValuesForLabel(label)[pos] += 1
-      except IndexError:
-        pass
+  # AbstractClientStatsAggregator subclasses to feed. If None, all registered
+  # aggregators are fed.
+  aggregator_classes = None
+
+  # Checkpoints of scans started longer ago than this are discarded and the
+  # scan is restarted, as the partial results would be too stale.
+  checkpoint_ttl = rdfvalue.Duration("1d")
+
+  def _GetAggregatorClasses(self):
+    if self.aggregator_classes is not None:
+      return list(self.aggregator_classes)
+    classes = AbstractClientStatsAggregator.classes
+    return [classes[name] for name in sorted(classes)]
+
+  def _ReadCheckpoint(self, aggregator_classes):
+    """Reads the checkpoint of an interrupted run.
+
+    Args:
+      aggregator_classes: Classes of aggregators the run has to feed.
+
+    Returns:
+      A tuple (scan_time, last_client_id, processed_count, aggregator_states)
+      of the interrupted scan or None if there is no usable checkpoint.
+    """
+    state = self.ReadCronState()
+    scan_time = state.get("scan_time")
+    if scan_time is None:
+      return None
+
+    scan_time = rdfvalue.RDFDatetime(scan_time)
+    if scan_time + self.checkpoint_ttl < rdfvalue.RDFDatetime.Now():
+      return None
+
+    aggregator_states = json.loads(state["aggregator_states"])
+    if set(aggregator_states) != set(c.__name__ for c in aggregator_classes):
+      return None
+
+    return (scan_time, state["last_client_id"], state["processed_count"],
+            aggregator_states)
+
+  def Run(self):
+    """Feeds all the clients to the aggregators."""
+    try:
+      aggregator_classes = self._GetAggregatorClasses()
+
+      checkpoint = self._ReadCheckpoint(aggregator_classes)
+      if checkpoint is None:
+        scan_time = rdfvalue.RDFDatetime.Now()
+        last_client_id = None
+        processed_count = 0
+        aggregator_states = {}
+      else:
+        (scan_time, last_client_id, processed_count,
+         aggregator_states) = checkpoint
+        self.Log("Resuming after %d processed clients.", processed_count)
+
+      aggregators = {}
+      for cls in aggregator_classes:
+        aggregator = cls(scan_time)
+        if cls.__name__ in aggregator_states:
+          aggregator.SetState(aggregator_states[cls.__name__])
+        aggregators[cls.__name__] = aggregator
+
+      # Minimum last ping time of clients each aggregator is interested in.
+      min_pings = {}
+      for name, aggregator in iteritems(aggregators):
+        if aggregator.recency_window is None:
+          min_pings[name] = None
+        else:
+          min_pings[name] = scan_time - aggregator.recency_window
+
+      if None in itervalues(min_pings) or not min_pings:
+        min_last_ping = None
+      else:
+        min_last_ping = min(itervalues(min_pings))
+
+      client_ids = sorted(
+          data_store.REL_DB.ReadAllClientIDs(min_last_ping=min_last_ping))
+      if last_client_id is not None:
+        client_ids = client_ids[bisect.bisect_right(client_ids,
+                                                    last_client_id):]
+
+      for client_id_batch, client_info_batch in _StreamClientBatches(
+          client_ids):
+        for client_info in client_info_batch:
+          ping = client_info.metadata.ping
+          for name, aggregator in iteritems(aggregators):
+            min_ping = min_pings[name]
+            if min_ping is None or (ping is not None and ping >= min_ping):
+              aggregator.ProcessClientFullInfo(client_info)
+
+        processed_count += len(client_info_batch)
+        self.Log("Processed %d clients.", processed_count)
+        self.WriteCronState(
+            rdf_protodict.AttributedDict({
+                "scan_time": scan_time.AsMicrosecondsSinceEpoch(),
+                "last_client_id": client_id_batch[-1],
+                "processed_count": processed_count,
+                "aggregator_states": json.dumps({
+                    name: aggregator.GetState()
+                    for name, aggregator in iteritems(aggregators)
+                }),
+            }))
+        self.HeartBeat()
+
+      for aggregator in itervalues(aggregators):
+        aggregator.Save(token=self.token)
+      self.WriteCronState(rdf_protodict.AttributedDict())
+
+      logging.info("%s: processed %d clients.", self.__class__.__name__,
+                   processed_count)
+    except Exception as e:  # pylint: disable=broad-except
+      logging.exception("Error while calculating stats: %s", e)
+      raise
+
+
+class FleetStatsCronJob(AbstractClientStatsCronJob):
+  """Computes all registered client reports in a single scan of the fleet."""
+
+  frequency = rdfvalue.Duration("6h")
+  lifetime = rdfvalue.Duration("6h")
+
+
+# The following jobs compute a single report each. FleetStatsCronJob computes
+# all of them with a single read of the fleet, so they are disabled by default
+# and only kept to run a single report on demand.
+
+
+class GRRVersionBreakDownCronJob(AbstractClientStatsCronJob):
+  """Records relative ratios of GRR versions in 7 day actives."""
+
+  frequency = rdfvalue.Duration("6h")
+  lifetime = rdfvalue.Duration("6h")
+  enabled = False
+
+  aggregator_classes = [GRRVersionBreakDownAggregator]
+
+
+class OSBreakDownCronJob(AbstractClientStatsCronJob):
+  """Records relative ratios of OS versions in 7 day actives."""
+
+  frequency = rdfvalue.Duration("1d")
+  lifetime = rdfvalue.Duration("20h")
+  enabled = False
+
+  aggregator_classes = [OSBreakDownAggregator]
+
+
+class LastAccessStatsCronJob(AbstractClientStatsCronJob):
+  """Calculates a histogram statistics of clients last contacted times."""
+
+  frequency = rdfvalue.Duration("1d")
+  lifetime = rdfvalue.Duration("20h")
+  enabled = False
+
+  aggregator_classes = [LastAccessStatsAggregator]
 
 
 class AbstractClientStatsCronFlow(aff4_cronjobs.SystemCronFlow):
@@ -691,3 +981,122 @@ class PurgeServerStatsCronJob(cronjobs.SystemCronJobBase):
         self.Log("Deleted %d stats entries.", total_entries_deleted)
         last_checkpoint = rdfvalue.RDFDatetime.Now()
       self.HeartBeat()  # Terminate cron-run if lifetime has been exceeded.
+
+
+class APIAuditDailyCountsCronJob(cronjobs.SystemCronJobBase):
+  """Rolls up API audit entries of complete days into daily counts.
+
+  The first day that is not rolled up yet is kept in the cron job state, so
+  every run only reads audit entries written since the previous one. Entries
+  are read one day at a time. Reports read the daily counts instead of
+  tallying raw audit entries.
+  """
+
+  frequency = rdfvalue.Duration("1h")
+  lifetime = rdfvalue.Duration("1h")
+
+  def Run(self):
+    if not data_store.RelationalDBWriteEnabled():
+      return
+
+    one_day = rdfvalue.Duration("1d")
+    end = (rdfvalue.RDFDatetime.Now() - _AUDIT_ROLLUP_DELAY).Floor(one_day)
+
+    next_day = self.ReadCronState().get("next_day")
+    if next_day is not None:
+      next_day = rdfvalue.RDFDatetime(next_day)
+    else:
+      # The state is reset when system cron jobs are rescheduled on startup.
+      # Days that are already rolled up don't have to be read again.
+      rolled_up_days = data_store.REL_DB.ReadAPIAuditDailyCounts()
+      if rolled_up_days:
+        next_day = max(rolled_up_days) + one_day
+      else:
+        next_day = end - _AUDIT_ROLLUP_BACKFILL
+
+    if next_day >= end:
+      return
+
+    day = next_day
+    while day < end:
+      counts = collections.Counter()
+      for entry in data_store.REL_DB.ReadAPIAuditEntries(
+          min_timestamp=day,
+          max_timestamp=rdfvalue.RDFDatetime.FromMicrosecondsSinceEpoch(
+              (day + one_day).AsMicrosecondsSinceEpoch() - 1)):
+        counts[(entry.username, entry.router_method_name or "")] += 1
+
+      data_store.REL_DB.WriteAPIAuditDailyCounts(day, dict(counts))
+      day = day + one_day
+      self.WriteCronState(
+          rdf_protodict.AttributedDict(
+              {"next_day": day.AsMicrosecondsSinceEpoch()}))
+      self.HeartBeat()
+
+    self.Log("Rolled up audit entries of %d days.",
+             (end - next_day).seconds // one_day.seconds)
+
+
+class ScheduleHuntsOnFleetCronJob(cronjobs.SystemCronJobBase):
+  """Schedules started hunts on all the matching clients of the fleet.
+
+  Only runs if Hunt.schedule_on_fleet_at_start is set. Every started standard
+  hunt is scheduled once (see hunt.ScheduleHuntOnFleet), so that matching
+  clients don't have to wait for their foreman check. Ids of the hunts that
+  are done are kept in the cron job state. The scan of a hunt is checkpointed
+  after every batch of clients, so that a run that is interrupted (e.g. by
+  exceeding its lifetime) is resumed by the next one. Rescanning a hunt (e.g.
+  after the state was reset) only schedules clients that don't have its flow
+  yet.
+  """
+
+  frequency = rdfvalue.Duration("5m")
+  lifetime = rdfvalue.Duration("1h")
+
+  def _WriteState(self, scheduled_hunt_ids, hunt_id=None, last_client_id=None):
+    state = rdf_protodict.AttributedDict(
+        {"scheduled_hunt_ids": json.dumps(sorted(scheduled_hunt_ids))})
+    if hunt_id is not None:
+      state["hunt_id"] = hunt_id
+      state["last_client_id"] = last_client_id
+    self.WriteCronState(state)
+
+  def _Checkpoint(self, scheduled_hunt_ids, hunt_id, last_client_id):
+    self._WriteState(
+        scheduled_hunt_ids, hunt_id=hunt_id, last_client_id=last_client_id)
+    self.HeartBeat()
+
+  def Run(self):
+    if (not config.CONFIG["Hunt.schedule_on_fleet_at_start"] or
+        not data_store.RelationalDBFlowsEnabled()):
+      return
+
+    state = self.ReadCronState()
+    scheduled_hunt_ids = set(json.loads(state.get("scheduled_hunt_ids", "[]")))
+    interrupted_hunt_id = state.get("hunt_id")
+
+    hunt_ids = sorted(
+        h.hunt_id for h in data_store.REL_DB.ListHuntObjects(0, sys.maxsize)
+        if h.hunt_state == rdf_hunt_objects.Hunt.HuntState.STARTED and
+        h.hunt_type == rdf_hunt_objects.HuntArguments.HuntType.STANDARD)
+    # Hunts that are not running anymore don't need to be remembered.
+    scheduled_hunt_ids &= set(hunt_ids)
+
+    for hunt_id in hunt_ids:
+      if hunt_id in scheduled_hunt_ids:
+        continue
+
+      after_client_id = None
+      if hunt_id == interrupted_hunt_id:
+        after_client_id = state.get("last_client_id")
+        self.Log("Resuming scheduling of hunt %s after client %s.", hunt_id,
+                 after_client_id)
+
+      num_scheduled = hunt.ScheduleHuntOnFleet(
+          hunt_id,
+          after_client_id=after_client_id,
+          progress_callback=functools.partial(self._Checkpoint,
+                                              scheduled_hunt_ids, hunt_id))
+      scheduled_hunt_ids.add(hunt_id)
+      self._WriteState(scheduled_hunt_ids)
+      self.Log("Scheduled hunt %s on %d clients.", hunt_id, num_scheduled)
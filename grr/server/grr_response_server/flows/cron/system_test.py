@@ -27,6 +27,7 @@ from grr_response_server import stats_store
 from grr_response_server.aff4_objects import stats as aff4_stats
 from grr_response_server.flows.cron import system
 from grr_response_server.rdfvalues import cronjobs as rdf_cronjobs
+from grr_response_server.rdfvalues import objects as rdf_objects
 from grr.test_lib import db_test_lib
 from grr.test_lib import flow_test_lib
 from grr.test_lib import test_lib
@@ -259,10 +260,15 @@ class SystemCronFlowTest(SystemCronTestMixin, flow_test_lib.FlowTestsBaseclass):
 class SystemCronJobTest(SystemCronTestMixin, test_lib.GRRBaseTest):
   """Test system cron jobs."""
 
+  def _ScheduleCronJob(self, cron_job_cls):
+    cron_name = compatibility.GetName(cron_job_cls)
+    cronjobs.ScheduleSystemCronJobs(names=[cron_name])
+    return data_store.REL_DB.ReadCronJobs([cron_name])[0]
+
   def testGRRVersionBreakDown(self):
     """Check that all client stats cron jobs are run."""
-    cron_run = rdf_cronjobs.CronJobRun()
-    job_data = rdf_cronjobs.CronJob()
+    cron_run = rdf_cronjobs.CronJobRun(started_at=rdfvalue.RDFDatetime.Now())
+    job_data = self._ScheduleCronJob(system.GRRVersionBreakDownCronJob)
     cron = system.GRRVersionBreakDownCronJob(cron_run, job_data)
     cron.Run()
 
@@ -271,20 +277,76 @@ class SystemCronJobTest(SystemCronTestMixin, test_lib.GRRBaseTest):
 
   def testOSBreakdown(self):
     """Check that all client stats cron jobs are run."""
-    run = rdf_cronjobs.CronJobRun()
-    job = rdf_cronjobs.CronJob()
+    run = rdf_cronjobs.CronJobRun(started_at=rdfvalue.RDFDatetime.Now())
+    job = self._ScheduleCronJob(system.OSBreakDownCronJob)
     system.OSBreakDownCronJob(run, job).Run()
 
     self._CheckOSBreakdown()
 
   def testLastAccessStats(self):
     """Check that all client stats cron jobs are run."""
-    run = rdf_cronjobs.CronJobRun()
-    job = rdf_cronjobs.CronJob()
+    run = rdf_cronjobs.CronJobRun(started_at=rdfvalue.RDFDatetime.Now())
+    job = self._ScheduleCronJob(system.LastAccessStatsCronJob)
     system.LastAccessStatsCronJob(run, job).Run()
 
     self._CheckLastAccessStats()
 
+  def testFleetStats(self):
+    run = rdf_cronjobs.CronJobRun(started_at=rdfvalue.RDFDatetime.Now())
+    job = self._ScheduleCronJob(system.FleetStatsCronJob)
+    cron = system.FleetStatsCronJob(run, job)
+    cron.Run()
+
+    self._CheckGRRVersionBreakDown()
+    self._CheckOSBreakdown()
+    self._CheckLastAccessStats()
+    self.assertEqual(cron.run_state.log_message, "Processed 22 clients.")
+
+  def testFleetStatsResumesInterruptedRun(self):
+    cron_name = compatibility.GetName(system.FleetStatsCronJob)
+    self._ScheduleCronJob(system.FleetStatsCronJob)
+
+    heartbeats = [0]
+
+    def InterruptingHeartBeat(job):
+      del job  # Unused.
+      heartbeats[0] += 1
+      if heartbeats[0] == 2:
+        raise cronjobs.LifetimeExceededError()
+
+    with mock.patch.object(system, "CLIENT_READ_BATCH_SIZE", 10):
+      with mock.patch.object(system.FleetStatsCronJob, "HeartBeat",
+                             InterruptingHeartBeat):
+        job = data_store.REL_DB.ReadCronJobs([cron_name])[0]
+        run = rdf_cronjobs.CronJobRun()
+        with self.assertRaises(cronjobs.LifetimeExceededError):
+          system.FleetStatsCronJob(run, job).Run()
+
+      job = data_store.REL_DB.ReadCronJobs([cron_name])[0]
+      self.assertEqual(job.state["processed_count"], 20)
+
+      with mock.patch.object(data_store.REL_DB, "MultiReadClientFullInfo",
+                             wraps=data_store.REL_DB.MultiReadClientFullInfo):
+        run = rdf_cronjobs.CronJobRun(started_at=rdfvalue.RDFDatetime.Now())
+        cron = system.FleetStatsCronJob(run, job)
+        cron.Run()
+
+        read_client_ids = []
+        for call in data_store.REL_DB.MultiReadClientFullInfo.call_args_list:
+          read_client_ids.extend(call[0][0])
+        self.assertEqual(read_client_ids,
+                         [u"C.1%015x" % i for i in range(20, 22)])
+
+    self.assertEqual(cron.run_state.log_message,
+                     "Processed 22 clients.\n"
+                     "Resuming after 20 processed clients.")
+    self._CheckGRRVersionBreakDown()
+    self._CheckOSBreakdown()
+    self._CheckLastAccessStats()
+
+    job = data_store.REL_DB.ReadCronJobs([cron_name])[0]
+    self.assertNotIn("scan_time", job.state)
+
   def testPurgeServerStats(self):
     if not data_store.RelationalDBReadEnabled():
       self.skipTest("Test is only for the relational DB. Skipping...")
@@ -350,6 +412,84 @@ class SystemCronJobTest(SystemCronTestMixin, test_lib.GRRBaseTest):
         self.assertEqual("Deleted 2 stats entries.\nDeleted 1 stats entries.",
                          cron.run_state.log_message)
 
+  def _RunAPIAuditDailyCounts(self):
+    cron_name = compatibility.GetName(system.APIAuditDailyCountsCronJob)
+    job = data_store.REL_DB.ReadCronJobs([cron_name])[0]
+    run = rdf_cronjobs.CronJobRun(started_at=rdfvalue.RDFDatetime.Now())
+    cron = system.APIAuditDailyCountsCronJob(run, job)
+    cron.Run()
+    return cron
+
+  def _WriteAPIAuditEntry(self, timestamp, username, router_method_name):
+    with test_lib.FakeTime(rdfvalue.RDFDatetime.FromHumanReadable(timestamp)):
+      data_store.REL_DB.WriteAPIAuditEntry(
+          rdf_objects.APIAuditEntry(
+              username=username, router_method_name=router_method_name))
+
+  def testAPIAuditDailyCounts(self):
+    if not data_store.RelationalDBWriteEnabled():
+      self.skipTest("Test is only for the relational DB. Skipping...")
+
+    self._WriteAPIAuditEntry("2018-01-01 10:00", "foo", "GetClient")
+    self._WriteAPIAuditEntry("2018-01-01 23:30", "foo", "GetClient")
+    self._WriteAPIAuditEntry("2018-01-01 23:45", "bar", "ListFlows")
+    self._WriteAPIAuditEntry("2018-01-03 12:00", "foo", "ListFlows")
+    self._WriteAPIAuditEntry("2018-01-04 00:30", "bar", "GetClient")
+
+    def Day(day):
+      return rdfvalue.RDFDatetime.FromHumanReadable(day)
+
+    cron_name = compatibility.GetName(system.APIAuditDailyCountsCronJob)
+    cronjobs.ScheduleSystemCronJobs(names=[cron_name])
+
+    # Entries of 2018-01-04 may still be in flight.
+    with test_lib.FakeTime(Day("2018-01-04 00:45")):
+      cron = self._RunAPIAuditDailyCounts()
+
+    # The first run rolls up the 30 days before 2018-01-03.
+    self.assertEqual(cron.run_state.log_message,
+                     "Rolled up audit entries of 30 days.")
+    daily_counts = data_store.REL_DB.ReadAPIAuditDailyCounts()
+    self.assertLen(daily_counts, 30)
+    self.assertEqual(min(daily_counts), Day("2017-12-04"))
+    self.assertEqual(daily_counts[Day("2017-12-04")], {})
+    self.assertEqual(daily_counts[Day("2018-01-01")], {
+        ("foo", "GetClient"): 2,
+        ("bar", "ListFlows"): 1
+    })
+    self.assertEqual(daily_counts[Day("2018-01-02")], {})
+
+    with mock.patch.object(
+        data_store.REL_DB,
+        "ReadAPIAuditEntries",
+        wraps=data_store.REL_DB.ReadAPIAuditEntries) as read_mock:
+      with test_lib.FakeTime(Day("2018-01-05 01:00")):
+        self._RunAPIAuditDailyCounts()
+      # Entries are read one day at a time.
+      self.assertEqual(
+          [call[1]["min_timestamp"] for call in read_mock.call_args_list],
+          [Day("2018-01-03"), Day("2018-01-04")])
+      self.assertEqual(
+          read_mock.call_args[1]["max_timestamp"].AsMicrosecondsSinceEpoch(),
+          Day("2018-01-05").AsMicrosecondsSinceEpoch() - 1)
+
+    daily_counts = data_store.REL_DB.ReadAPIAuditDailyCounts()
+    self.assertLen(daily_counts, 32)
+    self.assertEqual(max(daily_counts), Day("2018-01-04"))
+    self.assertEqual(daily_counts[Day("2018-01-03")], {("foo", "ListFlows"): 1})
+    self.assertEqual(daily_counts[Day("2018-01-04")], {("bar", "GetClient"): 1})
+
+    # Rescheduling resets the state, but rolled up days are still skipped.
+    cronjobs.ScheduleSystemCronJobs(names=[cron_name])
+    with mock.patch.object(
+        data_store.REL_DB,
+        "ReadAPIAuditEntries",
+        wraps=data_store.REL_DB.ReadAPIAuditEntries) as read_mock:
+      with test_lib.FakeTime(Day("2018-01-06 01:00")):
+        self._RunAPIAuditDailyCounts()
+      self.assertEqual(read_mock.call_args[1]["min_timestamp"],
+                       Day("2018-01-05"))
+
   def _RunPurgeClientStats(self):
     run = rdf_cronjobs.CronJobRun()
     job = rdf_cronjobs.CronJob()
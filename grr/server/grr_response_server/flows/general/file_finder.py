@@ -4,6 +4,7 @@ from __future__ import absolute_import
 from __future__ import division
 from __future__ import unicode_literals
 
+import binascii
 import stat
 
 from future.builtins import str
@@ -12,6 +13,7 @@ from future.utils import itervalues
 
 from grr_response_core.lib import artifact_utils
 from grr_response_core.lib import rdfvalue
+from grr_response_core.lib.rdfvalues import client as rdf_client
 from grr_response_core.lib.rdfvalues import client_fs as rdf_client_fs
 from grr_response_core.lib.rdfvalues import file_finder as rdf_file_finder
 from grr_response_core.lib.rdfvalues import paths as rdf_paths
@@ -387,6 +389,105 @@ class ClientFileFinderMixin(object):
       raise flow.FlowError(responses.status)
 
     self.state.files_found = len(responses)
+
+    if self._UploadsOnlyMissingChunks():
+      transferred_file_responses = []
+      other_responses = []
+      for response in responses:
+        if response.HasField("transferred_file"):
+          transferred_file_responses.append(response)
+        else:
+          other_responses.append(response)
+
+      self._StoreResponses(other_responses)
+      self._RequestMissingChunks(transferred_file_responses)
+    else:
+      self._StoreResponses(responses)
+
+  def _UploadsOnlyMissingChunks(self):
+    # Checking HasField first to not create the nested fields on access.
+    if not self.args.HasField("action"):
+      return False
+
+    action = self.args.action
+    return (action.action_type ==
+            rdf_file_finder.FileFinderAction.Action.DOWNLOAD and
+            action.download.upload_only_missing_chunks)
+
+  def _RequestMissingChunks(self, responses):
+    """Requests chunks of transferred files that the blob store doesn't have.
+
+    The client only sent digests of chunks of the files it was about to
+    upload. Every distinct missing chunk is requested once, all of them with a
+    single TransferBuffers client action. Files are stored when the action
+    completes.
+
+    Args:
+      responses: FileFinderResult objects with transferred_file set.
+    """
+    blob_ids = set()
+    for response in responses:
+      for chunk in response.transferred_file.chunks:
+        blob_ids.add(rdf_objects.BlobID.FromBytes(chunk.digest))
+
+    existing_blobs = data_store.BLOBS.CheckBlobsExist(blob_ids)
+
+    requested_digests = set()
+    buffer_references = rdf_client.BufferReferences()
+    for response in responses:
+      for chunk in response.transferred_file.chunks:
+        if existing_blobs[rdf_objects.BlobID.FromBytes(chunk.digest)]:
+          continue
+        if chunk.digest in requested_digests:
+          continue
+
+        requested_digests.add(chunk.digest)
+        buffer_references.Append(
+            rdf_client.BufferReference(
+                pathspec=response.stat_entry.pathspec,
+                offset=chunk.offset,
+                length=chunk.length))
+
+    if not requested_digests:
+      self._StoreResponses(responses)
+      return
+
+    self.state.pending_responses = responses
+    self.CallClient(
+        server_stubs.TransferBuffers,
+        buffer_references,
+        next_state="ReceiveMissingChunks",
+        request_data=dict(digests=list(requested_digests)))
+
+  def ReceiveMissingChunks(self, responses):
+    """Stores files waiting for chunks once they are received."""
+    if not responses.success:
+      self.Log("Failed to transfer missing chunks: %s", responses.status)
+
+    # Buffers that couldn't be read are not reported and buffers that have
+    # changed since they were hashed are reported with a different digest.
+    received_digests = set(response.data for response in responses)
+    failed_digests = set(responses.request_data["digests"]) - received_digests
+    for digest in failed_digests:
+      self.Log("Failed to transfer a chunk with digest %s.",
+               binascii.hexlify(digest))
+
+    stored_responses = []
+    for pending_response in self.state.pending_responses:
+      digests = set(c.digest for c in pending_response.transferred_file.chunks)
+      if digests & failed_digests:
+        stored_responses.append(
+            rdf_file_finder.FileFinderResult(
+                stat_entry=pending_response.stat_entry,
+                matches=pending_response.matches))
+      else:
+        stored_responses.append(pending_response)
+
+    self.state.pending_responses = []
+    self._StoreResponses(stored_responses)
+
+  def _StoreResponses(self, responses):
+    """Stores given FileFinderResult objects and sends them as results."""
     files_to_publish = []
     with data_store.DB.GetMutationPool() as pool:
       transferred_file_responses = []
@@ -12,8 +12,11 @@ import io
 import os
 
 from future.utils import itervalues
+import mock
 
 from grr_response_client import vfs
+from grr_response_client.client_actions import file_finder as client_file_finder
+from grr_response_client.client_actions import standard
 from grr_response_core.lib import flags
 from grr_response_core.lib import rdfvalue
 from grr_response_core.lib import utils
@@ -1016,6 +1019,87 @@ class TestClientFileFinderFlow(flow_test_lib.FlowTestsBaseclass):
     args = flow_obj.args
     self.assertCountEqual(args.paths, paths)
 
+  def _RunCFFUploadingOnlyMissingChunks(self, paths):
+    action = rdf_file_finder.FileFinderAction.Download(chunk_size=4)
+    action.download.upload_only_missing_chunks = True
+
+    flow_id = flow_test_lib.TestFlowHelper(
+        file_finder.ClientFileFinder.__name__,
+        action_mocks.ActionMock(client_file_finder.FileFinderOS,
+                                standard.TransferBuffers),
+        client_id=self.client_id,
+        paths=paths,
+        pathtype=rdf_paths.PathSpec.PathType.OS,
+        action=action,
+        token=self.token)
+
+    return flow_test_lib.GetFlowResults(self.client_id, flow_id)
+
+  def testUploadsOnlyMissingChunks(self):
+    with temp.AutoTempFilePath() as temp_filepath:
+      with io.open(temp_filepath, "wb") as temp_file:
+        temp_file.write(b"foobarfoarfobaz")
+
+      existing_blob_id = data_store.BLOBS.WriteBlobWithUnknownHash(b"foob")
+
+      with mock.patch.object(
+          standard.TransferBuffers,
+          "Run",
+          autospec=True,
+          side_effect=standard.TransferBuffers.Run) as run_mock:
+        results = self._RunCFFUploadingOnlyMissingChunks([temp_filepath])
+
+    # All the missing chunks are requested with a single client action.
+    # "foob" already exists and "arfo" is present twice in the file.
+    self.assertEqual(run_mock.call_count, 1)
+    buffer_references = run_mock.call_args[0][1]
+    self.assertEqual([(b.offset, b.length) for b in buffer_references],
+                     [(4, 4), (12, 3)])
+
+    self.assertLen(results, 1)
+    chunks = results[0].transferred_file.chunks
+    self.assertLen(chunks, 4)
+    self.assertEqual(
+        rdf_objects.BlobID.FromBytes(chunks[0].digest), existing_blob_id)
+
+    blob_ids = [rdf_objects.BlobID.FromBytes(c.digest) for c in chunks]
+    blobs = data_store.BLOBS.ReadBlobs(blob_ids)
+    self.assertEqual([blobs[blob_id] for blob_id in blob_ids],
+                     [b"foob", b"arfo", b"arfo", b"baz"])
+
+  def testStoresOnlyStatEntryWhenChunksCanNotBeTransferred(self):
+    with temp.AutoTempFilePath() as temp_filepath:
+      with io.open(temp_filepath, "wb") as temp_file:
+        temp_file.write(b"foobar")
+
+      # The file is gone by the time the missing chunks are requested.
+      with mock.patch.object(
+          standard.TransferBuffers, "Run", autospec=True, return_value=None):
+        results = self._RunCFFUploadingOnlyMissingChunks([temp_filepath])
+
+    self.assertLen(results, 1)
+    self.assertFalse(results[0].HasField("transferred_file"))
+    self.assertEqual(results[0].stat_entry.pathspec.path, temp_filepath)
+
+  def testDoesNotRequestChunksWhenAllAreStored(self):
+    data_store.BLOBS.WriteBlobsWithUnknownHashes([b"foob", b"ar"])
+
+    with temp.AutoTempFilePath() as temp_filepath:
+      with io.open(temp_filepath, "wb") as temp_file:
+        temp_file.write(b"foobar")
+
+      with mock.patch.object(
+          standard.TransferBuffers,
+          "Run",
+          autospec=True,
+          side_effect=standard.TransferBuffers.Run) as run_mock:
+        results = self._RunCFFUploadingOnlyMissingChunks([temp_filepath])
+
+    self.assertEqual(run_mock.call_count, 0)
+
+    self.assertLen(results, 1)
+    self.assertLen(results[0].transferred_file.chunks, 2)
+
   # TODO(hanuszczak): Similar function can be found in other modules. It should
   # be implemented once in the test library.
   def _Touch(self, filepath):
@@ -5,9 +5,14 @@ from __future__ import division
 from __future__ import unicode_literals
 
 import logging
+import threading
+import time
 
+from grr_response_core import config
 from grr_response_core.lib import rdfvalue
 from grr_response_core.lib import registry
+from grr_response_core.lib import utils
+from grr_response_core.stats import stats_collector_instance
 from grr_response_server import aff4
 from grr_response_server import data_store
 from grr_response_server import db
@@ -23,6 +28,78 @@ class UnknownHuntTypeError(Error):
   pass
 
 
+class _CompiledRules(object):
+  """A snapshot of the foreman rules compiled for evaluation."""
+
+  def __init__(self, rules):
+    self.rules = []
+    for rule in rules:
+      try:
+        self.rules.append((rule, rule.Compile()))
+      except ValueError as e:
+        logging.error("Foreman: ignoring invalid rule for hunt %s: %s",
+                      rule.hunt_id, e)
+
+    self.latest_creation_time = None
+    if rules:
+      self.latest_creation_time = max(rule.creation_time for rule in rules)
+
+
+class _ForemanRulesCache(object):
+  """An in-process cache of compiled foreman rules.
+
+  Rules are only read again when their version stamp in the database changes,
+  and the stamp itself is checked at most once every Foreman.rules_cache_ttl.
+
+  The cache also remembers the last foreman run time of the clients it has
+  seen. Clients that have already been checked against all the rules are
+  skipped without any database access.
+  """
+
+  _LAST_RUN_TIMES_CACHE_SIZE = 100000
+
+  def __init__(self):
+    self._lock = threading.Lock()
+    self._version = None
+    self._rules = _CompiledRules([])
+    self._last_check = None
+    self._last_run_times = utils.FastStore(
+        max_size=self._LAST_RUN_TIMES_CACHE_SIZE)
+
+  def GetRules(self):
+    """Returns current _CompiledRules, rereading them if they changed."""
+    ttl = config.CONFIG["Foreman.rules_cache_ttl"].seconds
+    with self._lock:
+      now = time.time()
+      if (self._last_check is not None and ttl and
+          self._last_check <= now < self._last_check + ttl):
+        return self._rules
+
+      self._last_check = now
+      version = data_store.REL_DB.ReadForemanRulesVersion()
+      if version != self._version:
+        self._rules = _CompiledRules(data_store.REL_DB.ReadAllForemanRules())
+        self._version = version
+        self._last_run_times.Flush()
+        stats_collector_instance.Get().IncrementCounter(
+            "foreman_rules_cache_refreshes")
+
+      return self._rules
+
+  def GetLastRunTime(self, client_id):
+    """Returns the cached last foreman run time of a client or None."""
+    try:
+      return self._last_run_times.Get(client_id)
+    except KeyError:
+      return None
+
+  def SetLastRunTime(self, client_id, last_run_time):
+    self._last_run_times.Put(client_id, last_run_time)
+
+
+_RULES_CACHE = _ForemanRulesCache()
+
+
 def GetForeman(token=None):
   if data_store.RelationalDBReadEnabled(category="foreman"):
     return Foreman()
@@ -103,6 +180,7 @@ class Foreman(object):
 
   def _SetLastForemanRunTime(self, client_id, latest_rule):
     data_store.REL_DB.WriteClientMetadata(client_id, last_foreman=latest_rule)
+    _RULES_CACHE.SetLastRunTime(client_id, latest_rule)
 
   def AssignTasksToClient(self, client_id):
     """Examines our rules and starts up flows based on the client.
@@ -113,15 +191,23 @@ class Foreman(object):
     Returns:
       Number of assigned tasks.
     """
-    rules = data_store.REL_DB.ReadAllForemanRules()
-    if not rules:
+    compiled_rules = _RULES_CACHE.GetRules()
+    if not compiled_rules.rules:
       return 0
 
-    last_foreman_run = self._GetLastForemanRunTime(client_id)
+    latest_rule_creation_time = compiled_rules.latest_creation_time
 
-    latest_rule_creation_time = max(rule.creation_time for rule in rules)
+    cached_last_foreman_run = _RULES_CACHE.GetLastRunTime(client_id)
+    if (cached_last_foreman_run is not None and
+        latest_rule_creation_time <= cached_last_foreman_run):
+      stats_collector_instance.Get().IncrementCounter(
+          "foreman_clients_skipped")
+      return 0
+
+    last_foreman_run = self._GetLastForemanRunTime(client_id)
 
     if latest_rule_creation_time <= last_foreman_run:
+      _RULES_CACHE.SetLastRunTime(client_id, last_foreman_run)
       return 0
 
     # Update the latest checked rule on the client.
@@ -132,14 +218,14 @@ class Foreman(object):
 
     now = rdfvalue.RDFDatetime.Now()
 
-    for rule in rules:
+    for rule, evaluate in compiled_rules.rules:
       if rule.expiration_time < now:
         expired_rules = True
         continue
       if rule.creation_time <= last_foreman_run:
         continue
 
-      relevant_rules.append(rule)
+      relevant_rules.append((rule, evaluate))
 
     actions_count = 0
     if relevant_rules:
@@ -147,8 +233,8 @@ class Foreman(object):
       if client_data is None:
         return
 
-      for rule in relevant_rules:
-        if rule.Evaluate(client_data):
+      for rule, evaluate in relevant_rules:
+        if evaluate(client_data):
           actions_count += self._RunAction(rule, client_id)
 
     if expired_rules:
@@ -163,10 +249,6 @@ class ForemanMessageHandler(message_handlers.MessageHandler):
   handler_name = "ForemanHandler"
 
   def ProcessMessages(self, msgs):
-    # TODO(amoser): The foreman reads the rules from the database for each
-    # client. In the old implementation we used to have a cache. If this is a
-    # performance hit, lets consider putting the cache back.
-
     foreman_obj = Foreman()
     for msg in msgs:
       foreman_obj.AssignTasksToClient(msg.client_id)
@@ -5,6 +5,7 @@ from __future__ import division
 from __future__ import unicode_literals
 
 import itertools
+import operator
 
 from grr_response_core import config
 from grr_response_core.lib import rdfvalue
@@ -12,6 +13,7 @@ from grr_response_core.lib import utils
 from grr_response_core.lib.rdfvalues import protodict as rdf_protodict
 from grr_response_core.lib.rdfvalues import standard as rdf_standard
 from grr_response_core.lib.rdfvalues import structs as rdf_structs
+from grr_response_core.lib.util import bitmap
 from grr_response_proto import jobs_pb2
 
 
@@ -39,6 +41,30 @@ class ForemanClientRuleBase(rdf_structs.RDFProtoStruct):
   def Validate(self):
     raise NotImplementedError
 
+  def Compile(self):
+    """Compiles the rule for repeated evaluation.
+
+    Returns:
+      A function taking a `db.ClientFullInfo` instance and returning a bool
+      value of the evaluation. The function is equivalent to Evaluate() with the
+      relational db used for reading.
+    """
+    raise NotImplementedError
+
+  def SelectClients(self, index):
+    """Selects clients matching the rule using a client bitmap index.
+
+    Args:
+      index: A `client_bitmap_index.ClientBitmapIndex` instance.
+
+    Returns:
+      A bitmap of ordinals of clients that may match the rule or None if the
+      rule can't be evaluated using the index. Selected clients still have to
+      be checked with Compile(), as the index may be stale.
+    """
+    del index  # Unused.
+    return None
+
 
 class ForemanOsClientRule(ForemanClientRuleBase):
   """This rule will fire if the client OS is marked as true in the proto."""
@@ -62,6 +88,28 @@ class ForemanOsClientRule(ForemanClientRuleBase):
   def Validate(self):
     pass
 
+  def _Prefixes(self):
+    prefixes = []
+    if self.os_windows:
+      prefixes.append("Windows")
+    if self.os_linux:
+      prefixes.append("Linux")
+    if self.os_darwin:
+      prefixes.append("Darwin")
+    return tuple(prefixes)
+
+  def Compile(self):
+    prefixes = self._Prefixes()
+
+    def Evaluate(client_info):
+      value = client_info.last_snapshot.knowledge_base.os
+      return bool(value) and utils.SmartStr(value).startswith(prefixes)
+
+    return Evaluate
+
+  def SelectClients(self, index):
+    return index.ClientsWithOsPrefixes(self._Prefixes())
+
 
 class ForemanLabelClientRule(ForemanClientRuleBase):
   """This rule will fire if the client has the selected label."""
@@ -89,6 +137,51 @@ class ForemanLabelClientRule(ForemanClientRuleBase):
   def Validate(self):
     pass
 
+  def Compile(self):
+    label_names = frozenset(self.label_names)
+    match_mode = self.match_mode
+    if match_mode == ForemanLabelClientRule.MatchMode.MATCH_ALL:
+      matches = label_names.issubset
+    elif match_mode == ForemanLabelClientRule.MatchMode.MATCH_ANY:
+      matches = lambda names: not label_names.isdisjoint(names)
+    elif match_mode == ForemanLabelClientRule.MatchMode.DOES_NOT_MATCH_ALL:
+      matches = lambda names: not label_names.issubset(names)
+    elif match_mode == ForemanLabelClientRule.MatchMode.DOES_NOT_MATCH_ANY:
+      matches = label_names.isdisjoint
+    else:
+      raise ValueError("Unexpected match mode value: %s" % match_mode)
+
+    def Evaluate(client_info):
+      return matches(set(label.name for label in client_info.labels))
+
+    return Evaluate
+
+  def SelectClients(self, index):
+    match_mode = self.match_mode
+    with_labels = [index.ClientsWithLabel(name) for name in self.label_names]
+    if match_mode in [
+        ForemanLabelClientRule.MatchMode.MATCH_ALL,
+        ForemanLabelClientRule.MatchMode.DOES_NOT_MATCH_ALL
+    ]:
+      if with_labels:
+        matching = bitmap.IntersectAll(with_labels)
+      else:
+        matching = index.AllClients()
+    elif match_mode in [
+        ForemanLabelClientRule.MatchMode.MATCH_ANY,
+        ForemanLabelClientRule.MatchMode.DOES_NOT_MATCH_ANY
+    ]:
+      matching = bitmap.UnionAll(with_labels)
+    else:
+      raise ValueError("Unexpected match mode value: %s" % match_mode)
+
+    if match_mode in [
+        ForemanLabelClientRule.MatchMode.DOES_NOT_MATCH_ALL,
+        ForemanLabelClientRule.MatchMode.DOES_NOT_MATCH_ANY
+    ]:
+      return index.AllClients() - matching
+    return matching
+
 
 class ForemanRegexClientRule(ForemanClientRuleBase):
   """The Foreman schedules flows based on these rules firing."""
@@ -195,6 +288,17 @@ class ForemanRegexClientRule(ForemanClientRuleBase):
     if self.field == ForemanRegexClientRule.ForemanStringField.UNSET:
       raise ValueError("ForemanRegexClientRule rule invalid - field not set.")
 
+  def Compile(self):
+    # Accessing attribute_regex deserializes the value and compiles the regex,
+    # so it's done only once here.
+    regex = self.attribute_regex
+    field = self.field
+
+    def Evaluate(client_info):
+      return bool(regex.Search(self._ResolveField(field, client_info)))
+
+    return Evaluate
+
 
 class ForemanIntegerClientRule(ForemanClientRuleBase):
   """This rule will fire if the expression operator(attribute, value) is true.
@@ -269,6 +373,39 @@ class ForemanIntegerClientRule(ForemanClientRuleBase):
     if self.field == ForemanIntegerClientRule.ForemanIntegerField.UNSET:
       raise ValueError("ForemanIntegerClientRule rule invalid - field not set.")
 
+  def _Comparison(self):
+    op = self.operator
+    if op == ForemanIntegerClientRule.Operator.LESS_THAN:
+      return operator.lt
+    elif op == ForemanIntegerClientRule.Operator.GREATER_THAN:
+      return operator.gt
+    elif op == ForemanIntegerClientRule.Operator.EQUAL:
+      return operator.eq
+    else:
+      # Unknown operator.
+      raise ValueError("Unknown operator: %d" % op)
+
+  def Compile(self):
+    compare = self._Comparison()
+    field = self.field
+    expected = self.value
+
+    def Evaluate(client_info):
+      value = self._ResolveField(field, client_info)
+      return value is not None and compare(value, expected)
+
+    return Evaluate
+
+  def SelectClients(self, index):
+    # Only client versions are indexed.
+    fif = ForemanIntegerClientRule.ForemanIntegerField
+    if self.field != fif.CLIENT_VERSION:
+      return None
+
+    compare = self._Comparison()
+    expected = self.value
+    return index.ClientsWithVersion(lambda version: compare(version, expected))
+
 
 class ForemanRuleAction(rdf_structs.RDFProtoStruct):
   protobuf = jobs_pb2.ForemanRuleAction
@@ -294,6 +431,12 @@ class ForemanClientRule(ForemanClientRuleBase):
   def Validate(self):
     self.UnionCast().Validate()
 
+  def Compile(self):
+    return self.UnionCast().Compile()
+
+  def SelectClients(self, index):
+    return self.UnionCast().SelectClients(index)
+
 
 class ForemanClientRuleSet(rdf_structs.RDFProtoStruct):
   """This proto holds rules and the strategy used to evaluate them."""
@@ -329,6 +472,62 @@ class ForemanClientRuleSet(rdf_structs.RDFProtoStruct):
     for rule in self.rules:
       rule.Validate()
 
+  def Compile(self):
+    """Compiles the rule set for repeated evaluation.
+
+    Returns:
+      A function taking a `db.ClientFullInfo` instance and returning a bool
+      value of the evaluation.
+
+    Raises:
+      ValueError: The match mode is of unknown value.
+    """
+    if self.match_mode == ForemanClientRuleSet.MatchMode.MATCH_ALL:
+      quantifier = all
+    elif self.match_mode == ForemanClientRuleSet.MatchMode.MATCH_ANY:
+      quantifier = any
+    else:
+      raise ValueError("Unexpected match mode value: %s" % self.match_mode)
+
+    evaluators = [rule.Compile() for rule in self.rules]
+
+    def Evaluate(client_info):
+      return quantifier(evaluate(client_info) for evaluate in evaluators)
+
+    return Evaluate
+
+  def SelectClients(self, index):
+    """Selects clients matching the rule set using a client bitmap index.
+
+    Rules that can't be evaluated using the index are ignored when all the
+    rules have to match, so the result is a superset of the matching clients.
+
+    Args:
+      index: A `client_bitmap_index.ClientBitmapIndex` instance.
+
+    Returns:
+      A bitmap of ordinals of clients that may match the rule set or None if
+      the rule set can't be evaluated using the index.
+
+    Raises:
+      ValueError: The match mode is of unknown value.
+    """
+    selected = [rule.SelectClients(index) for rule in self.rules]
+
+    if self.match_mode == ForemanClientRuleSet.MatchMode.MATCH_ALL:
+      if not self.rules:
+        return index.AllClients()
+      selected = [clients for clients in selected if clients is not None]
+      if not selected:
+        return None
+      return bitmap.IntersectAll(selected)
+    elif self.match_mode == ForemanClientRuleSet.MatchMode.MATCH_ANY:
+      if any(clients is None for clients in selected):
+        return None
+      return bitmap.UnionAll(selected)
+    else:
+      raise ValueError("Unexpected match mode value: %s" % self.match_mode)
+
 
 class ForemanRule(rdf_structs.RDFProtoStruct):
   """A Foreman rule RDF value."""
@@ -369,6 +568,12 @@ class ForemanCondition(rdf_structs.RDFProtoStruct):
   def Evaluate(self, client_data):
     return self.client_rule_set.Evaluate(client_data)
 
+  def Compile(self):
+    return self.client_rule_set.Compile()
+
+  def SelectClients(self, index):
+    return self.client_rule_set.SelectClients(index)
+
   def GetLifetime(self):
     if self.expiration_time < self.creation_time:
       raise ValueError("Rule expires before it was created.")
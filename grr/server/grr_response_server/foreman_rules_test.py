@@ -5,11 +5,14 @@ from __future__ import division
 from __future__ import unicode_literals
 
 from builtins import range  # pylint: disable=redefined-builtin
+from future.utils import iteritems
 
 from grr_response_core.lib import flags
 from grr_response_core.lib import rdfvalue
+from grr_response_core.lib.rdfvalues import client as rdf_client
 from grr_response_core.lib.rdfvalues import test_base as rdf_test_base
 from grr_response_server import aff4
+from grr_response_server import client_bitmap_index
 from grr_response_server import data_store
 from grr_response_server import foreman_rules
 from grr.test_lib import db_test_lib
@@ -269,6 +272,20 @@ class ForemanOsClientRuleTestRelational(db_test_lib.RelationalDBEnabledMixin,
     self.assertFalse(r0.Evaluate(info))
     self.assertTrue(r1.Evaluate(info))
 
+  def testCompiledRuleMatchesLikeEvaluate(self):
+    rules = [
+        foreman_rules.ForemanOsClientRule(
+            os_windows=True, os_linux=False, os_darwin=False),
+        foreman_rules.ForemanOsClientRule(
+            os_windows=False, os_linux=True, os_darwin=True),
+    ]
+
+    for i, system in enumerate(["Windows", "Linux", "Darwin", "FreeBSD"]):
+      client = self.SetupTestClientObject(i, system=system)
+      info = data_store.REL_DB.ReadClientFullInfo(client.client_id)
+      for r in rules:
+        self.assertEqual(r.Compile()(info), r.Evaluate(info))
+
 
 class ForemanLabelClientRuleTest(rdf_test_base.RDFValueTestMixin,
                                  test_lib.GRRBaseTest):
@@ -617,6 +634,123 @@ class ForemanIntegerClientRuleTestRelational(
       r.Evaluate(info)
 
 
+class ForemanRulesSelectClientsTest(db_test_lib.RelationalDBEnabledMixin,
+                                    test_lib.GRRBaseTest):
+
+  def setUp(self):
+    super(ForemanRulesSelectClientsTest, self).setUp()
+
+    self.client_ids = []
+    clients = [
+        ("Windows", 3000, [u"foo"]),
+        ("Linux", 3100, [u"foo", u"bar"]),
+        ("Darwin", 3200, [u"bar"]),
+        ("Linux", 3300, []),
+    ]
+    for i, (system, version, labels) in enumerate(clients):
+      client_id = self.SetupTestClientObject(i, system=system).client_id
+      startup_info = rdf_client.StartupInfo()
+      startup_info.client_info.client_version = version
+      data_store.REL_DB.WriteClientStartupInfo(client_id, startup_info)
+      if labels:
+        data_store.REL_DB.AddClientLabels(client_id, u"GRR", labels)
+      self.client_ids.append(client_id)
+
+  def _SelectClients(self, rule):
+    index = client_bitmap_index.GetIndex()
+    selected = rule.SelectClients(index)
+    if selected is None:
+      return None
+    return index.ClientIds(selected)
+
+  def _MatchingClients(self, rule):
+    evaluate = rule.Compile()
+    infos = data_store.REL_DB.MultiReadClientFullInfo(self.client_ids)
+    return sorted(
+        client_id for client_id, info in iteritems(infos) if evaluate(info))
+
+  def _AssertSelectsMatchingClients(self, rule):
+    self.assertEqual(self._SelectClients(rule), self._MatchingClients(rule))
+
+  def testOsRule(self):
+    self._AssertSelectsMatchingClients(
+        foreman_rules.ForemanOsClientRule(os_linux=True, os_darwin=True))
+    self._AssertSelectsMatchingClients(
+        foreman_rules.ForemanOsClientRule(os_windows=True))
+    self._AssertSelectsMatchingClients(foreman_rules.ForemanOsClientRule())
+
+  def testLabelRule(self):
+    match_mode = foreman_rules.ForemanLabelClientRule.MatchMode
+    for mode in match_mode.enum_dict:
+      for label_names in [[], [u"foo"], [u"foo", u"bar"], [u"baz"]]:
+        self._AssertSelectsMatchingClients(
+            foreman_rules.ForemanLabelClientRule(
+                match_mode=mode, label_names=label_names))
+
+  def testClientVersionRule(self):
+    operators = foreman_rules.ForemanIntegerClientRule.Operator
+    for op in operators.enum_dict:
+      self._AssertSelectsMatchingClients(
+          foreman_rules.ForemanIntegerClientRule(
+              field="CLIENT_VERSION", operator=op, value=3100))
+
+  def testOtherIntegerRulesAreNotIndexed(self):
+    rule = foreman_rules.ForemanIntegerClientRule(
+        field="INSTALL_TIME",
+        operator=foreman_rules.ForemanIntegerClientRule.Operator.GREATER_THAN,
+        value=0)
+    self.assertIsNone(self._SelectClients(rule))
+
+  def testRegexRuleIsNotIndexed(self):
+    rule = foreman_rules.ForemanRegexClientRule(
+        field="FQDN", attribute_regex="Host")
+    self.assertIsNone(self._SelectClients(rule))
+
+  def _RuleSet(self, match_mode, rules):
+    return foreman_rules.ForemanClientRuleSet(
+        match_mode=match_mode,
+        rules=[foreman_rules.ForemanClientRule(**rule) for rule in rules])
+
+  def testRuleSetInMatchAllModeIgnoresRulesThatAreNotIndexed(self):
+    os_rule = dict(
+        rule_type="OS", os=foreman_rules.ForemanOsClientRule(os_linux=True))
+    label_rule = dict(
+        rule_type="LABEL",
+        label=foreman_rules.ForemanLabelClientRule(label_names=[u"foo"]))
+    regex_rule = dict(
+        rule_type="REGEX",
+        regex=foreman_rules.ForemanRegexClientRule(
+            field="FQDN", attribute_regex="Host-3"))
+
+    match_all = foreman_rules.ForemanClientRuleSet.MatchMode.MATCH_ALL
+    self._AssertSelectsMatchingClients(
+        self._RuleSet(match_all, [os_rule, label_rule]))
+    self.assertEqual(
+        self._SelectClients(self._RuleSet(match_all, [os_rule, regex_rule])),
+        self._MatchingClients(self._RuleSet(match_all, [os_rule])))
+    self.assertIsNone(
+        self._SelectClients(self._RuleSet(match_all, [regex_rule])))
+    self._AssertSelectsMatchingClients(self._RuleSet(match_all, []))
+
+  def testRuleSetInMatchAnyModeNeedsAllRulesIndexed(self):
+    os_rule = dict(
+        rule_type="OS", os=foreman_rules.ForemanOsClientRule(os_windows=True))
+    label_rule = dict(
+        rule_type="LABEL",
+        label=foreman_rules.ForemanLabelClientRule(label_names=[u"bar"]))
+    regex_rule = dict(
+        rule_type="REGEX",
+        regex=foreman_rules.ForemanRegexClientRule(
+            field="FQDN", attribute_regex="Host-3"))
+
+    match_any = foreman_rules.ForemanClientRuleSet.MatchMode.MATCH_ANY
+    self._AssertSelectsMatchingClients(
+        self._RuleSet(match_any, [os_rule, label_rule]))
+    self.assertIsNone(
+        self._SelectClients(self._RuleSet(match_any, [os_rule, regex_rule])))
+    self._AssertSelectsMatchingClients(self._RuleSet(match_any, []))
+
+
 def main(argv):
   # Run the full test suite
   test_lib.main(argv)
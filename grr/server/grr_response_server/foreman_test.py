@@ -4,6 +4,8 @@ from __future__ import absolute_import
 from __future__ import division
 from __future__ import unicode_literals
 
+import mock
+
 from grr_response_core.lib import flags
 from grr_response_core.lib import rdfvalue
 from grr_response_core.lib import utils
@@ -19,6 +21,7 @@ from grr_response_server.aff4_objects import aff4_grr
 from grr_response_server.hunts import implementation
 from grr_response_server.hunts import standard
 from grr.test_lib import db_test_lib
+from grr.test_lib import stats_test_lib
 from grr.test_lib import test_lib
 
 
@@ -275,6 +278,7 @@ class ForemanTests(test_lib.GRRBaseTest):
 
 
 class RelationalForemanTests(db_test_lib.RelationalDBEnabledMixin,
+                             stats_test_lib.StatsTestMixin,
                              test_lib.GRRBaseTest):
   """Tests the Foreman."""
 
@@ -485,10 +489,68 @@ class RelationalForemanTests(db_test_lib.RelationalDBEnabledMixin,
         data_store.REL_DB.WriteClientMetadata(
             client_id,
             last_foreman=rdfvalue.RDFDatetime.FromSecondsSinceEpoch(100))
+        # The foreman remembers when it last checked the client, make it
+        # forget about it as well.
+        foreman._RULES_CACHE.SetLastRunTime(
+            client_id, rdfvalue.RDFDatetime.FromSecondsSinceEpoch(100))
         foreman_obj.AssignTasksToClient(client_id)
         rules = data_store.REL_DB.ReadAllForemanRules()
         self.assertLen(rules, num_rules)
 
+  def _WriteNonMatchingRule(self, hunt_id, creation_time):
+    rule = foreman_rules.ForemanCondition(
+        creation_time=creation_time,
+        expiration_time=creation_time + rdfvalue.Duration("1h"),
+        description="Test rule",
+        hunt_id=hunt_id)
+    rule.client_rule_set = foreman_rules.ForemanClientRuleSet(rules=[
+        foreman_rules.ForemanClientRule(
+            rule_type=foreman_rules.ForemanClientRule.Type.REGEX,
+            regex=foreman_rules.ForemanRegexClientRule(
+                field="SYSTEM", attribute_regex="XXX"))
+    ])
+    data_store.REL_DB.WriteForemanRule(rule)
+
+  def testRulesAreOnlyReadWhenTheyChange(self):
+    client_id = self.SetupTestClientObject(0x21).client_id
+    self._WriteNonMatchingRule("H:111111", rdfvalue.RDFDatetime.Now())
+
+    foreman_obj = foreman.GetForeman()
+    with mock.patch.object(
+        data_store.REL_DB,
+        "ReadAllForemanRules",
+        wraps=data_store.REL_DB.ReadAllForemanRules) as read_rules_mock:
+      foreman_obj.AssignTasksToClient(client_id)
+      foreman_obj.AssignTasksToClient(client_id)
+      self.assertEqual(read_rules_mock.call_count, 1)
+
+      self._WriteNonMatchingRule("H:222222", rdfvalue.RDFDatetime.Now())
+      with self.assertStatsCounterDelta(1, "foreman_rules_cache_refreshes"):
+        foreman_obj.AssignTasksToClient(client_id)
+      self.assertEqual(read_rules_mock.call_count, 2)
+
+  def testUpToDateClientsAreSkipped(self):
+    client_id = self.SetupTestClientObject(0x21).client_id
+    self._WriteNonMatchingRule("H:111111", rdfvalue.RDFDatetime.Now())
+
+    foreman_obj = foreman.GetForeman()
+    foreman_obj.AssignTasksToClient(client_id)
+
+    with test_lib.ConfigOverrider(
+        {"Foreman.rules_cache_ttl": rdfvalue.Duration("1h")}):
+      with mock.patch.object(data_store.REL_DB,
+                             "ReadClientMetadata") as read_metadata_mock:
+        with mock.patch.object(data_store.REL_DB,
+                               "ReadClientFullInfo") as read_info_mock:
+          with mock.patch.object(data_store.REL_DB,
+                                 "ReadForemanRulesVersion") as version_mock:
+            with self.assertStatsCounterDelta(1, "foreman_clients_skipped"):
+              self.assertEqual(foreman_obj.AssignTasksToClient(client_id), 0)
+
+    read_metadata_mock.assert_not_called()
+    read_info_mock.assert_not_called()
+    version_mock.assert_not_called()
+
 
 def main(argv):
   # Run the full test suite
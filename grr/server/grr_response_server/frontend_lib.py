@@ -6,6 +6,7 @@ from __future__ import unicode_literals
 
 import logging
 import operator
+import threading
 import time
 
 
@@ -192,15 +193,212 @@ class ServerCommunicator(communicator.Communicator):
     return rdf_flows.GrrMessage.AuthorizationState.AUTHENTICATED
 
 
+class _ClientMetadataBuffer(object):
+  """A write-behind buffer for client metadata updated on every poll.
+
+  Keeps the latest ping, clock and ip of every client in memory and writes
+  them to the database in bulk, either periodically from a background thread
+  or as soon as the buffer is full.
+  """
+
+  def __init__(self, flush_interval, max_size):
+    self._flush_interval = flush_interval
+    self._max_size = max_size
+    self._lock = threading.Lock()
+    # Database writes are serialized so that older values never overwrite
+    # newer ones.
+    self._write_lock = threading.Lock()
+    self._pending = {}
+    self._pending_since = None
+    self._flush_thread = None
+    self._stop_flushing = threading.Event()
+
+  def Get(self, client_id):
+    """Returns the buffered metadata of a client or None."""
+    with self._lock:
+      return self._pending.get(client_id)
+
+  def Put(self, client_id, metadata):
+    """Buffers metadata of a client, replacing previously buffered values."""
+    with self._lock:
+      buffered = self._pending.get(client_id)
+      if (buffered is not None and not metadata.HasField("ip") and
+          buffered.HasField("ip")):
+        metadata.ip = buffered.ip
+      if not self._pending:
+        self._pending_since = time.time()
+      self._pending[client_id] = metadata
+      full = len(self._pending) >= self._max_size
+
+      if self._flush_thread is None:
+        self._stop_flushing.clear()
+        self._flush_thread = threading.Thread(
+            name="ClientMetadataFlusher", target=self._FlushInBackground)
+        self._flush_thread.daemon = True
+        self._flush_thread.start()
+
+    stats_collector_instance.Get().IncrementCounter(
+        "frontend_client_metadata_writes", fields=["buffered"])
+
+    if full:
+      self.Flush()
+
+  def WriteNow(self, client_id, metadata):
+    """Writes metadata of a client immediately, bypassing the buffer."""
+    with self._write_lock:
+      with self._lock:
+        self._pending.pop(client_id, None)
+
+      data_store.REL_DB.WriteClientMetadata(
+          client_id, **db.ClientMetadataWriteArgs(metadata))
+
+    stats_collector_instance.Get().IncrementCounter(
+        "frontend_client_metadata_writes", fields=["immediate"])
+
+  def Flush(self):
+    """Writes all buffered metadata to the database."""
+    with self._write_lock:
+      with self._lock:
+        pending, self._pending = self._pending, {}
+
+      if not pending:
+        return
+
+      try:
+        data_store.REL_DB.MultiWriteClientMetadata(pending)
+      except Exception:
+        # Keep the values for the next attempt unless newer ones arrived.
+        with self._lock:
+          for client_id, metadata in iteritems(pending):
+            self._pending.setdefault(client_id, metadata)
+        raise
+
+    stats_collector_instance.Get().RecordEvent(
+        "frontend_client_metadata_flush_size", len(pending))
+
+  def Stop(self):
+    """Stops the background thread and writes all buffered metadata."""
+    with self._lock:
+      flush_thread, self._flush_thread = self._flush_thread, None
+
+    if flush_thread is not None:
+      self._stop_flushing.set()
+      flush_thread.join()
+
+    self.Flush()
+
+  def _FlushInBackground(self):
+    while not self._stop_flushing.wait(self._flush_interval):
+      with self._lock:
+        if (not self._pending or
+            time.time() - self._pending_since < self._flush_interval):
+          continue
+
+      try:
+        self.Flush()
+      except Exception:  # pylint: disable=broad-except
+        logging.exception("Failed to write buffered client metadata.")
+
+
 class RelationalServerCommunicator(communicator.Communicator):
   """A communicator which stores certificates using the relational db."""
 
-  def __init__(self, certificate, private_key):
+  _PUB_KEY_CACHE_SIZE = 50000
+  # Number of clients whose metadata is read at once when warming up the
+  # public key cache.
+  _WARMUP_BATCH_SIZE = 1000
+
+  def __init__(self,
+               certificate,
+               private_key,
+               cipher_cache_size=None,
+               cipher_cache_ttl=None,
+               metadata_flush_interval=None):
     super(RelationalServerCommunicator, self).__init__(
         certificate=certificate, private_key=private_key)
-    self.pub_key_cache = utils.FastStore(max_size=50000)
+    self.pub_key_cache = utils.FastStore(max_size=self._PUB_KEY_CACHE_SIZE)
     self.common_name = self.certificate.GetCN()
 
+    if cipher_cache_size is None:
+      cipher_cache_size = config.CONFIG["Frontend.cipher_cache_size"]
+    if cipher_cache_ttl is None:
+      cipher_cache_ttl = config.CONFIG["Frontend.cipher_cache_ttl"]
+
+    # Outbound ciphers keyed by client id. Creating a cipher costs two RSA
+    # operations (signing and encrypting the session key), so we reuse it
+    # for a while, just like the client reuses its server cipher.
+    self.cipher_cache = None
+    if cipher_cache_size:
+      self.cipher_cache = utils.AgeBasedCache(
+          max_size=cipher_cache_size, max_age=cipher_cache_ttl.seconds)
+
+    if metadata_flush_interval is None:
+      metadata_flush_interval = config.CONFIG[
+          "Frontend.client_metadata_flush_interval"]
+
+    # Pings are only written to the database every metadata_flush_interval.
+    self.metadata_buffer = None
+    if metadata_flush_interval:
+      self.metadata_buffer = _ClientMetadataBuffer(
+          flush_interval=metadata_flush_interval.seconds,
+          max_size=config.CONFIG["Frontend.client_metadata_buffer_size"])
+
+  def _GetRemoteCipher(self, destination):
+    if self.cipher_cache is None:
+      return super(RelationalServerCommunicator,
+                   self)._GetRemoteCipher(destination)
+
+    remote_client_id = destination.Basename()
+    try:
+      cipher = self.cipher_cache.Get(remote_client_id)
+      stats_collector_instance.Get().IncrementCounter(
+          "grr_cipher_cache", fields=["hits"])
+      # Each cipher we reuse saves signing and encrypting a session key.
+      stats_collector_instance.Get().IncrementCounter(
+          "grr_rsa_operations_avoided", delta=2)
+      return cipher
+    except KeyError:
+      stats_collector_instance.Get().IncrementCounter(
+          "grr_cipher_cache", fields=["misses"])
+
+    cipher = super(RelationalServerCommunicator,
+                   self)._GetRemoteCipher(destination)
+    self.cipher_cache.Put(remote_client_id, cipher)
+    return cipher
+
+  def WarmUpPublicKeyCache(self, min_last_ping):
+    """Preloads public keys of clients that pinged recently.
+
+    Args:
+      min_last_ping: An rdfvalue.RDFDatetime. Public keys of all clients that
+        pinged after this time are loaded, up to the size of the cache.
+
+    Returns:
+      The number of public keys loaded.
+    """
+    client_ids = data_store.REL_DB.ReadAllClientIDs(min_last_ping=min_last_ping)
+    client_ids = client_ids[:self._PUB_KEY_CACHE_SIZE]
+
+    count = 0
+    for batch in collection.Batch(client_ids, self._WARMUP_BATCH_SIZE):
+      metadatas = data_store.REL_DB.MultiReadClientMetadata(batch)
+      for client_id, md in iteritems(metadatas):
+        if not md.HasField("certificate"):
+          continue
+
+        cert = md.certificate
+        if rdf_client.ClientURN(client_id) != rdfvalue.RDFURN(cert.GetCN()):
+          logging.error("Stored cert mismatch for %s", client_id)
+          continue
+
+        self.pub_key_cache.Put(client_id, cert.GetPublicKey())
+        count += 1
+
+    stats_collector_instance.Get().IncrementCounter(
+        "grr_pub_key_cache", delta=count, fields=["preloaded"])
+    logging.info("Preloaded %d client public keys.", count)
+    return count
+
   def _GetRemotePublicKey(self, common_name):
     remote_client_id = common_name.Basename()
     try:
@@ -225,9 +423,60 @@ class RelationalServerCommunicator(communicator.Communicator):
       raise communicator.UnknownClientCertError("Stored cert mismatch")
 
     pub_key = cert.GetPublicKey()
-    self.pub_key_cache.Put(common_name, pub_key)
+    self.pub_key_cache.Put(remote_client_id, pub_key)
     return pub_key
 
+  def FlushClientMetadata(self):
+    """Writes buffered client metadata to the database."""
+    if self.metadata_buffer is not None:
+      self.metadata_buffer.Flush()
+
+  def Close(self):
+    """Stops background metadata writes and flushes buffered metadata."""
+    if self.metadata_buffer is not None:
+      self.metadata_buffer.Stop()
+
+  def _ReadClientMetadata(self, client_id):
+    """Reads client metadata, taking buffered values into account."""
+    metadata = data_store.REL_DB.ReadClientMetadata(client_id)
+    if self.metadata_buffer is None:
+      return metadata
+
+    buffered = self.metadata_buffer.Get(client_id)
+    if buffered is not None:
+      # Buffered values are always newer than the stored ones.
+      metadata.ping = buffered.ping
+      metadata.clock = buffered.clock
+      if buffered.HasField("ip"):
+        metadata.ip = buffered.ip
+
+    return metadata
+
+  def _WriteClientPing(self, client_id, metadata, last_clock, last_ip):
+    """Records a client poll."""
+    last_ping = rdfvalue.RDFDatetime.Now()
+    if self.metadata_buffer is None:
+      data_store.REL_DB.WriteClientMetadata(
+          client_id,
+          last_ip=last_ip,
+          last_clock=last_clock,
+          last_ping=last_ping,
+          fleetspeak_enabled=False)
+      return
+
+    update = rdf_objects.ClientMetadata(
+        ping=last_ping, clock=last_clock, fleetspeak_enabled=False)
+    if last_ip:
+      update.ip = last_ip
+
+    # Most polls only advance the timestamps, those can wait. The first contact
+    # of a client and changes of anything else are written right away.
+    if (not metadata.ping or metadata.fleetspeak_enabled or
+        (last_ip and last_ip != metadata.ip)):
+      self.metadata_buffer.WriteNow(client_id, update)
+    else:
+      self.metadata_buffer.Put(client_id, update)
+
   def VerifyMessageSignature(self, response_comms, packed_message_list, cipher,
                              cipher_verified, api_version, remote_public_key):
     """Verifies the message list signature.
@@ -255,7 +504,7 @@ class RelationalServerCommunicator(communicator.Communicator):
 
     try:
       client_id = cipher.cipher_metadata.source.Basename()
-      metadata = data_store.REL_DB.ReadClientMetadata(client_id)
+      metadata = self._ReadClientMetadata(client_id)
       client_time = packed_message_list.timestamp or rdfvalue.RDFDatetime(0)
 
       # This used to be a strict check here so absolutely no out of
@@ -300,12 +549,8 @@ class RelationalServerCommunicator(communicator.Communicator):
       else:
         last_ip = None
 
-      data_store.REL_DB.WriteClientMetadata(
-          client_id,
-          last_ip=last_ip,
-          last_clock=client_time,
-          last_ping=rdfvalue.RDFDatetime.Now(),
-          fleetspeak_enabled=False)
+      self._WriteClientPing(
+          client_id, metadata, last_clock=client_time, last_ip=last_ip)
 
     except communicator.UnknownClientCertError:
       pass
@@ -313,6 +558,108 @@ class RelationalServerCommunicator(communicator.Communicator):
     return rdf_flows.GrrMessage.AuthorizationState.AUTHENTICATED
 
 
+class _IngestionBatch(object):
+  """Messages from one or more client polls that are written together."""
+
+  def __init__(self):
+    self.flow_responses = []
+    self.message_handler_requests = []
+    self.size = 0
+    self.written = threading.Event()
+    self.error = None
+
+
+class _IngestionBatcher(object):
+  """Groups the database writes of concurrent client polls.
+
+  Every poll hands its flow responses and message handler requests to Write()
+  which returns once they are persisted. The first poll that joins a batch
+  becomes its leader: it waits until the previous batch has been written, for
+  at most max_delay seconds or until the batch holds max_messages messages,
+  and then writes the whole batch with a single WriteFlowResponses and a
+  single WriteMessageHandlerRequests call. All other polls in the batch just
+  wait for the leader.
+
+  Since only one batch is written at a time, polls arriving while a write is
+  in progress are collected into the next batch, so under load the number of
+  database round trips no longer grows with the number of polls.
+  """
+
+  def __init__(self, max_messages, max_delay):
+    self._max_messages = max_messages
+    self._max_delay = max_delay
+    self._cond = threading.Condition()
+    self._pending = _IngestionBatch()
+    self._writing = False
+
+  def Write(self, flow_responses, message_handler_requests):
+    """Writes the given objects to the database as part of a batch.
+
+    Args:
+      flow_responses: A list of rdf_flow_objects.FlowResponse objects.
+      message_handler_requests: A list of rdf_objects.MessageHandlerRequest
+        objects.
+
+    Raises:
+      Exception: Any error raised while writing the batch is reraised in all
+        the polls the batch contains.
+    """
+    with self._cond:
+      if self._pending.size >= self._max_messages:
+        self._pending = _IngestionBatch()
+
+      batch = self._pending
+      is_leader = not batch.size
+      batch.flow_responses.extend(flow_responses)
+      batch.message_handler_requests.extend(message_handler_requests)
+      batch.size += len(flow_responses) + len(message_handler_requests)
+
+      if is_leader:
+        self._WaitForTurn(batch)
+        if self._pending is batch:
+          self._pending = _IngestionBatch()
+        self._writing = True
+      elif batch.size >= self._max_messages:
+        self._cond.notify_all()
+
+    if is_leader:
+      self._WriteBatch(batch)
+    else:
+      batch.written.wait()
+
+    if batch.error is not None:
+      raise batch.error  # pylint: disable=raising-bad-type
+
+  def _WaitForTurn(self, batch):
+    """Waits until the batch is due and no other batch is being written."""
+    deadline = time.time() + self._max_delay
+    while True:
+      remaining = deadline - time.time()
+      lingering = batch.size < self._max_messages and remaining > 0
+      if not self._writing and not lingering:
+        return
+
+      self._cond.wait(remaining if lingering else None)
+
+  def _WriteBatch(self, batch):
+    """Writes the batch and wakes up all the polls waiting for it."""
+    try:
+      if batch.flow_responses:
+        data_store.REL_DB.WriteFlowResponses(batch.flow_responses)
+      if batch.message_handler_requests:
+        data_store.REL_DB.WriteMessageHandlerRequests(
+            batch.message_handler_requests)
+      stats_collector_instance.Get().RecordEvent("frontend_ingestion_batch_size",
+                                                 batch.size)
+    except Exception as e:  # pylint: disable=broad-except
+      batch.error = e
+    finally:
+      with self._cond:
+        self._writing = False
+        self._cond.notify_all()
+      batch.written.set()
+
+
 class FrontEndServer(object):
   """This is the front end server.
 
@@ -349,6 +696,11 @@ class FrontEndServer(object):
     self.max_retransmission_time = max_retransmission_time
     self.max_queue_size = max_queue_size
 
+    self._ingestion_batcher = _IngestionBatcher(
+        max_messages=config.CONFIG["Frontend.ingestion_batch_max_messages"],
+        max_delay=config.CONFIG["Frontend.ingestion_batch_max_delay_ms"] /
+        1000)
+
     # There is only a single session id that we accept unauthenticated
     # messages for, the one to enroll new clients.
     self.unauth_allowed_session_id = rdfvalue.SessionID(
@@ -369,6 +721,21 @@ class FrontEndServer(object):
         for flow_name in whitelist & available_wkf_set
     }
 
+  def WarmUpCaches(self):
+    """Preloads public keys of recently seen clients into the communicator."""
+    window = config.CONFIG["Frontend.public_key_cache_warmup_window"]
+    if not window or not isinstance(self._communicator,
+                                    RelationalServerCommunicator):
+      return
+
+    self._communicator.WarmUpPublicKeyCache(rdfvalue.RDFDatetime.Now() -
+                                            window)
+
+  def Close(self):
+    """Writes client metadata that is still buffered by the communicator."""
+    if isinstance(self._communicator, RelationalServerCommunicator):
+      self._communicator.Close()
+
   @stats_utils.Counted("grr_frontendserver_handle_num")
   @stats_utils.Timed("grr_frontendserver_handle_time")
   def HandleMessageBundles(self, request_comms, response_comms):
@@ -570,31 +937,28 @@ class FrontEndServer(object):
       logging.info("Dropped %d unauthenticated messages for %s", dropped_count,
                    client_id)
 
-    if unprocessed_msgs:
-      flow_responses = []
-      for message in unprocessed_msgs:
-        flow_responses.append(
-            rdf_flow_objects.FlowResponseForLegacyResponse(message))
-
-      data_store.REL_DB.WriteFlowResponses(flow_responses)
-
-      for msg in unprocessed_msgs:
-        if msg.type == rdf_flows.GrrMessage.Type.STATUS:
-          stat = rdf_flows.GrrStatus(msg.payload)
-          if stat.status == rdf_flows.GrrStatus.ReturnedStatus.CLIENT_KILLED:
-            # A client crashed while performing an action, fire an event.
-            crash_details = rdf_client.ClientCrash(
-                client_id=client_id,
-                session_id=msg.source,
-                backtrace=stat.backtrace,
-                crash_message=stat.error_message,
-                nanny_status=stat.nanny_status,
-                timestamp=rdfvalue.RDFDatetime.Now())
-            events.Events.PublishEvent(
-                "ClientCrash", crash_details, token=self.token)
-
-    if message_handler_requests:
-      data_store.REL_DB.WriteMessageHandlerRequests(message_handler_requests)
+    flow_responses = []
+    for message in unprocessed_msgs:
+      flow_responses.append(
+          rdf_flow_objects.FlowResponseForLegacyResponse(message))
+
+    if flow_responses or message_handler_requests:
+      self._ingestion_batcher.Write(flow_responses, message_handler_requests)
+
+    for msg in unprocessed_msgs:
+      if msg.type == rdf_flows.GrrMessage.Type.STATUS:
+        stat = rdf_flows.GrrStatus(msg.payload)
+        if stat.status == rdf_flows.GrrStatus.ReturnedStatus.CLIENT_KILLED:
+          # A client crashed while performing an action, fire an event.
+          crash_details = rdf_client.ClientCrash(
+              client_id=client_id,
+              session_id=msg.source,
+              backtrace=stat.backtrace,
+              crash_message=stat.error_message,
+              nanny_status=stat.nanny_status,
+              timestamp=rdfvalue.RDFDatetime.Now())
+          events.Events.PublishEvent(
+              "ClientCrash", crash_details, token=self.token)
 
     logging.debug("Received %s messages from %s in %s sec", len(messages),
                   client_id,
@@ -612,7 +976,10 @@ class FrontEndServer(object):
       messages: A list of GrrMessage RDFValues.
     """
     if data_store.RelationalDBFlowsEnabled():
-      return self.ReceiveMessagesRelationalFlows(client_id, messages)
+      # Messages are matched against flow state that workers have just
+      # written, which a read replica might not have applied yet.
+      with data_store.REL_DB.ReadsFromPrimary():
+        return self.ReceiveMessagesRelationalFlows(client_id, messages)
 
     now = time.time()
     with queue_manager.QueueManager(token=self.token) as manager:
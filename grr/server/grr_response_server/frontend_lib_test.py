@@ -7,6 +7,7 @@ from __future__ import unicode_literals
 import array
 import logging
 import pdb
+import threading
 import time
 
 from builtins import chr  # pylint: disable=redefined-builtin
@@ -26,6 +27,7 @@ from grr_response_core.lib import queues
 from grr_response_core.lib import rdfvalue
 from grr_response_core.lib import utils
 from grr_response_core.lib.rdfvalues import client as rdf_client
+from grr_response_core.lib.rdfvalues import client_network as rdf_client_network
 from grr_response_core.lib.rdfvalues import crypto as rdf_crypto
 from grr_response_core.lib.rdfvalues import flows as rdf_flows
 from grr_response_core.lib.rdfvalues import protodict as rdf_protodict
@@ -46,6 +48,7 @@ from grr.test_lib import client_test_lib
 from grr.test_lib import db_test_lib
 from grr.test_lib import flow_test_lib
 from grr.test_lib import frontend_test_lib
+from grr.test_lib import stats_test_lib
 from grr.test_lib import test_lib
 from grr.test_lib import worker_mocks
 
@@ -540,6 +543,106 @@ class GRRFEServerTestRelational(db_test_lib.RelationalDBEnabledMixin,
     ReceiveMessages(client_id, messages)
 
 
+class IngestionBatcherTest(db_test_lib.RelationalDBEnabledMixin,
+                           test_lib.GRRBaseTest):
+  """Tests batching of database writes across client polls."""
+
+  def setUp(self):
+    super(IngestionBatcherTest, self).setUp()
+    self.written_batches = []
+    self.first_write_started = threading.Event()
+    self.release_first_write = threading.Event()
+
+    patcher = mock.patch.object(
+        data_store.REL_DB,
+        "WriteFlowResponses",
+        side_effect=self._WriteFlowResponses)
+    patcher.start()
+    self.addCleanup(patcher.stop)
+
+  def _WriteFlowResponses(self, responses):
+    self.written_batches.append(sorted(responses))
+    if len(self.written_batches) == 1:
+      self.first_write_started.set()
+      self.release_first_write.wait()
+
+  def _StartWrite(self, batcher, response):
+    thread = threading.Thread(target=batcher.Write, args=([response], []))
+    thread.start()
+    self.addCleanup(thread.join)
+    return thread
+
+  def _WaitForPendingSize(self, batcher, size):
+    while batcher._pending.size < size:
+      time.sleep(0.01)
+
+  def testBatchesPollsArrivingDuringWrite(self):
+    batcher = frontend_lib._IngestionBatcher(max_messages=100, max_delay=0)
+
+    threads = [self._StartWrite(batcher, "r0")]
+    self.first_write_started.wait()
+    threads.append(self._StartWrite(batcher, "r1"))
+    threads.append(self._StartWrite(batcher, "r2"))
+    self._WaitForPendingSize(batcher, 2)
+
+    self.release_first_write.set()
+    for thread in threads:
+      thread.join()
+
+    self.assertEqual(self.written_batches, [["r0"], ["r1", "r2"]])
+
+  def testLimitsBatchSize(self):
+    batcher = frontend_lib._IngestionBatcher(max_messages=2, max_delay=0)
+
+    threads = [self._StartWrite(batcher, "r0")]
+    self.first_write_started.wait()
+    threads.append(self._StartWrite(batcher, "r1"))
+    threads.append(self._StartWrite(batcher, "r2"))
+    self._WaitForPendingSize(batcher, 2)
+    # The pending batch is full, so this one has to go into the next batch.
+    threads.append(self._StartWrite(batcher, "r3"))
+
+    self.release_first_write.set()
+    for thread in threads:
+      thread.join()
+
+    self.assertLen(self.written_batches, 3)
+    self.assertCountEqual(self.written_batches[1:], [["r1", "r2"], ["r3"]])
+
+  def testWritesFullBatchBeforeMaxDelay(self):
+    self.release_first_write.set()
+    batcher = frontend_lib._IngestionBatcher(max_messages=2, max_delay=60)
+
+    thread = self._StartWrite(batcher, "r0")
+    self._WaitForPendingSize(batcher, 1)
+    batcher.Write(["r1"], [])
+    thread.join()
+
+    self.assertEqual(self.written_batches, [["r0", "r1"]])
+
+  def testRaisesWriteErrors(self):
+    batcher = frontend_lib._IngestionBatcher(max_messages=100, max_delay=0)
+
+    with mock.patch.object(
+        data_store.REL_DB, "WriteFlowResponses", side_effect=IOError("fail")):
+      with self.assertRaises(IOError):
+        batcher.Write(["r0"], [])
+
+    self.release_first_write.set()
+    batcher.Write(["r1"], [])
+    self.assertEqual(self.written_batches, [["r1"]])
+
+  def testWritesMessageHandlerRequests(self):
+    batcher = frontend_lib._IngestionBatcher(max_messages=100, max_delay=0)
+
+    with mock.patch.object(data_store.REL_DB,
+                           "WriteMessageHandlerRequests") as write_mock:
+      batcher.Write([], ["req"])
+
+    write_mock.assert_called_once_with(["req"])
+    self.assertEmpty(self.written_batches)
+
+
 class FleetspeakFrontendTests(frontend_test_lib.FrontEndServerTest):
 
   def testFleetspeakEnrolment(self):
@@ -1401,7 +1504,8 @@ class HTTPClientTests(test_lib.GRRBaseTest):
       self.assertEqual(client_obj.http_manager.consecutive_connection_errors, 9)
 
 
-class RelationalClientCommsTest(ClientCommsTest):
+class RelationalClientCommsTest(stats_test_lib.StatsTestMixin,
+                                ClientCommsTest):
 
   def _MakeClientRecord(self):
     """Make a client in the data store."""
@@ -1415,6 +1519,13 @@ class RelationalClientCommsTest(ClientCommsTest):
         certificate=self.server_certificate,
         private_key=self.server_private_key)
 
+  def tearDown(self):
+    # Some tests replace the communicator with a legacy one.
+    if isinstance(self.server_communicator,
+                  frontend_lib.RelationalServerCommunicator):
+      self.server_communicator.Close()
+    super(RelationalClientCommsTest, self).tearDown()
+
   def _LabelClient(self, client_id, label):
     data_store.REL_DB.AddClientLabels(client_id, u"Test", [label])
 
@@ -1437,11 +1548,175 @@ class RelationalClientCommsTest(ClientCommsTest):
     client_now += 40
     with test_lib.FakeTime(now):
       self.ClientServerCommunicate(timestamp=client_now)
+    self.server_communicator.FlushClientMetadata()
 
     metadata = data_store.REL_DB.ReadClientMetadata(self.client_id)
     self.assertEqual(now, metadata.ping)
     self.assertEqual(client_now, metadata.clock)
 
+  def testClientPingIsBuffered(self):
+    self._MakeClientRecord()
+
+    first_ping = rdfvalue.RDFDatetime.Now()
+    with test_lib.FakeTime(first_ping):
+      self.ClientServerCommunicate(timestamp=first_ping)
+
+    # The first contact of a client is written immediately.
+    metadata = data_store.REL_DB.ReadClientMetadata(self.client_id)
+    self.assertEqual(metadata.ping, first_ping)
+
+    second_ping = first_ping + rdfvalue.Duration("60s")
+    with test_lib.FakeTime(second_ping):
+      with self.assertStatsCounterDelta(
+          1, "frontend_client_metadata_writes", fields=["buffered"]):
+        self.ClientServerCommunicate(timestamp=second_ping)
+
+    metadata = data_store.REL_DB.ReadClientMetadata(self.client_id)
+    self.assertEqual(metadata.ping, first_ping)
+
+    self.server_communicator.FlushClientMetadata()
+    metadata = data_store.REL_DB.ReadClientMetadata(self.client_id)
+    self.assertEqual(metadata.ping, second_ping)
+    self.assertEqual(metadata.clock, second_ping)
+
+  def testClientIpChangeIsWrittenImmediately(self):
+    self._MakeClientRecord()
+    self.ClientServerCommunicate()
+
+    metadata = data_store.REL_DB.ReadClientMetadata(self.client_id)
+    new_ip = rdf_client_network.NetworkAddress(
+        human_readable_address="10.0.0.2")
+    with self.assertStatsCounterDelta(
+        1, "frontend_client_metadata_writes", fields=["immediate"]):
+      self.server_communicator._WriteClientPing(
+          self.client_id,
+          metadata,
+          last_clock=rdfvalue.RDFDatetime.Now(),
+          last_ip=new_ip)
+
+    metadata = data_store.REL_DB.ReadClientMetadata(self.client_id)
+    self.assertEqual(metadata.ip, new_ip)
+
+  def testClientPingIsNotBufferedWhenDisabled(self):
+    self._MakeClientRecord()
+    self.server_communicator = frontend_lib.RelationalServerCommunicator(
+        certificate=self.server_certificate,
+        private_key=self.server_private_key,
+        metadata_flush_interval=rdfvalue.Duration(0))
+    self.ClientServerCommunicate()
+
+    now = rdfvalue.RDFDatetime.Now() + rdfvalue.Duration("60s")
+    with test_lib.FakeTime(now):
+      self.ClientServerCommunicate(timestamp=now)
+
+    metadata = data_store.REL_DB.ReadClientMetadata(self.client_id)
+    self.assertEqual(metadata.ping, now)
+
+  def testFrontEndServerCloseWritesBufferedPing(self):
+    self._MakeClientRecord()
+    self.ClientServerCommunicate()
+
+    now = rdfvalue.RDFDatetime.Now() + rdfvalue.Duration("60s")
+    with test_lib.FakeTime(now):
+      self.ClientServerCommunicate(timestamp=now)
+
+    server = TestServer()
+    server._communicator = self.server_communicator
+    server.Close()
+
+    metadata = data_store.REL_DB.ReadClientMetadata(self.client_id)
+    self.assertEqual(metadata.ping, now)
+
+  def _ServerEncode(self, timestamp=None):
+    result = rdf_flows.ClientCommunication()
+    self.server_communicator.EncodeMessages(
+        rdf_flows.MessageList(),
+        result,
+        timestamp=timestamp,
+        destination=rdf_client.ClientURN(self.client_id))
+    return result
+
+  def testOutboundCipherIsReused(self):
+    self._MakeClientRecord()
+
+    first = self._ServerEncode()
+    with self.assertStatsCounterDelta(2, "grr_rsa_operations_avoided"):
+      with self.assertStatsCounterDelta(0, "grr_rsa_operations"):
+        second = self._ServerEncode(timestamp=12345)
+
+    self.assertEqual(first.encrypted_cipher, second.encrypted_cipher)
+    self.assertNotEqual(first.packet_iv, second.packet_iv)
+
+    # The client still decodes messages encrypted with a reused cipher. The
+    # server echoes the nonce of the client's last request.
+    self.client_communicator.timestamp = 12345
+    _, source, _ = self.client_communicator.DecryptMessage(
+        second.SerializeToString())
+    self.assertEqual(source, self.server_communicator.common_name)
+
+  def testOutboundCipherExpires(self):
+    self._MakeClientRecord()
+
+    now = rdfvalue.RDFDatetime.Now()
+    with test_lib.FakeTime(now):
+      first = self._ServerEncode()
+
+    with test_lib.FakeTime(now + config.CONFIG["Frontend.cipher_cache_ttl"] +
+                           rdfvalue.Duration("1s")):
+      with self.assertStatsCounterDelta(1, "grr_rsa_operations"):
+        second = self._ServerEncode()
+
+    self.assertNotEqual(first.encrypted_cipher, second.encrypted_cipher)
+
+  def testOutboundCipherCacheCanBeDisabled(self):
+    self._MakeClientRecord()
+    self.server_communicator = frontend_lib.RelationalServerCommunicator(
+        certificate=self.server_certificate,
+        private_key=self.server_private_key,
+        cipher_cache_size=0)
+
+    first = self._ServerEncode()
+    second = self._ServerEncode()
+    self.assertNotEqual(first.encrypted_cipher, second.encrypted_cipher)
+
+  def testPublicKeyIsCachedByClientId(self):
+    self._MakeClientRecord()
+    urn = rdf_client.ClientURN(self.client_id)
+    self.server_communicator._GetRemotePublicKey(urn)
+
+    with mock.patch.object(data_store.REL_DB,
+                           "ReadClientMetadata") as read_metadata_mock:
+      self.server_communicator._GetRemotePublicKey(urn)
+      read_metadata_mock.assert_not_called()
+
+  def testWarmUpPublicKeyCache(self):
+    now = rdfvalue.RDFDatetime.Now()
+    self._MakeClientRecord()
+    data_store.REL_DB.WriteClientMetadata(self.client_id, last_ping=now)
+
+    # A client that didn't ping within the warm-up window.
+    stale_cert = self.ClientCertFromPrivateKey(
+        rdf_crypto.RSAPrivateKey.GenerateKey())
+    stale_client_id = stale_cert.GetCN()[len("aff4:/"):]
+    data_store.REL_DB.WriteClientMetadata(
+        stale_client_id,
+        fleetspeak_enabled=False,
+        certificate=stale_cert,
+        last_ping=now - rdfvalue.Duration("2d"))
+
+    self.assertEqual(
+        self.server_communicator.WarmUpPublicKeyCache(
+            now - rdfvalue.Duration("1d")), 1)
+
+    self.assertIn(self.client_id, self.server_communicator.pub_key_cache)
+    self.assertNotIn(stale_client_id, self.server_communicator.pub_key_cache)
+
+    with mock.patch.object(data_store.REL_DB,
+                           "ReadClientMetadata") as read_metadata_mock:
+      self.server_communicator._GetRemotePublicKey(
+          rdf_client.ClientURN(self.client_id))
+      read_metadata_mock.assert_not_called()
+
 
 class RelationalHTTPClientTests(HTTPClientTests):
 
@@ -1457,11 +1732,18 @@ class RelationalHTTPClientTests(HTTPClientTests):
         fleetspeak_enabled=False)
 
   def CreateNewServerCommunicator(self):
+    # The replaced communicator's background flusher must not outlive it.
+    if getattr(self, "server_communicator", None) is not None:
+      self.server_communicator.Close()
     self._MakeClient()
     self.server_communicator = frontend_lib.RelationalServerCommunicator(
         certificate=self.server_certificate,
         private_key=self.server_private_key)
 
+  def tearDown(self):
+    self.server_communicator.Close()
+    super(RelationalHTTPClientTests, self).tearDown()
+
   def _ClearClient(self):
     del data_store.REL_DB.delegate.metadatas[self.client_id]
 
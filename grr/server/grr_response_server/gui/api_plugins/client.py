@@ -9,7 +9,6 @@ from future.builtins import str
 from future.moves.urllib import parse as urlparse
 from future.utils import iteritems
 from future.utils import iterkeys
-from future.utils import itervalues
 
 import ipaddress
 
@@ -309,18 +308,23 @@ class ApiSearchClientsHandler(api_call_handler_base.ApiCallHandler):
     if data_store.RelationalDBReadEnabled():
       index = client_index.ClientIndex()
 
-      # LookupClients returns a sorted list of client ids.
-      clients = index.LookupClients(keywords)[args.offset:args.offset + end]
+      # The database intersects the keywords and only returns the requested
+      # page of sorted client ids.
+      clients = index.LookupClients(keywords, offset=args.offset, count=end)
+      total_count = index.EstimateClients(keywords)
 
       client_infos = data_store.REL_DB.MultiReadClientFullInfo(clients)
-      for client_info in itervalues(client_infos):
-        api_clients.append(ApiClient().InitFromClientInfo(client_info))
+      for client_id in clients:
+        if client_id in client_infos:
+          api_clients.append(ApiClient().InitFromClientInfo(
+              client_infos[client_id]))
 
     else:
       index = client_index.CreateClientIndex(token=token)
 
-      result_urns = sorted(
-          index.LookupClients(keywords))[args.offset:args.offset + end]
+      all_urns = index.LookupClients(keywords)
+      total_count = len(all_urns)
+      result_urns = sorted(all_urns)[args.offset:args.offset + end]
 
       result_set = aff4.FACTORY.MultiOpen(result_urns, token=token)
 
@@ -328,7 +332,7 @@ class ApiSearchClientsHandler(api_call_handler_base.ApiCallHandler):
         api_clients.append(ApiClient().InitFromAff4Object(child))
 
     UpdateClientsFromFleetspeak(api_clients)
-    return ApiSearchClientsResult(items=api_clients)
+    return ApiSearchClientsResult(items=api_clients, total_count=total_count)
 
 
 class ApiLabelsRestrictedSearchClientsHandler(
@@ -378,10 +382,14 @@ class ApiLabelsRestrictedSearchClientsHandler(
       # database making this method more efficient. Label restrictions
       # should be on small subsets though so this might not be worth
       # it.
-      all_client_ids = set()
-      for label in self.labels_whitelist:
-        label_filter = ["label:" + label] + keywords
-        all_client_ids.update(index.LookupClients(label_filter))
+      if keywords:
+        all_client_ids = set()
+        for label in self.labels_whitelist:
+          label_filter = ["label:" + label] + keywords
+          all_client_ids.update(index.LookupClients(label_filter))
+      else:
+        all_client_ids = index.LookupClientsWithLabels(
+            self.labels_whitelist, owners=self.labels_owners_whitelist)
 
       index = 0
       for cid_batch in collection.Batch(sorted(all_client_ids), batch_size):
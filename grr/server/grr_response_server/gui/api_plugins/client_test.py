@@ -672,6 +672,31 @@ class ApiSearchClientsHandlerTest(api_test_lib.ApiCallHandlerTest):
     self.assertLen(result.items, 1)
     self.assertEqual(result.items[0].client_id, client_id)
 
+  def testSearchPaginatesSortedResults(self):
+    client_ids = [urn.Basename() for urn in self.SetupClients(5)]
+    for client_id in client_ids:
+      self._AddLabels(client_id, labels=["foo"])
+
+    pages = []
+    for offset in range(0, 5, 2):
+      args = client_plugin.ApiSearchClientsArgs(
+          query="label:foo", offset=offset, count=2)
+      result = self.search_handler.Handle(args, token=self.token)
+      pages.append([item.client_id for item in result.items])
+
+    self.assertEqual(pages, [client_ids[0:2], client_ids[2:4], client_ids[4:]])
+
+  def testSearchReturnsTotalCount(self):
+    client_ids = [urn.Basename() for urn in self.SetupClients(5)]
+    for client_id in client_ids:
+      self._AddLabels(client_id, labels=["foo"])
+
+    args = client_plugin.ApiSearchClientsArgs(
+        query="label:foo", offset=0, count=2)
+    result = self.search_handler.Handle(args, token=self.token)
+    self.assertLen(result.items, 2)
+    self.assertEqual(result.total_count, 5)
+
 
 def main(argv):
   test_lib.main(argv)
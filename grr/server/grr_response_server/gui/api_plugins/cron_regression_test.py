@@ -101,6 +101,8 @@ def _SetupAndRunVersionBreakDownCronjob(token=None):
       cron_job_name = compatibility.GetName(
           cron_system.GRRVersionBreakDownCronJob)
       cronjobs.ScheduleSystemCronJobs(names=[cron_job_name])
+      # The job is superseded by FleetStatsCronJob and disabled by default.
+      manager.EnableJob(cron_job_name)
       manager.RunOnce()
       manager._GetThreadPool().Stop()
     else:
@@ -217,6 +217,46 @@ class ApiHunt(rdf_structs.RDFProtoStruct):
 
     return self
 
+  def InitFromHuntMetadata(self, hunt_metadata):
+    """Initialize API hunt object from database hunt metadata.
+
+    Args:
+      hunt_metadata: rdf_hunt_objects.HuntMetadata to read the data from.
+
+    Returns:
+      Self, with enough data to be rendered as a hunts list row.
+    """
+    self.urn = rdfvalue.RDFURN("hunts").Add(str(hunt_metadata.hunt_id))
+    self.hunt_id = hunt_metadata.hunt_id
+    if (hunt_metadata.hunt_type ==
+        rdf_hunt_objects.HuntArguments.HuntType.STANDARD):
+      self.name = "GenericHunt"
+    else:
+      self.name = "VariableGenericHunt"
+    self.state = str(hunt_metadata.hunt_state)
+    self.crash_limit = hunt_metadata.crash_limit
+    self.client_limit = hunt_metadata.client_limit
+    self.client_rate = hunt_metadata.client_rate
+    self.created = hunt_metadata.create_time
+    self.expires = hunt_metadata.expiry_time
+    self.creator = hunt_metadata.creator
+    self.description = hunt_metadata.description
+    self.is_robot = hunt_metadata.creator in ["GRRWorker", "Cron"]
+    self.results_count = hunt_metadata.num_results
+    self.clients_with_results_count = hunt_metadata.num_clients_with_results
+    self.clients_queued_count = (
+        hunt_metadata.num_clients - hunt_metadata.num_successful_clients -
+        hunt_metadata.num_failed_clients - hunt_metadata.num_crashed_clients)
+    if hunt_metadata.original_object.object_type != "UNKNOWN":
+      ref = ApiFlowLikeObjectReference()
+      self.original_object = ref.FromFlowLikeObjectReference(
+          hunt_metadata.original_object)
+
+    self.total_cpu_usage = hunt_metadata.total_cpu_usage
+    self.total_net_usage = hunt_metadata.total_network_bytes_sent
+
+    return self
+
   def InitFromHuntObject(self, hunt_obj, with_full_summary=False):
     """Initialize API hunt object from a database hunt object.
 
@@ -232,35 +272,8 @@ class ApiHunt(rdf_structs.RDFProtoStruct):
       Self.
     """
 
-    self.urn = rdfvalue.RDFURN("hunts").Add(str(hunt_obj.hunt_id))
-    self.hunt_id = hunt_obj.hunt_id
-    if (hunt_obj.args.hunt_type ==
-        rdf_hunt_objects.HuntArguments.HuntType.STANDARD):
-      self.name = "GenericHunt"
-    else:
-      self.name = "VariableGenericHunt"
-    self.state = str(hunt_obj.hunt_state)
-    self.crash_limit = hunt_obj.crash_limit
-    self.client_limit = hunt_obj.client_limit
-    self.client_rate = hunt_obj.client_rate
-    self.created = hunt_obj.create_time
-    self.expires = hunt_obj.expiry_time
-    self.creator = hunt_obj.creator
-    self.description = hunt_obj.description
-    self.is_robot = hunt_obj.creator in ["GRRWorker", "Cron"]
-    self.results_count = hunt_obj.num_results
-    self.clients_with_results_count = hunt_obj.num_clients_with_results
-    self.clients_queued_count = (
-        hunt_obj.num_clients - hunt_obj.num_successful_clients -
-        hunt_obj.num_failed_clients - hunt_obj.num_crashed_clients)
-    if hunt_obj.original_object.object_type != "UNKNOWN":
-      ref = ApiFlowLikeObjectReference()
-      self.original_object = ref.FromFlowLikeObjectReference(
-          hunt_obj.original_object)
-
-    crs = hunt_obj.client_resources_stats
-    self.total_cpu_usage = (crs.user_cpu_stats.sum + crs.system_cpu_stats.sum)
-    self.total_net_usage = crs.network_bytes_sent_stats.sum
+    self.InitFromHuntMetadata(
+        rdf_hunt_objects.HuntMetadata.FromHunt(hunt_obj))
 
     if with_full_summary:
       self.all_clients_count = hunt_obj.num_clients
@@ -454,46 +467,33 @@ class ApiListHuntsHandler(api_call_handler_base.ApiCallHandler):
   def _DescriptionContainsFilterLegacy(self, substring, hunt_obj):
     return substring in hunt_obj.runner_args.description
 
-  def _CreatedByFilterRelational(self, username, hunt_obj):
-    return hunt_obj.creator == username
-
-  def _DescriptionContainsFilterRelational(self, substring, hunt_obj):
-    return substring in hunt_obj.description
-
   def _Username(self, username, token):
     if username == "me":
       return token.username
     else:
       return username
 
-  def _BuildFilter(self, args, token):
-    filters = []
-
+  def _CheckFilterArgs(self, args):
     if ((args.created_by or args.description_contains) and
         not args.active_within):
       raise ValueError("created_by/description_contains filters have to be "
                        "used together with active_within filter (to prevent "
                        "queries of death)")
 
+  def _BuildFilter(self, args, token):
+    filters = []
+
+    self._CheckFilterArgs(args)
+
     if args.created_by:
-      if data_store.RelationalDBReadEnabled("hunts"):
-        filters.append(
-            functools.partial(self._CreatedByFilterRelational,
-                              self._Username(args.created_by, token)))
-      else:
-        filters.append(
-            functools.partial(self._CreatedByFilterLegacy,
-                              self._Username(args.created_by, token)))
+      filters.append(
+          functools.partial(self._CreatedByFilterLegacy,
+                            self._Username(args.created_by, token)))
 
     if args.description_contains:
-      if data_store.RelationalDBReadEnabled("hunts"):
-        filters.append(
-            functools.partial(self._DescriptionContainsFilterRelational,
-                              args.description_contains))
-      else:
-        filters.append(
-            functools.partial(self._DescriptionContainsFilterLegacy,
-                              args.description_contains))
+      filters.append(
+          functools.partial(self._DescriptionContainsFilterLegacy,
+                            args.description_contains))
 
     if filters:
 
@@ -588,30 +588,26 @@ class ApiListHuntsHandler(api_call_handler_base.ApiCallHandler):
       return self.HandleNonFiltered(args, token)
 
   def _HandleRelational(self, args, token=None):
-    hunt_objs = data_store.REL_DB.ReadAllHuntObjects()
+    self._CheckFilterArgs(args)
 
-    # TODO(user): Add support for args.active_within filtering on the
-    # DB API level.
-    now = rdfvalue.RDFDatetime.Now()
+    # Filtering and pagination are done by the database, which only reads
+    # the metadata of listed hunts.
+    filter_kwargs = {}
+    if args.created_by:
+      filter_kwargs["with_creator"] = self._Username(args.created_by, token)
+    if args.description_contains:
+      filter_kwargs["with_description_match"] = args.description_contains
     if args.active_within:
-      hunt_objs = [
-          h for h in hunt_objs if now - h.create_time < args.active_within
-      ]
-
-    filter_func = self._BuildFilter(args, token)
-    if filter_func:
-      hunt_objs = [h for h in hunt_objs if filter_func(h)]
-
-    total_count = len(hunt_objs)
-    count = args.count or total_count
+      filter_kwargs["created_after"] = (
+          rdfvalue.RDFDatetime.Now() - args.active_within)
 
-    hunt_objs = sorted(
-        hunt_objs, reverse=True,
-        key=lambda h: h.create_time)[args.offset:args.offset + count]
+    hunts_metadata = data_store.REL_DB.ListHuntObjects(
+        args.offset, args.count or db.MAX_COUNT, **filter_kwargs)
+    total_count = data_store.REL_DB.CountHuntObjects(**filter_kwargs)
 
     return ApiListHuntsResult(
         total_count=total_count,
-        items=[ApiHunt().InitFromHuntObject(h) for h in hunt_objs])
+        items=[ApiHunt().InitFromHuntMetadata(h) for h in hunts_metadata])
 
   def Handle(self, args, token=None):
     if data_store.RelationalDBReadEnabled("hunts"):
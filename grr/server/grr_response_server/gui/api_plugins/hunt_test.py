@@ -11,6 +11,7 @@ import zipfile
 
 
 from builtins import range  # pylint: disable=redefined-builtin
+import mock
 import yaml
 
 from grr_response_core.lib import flags
@@ -211,6 +212,26 @@ class ApiListHuntsHandlerTest(api_test_lib.ApiCallHandlerTest,
     for item in result.items:
       self.assertIn("bar", item.description)
 
+  def testListsHuntsWithoutReadingHuntObjects(self):
+    if not data_store.RelationalDBReadEnabled("hunts"):
+      self.skipTest("Only the relational DB lists hunt metadata.")
+
+    for i in range(1, 6):
+      with test_lib.FakeTime(i * 1000):
+        self.CreateHunt(description="foo_hunt_%d" % i)
+
+    with mock.patch.object(
+        data_store.REL_DB, "ReadAllHuntObjects") as read_all_mock:
+      with mock.patch.object(data_store.REL_DB, "ReadHuntObject") as read_mock:
+        result = self.handler.Handle(
+            hunt_plugin.ApiListHuntsArgs(offset=1, count=2), token=self.token)
+
+    self.assertFalse(read_all_mock.called)
+    self.assertFalse(read_mock.called)
+    self.assertEqual(result.total_count, 5)
+    self.assertEqual([item.description for item in result.items],
+                     ["foo_hunt_4", "foo_hunt_3"])
+
   def testOffsetIsRelativeToFilteredResultsWhenFilterIsPresent(self):
     for i in range(5):
       self.CreateHunt(description="foo_hunt_%d" % i)
@@ -13,6 +13,8 @@ from grr_response_core import config
 from grr_response_core.lib import flags
 from grr_response_core.lib import rdfvalue
 from grr_response_core.lib.rdfvalues import events as rdf_events
+from grr_response_core.lib.util import compatibility
+from grr_response_server import cronjobs
 from grr_response_server import data_store
 from grr_response_server import events
 from grr_response_server.flows.cron import system as cron_system
@@ -24,6 +26,7 @@ from grr_response_server.gui.api_plugins.report_plugins import rdf_report_plugin
 from grr_response_server.gui.api_plugins.report_plugins import report_plugins
 from grr_response_server.gui.api_plugins.report_plugins import report_plugins_test_mocks
 from grr_response_server.gui.api_plugins.report_plugins import server_report_plugins
+from grr_response_server.rdfvalues import cronjobs as rdf_cronjobs
 from grr_response_server.rdfvalues import flow_objects as rdf_flow_objects
 from grr_response_server.rdfvalues import objects as rdf_objects
 from grr.test_lib import db_test_lib
@@ -725,6 +728,64 @@ class ServerReportPluginsTest(test_lib.GRRBaseTest):
                   rdf_report_plugins.ApiReportDataPoint1D(label="User456", x=1)
               ])))
 
+  def _RollUpAuditEntries(self):
+    cron_name = compatibility.GetName(cron_system.APIAuditDailyCountsCronJob)
+    cronjobs.ScheduleSystemCronJobs(names=[cron_name])
+    job = data_store.REL_DB.ReadCronJobs([cron_name])[0]
+    run = rdf_cronjobs.CronJobRun(started_at=rdfvalue.RDFDatetime.Now())
+    cron_system.APIAuditDailyCountsCronJob(run, job).Run()
+
+  def _WriteFakeDailyCounts(self):
+    # Daily counts of a day without audit entries show that reports use them
+    # instead of reading the entries.
+    data_store.REL_DB.WriteAPIAuditDailyCounts(
+        rdfvalue.RDFDatetime.FromHumanReadable("2012/12/20"),
+        {("User789", "GetClient"): 2})
+
+  def testMostActiveUsersReportPluginUsesDailyCounts(self):
+    if not data_store.RelationalDBReadEnabled():
+      self.skipTest("Daily counts are only kept in the relational DB.")
+
+    with test_lib.FakeTime(
+        rdfvalue.RDFDatetime.FromHumanReadable("2012/12/14")):
+      AddFakeAuditLog(user="User123", token=self.token)
+
+    with test_lib.FakeTime(
+        rdfvalue.RDFDatetime.FromHumanReadable("2012/12/22")):
+      for _ in range(10):
+        AddFakeAuditLog(user="User123", token=self.token)
+
+    report = report_plugins.GetReportByName(
+        server_report_plugins.MostActiveUsersReportPlugin.__name__)
+
+    with test_lib.FakeTime(
+        rdfvalue.RDFDatetime.FromHumanReadable("2012/12/31 12:00")):
+      self._RollUpAuditEntries()
+      self._WriteFakeDailyCounts()
+      # Entries of the current day are not rolled up yet.
+      AddFakeAuditLog(user="User456", token=self.token)
+
+      now = rdfvalue.RDFDatetime().Now()
+      month_duration = rdfvalue.Duration("30d")
+
+      api_report_data = report.GetReportData(
+          stats_api.ApiGetReportArgs(
+              name=report.__class__.__name__,
+              start_time=now - month_duration,
+              duration=month_duration),
+          token=self.token)
+
+      self.assertEqual(
+          api_report_data,
+          rdf_report_plugins.ApiReportData(
+              representation_type=RepresentationType.PIE_CHART,
+              pie_chart=rdf_report_plugins.ApiPieChartReportData(data=[
+                  rdf_report_plugins.ApiReportDataPoint1D(
+                      label="User123", x=11),
+                  rdf_report_plugins.ApiReportDataPoint1D(label="User456", x=1),
+                  rdf_report_plugins.ApiReportDataPoint1D(label="User789", x=2)
+              ])))
+
   def testMostActiveUsersReportPluginWithNoActivityToReport(self):
     report = report_plugins.GetReportByName(
         server_report_plugins.MostActiveUsersReportPlugin.__name__)
@@ -899,6 +960,40 @@ class ServerReportPluginsTest(test_lib.GRRBaseTest):
                       ])
               ])))
 
+  def testUserActivityReportPluginUsesDailyCounts(self):
+    if not data_store.RelationalDBReadEnabled():
+      self.skipTest("Daily counts are only kept in the relational DB.")
+
+    with test_lib.FakeTime(
+        rdfvalue.RDFDatetime.FromHumanReadable("2012/12/14")):
+      AddFakeAuditLog(user="User123", token=self.token)
+
+    with test_lib.FakeTime(
+        rdfvalue.RDFDatetime.FromHumanReadable("2012/12/22")):
+      for _ in range(10):
+        AddFakeAuditLog(user="User123", token=self.token)
+
+    report = report_plugins.GetReportByName(
+        server_report_plugins.UserActivityReportPlugin.__name__)
+
+    with test_lib.FakeTime(
+        rdfvalue.RDFDatetime.FromHumanReadable("2012/12/31")):
+      self._RollUpAuditEntries()
+      self._WriteFakeDailyCounts()
+
+      api_report_data = report.GetReportData(
+          stats_api.ApiGetReportArgs(name=report.__class__.__name__),
+          token=self.token)
+
+    weekly_counts = {
+        series.label: [point.y for point in series.points]
+        for series in api_report_data.stack_chart.data
+    }
+    self.assertEqual(weekly_counts, {
+        "User123": [0, 0, 0, 0, 0, 0, 0, 1, 10, 0],
+        "User789": [0, 0, 0, 0, 0, 0, 0, 0, 2, 0]
+    })
+
   def testUserActivityReportPluginWithNoActivityToReport(self):
     report = report_plugins.GetReportByName(
         server_report_plugins.UserActivityReportPlugin.__name__)
@@ -23,6 +23,60 @@ from grr_response_server.gui.api_plugins.report_plugins import report_utils
 
 RepresentationType = rdf_report_plugins.ApiReportData.RepresentationType
 
+_DAY_MICROS = 24 * 60 * 60 * 1000000
+
+
+def _CountAuditEntries(min_timestamp, max_timestamp):
+  """Counts API audit entries by username and router method name.
+
+  Days that lie completely within the time range and have been rolled up by
+  APIAuditDailyCountsCronJob are counted using their daily counts. Raw audit
+  entries are only read for the remaining days, i.e. partial days at the ends
+  of the range and days that are not rolled up yet (like the current one).
+
+  Args:
+    min_timestamp: Minimum rdfvalue.RDFDatetime (inclusive).
+    max_timestamp: Maximum rdfvalue.RDFDatetime (inclusive).
+
+  Returns:
+    A collections.Counter mapping (username, router_method_name) tuples to
+    numbers of audit entries.
+  """
+  min_micros = min_timestamp.AsMicrosecondsSinceEpoch()
+  end_micros = max_timestamp.AsMicrosecondsSinceEpoch() + 1
+  # Days in [first_day, end_day) lie completely within the time range.
+  first_day = -(-min_micros // _DAY_MICROS)
+  end_day = end_micros // _DAY_MICROS
+
+  counts = collections.Counter()
+  rolled_up_days = set()
+  if first_day < end_day:
+    daily_counts = data_store.REL_DB.ReadAPIAuditDailyCounts(
+        min_day=rdfvalue.RDFDatetime(first_day * _DAY_MICROS),
+        max_day=rdfvalue.RDFDatetime((end_day - 1) * _DAY_MICROS))
+    for day, day_counts in iteritems(daily_counts):
+      rolled_up_days.add(day.AsMicrosecondsSinceEpoch() // _DAY_MICROS)
+      counts.update(day_counts)
+
+  # Adjacent days that are not rolled up are read with a single query.
+  raw_ranges = []
+  start_micros = min_micros
+  for day in sorted(rolled_up_days):
+    if start_micros < day * _DAY_MICROS:
+      raw_ranges.append((start_micros, day * _DAY_MICROS))
+    start_micros = (day + 1) * _DAY_MICROS
+  if start_micros < end_micros:
+    raw_ranges.append((start_micros, end_micros))
+
+  for start_micros, stop_micros in raw_ranges:
+    entries = data_store.REL_DB.ReadAPIAuditEntries(
+        min_timestamp=rdfvalue.RDFDatetime(start_micros),
+        max_timestamp=rdfvalue.RDFDatetime(stop_micros - 1))
+    for entry in entries:
+      counts[(entry.username, entry.router_method_name or "")] += 1
+
+  return counts
+
 
 def _LoadAuditEvents(handlers,
                      get_report_args,
@@ -223,10 +277,13 @@ class MostActiveUsersReportPlugin(report_plugin_base.ReportPluginBase):
 
   def _GetUserCounts(self, get_report_args, token=None):
     if data_store.RelationalDBReadEnabled():
-      entries = data_store.REL_DB.ReadAPIAuditEntries(
-          min_timestamp=get_report_args.start_time,
-          max_timestamp=get_report_args.start_time + get_report_args.duration)
-      return collections.Counter(entry.username for entry in entries)
+      counts = collections.Counter()
+      for (username, _), count in iteritems(
+          _CountAuditEntries(
+              get_report_args.start_time,
+              get_report_args.start_time + get_report_args.duration)):
+        counts[username] += count
+      return counts
     else:
       events = report_utils.GetAuditLogEntries(
           offset=get_report_args.duration,
@@ -347,32 +404,50 @@ class UserActivityReportPlugin(report_plugin_base.ReportPluginBase):
     now = rdfvalue.RDFDatetime.Now()
     start_time = now - week_duration * self.WEEKS
 
-    if data_store.RelationalDBReadEnabled():
-      for entry in data_store.REL_DB.ReadAPIAuditEntries(
-          min_timestamp=start_time):
-        yield entry.username, entry.timestamp
-    else:
-      for fd in audit.LegacyAuditLogsForTimespan(
-          start_time=start_time - audit.AUDIT_ROLLOVER_TIME,
-          end_time=now,
-          token=token):
-        for event in fd.GenerateItems():
-          yield event.user, event.timestamp
+    for fd in audit.LegacyAuditLogsForTimespan(
+        start_time=start_time - audit.AUDIT_ROLLOVER_TIME,
+        end_time=now,
+        token=token):
+      for event in fd.GenerateItems():
+        yield event.user, event.timestamp
+
+  def _CountUserActivity(self, weeks):
+    """Counts audit entries of every user in each of the given weeks."""
+    # Weeks are counted back from the current second, as in the legacy
+    # branch, where week numbers are computed from durations in seconds.
+    now = rdfvalue.RDFDatetime.FromSecondsSinceEpoch(
+        rdfvalue.RDFDatetime.Now().AsSecondsSinceEpoch())
+    week_duration = rdfvalue.Duration("7d")
+    user_activity = collections.defaultdict(lambda: {week: 0 for week in weeks})
+
+    for week in weeks:
+      week_start = now + week_duration * week
+      week_end = rdfvalue.RDFDatetime(
+          (week_start + week_duration).AsMicrosecondsSinceEpoch() - 1)
+      for (username, _), count in iteritems(
+          _CountAuditEntries(week_start, week_end)):
+        user_activity[username][week] += count
+
+    return user_activity
 
   def GetReportData(self, get_report_args, token):
     """Filter the last week of user actions."""
     ret = rdf_report_plugins.ApiReportData(
         representation_type=RepresentationType.STACK_CHART)
 
-    now = rdfvalue.RDFDatetime.Now()
     weeks = range(-self.WEEKS, 0, 1)
-    week_duration = rdfvalue.Duration("7d")
-    user_activity = collections.defaultdict(lambda: {week: 0 for week in weeks})
-
-    for username, timestamp in self._LoadUserActivity(token):
-      week = (timestamp - now).seconds // week_duration.seconds
-      if week in user_activity[username]:
-        user_activity[username][week] += 1
+    if data_store.RelationalDBReadEnabled():
+      user_activity = self._CountUserActivity(weeks)
+    else:
+      now = rdfvalue.RDFDatetime.Now()
+      week_duration = rdfvalue.Duration("7d")
+      user_activity = collections.defaultdict(
+          lambda: {week: 0 for week in weeks})
+
+      for username, timestamp in self._LoadUserActivity(token):
+        week = (timestamp - now).seconds // week_duration.seconds
+        if week in user_activity[username]:
+          user_activity[username][week] += 1
 
     user_activity = sorted(iteritems(user_activity))
     user_activity = [(user, data)
@@ -26,6 +26,7 @@ from grr_response_core.lib import rdfvalue
 from grr_response_core.lib import registry
 from grr_response_core.lib import utils
 from grr_response_core.lib.rdfvalues import structs as rdf_structs
+from grr_response_core.lib.util import context
 from grr_response_core.lib.util import precondition
 from grr_response_core.stats import stats_collector_instance
 from grr_response_server import access_control
@@ -291,6 +292,13 @@ class HttpRequestHandler(object):
     else:
       raise ValueError("Invalid format_mode: %s" % format_mode)
 
+  @staticmethod
+  def _ReadsFromPrimary():
+    """Returns a context sending relational DB reads to the primary."""
+    if data_store.RelationalDBWriteEnabled():
+      return data_store.REL_DB.ReadsFromPrimary()
+    return context.NullContext(None)
+
   @staticmethod
   def CallApiHandler(handler, args, token=None):
     """Handles API call to a given handler with given args and token."""
@@ -462,7 +470,10 @@ class HttpRequestHandler(object):
       # ACL checks are done here by the router. If this method succeeds (i.e.
       # does not raise), then handlers run without further ACL checks (they're
       # free to do some in their own implementations, though).
-      handler = getattr(router, method_metadata.name)(args, token=token)
+      # Approvals checked by the router may have been granted by a request
+      # served just before, so these reads can't go to a read replica.
+      with self._ReadsFromPrimary():
+        handler = getattr(router, method_metadata.name)(args, token=token)
 
       if handler.args_type != method_metadata.args_type:
         raise RuntimeError("Handler args type doesn't match "
@@ -507,7 +518,13 @@ class HttpRequestHandler(object):
             binary_stream, method_name=method_metadata.name)
       else:
         format_mode = GetRequestFormatMode(request, method_metadata)
-        result = self.CallApiHandler(handler, args, token=token)
+        if request.method == "GET":
+          result = self.CallApiHandler(handler, args, token=token)
+        else:
+          # Methods changing the state (e.g. cancelling a flow) have to see
+          # the latest version of what they change.
+          with self._ReadsFromPrimary():
+            result = self.CallApiHandler(handler, args, token=token)
         rendered_data = self._FormatResultAsJson(
             result, format_mode=format_mode)
 
@@ -352,6 +352,26 @@ class HttpRequestHandlerTest(test_lib.GRRBaseTest,
         })
     self.assertEqual(response.status_code, 200)
 
+  def testOnlyRouterChecksOfGetRequestsReadFromPrimary(self):
+    with mock.patch.object(
+        data_store.REL_DB,
+        "ReadsFromPrimary",
+        wraps=data_store.REL_DB.ReadsFromPrimary) as reads_from_primary_mock:
+      self._RenderResponse(
+          self._CreateRequest("GET", "/test_sample/some/path"))
+
+    reads_from_primary_mock.assert_called_once_with()
+
+  def testHandlersOfModifyingRequestsReadFromPrimary(self):
+    with mock.patch.object(
+        data_store.REL_DB,
+        "ReadsFromPrimary",
+        wraps=data_store.REL_DB.ReadsFromPrimary) as reads_from_primary_mock:
+      self._RenderResponse(
+          self._CreateRequest("DELETE", "/test_resource/R:123456"))
+
+    self.assertEqual(reads_from_primary_mock.call_count, 2)
+
   def testStatsAreCorrectlyUpdatedOnHeadRequests(self):
     with self.assertStatsCounterDelta(
         1, "api_access_probe_latency",
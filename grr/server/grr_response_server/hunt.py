@@ -4,11 +4,19 @@ from __future__ import absolute_import
 from __future__ import division
 from __future__ import unicode_literals
 
+import bisect
+import logging
 import sys
 
+from future.builtins import range
+
+from grr_response_core import config
 from grr_response_core.lib import rdfvalue
 from grr_response_core.lib import registry
+from grr_response_core.lib.util import collection
+from grr_response_core.stats import stats_collector_instance
 from grr_response_server import access_control
+from grr_response_server import client_bitmap_index
 from grr_response_server import data_store
 from grr_response_server import db
 from grr_response_server import flow
@@ -280,31 +288,15 @@ def StartHuntFlowOnClient(client_id, hunt_id):
     return
 
   if hunt_obj.args.hunt_type == hunt_obj.args.HuntType.STANDARD:
-    hunt_args = hunt_obj.args.standard
 
     def UpdateFn(h):
-      # h.num_clients > 0 check ensures that first client will be scheduled
-      # immediately and not 60.0 / h.client_rate seconds after the hunt is
-      # started.
-      if h.client_rate > 0 and h.num_clients > 0:
-        h.next_client_due = h.next_client_due + 60.0 / h.client_rate
-      h.num_clients += 1
+      _AddHuntClient(h)
       return h
 
     hunt_obj = data_store.REL_DB.UpdateHuntObject(hunt_id, UpdateFn)
     start_at = hunt_obj.next_client_due if hunt_obj.client_rate > 0 else None
 
-    flow_cls = registry.FlowRegistry.FlowClassByName(hunt_args.flow_name)
-    flow_args = hunt_args.flow_args if hunt_args.HasField("flow_args") else None
-    flow.StartFlow(
-        client_id=client_id,
-        creator=hunt_obj.creator,
-        cpu_limit=hunt_obj.per_client_cpu_limit,
-        network_bytes_limit=hunt_obj.per_client_network_bytes_limit,
-        flow_cls=flow_cls,
-        flow_args=flow_args,
-        start_at=start_at,
-        parent_hunt_id=hunt_id)
+    _StartStandardHuntFlow(hunt_obj, client_id, start_at)
 
     if hunt_obj.client_limit and hunt_obj.num_clients >= hunt_obj.client_limit:
       PauseHunt(hunt_obj.hunt_id)
@@ -316,6 +308,206 @@ def StartHuntFlowOnClient(client_id, hunt_id):
                                "hunt %s on client %s." % (client_id, hunt_id))
 
 
+def _AddHuntClient(hunt_obj):
+  """Accounts for a new client of the hunt, returns its flow start time."""
+  # hunt_obj.num_clients > 0 check ensures that first client will be scheduled
+  # immediately and not 60.0 / hunt_obj.client_rate seconds after the hunt is
+  # started.
+  if hunt_obj.client_rate > 0 and hunt_obj.num_clients > 0:
+    hunt_obj.next_client_due = (
+        hunt_obj.next_client_due + 60.0 / hunt_obj.client_rate)
+  hunt_obj.num_clients += 1
+  return hunt_obj.next_client_due if hunt_obj.client_rate > 0 else None
+
+
+def _StartStandardHuntFlow(hunt_obj, client_id, start_at):
+  """Starts the flow of a standard hunt on a given client."""
+  hunt_args = hunt_obj.args.standard
+  flow_cls = registry.FlowRegistry.FlowClassByName(hunt_args.flow_name)
+  flow_args = hunt_args.flow_args if hunt_args.HasField("flow_args") else None
+  flow.StartFlow(
+      client_id=client_id,
+      creator=hunt_obj.creator,
+      cpu_limit=hunt_obj.per_client_cpu_limit,
+      network_bytes_limit=hunt_obj.per_client_network_bytes_limit,
+      flow_cls=flow_cls,
+      flow_args=flow_args,
+      start_at=start_at,
+      parent_hunt_id=hunt_obj.hunt_id)
+
+
+def _ReserveHuntClients(hunt_id, count):
+  """Accounts for up to count new hunt clients in a single hunt update.
+
+  Args:
+    hunt_id: Id of the hunt.
+    count: Number of clients to account for.
+
+  Returns:
+    A tuple (hunt_obj, start_times) where hunt_obj is the updated hunt object
+    and start_times is a list with a flow start time (or None) for every client
+    that was accounted for. The list is shorter than count if the hunt is not
+    running anymore or reached its client limit.
+  """
+  start_times = []
+
+  def UpdateFn(h):
+    # The update function may be retried, so start from scratch every time.
+    del start_times[:]
+    if h.hunt_state != h.HuntState.STARTED:
+      return h
+
+    for _ in range(count):
+      if h.client_limit and h.num_clients >= h.client_limit:
+        break
+      start_times.append(_AddHuntClient(h))
+    return h
+
+  hunt_obj = data_store.REL_DB.UpdateHuntObject(hunt_id, UpdateFn)
+  return hunt_obj, start_times
+
+
+def _IterateCandidateClientBatches(client_rule_set,
+                                   min_last_ping,
+                                   batch_size,
+                                   after_client_id=None):
+  """Yields batches of full infos of clients that may match a rule set.
+
+  Clients are yielded in the order of their ids. If the rule set can be
+  evaluated using the client bitmap index, only the clients selected by the
+  index are read. Otherwise all the clients seen after min_last_ping are.
+
+  Args:
+    client_rule_set: A `foreman_rules.ForemanClientRuleSet` instance.
+    min_last_ping: Only clients seen after this time are yielded.
+    batch_size: Number of clients to read at once.
+    after_client_id: If set, only clients with greater ids are yielded.
+
+  Yields:
+    Tuples (client_ids, client_infos) where client_ids is a list of ids of
+    clients in the batch and client_infos is a list of
+    `rdf_objects.ClientFullInfo` instances of the ones that were read.
+  """
+  index = client_bitmap_index.GetIndex()
+  selected = client_rule_set.SelectClients(index)
+  if selected is None:
+    client_ids = sorted(
+        data_store.REL_DB.ReadAllClientIDs(min_last_ping=min_last_ping))
+  else:
+    selected &= index.ClientsPingedSince(min_last_ping)
+    client_ids = index.ClientIds(selected)
+
+  if after_client_id is not None:
+    client_ids = client_ids[bisect.bisect_right(client_ids, after_client_id):]
+
+  for batch in collection.Batch(client_ids, batch_size):
+    infos = data_store.REL_DB.MultiReadClientFullInfo(
+        batch, min_last_ping=min_last_ping)
+    yield batch, [infos[client_id] for client_id in batch if client_id in infos]
+
+
+def ScheduleHuntOnFleet(hunt_id,
+                        min_last_ping=None,
+                        batch_size=None,
+                        after_client_id=None,
+                        progress_callback=None):
+  """Evaluates hunt's client rules against the fleet and schedules its flows.
+
+  Instead of waiting for every client to pass a foreman check, clients are
+  read in batches ordered by client id, the hunt's compiled client rule set is
+  evaluated against each batch and the hunt's flows are scheduled for all the
+  matching clients that don't have them yet. Where possible, the client bitmap
+  index narrows down the clients to read. The hunt's client_rate is respected:
+  flows are scheduled with the same start times the foreman would give them.
+  Clients that are not scheduled here still get the hunt through the foreman.
+
+  This reads the whole fleet, so it is meant to be run by
+  ScheduleHuntsOnFleetCronJob and not while handling a request.
+
+  Args:
+    hunt_id: Id of a started standard hunt.
+    min_last_ping: Only clients seen after this time are scheduled. Defaults
+      to now minus Hunt.fleet_scheduling_ping_window.
+    batch_size: Number of clients to evaluate at once. Defaults to
+      Hunt.fleet_scheduling_batch_size.
+    after_client_id: If set, only clients with greater ids are scheduled. Used
+      to resume an interrupted scan.
+    progress_callback: If set, called with the id of the last client of every
+      processed batch.
+
+  Returns:
+    Number of clients the hunt was scheduled on.
+
+  Raises:
+    NotImplementedError: if the hunt is not a standard hunt.
+  """
+  hunt_obj = data_store.REL_DB.ReadHuntObject(hunt_id)
+  hunt_obj = CompleteHuntIfExpirationTimeReached(hunt_obj)
+  if hunt_obj.hunt_state != hunt_obj.HuntState.STARTED:
+    return 0
+
+  if hunt_obj.args.hunt_type != hunt_obj.args.HuntType.STANDARD:
+    raise NotImplementedError(
+        "Only standard hunts can be scheduled on the fleet.")
+
+  if min_last_ping is None:
+    min_last_ping = (
+        rdfvalue.RDFDatetime.Now() -
+        config.CONFIG["Hunt.fleet_scheduling_ping_window"])
+  if batch_size is None:
+    batch_size = config.CONFIG["Hunt.fleet_scheduling_batch_size"]
+
+  evaluate = hunt_obj.client_rule_set.Compile()
+
+  num_scheduled = 0
+  batches = _IterateCandidateClientBatches(
+      hunt_obj.client_rule_set,
+      min_last_ping,
+      batch_size,
+      after_client_id=after_client_id)
+  for batch_client_ids, infos in batches:
+    matching_client_ids = [
+        info.last_snapshot.client_id for info in infos if evaluate(info)
+    ]
+    # Clients may have the hunt's flow already, e.g. from the foreman or an
+    # earlier scan.
+    assigned_client_ids = data_store.REL_DB.ReadClientIdsWithHuntFlows(
+        hunt_id, matching_client_ids)
+    client_ids = [
+        client_id for client_id in matching_client_ids
+        if client_id not in assigned_client_ids
+    ]
+
+    if client_ids:
+      hunt_obj, start_times = _ReserveHuntClients(hunt_id, len(client_ids))
+      for client_id, start_at in zip(client_ids, start_times):
+        try:
+          _StartStandardHuntFlow(hunt_obj, client_id, start_at)
+        # Same as in the foreman: one broken client shouldn't stop the others.
+        except Exception as e:  # pylint: disable=broad-except
+          logging.exception("Failure scheduling hunt %s on client %s: %s",
+                            hunt_id, client_id, e)
+          continue
+
+        num_scheduled += 1
+
+      if len(start_times) < len(client_ids):
+        break
+
+    if progress_callback is not None:
+      progress_callback(batch_client_ids[-1])
+
+  stats_collector_instance.Get().IncrementCounter(
+      "hunt_fleet_scheduled_clients", delta=num_scheduled)
+
+  if (hunt_obj.hunt_state == hunt_obj.HuntState.STARTED and
+      hunt_obj.client_limit and hunt_obj.num_clients >= hunt_obj.client_limit):
+    PauseHunt(hunt_id)
+
+  logging.info("Scheduled hunt %s on %d clients.", hunt_id, num_scheduled)
+  return num_scheduled
+
+
 def GetHuntOutputPluginLogs(hunt_id, offset, count):
   """Gets hunt's output plugins logs."""
 
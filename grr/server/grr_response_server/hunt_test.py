@@ -17,14 +17,18 @@ from grr_response_core.lib.rdfvalues import file_finder as rdf_file_finder
 from grr_response_core.lib.rdfvalues import paths as rdf_paths
 from grr_response_core.lib.util import compatibility
 from grr_response_core.stats import stats_collector_instance
+from grr_response_server import client_bitmap_index
+from grr_response_server import cronjobs
 from grr_response_server import data_store
 from grr_response_server import foreman
 from grr_response_server import foreman_rules
 from grr_response_server import hunt
 from grr_response_server import output_plugin
+from grr_response_server.flows.cron import system
 from grr_response_server.flows.general import file_finder
 from grr_response_server.flows.general import processes
 from grr_response_server.flows.general import transfer
+from grr_response_server.rdfvalues import cronjobs as rdf_cronjobs
 from grr_response_server.rdfvalues import hunt_objects as rdf_hunt_objects
 from grr_response_server.rdfvalues import output_plugin as rdf_output_plugin
 from grr.test_lib import acl_test_lib
@@ -280,6 +284,220 @@ class HuntTest(db_test_lib.RelationalDBEnabledMixin,
       time_diff = r.delivery_time - (now + rdfvalue.Duration("1m") * i)
       self.assertLess(time_diff, rdfvalue.Duration("5s"))
 
+  def _ScheduleHuntOnFleet(self, hunt_id):
+    return hunt.ScheduleHuntOnFleet(
+        hunt_id, min_last_ping=rdfvalue.RDFDatetime(0), batch_size=3)
+
+  def testScheduleHuntOnFleetStartsFlowsOnMatchingClientsOnly(self):
+    client_ids = self.SetupClients(6)
+    for client_id in client_ids[::2]:
+      data_store.REL_DB.AddClientLabels(client_id.Basename(), u"GRR",
+                                        [u"foo"])
+
+    hunt_id = self._CreateHunt(
+        client_rule_set=foreman_rules.ForemanClientRuleSet(rules=[
+            foreman_rules.ForemanClientRule(
+                rule_type=foreman_rules.ForemanClientRule.Type.LABEL,
+                label=foreman_rules.ForemanLabelClientRule(
+                    label_names=[u"foo"]))
+        ]),
+        client_rate=0,
+        args=self.GetFileHuntArgs())
+
+    self.assertEqual(self._ScheduleHuntOnFleet(hunt_id), 3)
+
+    flows = data_store.REL_DB.ReadHuntFlows(hunt_id, 0, sys.maxsize)
+    self.assertCountEqual([f.client_id for f in flows],
+                          [c.Basename() for c in client_ids[::2]])
+
+    hunt_obj = data_store.REL_DB.ReadHuntObject(hunt_id)
+    self.assertEqual(hunt_obj.num_clients, 3)
+
+  def testScheduleHuntOnFleetReadsOnlyClientsSelectedByIndex(self):
+    client_ids = [client_id.Basename() for client_id in self.SetupClients(6)]
+    for client_id in [client_ids[1], client_ids[4]]:
+      data_store.REL_DB.AddClientLabels(client_id, u"GRR", [u"foo"])
+
+    hunt_id = self._CreateHunt(
+        client_rule_set=foreman_rules.ForemanClientRuleSet(rules=[
+            foreman_rules.ForemanClientRule(
+                rule_type=foreman_rules.ForemanClientRule.Type.LABEL,
+                label=foreman_rules.ForemanLabelClientRule(
+                    label_names=[u"foo"]))
+        ]),
+        client_rate=0,
+        args=self.GetFileHuntArgs())
+
+    read_client_ids = []
+    read_full_info = data_store.REL_DB.MultiReadClientFullInfo
+
+    def MultiReadClientFullInfo(client_ids, min_last_ping=None):
+      read_client_ids.extend(client_ids)
+      return read_full_info(client_ids, min_last_ping=min_last_ping)
+
+    with test_lib.ConfigOverrider({"ClientIndex.bitmap_index_ttl": "1h"}):
+      client_bitmap_index.GetIndex()
+      with utils.Stubber(data_store.REL_DB, "MultiReadClientFullInfo",
+                         MultiReadClientFullInfo):
+        self.assertEqual(self._ScheduleHuntOnFleet(hunt_id), 2)
+
+    self.assertEqual(read_client_ids, [client_ids[1], client_ids[4]])
+
+  def testScheduleHuntOnFleetDoesNotScheduleClientsTwice(self):
+    client_ids = self.SetupClients(5)
+    hunt_id = self._CreateHunt(
+        client_rule_set=foreman_rules.ForemanClientRuleSet(),
+        client_rate=0,
+        args=self.GetFileHuntArgs())
+
+    foreman_obj = foreman.GetForeman()
+    foreman_obj.AssignTasksToClient(client_ids[0].Basename())
+
+    self.assertEqual(self._ScheduleHuntOnFleet(hunt_id), 4)
+    self.assertEqual(self._ScheduleHuntOnFleet(hunt_id), 0)
+
+    self._RunHunt(client_ids)
+    hunt_obj = data_store.REL_DB.ReadHuntObject(hunt_id)
+    self.assertEqual(hunt_obj.num_clients, 5)
+
+  def testScheduleHuntOnFleetRespectsClientLimit(self):
+    self.SetupClients(10)
+    hunt_id = self._CreateHunt(
+        client_rule_set=foreman_rules.ForemanClientRuleSet(),
+        client_rate=0,
+        client_limit=5,
+        args=self.GetFileHuntArgs())
+
+    self.assertEqual(self._ScheduleHuntOnFleet(hunt_id), 5)
+
+    hunt_obj = data_store.REL_DB.ReadHuntObject(hunt_id)
+    self.assertEqual(hunt_obj.num_clients, 5)
+    self.assertEqual(hunt_obj.hunt_state,
+                     rdf_hunt_objects.Hunt.HuntState.PAUSED)
+
+  def testScheduleHuntOnFleetRespectsClientRate(self):
+    now = rdfvalue.RDFDatetime.Now()
+
+    self.SetupClients(10)
+    hunt_id = self._CreateHunt(
+        client_rule_set=foreman_rules.ForemanClientRuleSet(),
+        client_rate=1,
+        args=self.GetFileHuntArgs())
+
+    self.assertEqual(self._ScheduleHuntOnFleet(hunt_id), 10)
+
+    requests = data_store.REL_DB.ReadFlowProcessingRequests()
+    requests.sort(key=lambda r: r.delivery_time)
+    self.assertLen(requests, 10)
+    for i, r in enumerate(requests):
+      time_diff = r.delivery_time - (now + rdfvalue.Duration("1m") * i)
+      self.assertLess(time_diff, rdfvalue.Duration("5s"))
+
+  def testScheduleHuntOnFleetResumesAfterGivenClient(self):
+    client_ids = sorted(c.Basename() for c in self.SetupClients(5))
+    hunt_id = self._CreateHunt(
+        client_rule_set=foreman_rules.ForemanClientRuleSet(),
+        client_rate=0,
+        args=self.GetFileHuntArgs())
+
+    checkpoints = []
+    self.assertEqual(
+        hunt.ScheduleHuntOnFleet(
+            hunt_id,
+            min_last_ping=rdfvalue.RDFDatetime(0),
+            batch_size=2,
+            after_client_id=client_ids[1],
+            progress_callback=checkpoints.append), 3)
+
+    self.assertEqual(checkpoints, [client_ids[3], client_ids[4]])
+    flows = data_store.REL_DB.ReadHuntFlows(hunt_id, 0, sys.maxsize)
+    self.assertCountEqual([f.client_id for f in flows], client_ids[2:])
+
+  def _RunScheduleHuntsOnFleetCronJob(self, heartbeat_fn=None):
+    cron_name = compatibility.GetName(system.ScheduleHuntsOnFleetCronJob)
+    # Rescheduling system cron jobs resets their state, so the job is only
+    # scheduled once.
+    cron_job_ids = [job.cron_job_id for job in data_store.REL_DB.ReadCronJobs()]
+    if cron_name not in cron_job_ids:
+      cronjobs.ScheduleSystemCronJobs(names=[cron_name])
+    job = data_store.REL_DB.ReadCronJobs([cron_name])[0]
+    run = rdf_cronjobs.CronJobRun(started_at=rdfvalue.RDFDatetime.Now())
+    cron = system.ScheduleHuntsOnFleetCronJob(run, job)
+    if heartbeat_fn is not None:
+      cron.HeartBeat = heartbeat_fn
+    cron.Run()
+    return cron
+
+  def testStartHuntDoesNotScheduleHuntOnFleet(self):
+    self.SetupClients(3)
+    with test_lib.ConfigOverrider({"Hunt.schedule_on_fleet_at_start": True}):
+      hunt_id = self._CreateHunt(
+          client_rule_set=foreman_rules.ForemanClientRuleSet(),
+          client_rate=0,
+          args=self.GetFileHuntArgs())
+
+    hunt_obj = data_store.REL_DB.ReadHuntObject(hunt_id)
+    self.assertEqual(hunt_obj.num_clients, 0)
+
+  def testScheduleHuntsOnFleetCronJobSchedulesStartedHuntsOnce(self):
+    self.SetupClients(3)
+    hunt_id = self._CreateHunt(
+        client_rule_set=foreman_rules.ForemanClientRuleSet(),
+        client_rate=0,
+        args=self.GetFileHuntArgs())
+
+    self._RunScheduleHuntsOnFleetCronJob()
+    hunt_obj = data_store.REL_DB.ReadHuntObject(hunt_id)
+    self.assertEqual(hunt_obj.num_clients, 0)
+
+    with test_lib.ConfigOverrider({
+        "Hunt.schedule_on_fleet_at_start": True,
+        "Hunt.fleet_scheduling_ping_window": rdfvalue.Duration("520w"),
+    }):
+      self._RunScheduleHuntsOnFleetCronJob()
+      hunt_obj = data_store.REL_DB.ReadHuntObject(hunt_id)
+      self.assertEqual(hunt_obj.num_clients, 3)
+
+      with utils.Stubber(hunt, "ScheduleHuntOnFleet",
+                         lambda *args, **kwargs: self.fail()):
+        self._RunScheduleHuntsOnFleetCronJob()
+
+  def testScheduleHuntsOnFleetCronJobResumesInterruptedScan(self):
+    client_ids = sorted(c.Basename() for c in self.SetupClients(5))
+    hunt_id = self._CreateHunt(
+        client_rule_set=foreman_rules.ForemanClientRuleSet(),
+        client_rate=0,
+        args=self.GetFileHuntArgs())
+
+    def HeartBeat():
+      raise cronjobs.LifetimeExceededError()
+
+    with test_lib.ConfigOverrider({
+        "Hunt.schedule_on_fleet_at_start": True,
+        "Hunt.fleet_scheduling_ping_window": rdfvalue.Duration("520w"),
+        "Hunt.fleet_scheduling_batch_size": 2,
+    }):
+      with self.assertRaises(cronjobs.LifetimeExceededError):
+        self._RunScheduleHuntsOnFleetCronJob(heartbeat_fn=HeartBeat)
+
+      hunt_obj = data_store.REL_DB.ReadHuntObject(hunt_id)
+      self.assertEqual(hunt_obj.num_clients, 2)
+
+      after_client_ids = []
+      schedule_hunt_on_fleet = hunt.ScheduleHuntOnFleet
+
+      def ScheduleHuntOnFleet(hunt_id, after_client_id=None, **kwargs):
+        after_client_ids.append(after_client_id)
+        return schedule_hunt_on_fleet(
+            hunt_id, after_client_id=after_client_id, **kwargs)
+
+      with utils.Stubber(hunt, "ScheduleHuntOnFleet", ScheduleHuntOnFleet):
+        self._RunScheduleHuntsOnFleetCronJob()
+
+    self.assertEqual(after_client_ids, [client_ids[1]])
+    hunt_obj = data_store.REL_DB.ReadHuntObject(hunt_id)
+    self.assertEqual(hunt_obj.num_clients, 5)
+
   def testResultsAreCorrectlyCounted(self):
     path = os.path.join(self.base_path, "hello*")
     num_files = len(glob.glob(path))
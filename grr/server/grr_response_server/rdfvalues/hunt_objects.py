@@ -111,3 +111,48 @@ class Hunt(rdf_structs.RDFProtoStruct):
     if not self.HasField("avg_network_bytes_per_client_limit"):
       self.avg_network_bytes_per_client_limit = config.CONFIG[
           "Hunt.default_avg_network_bytes_per_client_limit"]
+
+
+class HuntMetadata(rdf_structs.RDFProtoStruct):
+  """Hunt fields needed to list hunts."""
+  protobuf = hunts_pb2.HuntMetadata
+  rdf_deps = [
+      rdfvalue.RDFDatetime,
+      rdf_hunts.FlowLikeObjectReference,
+  ]
+
+  @classmethod
+  def FromHunt(cls, hunt_obj):
+    """Creates hunt metadata from an rdf_hunt_objects.Hunt."""
+    result = cls(
+        hunt_id=hunt_obj.hunt_id,
+        description=hunt_obj.description,
+        create_time=hunt_obj.create_time,
+        creator=hunt_obj.creator,
+        expiry_time=hunt_obj.expiry_time,
+        client_rate=hunt_obj.client_rate,
+        client_limit=hunt_obj.client_limit,
+        crash_limit=hunt_obj.crash_limit,
+        hunt_state=hunt_obj.hunt_state,
+        num_clients=hunt_obj.num_clients,
+        num_successful_clients=hunt_obj.num_successful_clients,
+        num_failed_clients=hunt_obj.num_failed_clients,
+        num_clients_with_results=hunt_obj.num_clients_with_results,
+        num_crashed_clients=hunt_obj.num_crashed_clients,
+        num_results=hunt_obj.num_results)
+
+    # Reading unset nested fields would set them, so they are checked first
+    # to leave the hunt object unchanged.
+    if hunt_obj.HasField("args"):
+      result.hunt_type = hunt_obj.args.hunt_type
+    if hunt_obj.HasField("last_update_time"):
+      result.last_update_time = hunt_obj.last_update_time
+    if hunt_obj.HasField("original_object"):
+      result.original_object = hunt_obj.original_object
+
+    if hunt_obj.HasField("client_resources_stats"):
+      crs = hunt_obj.client_resources_stats
+      result.total_cpu_usage = (
+          crs.user_cpu_stats.sum + crs.system_cpu_stats.sum)
+      result.total_network_bytes_sent = crs.network_bytes_sent_stats.sum
+    return result
@@ -48,6 +48,36 @@ def GetMetadata():
           bins=[0.05 * 1.2**x for x in range(30)]),  # 50ms to ~10 secs
       stats_utils.CreateCounterMetadata(
           "db_request_errors", fields=[("call", str), ("type", str)]),
+      stats_utils.CreateEventMetadata(
+          "mysql_pool_wait_time", fields=[("pool_name", str)]),
+      stats_utils.CreateEventMetadata(
+          "mysql_pool_checkout_latency", fields=[("pool_name", str)]),
+      stats_utils.CreateGaugeMetadata(
+          "mysql_pool_connections_in_use", int, fields=[("pool_name", str)]),
+      stats_utils.CreateCounterMetadata(
+          "mysql_pool_connections_created", fields=[("pool_name", str)]),
+      stats_utils.CreateCounterMetadata(
+          "mysql_pool_connections_closed",
+          fields=[("pool_name", str), ("reason", str)]),
+      stats_utils.CreateEventMetadata(
+          "mysql_transaction_latency",
+          fields=[("route", str)],
+          bins=[0.05 * 1.2**x for x in range(30)]),  # 50ms to ~10 secs
+
+      # File store metrics.
+      stats_utils.CreateEventMetadata(
+          "file_store_stream_batch_latency",
+          bins=[0.05 * 1.2**x for x in range(30)]),  # 50ms to ~10 secs
+      stats_utils.CreateCounterMetadata(
+          "file_store_stream_batch_bytes", units="BYTES"),
+
+      # Blob store cache metrics.
+      stats_utils.CreateCounterMetadata(
+          "blob_store_cache_hits", fields=[("tier", str)]),
+      stats_utils.CreateCounterMetadata(
+          "blob_store_cache_misses", fields=[("tier", str)]),
+      stats_utils.CreateCounterMetadata(
+          "blob_store_cache_evictions", fields=[("tier", str)]),
 
       # Threadpool metrics.
       stats_utils.CreateGaugeMetadata(
@@ -106,6 +136,7 @@ def GetMetadata():
       stats_utils.CreateCounterMetadata(
           "hunt_results_compaction_locking_errors"),
       stats_utils.CreateCounterMetadata("hunt_results_added"),
+      stats_utils.CreateCounterMetadata("hunt_fleet_scheduled_clients"),
 
       # Metric used to identify the master in a distributed server setup.
       stats_utils.CreateGaugeMetadata("is_master", int),
@@ -145,6 +176,19 @@ def GetMetadata():
       stats_utils.CreateGaugeMetadata("grr_frontendserver_client_cache_size",
                                       int),
       stats_utils.CreateCounterMetadata("grr_messages_sent"),
+      stats_utils.CreateEventMetadata(
+          "frontend_ingestion_batch_size",
+          bins=[1, 10, 50, 100, 500, 1000, 5000]),
+      stats_utils.CreateCounterMetadata(
+          "frontend_client_metadata_writes", fields=[("type", str)]),
+      stats_utils.CreateEventMetadata(
+          "frontend_client_metadata_flush_size",
+          bins=[1, 10, 100, 1000, 10000]),
       stats_utils.CreateCounterMetadata(
           "grr_pub_key_cache", fields=[("type", str)]),
+      stats_utils.CreateCounterMetadata(
+          "grr_cipher_cache", fields=[("type", str)]),
+      stats_utils.CreateCounterMetadata("grr_rsa_operations_avoided"),
+      stats_utils.CreateCounterMetadata("foreman_rules_cache_refreshes"),
+      stats_utils.CreateCounterMetadata("foreman_clients_skipped"),
   ]
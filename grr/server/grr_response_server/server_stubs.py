@@ -223,6 +223,13 @@ class TransferBuffer(ClientActionStub):
   out_rdfvalues = [rdf_client.BufferReference]
 
 
+class TransferBuffers(ClientActionStub):
+  """Reads multiple buffers and returns them to the server efficiently."""
+
+  in_rdfvalue = rdf_client.BufferReferences
+  out_rdfvalues = [rdf_client.BufferReference]
+
+
 class HashBuffer(ClientActionStub):
   """Hash a buffer from a file and returns it to the server efficiently."""
 
@@ -25,6 +25,7 @@ from __future__ import absolute_import
 from __future__ import division
 from __future__ import unicode_literals
 
+import contextlib
 import itertools
 import logging
 import threading
@@ -215,6 +216,8 @@ class ThreadPool(object):
   # A global dictionary of pools, keyed by pool name.
   POOLS = {}
   factory_lock = threading.Lock()
+  # Guards the user counts of pools obtained through Shared().
+  shared_lock = threading.Lock()
 
   JOIN_TIMEOUT_DECISECONDS = 600
 
@@ -243,6 +246,38 @@ class ThreadPool(object):
 
       return result
 
+  @classmethod
+  @contextlib.contextmanager
+  def Shared(cls, name, min_threads, max_threads=None):
+    """Yields a started pool created by the Factory for the duration of a use.
+
+    The pool is shared by all concurrent users. It is started by the first one
+    and stopped when the last one is done, so that no idle workers are left
+    behind while the pool is not used.
+
+    Args:
+      name: The name of the required pool.
+      min_threads: The number of threads in the pool.
+      max_threads: The maximum number of threads to grow the pool to. If not set
+        we do not grow the pool.
+
+    Yields:
+      A started threadpool instance.
+    """
+    pool = cls.Factory(name, min_threads, max_threads=max_threads)
+    with cls.shared_lock:
+      if not pool.shared_users:
+        pool.Start()
+      pool.shared_users += 1
+
+    try:
+      yield pool
+    finally:
+      with cls.shared_lock:
+        pool.shared_users -= 1
+        if not pool.shared_users:
+          pool.Stop()
+
   def __init__(self, name, min_threads, max_threads=None):
     """This creates a new thread pool using min_threads workers.
 
@@ -266,6 +301,8 @@ class ThreadPool(object):
     self._queue = queue.Queue(maxsize=max_threads)
     self.name = name
     self.started = False
+    # Number of users currently holding the pool through Shared().
+    self.shared_users = 0
     self.process = psutil.Process()
 
     # A reference for all our workers. Keys are thread names, and values are the
@@ -354,6 +354,24 @@ class ThreadPoolTest(test_lib.GRRBaseTest):
     finally:
       pool.Stop()
 
+  def testSharedPoolIsStoppedAfterLastUse(self):
+    prefix = "shared_pool"
+    with threadpool.ThreadPool.Shared(prefix, 1, max_threads=10) as pool:
+      self.assertTrue(pool.started)
+
+      with threadpool.ThreadPool.Shared(prefix, 1, max_threads=10) as pool2:
+        self.assertIs(pool2, pool)
+      self.assertTrue(pool.started)
+
+    self.assertFalse(pool.started)
+    self.assertEqual(self.Count(prefix), 0)
+
+    # The pool is started again by the next use.
+    with threadpool.ThreadPool.Shared(prefix, 1, max_threads=10) as pool3:
+      self.assertIs(pool3, pool)
+      self.assertTrue(pool.started)
+    self.assertFalse(pool.started)
+
   def testAnonymousThreadpool(self):
     """Tests that we can't starts anonymous threadpools."""
     prefix = None
@@ -149,23 +149,27 @@ class GRRWorker(object):
     """Processes message handler requests."""
     logging.debug("Leased message handler request ids: %s", ",".join(
         str(r.request_id) for r in requests))
-    grouped_requests = collection.Group(requests, lambda r: r.handler_name)
-    for handler_name, requests_for_handler in iteritems(grouped_requests):
-      handler_cls = handler_registry.handler_name_map.get(handler_name)
-      if not handler_cls:
-        logging.error("Unknown message handler: %s", handler_name)
-        continue
+    # Handlers work on state that was just written by frontends, so none of
+    # their reads can go to a lagging read replica.
+    with data_store.REL_DB.ReadsFromPrimary():
+      grouped_requests = collection.Group(requests, lambda r: r.handler_name)
+      for handler_name, requests_for_handler in iteritems(grouped_requests):
+        handler_cls = handler_registry.handler_name_map.get(handler_name)
+        if not handler_cls:
+          logging.error("Unknown message handler: %s", handler_name)
+          continue
 
-      stats_collector_instance.Get().IncrementCounter(
-          "well_known_flow_requests", fields=[handler_name])
+        stats_collector_instance.Get().IncrementCounter(
+            "well_known_flow_requests", fields=[handler_name])
 
-      try:
-        logging.debug("Running %d messages for handler %s",
-                      len(requests_for_handler), handler_name)
-        handler_cls(token=self.token).ProcessMessages(requests_for_handler)
-      except Exception as e:  # pylint: disable=broad-except
-        logging.exception("Exception while processing message handler %s: %s",
-                          handler_name, e)
+        try:
+          logging.debug("Running %d messages for handler %s",
+                        len(requests_for_handler), handler_name)
+          handler_cls(token=self.token).ProcessMessages(requests_for_handler)
+        except Exception as e:  # pylint: disable=broad-except
+          logging.exception(
+              "Exception while processing message handler %s: %s",
+              handler_name, e)
 
     logging.debug("Deleting message handler request ids: %s", ",".join(
         str(r.request_id) for r in requests))
@@ -407,6 +411,13 @@ class GRRWorker(object):
 
   def ProcessFlow(self, flow_processing_request):
     """The callback for the flow processing queue."""
+    # Flows are processed based on state that frontends and other workers have
+    # just written, so none of the reads can go to a lagging read replica.
+    with data_store.REL_DB.ReadsFromPrimary():
+      self._ProcessFlow(flow_processing_request)
+
+  def _ProcessFlow(self, flow_processing_request):
+    """Processes all the ready requests of a flow."""
 
     client_id = flow_processing_request.client_id
     flow_id = flow_processing_request.flow_id
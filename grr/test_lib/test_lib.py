@@ -91,6 +91,8 @@ class GRRBaseTest(absltest.TestCase):
     # to access the delegate directly (assuming it's an InMemoryDB
     # implementation).
     data_store.REL_DB.delegate.ClearTestDB()
+    # An index built before the database was cleared would be stale.
+    data_store.REL_DB.client_bitmap_index = None
 
     aff4.FACTORY.Flush()
 